@@ -2,6 +2,223 @@
 #Copyright ©: Licel Gmbh
 
 import socket
+import threading
+import numpy
+from dataclasses import dataclass, field
+
+from typing import TYPE_CHECKING, Any
+if TYPE_CHECKING:
+    from Licel import licel_heartbeat
+
+#: maximal number of commands written at once by ``CommandBatch``, the responses 
+#: of these commands are read before the next commands are written.
+MAX_PIPELINED_COMMANDS = 32
+
+def setKeepAlive(sock: socket.socket, idle: int | None = None, interval: int | None = None,
+                 count: int | None = None) -> None:
+    """
+    enable TCP keepalive on ``sock`` and set its timing where the platform supports it.
+
+    :param sock: socket
+    :type sock: socket.socket
+
+    :param idle: idle seconds before the first keepalive probe
+    :type idle: int | None
+
+    :param interval: seconds between keepalive probes
+    :type interval: int | None
+
+    :param count: unanswered probes before the connection is dropped
+    :type count: int | None
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, "SIO_KEEPALIVE_VALS") and idle is not None and interval is not None:
+        # windows sets idle time and interval in ms with a single ioctl
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
+        return
+    # TCP_KEEPALIVE is the name of TCP_KEEPIDLE on macOS
+    idleOption = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+    for option, value in ((idleOption, idle),
+                          (getattr(socket, "TCP_KEEPINTVL", None), interval),
+                          (getattr(socket, "TCP_KEEPCNT", None), count)):
+        if option is not None and value is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+@dataclass
+class SocketOptions:
+    """
+    options of the command and push sockets. The defaults leave the operating system 
+    defaults untouched, except for the timeouts. 
+    Options not supported by the platform, like ``TCP_QUICKACK`` outside Linux, are ignored.
+    """
+    #: timeout in seconds of the command socket
+    commandTimeout    : float = field(default =5.0)
+    #: timeout in seconds of the push socket
+    pushTimeout       : float = field(default =5.0)
+    #: receive buffer size of the push socket in bytes (``SO_RCVBUF``), None for the 
+    #: system default. It is set before connecting so that the TCP window can use it.
+    pushReceiveBuffer : int | None = field(default =None)
+    #: disable the Nagle algorithm on the command socket (``TCP_NODELAY``)
+    commandNoDelay    : bool = field(default =False)
+    #: acknowledge the push data immediately (``TCP_QUICKACK``, Linux only). The kernel 
+    #: clears the option, it is set again after each receive into the push buffer.
+    quickAck          : bool = field(default =False)
+    #: enable TCP keepalive on both sockets
+    keepAlive         : bool = field(default =False)
+    #: idle time in seconds before the first keepalive probe, None for the system default
+    keepAliveIdle     : int | None = field(default =None)
+    #: interval between keepalive probes in seconds
+    keepAliveInterval : int | None = field(default =None)
+    #: number of unanswered keepalive probes before the connection is dropped
+    keepAliveCount    : int | None = field(default =None)
+
+    def applyToCommandSocket(self, sock: socket.socket) -> None:
+        """ set the options of the command socket, before connecting """
+        sock.settimeout(self.commandTimeout)
+        if self.commandNoDelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.keepAlive:
+            setKeepAlive(sock, self.keepAliveIdle, self.keepAliveInterval, self.keepAliveCount)
+
+    def applyToPushSocket(self, sock: socket.socket) -> None:
+        """ set the options of the push socket, before connecting """
+        sock.settimeout(self.pushTimeout)
+        if self.pushReceiveBuffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.pushReceiveBuffer)
+        if self.keepAlive:
+            setKeepAlive(sock, self.keepAliveIdle, self.keepAliveInterval, self.keepAliveCount)
+
+    def applyToConnectedPushSocket(self, sock: socket.socket) -> None:
+        """ set the options of the push socket which only apply to a connected socket """
+        if self.usesQuickAck():
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+    def usesQuickAck(self) -> bool:
+        """ True if ``quickAck`` is set and supported by the platform """
+        return self.quickAck and hasattr(socket, "TCP_QUICKACK")
+
+class BufferPool:
+
+    """
+    pool of preallocated numpy uint16 buffers keyed by their number of elements. 
+    Buffers are taken with ``acquire()`` and given back with ``release()`` so that 
+    repeated reads of the same size do not allocate.
+    The pool is thread safe.
+    """
+
+    def __init__(self, maxBuffersPerSize: int = 4) -> None:
+        """
+        :param maxBuffersPerSize: maximal number of free buffers kept for each size
+        :type maxBuffersPerSize: int
+        """
+        self.maxBuffersPerSize = maxBuffersPerSize
+        self._freeBuffers : dict[int, list[numpy.ndarray[Any, numpy.dtype[numpy.uint16]]]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, nBins: int) -> numpy.ndarray[Any, numpy.dtype[numpy.uint16]]:
+        """
+        :param nBins: number of uint16 elements
+        :type nBins: int
+
+        :returns: buffer of ``nBins`` elements, the content is undefined.
+        :rtype: numpy.ndarray(dtype=uint16, ndim =1)
+        """
+        with self._lock:
+            freeBuffers = self._freeBuffers.get(nBins)
+            if freeBuffers:
+                return freeBuffers.pop()
+        return numpy.empty(nBins, numpy.uint16)
+
+    def release(self, buffer: numpy.ndarray[Any, numpy.dtype[numpy.uint16]]) -> None:
+        """
+        give a buffer back to the pool, it must not be used afterwards.
+
+        :param buffer: buffer returned by ``acquire()``
+        :type buffer: numpy.ndarray(dtype=uint16, ndim =1)
+        """
+        with self._lock:
+            freeBuffers = self._freeBuffers.setdefault(buffer.size, [])
+            if len(freeBuffers) < self.maxBuffersPerSize:
+                freeBuffers.append(buffer)
+
+    def clear(self) -> None:
+        """ drop all free buffers """
+        with self._lock:
+            self._freeBuffers.clear()
+
+class CommandBatch:
+
+    """
+    commands queued for a pipelined execution: the commands are written with a single 
+    send, the responses are then read and verified in order. This saves one network 
+    round trip per command compared with ``util._writeReadAndVerify()``.
+    The commands following a barrier, for example the commands configuring the transient
+    recorder selected by a ``SELECT``, are written only after the response of the barrier
+    was verified.
+
+    Usage::
+
+        batch = ethernetController.commandBatch()
+        batch.add("SELECT 0", "executed", barrier = True)
+        batch.add("STAT?")
+        responses = batch.execute()
+    """
+
+    def __init__(self, connection: 'util',
+                 maxPipelinedCommands: int = MAX_PIPELINED_COMMANDS) -> None:
+        self.connection = connection
+        self.maxPipelinedCommands = maxPipelinedCommands
+        self.commands : list[tuple[str, str | None, bool]] = []
+
+    def add(self, command: str, verifyString: str | None = None, barrier: bool = False) -> None:
+        """
+        queue a command.
+
+        :param command: command to be sent. 
+        :type command: str 
+
+        :param verifyString: substring expected to be received in the response, 
+            None to accept any response.
+        :type verifyString: str 
+
+        :param barrier: write the following commands only after the response of this
+            command was verified.
+        :type barrier: bool
+        """
+        self.commands.append((command, verifyString, barrier))
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def execute(self) -> list[str]:
+        """
+        write the queued commands and read their responses. The queue is emptied. 
+
+        :raises: RuntimeError with the response of the first command whose response does
+            not contain the expected `verifyString`. All responses of the commands written
+            so far are read before, the command connection stays usable. The commands
+            after the first barrier not written yet are not sent.
+
+        :returns: responses in the order of the commands
+        :rtype: list[str]
+        """
+        commands, self.commands = self.commands, []
+        responses : list[str] = []
+        first = 0
+        while first < len(commands):
+            end = min(first + self.maxPipelinedCommands, len(commands))
+            # a chunk ends after a barrier, its response is verified before the next chunk
+            end = next((index + 1 for index in range(first, end) if commands[index][2]), end)
+            chunk = commands[first : end]
+            first = end
+            with self.connection.commandLock:
+                self.connection.writeCommands([command for command, _, _ in chunk])
+                chunkResponses = [self.connection.readResponse() for _ in chunk]
+            for (command, verifyString, _), resp in zip(chunk, chunkResponses):
+                if verifyString is not None and resp.find(verifyString) == -1 :
+                    raise RuntimeError(resp)
+            responses.extend(chunkResponses)
+        return responses
 
 class util:
 
@@ -10,14 +227,24 @@ class util:
     the class is to be inherited by licelTCP and licelTrTCP
 
     """
+
+    #: buffers used by ``recvInto()`` when no output buffer is given, shared by all instances
+    bufferPool = BufferPool()
+    #: liveness supervision probing on the command socket, see ``licel_heartbeat``
+    heartbeat : 'licel_heartbeat.Heartbeat | None' = None
     
-    def __init__(self, ip: str, port : int):
+    def __init__(self, ip: str, port : int, socketOptions: SocketOptions | None = None):
         self.commandSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.PushSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.killsock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-        self.commandSocket.settimeout(5) # 1sec timeout 
-        self.PushSocket.settimeout(5)
+        #: options applied to the command and push sockets
+        self.socketOptions = socketOptions if socketOptions is not None else SocketOptions()
+        self.socketOptions.applyToCommandSocket(self.commandSocket)
+        self.socketOptions.applyToPushSocket(self.PushSocket)
+        #: serializes the command/response pairs of the threads sharing the command socket,
+        #: for example the acquisition and the ``licel_heartbeat.Heartbeat`` probes.
+        self.commandLock = threading.RLock()
         self.sockFile=self.commandSocket.makefile('rw')
         self.pushSockFile=self.PushSocket.makefile('rw')
         self.ip = ip
@@ -35,10 +262,35 @@ class util:
 
         :type command: str 
         """
+        if self.heartbeat is not None and self.heartbeat.lateResponsePending:
+            self.heartbeat.discardLateResponse()
         command = command+"\r\n"
         self.commandSocket.send(command.encode())
         return
 
+    def writeCommands(self, commands: list[str]) -> None:
+        """
+        write several commands with a single send. adds <CRLF> to each command.
+
+        :param commands: commands to be sent
+        :type commands: list[str]
+        """
+        if self.heartbeat is not None and self.heartbeat.lateResponsePending:
+            self.heartbeat.discardLateResponse()
+        self.commandSocket.sendall("".join(command + "\r\n" for command in commands).encode())
+
+    def commandBatch(self, maxPipelinedCommands: int = MAX_PIPELINED_COMMANDS) -> CommandBatch:
+        """
+        create a batch of pipelined commands, see ``CommandBatch``.
+
+        :param maxPipelinedCommands: maximal number of commands written at once
+        :type maxPipelinedCommands: int
+
+        :returns: empty command batch executed on this connection
+        :rtype: CommandBatch
+        """
+        return CommandBatch(self, maxPipelinedCommands)
+
     def readResponse(self) -> str:
         """
         read response from the command socket of the ethernet controller. 
@@ -71,6 +323,45 @@ class util:
                 return None
             rawData.extend(packet)
         return rawData
+
+    def recvInto(self, nBins: int,
+                 out: numpy.ndarray[Any, numpy.dtype[numpy.uint16]] | None = None
+                 ) -> numpy.ndarray[Any, numpy.dtype[numpy.uint16]]:
+        """
+        receive the number of nBins specified directly into a uint16 buffer, 
+        without intermediate copies. \r\n
+        If ``out`` is not given the buffer is taken from ``bufferPool``, it should be 
+        given back with ``self.bufferPool.release()`` once the data is processed.
+
+        :param nBins: number of bins to read. Note that a bin consists of uint16, 
+                      so the total number of received bytes equals 2* bins    
+        :type nBins: int  
+
+        :param out: contiguous buffer of at least ``nBins`` elements receiving the raw data.
+        :type out: numpy.ndarray(dtype=uint16, ndim =1) 
+
+        :raises: ConnectionResetError if the counter part closes the connection
+
+        :returns: buffer holding the raw data, ``out`` if given.
+        :rtype: numpy.ndarray(dtype=uint16, ndim =1) 
+        """
+        pooled = out is None
+        if out is None:
+            out = self.bufferPool.acquire(nBins)
+        view = memoryview(out).cast('B')[:2*nBins]
+        received = 0
+        try:
+            while received < len(view):
+                nbytes = self.commandSocket.recv_into(view[received:])
+                if not nbytes:
+                    #connection closed by the counter part
+                    raise ConnectionResetError ("\nCommand connection was closed by the remote host.")
+                received += nbytes
+        except BaseException:
+            if pooled:
+                self.bufferPool.release(out)
+            raise
+        return out
     
     def _writeReadAndVerify(self, command:str, verifyString:str) -> str:
         """
@@ -87,8 +378,9 @@ class util:
         :returns: response 
         :rtype: str
         """
-        self.writeCommand(command)
-        resp= self.readResponse()
+        with self.commandLock:
+            self.writeCommand(command)
+            resp= self.readResponse()
         if resp.find(verifyString) == -1 :
             raise RuntimeError(resp)
         return resp
\ No newline at end of file
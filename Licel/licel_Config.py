@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
 import configparser
+from Licel import TCP_util
 
 
 @dataclass()
@@ -150,9 +151,16 @@ class Config():
     numDataSets = 0 
     #: parser object to parse the .ini configuration file 
     parser = configparser.ConfigParser()
+    #: options of the ethernet controller sockets, from the optional [socket] section
+    socketOptions : TCP_util.SocketOptions = TCP_util.SocketOptions()
 
     def __init__(self, acquisIniPath: str ) -> None:
-        self.acquisIniConfigPath = acquisIniPath 
+        self.acquisIniConfigPath = acquisIniPath
+        # per instance state, several configurations can be used in the same process
+        self.measurementInfo = MeasureInfo()
+        self.TrConfigs = [ ]
+        self.parser = configparser.ConfigParser()
+        self.socketOptions = TCP_util.SocketOptions()
 
     def readConfig(self):
         '''
@@ -162,6 +170,7 @@ class Config():
         '''
         self.__getGlobalInfoConfig__()
         self.__getAcquisConfig__() 
+        self.__getSocketConfig__()
 
 
         return self.TrConfigs  
@@ -231,6 +240,37 @@ class Config():
                         self.measurementInfo.Zenith = float(self.parser[section][key].replace(",","."))
         self.parser.clear()
 
+    def __getSocketConfig__(self):
+        '''
+        get the socket options from the optional [socket] section: 
+        command_timeout, push_timeout, push_rcvbuf, tcp_nodelay, tcp_quickack, 
+        keepalive, keepalive_idle, keepalive_interval, keepalive_count
+        '''
+        self.parser.read(self.acquisIniConfigPath)
+        if not self.parser.has_section("socket"):
+            return
+        section = "socket"
+        options = self.socketOptions
+        for key in self.parser[section]:
+            if (key == "command_timeout"):
+                options.commandTimeout = float(self.parser[section][key].replace(",","."))
+            if (key == "push_timeout"):
+                options.pushTimeout = float(self.parser[section][key].replace(",","."))
+            if (key == "push_rcvbuf"):
+                options.pushReceiveBuffer = self.parser.getint(section,key)
+            if (key == "tcp_nodelay"):
+                options.commandNoDelay = self.parser.getboolean(section,key)
+            if (key == "tcp_quickack"):
+                options.quickAck = self.parser.getboolean(section,key)
+            if (key == "keepalive"):
+                options.keepAlive = self.parser.getboolean(section,key)
+            if (key == "keepalive_idle"):
+                options.keepAliveIdle = self.parser.getint(section,key)
+            if (key == "keepalive_interval"):
+                options.keepAliveInterval = self.parser.getint(section,key)
+            if (key == "keepalive_count"):
+                options.keepAliveCount = self.parser.getint(section,key)
+
     def __getAcquisConfig__(self): 
         '''
         Get acquisition parameter for each transient recorder in .ini file 
@@ -0,0 +1,593 @@
+'''
+Copyright ©: Licel Gmbh
+
+asyncio client for the ethernet controller and the transient recorders.
+The AsyncEthernetController and AsyncTransientRecorder classes provide the commands of
+EthernetController and TransientRecorder as coroutines, built on asyncio streams.
+A single event loop can therefore drive several controllers concurrently::
+
+    async def acquire(ip, port, Config, shots):
+        controller = licel_asyncio.AsyncEthernetController(ip, port)
+        await controller.openConnection()
+        await controller.openPushConnection()
+        await controller.Tr.listInstalledTr()
+        await controller.Tr.configureHardware(Config)
+        await controller.Tr.MPushStartFromConfig(shots, Config)
+        async for (DataSet, time_stamp, analogue_shots, pc_shots,
+                   startTime, stopTime) in controller.Tr.pushFrames(dataParser):
+            ...
+'''
+import asyncio
+from datetime import datetime
+
+from Licel import licel_mpush, licel_tr_tcpip, licel_cache, licel_capture
+
+from typing import TYPE_CHECKING, Any, AsyncIterator
+if TYPE_CHECKING:
+    import numpy
+    from Licel import licel_data, licel_Config
+
+#: timeout in seconds for connecting and for the response to a command
+COMMAND_TIMEOUT = 5
+#: seconds without push data before the controller is probed with ``*IDN?``
+PUSH_IDLE_TIMEOUT = 5
+
+class AsyncUtil:
+    '''
+    asyncio counterpart of ``TCP_util.util``, holds the command and push streams.
+    A lock serializes the command/response pairs, so that coroutines sharing a controller,
+    for example the push idle check and the user commands, do not mix up the responses.
+    '''
+
+    def __init__(self, ip: str, port : int) -> None:
+        self.ip = ip
+        self.port = port
+        self.pushPort = port + 1
+        self.killPort = port + 2
+        self.commandReader : asyncio.StreamReader | None = None
+        self.commandWriter : asyncio.StreamWriter | None = None
+        self.pushReader    : asyncio.StreamReader | None = None
+        self.pushWriter    : asyncio.StreamWriter | None = None
+        self.commandLock = asyncio.Lock()
+
+    async def writeCommand(self, command: str) -> None:
+        """
+        write the specified command to the ethernet controller.
+        adds <CRLF> to each command before sending.
+
+        :param command: possible command are referenced in \r\n
+        https://licel.com/manuals/ethernet_pmt_tr.pdf#section.9.1
+
+        :type command: str
+        """
+        command = command+"\r\n"
+        self.commandWriter.write(command.encode())
+        await self.commandWriter.drain()
+
+    async def writeCommands(self, commands: list[str]) -> None:
+        """
+        write several commands at once, see ``TCP_util.util.writeCommands()``
+        """
+        self.commandWriter.write("".join(command + "\r\n" for command in commands).encode())
+        await self.commandWriter.drain()
+
+    async def readResponse(self) -> str:
+        """
+        read response from the command socket of the ethernet controller.
+        As for ``TCP_util.util.readResponse()`` the line ending is changed to \\n
+
+        :returns: response string.
+        :raises: TimeoutError if the controller fails to respond.
+        """
+        try:
+            line = await asyncio.wait_for(self.commandReader.readline(), COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError ("Response timeout")
+        response = line.decode()
+        if response.endswith("\r\n"):
+            response = response[:-2] + "\n"
+        return response
+
+    async def recvall(self, nBins: int) -> bytes | None:
+        """
+        receive the number of nBins specified \r\n
+
+        :param nBins: number of bins to read. Note that a bin consists of uint16,
+                      so the total number of received bytes equals 2* bins
+        :type nBins: int
+
+        :returns: bytes of size (2*nBins) containing the raw data,
+            None if the connection was closed by the counter part.
+        """
+        try:
+            return await self.commandReader.readexactly(2*nBins)
+        except asyncio.IncompleteReadError:
+            return None
+
+    async def _writeReadAndVerify(self, command:str, verifyString:str) -> str:
+        """
+        helper function to write on the command socket, it reads and verifies the response
+
+        :param command: command to be sent.
+        :type command: str
+
+        :param verifyString: substring expected to be received in the response
+        :type: str
+
+        :raises: RuntimeError if the response does not contain the expected `verifyString`
+
+        :returns: response
+        :rtype: str
+        """
+        async with self.commandLock:
+            await self.writeCommand(command)
+            resp = await self.readResponse()
+        if resp.find(verifyString) == -1 :
+            raise RuntimeError(resp)
+        return resp
+
+class AsyncEthernetController(AsyncUtil):
+    '''
+    asyncio counterpart of ``licel_tcpip.EthernetController``
+    '''
+
+    #:
+    Tr: 'AsyncTransientRecorder'
+
+    def __init__(self, ip: str, port : int) -> None:
+        AsyncUtil.__init__(self, ip, port)
+        self.Tr = AsyncTransientRecorder(self)
+
+    async def openConnection(self) -> None:
+        """
+        Open connection to the command socket
+
+        :raises TimeoutError: attempted connection but controller did not respond.
+        """
+        try:
+            (self.commandReader,
+             self.commandWriter) = await asyncio.wait_for(asyncio.open_connection(self.ip,
+                                                                                  self.port),
+                                                          COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError ("\nConnection timeout to IP: "+self.ip +
+                                " PORT: "+str(self.port))
+
+    async def shutdownConnection(self) -> None:
+        """ close connection to the command socket """
+        self.commandWriter.close()
+        await self.commandWriter.wait_closed()
+
+    async def openPushConnection(self) -> None:
+        """
+        Open connection to the push socket
+
+        :raises TimeoutError: attempted connection but controller did not respond.
+        """
+        try:
+            (self.pushReader,
+             self.pushWriter) = await asyncio.wait_for(asyncio.open_connection(self.ip,
+                                                                               self.pushPort),
+                                                       COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError ("\nConnection timeout to IP: "+self.ip +
+                                " PORT: "+str(self.pushPort))
+
+    async def shutdownPushConnection(self) -> None:
+        """ close connection to the push socket """
+        self.pushWriter.close()
+        await self.pushWriter.wait_closed()
+
+    async def killSocket(self) -> None:
+        """
+        connect on the controller ``kill port`` and ask the controller to close all its
+        open connections. see ``licel_tcpip.EthernetController.killSocket()``
+
+        :raises TimeoutError: if unable to connect to kill port.
+        """
+        try:
+            _, killWriter = await asyncio.wait_for(asyncio.open_connection(self.ip,
+                                                                           self.killPort),
+                                                   COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError ("\nKill socket Connection timeout to IP: "+self.ip +
+                                " PORT: "+str(self.killPort))
+        killWriter.write("KILL SOCKETS Administrator\r\n".encode())
+        await killWriter.drain()
+        killWriter.close()
+
+    async def getID(self) -> str:
+        ''' Get the identification string from the controller '''
+        return await self._writeReadAndVerify("*IDN?", " ")
+
+    async def getCapabilities(self) -> str:
+        ''' Get the available subcomponents of the ethernet controller '''
+        return await self._writeReadAndVerify("CAP?", "CAP")
+
+    async def getMilliSecs(self) -> str:
+        ''' Requests the millisecond timer value of the controller '''
+        return await self._writeReadAndVerify("MILLISEC?", " ")
+
+class AsyncTransientRecorder:
+    '''
+    asyncio counterpart of ``licel_tr_tcpip.TransientRecorder``.
+    The commands are sent over the streams of the owning ``AsyncEthernetController``.
+    Contrary to ``TransientRecorder`` the hardware information and the installed
+    transient recorders are kept per instance, each controller has its own.
+    '''
+
+    def __init__(self, controller: AsyncEthernetController) -> None:
+        self.controller = controller
+        self.bigEndianTimeStamp = False
+        #: preallocated buffer holding the received push data
+        self.pushBuffer = licel_mpush.PushBuffer()
+        #: layout of the MPUSH frames, set by ``MPushStartFromConfig()``
+        self.frameLayout : licel_mpush.MPushFrameLayout | None = None
+        #: a dictionary containing hardware info for each active transient recorder.
+        self.hardwareInfos : dict[int, dict[str, int | str | float]] = {}
+        self.TrDict : dict[str, str] = {}
+        #: number of invalid frames removed from the push buffer by ``pushFrames()``
+        self.invalidFrames = 0
+        #: capture of the received push data, set by ``startPushCapture()``
+        self.pushCapture : 'licel_capture.PushCapture | None' = None
+        self._controllerIdentifier : str | None = None
+
+    async def _writeReadAndVerify(self, command:str, verifyString:str) -> str:
+        return await self.controller._writeReadAndVerify(command, verifyString)
+
+    async def _writeRead(self, command: str) -> str:
+        ''' write ``command`` and return the unverified response '''
+        controller = self.controller
+        async with controller.commandLock:
+            await controller.writeCommand(command)
+            return await controller.readResponse()
+
+    def startPushCapture(self, path: str, compression: str | None = None,
+                         metadata: dict[str, Any] | None = None) -> 'licel_capture.PushCapture':
+        '''
+        write the received push data to a capture file,
+        see ``TransientRecorder.startPushCapture()``. Called after ``MPushStartFromConfig()``.
+        '''
+        self.stopPushCapture()
+        header = {'hardwareInfos'      : self.hardwareInfos,
+                  'bigEndianTimeStamp' : self.bigEndianTimeStamp,
+                  'shots'              : self.frameLayout.shots if self.frameLayout else 0,
+                  'frameSize'          : self.frameLayout.frameSize if self.frameLayout else 0,
+                  'created'            : datetime.now().timestamp(),
+                  'metadata'           : metadata if metadata is not None else {}}
+        self.pushCapture = licel_capture.PushCapture(path, header, compression)
+        return self.pushCapture
+
+    def stopPushCapture(self) -> None:
+        ''' stop and close the capture started by ``startPushCapture()`` '''
+        pushCapture, self.pushCapture = self.pushCapture, None
+        if pushCapture is not None:
+            pushCapture.close()
+
+    async def getID(self) -> str:
+        ''' Get the identification string from the controller '''
+        return await self._writeReadAndVerify("*IDN?", " ")
+
+    async def selectTR(self, numTR : int) -> str:
+        """
+        select transient recorder to communicate with.
+
+        :param numTR: transient recorder adresse between 0 .. 15, -1 to deselect
+        :type numTR: int
+        """
+        if ( not isinstance(numTR, int) ):
+            raise ValueError ("selectTR argument must be an integer \r\n" "passed argument is :"+ str(type(numTR)))
+        return await self._writeReadAndVerify("SELECT " +str(numTR), "executed")
+
+    async def getStatus(self) -> tuple[bool, bool, str,int]:
+        ''' see ``TransientRecorder.getStatus()`` '''
+        acquisitionState =False
+        recording = False
+        memory = "MEM_A "
+        resp = await self._writeReadAndVerify("STAT?", "Shots")
+        if resp.find("Armed") != -1:
+            acquisitionState = True
+            recording = True
+        if resp.find("MemB") != -1:
+            memory = "MEM_B"
+        shots = resp.split(" ")[1]
+        return acquisitionState, recording, memory,int(shots)
+
+    async def listInstalledTr(self, useCache: bool = False) -> dict[str, str]:
+        '''
+        attempts to communicate with transient recorder with adresse 0 .. 15 and lists
+        all installed transient recorders. see ``TransientRecorder.listInstalledTr()``
+
+        :param useCache: return the result cached in ``licel_cache.trDiscoveryCache``
+            if the controller was probed before.
+
+        :raises RuntimeError: if no transient recorder is detected
+        '''
+        address = self._controllerAddress()
+        if useCache:
+            idn = await self.getID()
+            installed = licel_cache.trDiscoveryCache.get(address, idn)
+            if installed is not None:
+                self.TrDict = installed
+                return self.TrDict
+        commands = ["*IDN?", "SELECT -1"]
+        for i in range (0,16):
+            commands += ["SELECT " + str(i), "STAT?"]
+        # all probes in a single burst
+        async with self.controller.commandLock:
+            await self.controller.writeCommands(commands)
+            responses = [await self.controller.readResponse() for _ in commands]
+        for command, resp in zip(commands, responses):
+            if command.startswith("SELECT") and resp.find("executed") == -1:
+                raise RuntimeError(resp)
+        idn = responses[0]
+        self._controllerIdentifier = address + " " + idn.strip()
+        installed = 0
+        self.TrDict = {}
+        for i, resp in enumerate(responses[3::2]):
+            key = "TR" + str(i)
+            if (resp.find("Shots") >= 0):
+                installed += 1
+                self.TrDict[key] = "installed"
+            else:
+                self.TrDict[key] = "not installed"
+        if installed == 0:
+            raise RuntimeError ("no TR detected")
+        licel_cache.trDiscoveryCache.store(address, idn, self.TrDict)
+        return self.TrDict
+
+    def invalidateInstalledTr(self) -> None:
+        ''' see ``TransientRecorder.invalidateInstalledTr()`` '''
+        licel_cache.trDiscoveryCache.invalidate(self._controllerAddress())
+
+    def _controllerAddress(self) -> str:
+        return "{}:{}".format(self.controller.ip, self.controller.port)
+
+    async def _controllerId(self) -> str:
+        ''' see ``TransientRecorder._controllerId()`` '''
+        if self._controllerIdentifier is None:
+            self._controllerIdentifier = self._controllerAddress() + " " + (await self.getID()).strip()
+        return self._controllerIdentifier
+
+    async def refreshHardwareInfo(self) -> None:
+        ''' see ``TransientRecorder.refreshHardwareInfo()`` '''
+        licel_cache.hardwareInfoCache.refresh(await self._controllerId())
+
+    async def setSlaveMode(self) -> str:
+        ''' Set slave mode. End push mode '''
+        return await self._writeReadAndVerify("SLAVE", "executed")
+
+    async def MPushStop(self) -> str:
+        """ stops the push/mpush mode. Internally it sends a ``SLAVE`` command. """
+        return await self.setSlaveMode()
+
+    async def clearMemory(self) -> str:
+        ''' Clear both memories (A and B) of the previously selected device. '''
+        return await self._writeReadAndVerify("CLEAR", "executed")
+
+    async def enablePretrigger(self) -> str:
+        ''' Enable the pretrigger for a selected TR '''
+        return await self._writeReadAndVerify("PRETRIG 1", "executed")
+
+    async def disablePretrigger(self) -> str:
+        ''' Disable the pretrigger for a selected TR '''
+        return await self._writeReadAndVerify("PRETRIG 0", "executed")
+
+    async def blockRackTrigger(self, trig: str) -> str:
+        '''
+        Block a trigger related to the acquisition at the specified Memory.
+
+        :param trig: trigger to be blocked, possible value are ``A``, ``B``, ``C``, ``D``
+        :type trig: str
+        '''
+        mode, expected = licel_tr_tcpip.TransientRecorder._blockRackTriggerCommand(trig)
+        resp = await self._writeRead(mode)
+        assert resp == expected, "\r\nLicel_TCPIP_BlockRackTrigger - Error 5108 : " + resp
+        return resp
+
+    async def unblockRackTrigger(self) -> str:
+        ''' To unblock previously blocked triggers by ``blockRackTrigger`` '''
+        command, expected = licel_tr_tcpip.TransientRecorder._unblockRackTriggerCommand()
+        resp = await self._writeRead(command)
+        assert resp == expected, "\r\nLicel_TCPIP_UnblockRackTrigger - Error 5108 : " + resp
+        return resp
+
+    async def setMaxShots(self, maxShots : int) ->str:
+        ''' Set the maxmimum shotnumber of the TR, between 1 and 65534 '''
+        if (not (maxShots <= 65534 and maxShots >= 1)):
+            raise ValueError ('setMaxShots argument must be in range of (1 ... 65534) ')
+        return await self._writeReadAndVerify("SETMAXSHOTS "+ str(maxShots), "executed")
+
+    async def setThresholdMode(self, thresholdMode : str) -> str:
+        ''' Sets the damping state to either "ON" or "OFF" '''
+        if (not ((thresholdMode != 'ON') ^ (thresholdMode != 'OFF'))):
+            raise ValueError ('setThresholdMode argument must be either "ON" or "OFF" \r\n passed argument is :'+thresholdMode)
+        cmd = "THRESHOLD 1" if thresholdMode == 'ON' else "THRESHOLD 0"
+        return await self._writeReadAndVerify(cmd, "Damping")
+
+    async def setInputRange(self, Range : str ) -> str:
+        ''' Change the input voltage range to "-500mV", "-100mV" or "-20mV" '''
+        if (not (Range in licel_tr_tcpip.INPUTRANGE.keys())):
+            raise ValueError ('setInputRange argument must be either "-500mV", "-100mV", "-20mV" \r\n passed argument is :'+ Range)
+        cmd = (("RANGE "+str(licel_tr_tcpip.INPUTRANGE[Range])))
+        return await self._writeReadAndVerify(cmd, "set to " + Range)
+
+    async def setDiscriminatorLevel(self, discriminatorLevel:int ) -> str:
+        ''' Set the discriminator level between 0 and 63 for the selected transient recorder '''
+        if (discriminatorLevel <0 or discriminatorLevel > 63):
+            raise ValueError ('setDiscriminatorLevel() discriminatorLevel must be in range 1 ... 63 \r\n passed argument is :'+ str(discriminatorLevel))
+        return await self._writeReadAndVerify("DISC " + str(discriminatorLevel), "set to")
+
+    async def _getFreqDivider(self) -> str:
+        ''' Retrieve the frequency divider, see ``TransientRecorder._getFreqDivider()`` '''
+        return await self._writeReadAndVerify("FREQDIV?", " ")
+
+    async def multiplyBinwidth(self, multiplier: int) -> str:
+        '''
+        Multiply the the transient recorder base binwidth by ``multiplier``,
+        possible value are 0, 1, 2 ,4, 8, 16, 32, 64, 128.
+        '''
+        if (multiplier & (multiplier-1) != 0 or multiplier > 128 or multiplier < 0):
+            raise ValueError ('\r\n multiplier must be 0 or a power of 2, possible value are 0, 1, 2 ,4, 8, 16, 32, 64, 128. Passed argument is :'+ str(multiplier))
+        exponent = max(multiplier, 1).bit_length() - 1
+        return await self._writeReadAndVerify("FREQDIV "+ str(exponent)+" 0", str(exponent))
+
+    async def TRtype(self) -> dict[str, int | float | str]:
+        ''' Get transient recorder hardware information for the selected transient recorder '''
+        resp = await self._writeReadAndVerify("TRTYPE?", "TRTYPE ADC Bits")
+        return licel_tr_tcpip.parseTRtypeResponse(resp)
+
+    def _activeTransientRecorders(self, Config: 'licel_Config.Config') -> list['licel_Config.TrConfig']:
+        ''' transient recorders with at least one enabled data set '''
+        return [trConfig for trConfig in Config.TrConfigs
+                if any(trConfig.analogueEnabled[key] == True or trConfig.pcEnabled[key] == True
+                       for key in trConfig.analogueEnabled)]
+
+    async def configureHardware(self, Config: 'licel_Config.Config') -> None:
+        """
+        Configure the active transient recorders hardware as specified in config,
+        see ``TransientRecorder.configureHardware()``
+
+        :param Config: holds the acquisition configuration information
+        :type Config: Licel.licel_acq.Config()
+        """
+        if not Config.TrConfigs :
+            raise RuntimeError("Config file does not contain any transient recorder configuration.")
+        for trConfig in self._activeTransientRecorders(Config):
+            await self.selectTR(trConfig.nTransientRecorder)
+            await self.setSlaveMode()
+            await self.clearMemory()
+            await self.setDiscriminatorLevel(trConfig.discriminator)
+            if trConfig.pretrigger == 0:
+                await self.disablePretrigger()
+            else:
+                await self.enablePretrigger()
+            await self.setThresholdMode("ON" if trConfig.threshold != 0 else "OFF")
+            if trConfig.shotLimit != 0 :
+                await self.setMaxShots(trConfig.shotLimit)
+            await self.setInputRange("-"+ str(trConfig.nRange) +"mV")
+            await self.multiplyBinwidth(trConfig.freqDivider)
+            await self.unblockRackTrigger()
+            for trigger in ("A", "B", "C", "D"):
+                if trConfig.blockedTrig[trigger]:
+                    await self.blockRackTrigger(trigger)
+        await self.selectTR(-1)
+        await self._getTrHardwareInfo(Config)
+
+    async def _getTrHardwareInfo(self, Config: 'licel_Config.Config') -> None:
+        '''
+        read the hardware description of each active transient recorder into ``hardwareInfos``,
+        descriptions found in ``licel_cache.hardwareInfoCache`` are not queried again.
+        '''
+        controllerId = await self._controllerId()
+        queried = False
+        for trConfig in self._activeTransientRecorders(Config):
+            description = licel_cache.hardwareInfoCache.get(controllerId, trConfig.nTransientRecorder)
+            if description is not None and description.hardwareInfo is not None:
+                self.hardwareInfos[trConfig.nTransientRecorder] = description.hardwareInfo
+                continue
+            await self.selectTR(trConfig.nTransientRecorder)
+            self.hardwareInfos[trConfig.nTransientRecorder] = await self.TRtype()
+            licel_cache.hardwareInfoCache.store(controllerId, trConfig.nTransientRecorder,
+                                                hardwareInfo = self.hardwareInfos[trConfig.nTransientRecorder])
+            queried = True
+        if queried:
+            await self.selectTR(-1)
+
+    async def _getTimestampEndianness(self) -> None:
+        Idn = await self.getID()
+        self.bigEndianTimeStamp = (Idn.find("ColdFireEthernet") != -1)
+
+    async def MPushStartFromConfig(self, shots: int, Config: 'licel_Config.Config') -> str:
+        '''
+        Starts the MPUSH acquisition mode from configuration,
+        see ``TransientRecorder.MPushStartFromConfig()``.
+        ``configureHardware()`` must have been called before.
+
+        :param shots: number of shots to be acquired
+        :type shots: int
+
+        :param Config: system configuration
+        :type Config: Licel.licel_acq.Config()
+
+        :returns: ethernet controller response
+        :rtype: str
+        '''
+        await self._getTimestampEndianness()
+        self.frameLayout = licel_mpush.MPushFrameLayout(Config, self.hardwareInfos, shots,
+                                                        self.bigEndianTimeStamp)
+        Config.numDataSets = len(self.frameLayout.datasets)
+        self.pushBuffer.clear()
+        self.pushBuffer.reserve(licel_tr_tcpip.PUSHBUFFER_FRAMES * self.frameLayout.bufferSize,
+                                self.frameLayout.bufferSize)
+        return await self._writeReadAndVerify(self.frameLayout.mpushCommand(), "executed")
+
+    async def recvPushData(self) -> None:
+        """
+        read push data until ``pushBuffer`` holds at least one frame and the next delimiter.
+        If no data is received for ``PUSH_IDLE_TIMEOUT`` seconds, checks if counterpart
+        is still reachable by sending ``*IDN?`` on the command socket.
+
+        :raises: ConnectionResetError if the counter part closes the connection
+        :raises: TimeoutError if counter part is unreachable
+        """
+        pushReader = self.controller.pushReader
+        while (len(self.pushBuffer) < self.frameLayout.bufferSize):
+            # asyncio.wait instead of asyncio.wait_for, wait_for may swallow a cancellation
+            # when the read completes at the same time, push data arrives continuously.
+            readTask = asyncio.ensure_future(pushReader.read(licel_mpush.DEFAULT_RECV_SIZE))
+            try:
+                done, _ = await asyncio.wait({readTask}, timeout = PUSH_IDLE_TIMEOUT)
+            except asyncio.CancelledError:
+                readTask.cancel()
+                raise
+            if not done:
+                readTask.cancel()
+                # if connection is broken a timeout will be raised
+                await self.getID()
+                continue
+            packet = readTask.result()
+            if not packet:
+                raise ConnectionResetError ("\nPush connection was closed by the remote host.")
+            self.pushBuffer.extend(packet)
+            if self.pushCapture is not None:
+                self.pushCapture.write(packet)
+
+    async def pushFrames(self, dataParser: 'licel_data.DataParser'
+                         ) -> AsyncIterator[tuple[list['numpy.ndarray[Any, numpy.dtype[numpy.uint32]]'],
+                                                  int,
+                                                  dict[int, dict[str, int]],
+                                                  dict[int, dict[str, int]],
+                                                  datetime, datetime]]:
+        '''
+        asynchronous iterator over the received MPUSH frames, started by
+        ``MPushStartFromConfig()``. The frames are checked by ``dataParser.frameValidator``,
+        invalid frames are removed from the push buffer and skipped.
+
+        :param dataParser: parser used for decoding the frames
+        :type dataParser: licel_data.DataParser
+
+        :returns: for each frame (DataSet, time_stamp, analogue_shots, pc_shots,
+            startTime, stopTime), as returned by ``DataParser.parseDataFromBuffer()``
+            followed by the reception start and stop time.
+        '''
+        frameLayout = self.frameLayout
+        startTime = datetime.now()
+        while True:
+            await self.recvPushData()
+            stopTime = datetime.now()
+            while len(self.pushBuffer) >= frameLayout.bufferSize:
+                if not dataParser.frameValidator.validate(frameLayout, self.pushBuffer.buffer,
+                                                          self.pushBuffer.start):
+                    dataParser.removeInvalidDataFromBuffer(self.pushBuffer,
+                                                            frameLayout.frameSize)
+                    self.invalidFrames += 1
+                    continue
+                (DataSet,
+                 time_stamp,
+                 analogue_shots,
+                 pc_shots) = dataParser.decodeFrame(frameLayout, self.pushBuffer.buffer,
+                                                    self.pushBuffer.start)
+                self.pushBuffer.consume(frameLayout.frameSize)
+                yield DataSet, time_stamp, analogue_shots, pc_shots, startTime, stopTime
+                startTime = stopTime
@@ -0,0 +1,236 @@
+'''
+Copyright ©: Licel Gmbh
+
+Caches for information queried from the ethernet controllers which does not change
+while the controller is running. They allow to skip the queries when reconnecting
+to a controller, for example after a network glitch.
+'''
+from dataclasses import dataclass, field, asdict
+import json
+import os
+import threading
+import time
+
+#: seconds a cached hardware description stays valid
+HARDWARE_INFO_TTL = 24 * 3600
+
+class TrDiscoveryCache:
+
+    """
+    installed transient recorders of each controller as returned by
+    ``TransientRecorder.listInstalledTr()``.
+    The entries are keyed on the controller address and its ``*IDN?`` response, a
+    controller replaced at the same address or running an other firmware is therefore
+    probed again. The cache can not detect transient recorders added to or removed
+    from a rack, ``invalidate()`` has to be called after changing the hardware.
+    """
+
+    def __init__(self) -> None:
+        self._entries : dict[tuple[str, str], dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(address: str, idn: str) -> tuple[str, str]:
+        return address, idn.strip()
+
+    def get(self, address: str, idn: str) -> dict[str, str] | None:
+        """
+        :param address: controller address as ``<ip>:<port>``
+        :type address: str
+
+        :param idn: ``*IDN?`` response of the controller
+        :type idn: str
+
+        :returns: copy of the cached installed transient recorders, None if the
+            controller was not probed yet.
+        :rtype: dict[str, str] | None
+        """
+        with self._lock:
+            installed = self._entries.get(self._key(address, idn))
+        return None if installed is None else dict(installed)
+
+    def store(self, address: str, idn: str, installed: dict[str, str]) -> None:
+        """
+        cache the installed transient recorders of the controller.
+
+        :param address: controller address as ``<ip>:<port>``
+        :type address: str
+
+        :param idn: ``*IDN?`` response of the controller
+        :type idn: str
+
+        :param installed: {'TR0': '(not)installed', ... 'TR15': '(not)installed'}
+        :type installed: dict[str, str]
+        """
+        with self._lock:
+            self._entries[self._key(address, idn)] = dict(installed)
+
+    def invalidate(self, address: str | None = None) -> None:
+        """
+        remove the cached entries of the controller at ``address``, all entries
+        if ``address`` is None.
+
+        :param address: controller address as ``<ip>:<port>``
+        :type address: str | None
+        """
+        with self._lock:
+            if address is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == address]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+#: transient recorder discovery cache shared by all controllers of the process
+trDiscoveryCache = TrDiscoveryCache()
+
+@dataclass
+class HardwareDescription:
+    """ cached hardware description of a single transient recorder """
+    #: ``TRTYPE?`` response as returned by ``licel_tr_tcpip.parseTRtypeResponse()``
+    hardwareInfo        : dict[str, int | float | str] | None = field(default =None)
+    #: exponent of the frequency divider, the binwidth is multiplied with (1 << exponent)
+    freqDividerExponent : int | None = field(default =None)
+    #: time.time() of the last update
+    updated             : float = field(default =0.0)
+
+class HardwareInfoCache:
+
+    """
+    hardware description of the transient recorders keyed by the controller ID and
+    the transient recorder address. An entry expires ``ttl`` seconds after its last
+    update, ``refresh()`` drops the entries explicitly so that they are queried again.
+    If ``path`` is given the cache is loaded from and saved to this JSON file, the
+    descriptions then survive a restart of the acquisition program.
+
+    :param ttl: seconds an entry stays valid, None for no expiry
+    :type ttl: float | None
+
+    :param path: JSON file to persist the cache, None to keep it in memory only
+    :type path: str | None
+    """
+
+    def __init__(self, ttl: float | None = HARDWARE_INFO_TTL, path: str | None = None) -> None:
+        self.ttl = ttl
+        self.path = path
+        self._entries : dict[str, dict[int, HardwareDescription]] = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def _isExpired(self, description: HardwareDescription) -> bool:
+        return self.ttl is not None and time.time() - description.updated > self.ttl
+
+    def get(self, controllerId: str, trAddress: int) -> HardwareDescription | None:
+        """
+        :param controllerId: controller address and ``*IDN?`` response
+        :type controllerId: str
+
+        :param trAddress: transient recorder address 0 .. 15
+        :type trAddress: int
+
+        :returns: copy of the cached description, None if missing or expired
+        :rtype: HardwareDescription | None
+        """
+        with self._lock:
+            description = self._entries.get(controllerId, {}).get(trAddress)
+            if description is None or self._isExpired(description):
+                return None
+            return HardwareDescription(**asdict(description))
+
+    def store(self, controllerId: str, trAddress: int,
+              hardwareInfo: dict[str, int | float | str] | None = None,
+              freqDividerExponent: int | None = None) -> None:
+        """
+        update the description of a transient recorder, the arguments which are None
+        keep their cached value. The cache is saved if it has a ``path``.
+
+        :param controllerId: controller address and ``*IDN?`` response
+        :type controllerId: str
+
+        :param trAddress: transient recorder address 0 .. 15
+        :type trAddress: int
+
+        :param hardwareInfo: parsed ``TRTYPE?`` response
+        :type hardwareInfo: dict[str, int | float | str] | None
+
+        :param freqDividerExponent: exponent of the frequency divider
+        :type freqDividerExponent: int | None
+        """
+        with self._lock:
+            description = self._entries.setdefault(controllerId, {}).get(trAddress)
+            if description is None or self._isExpired(description):
+                description = HardwareDescription()
+                self._entries[controllerId][trAddress] = description
+            if hardwareInfo is not None:
+                description.hardwareInfo = dict(hardwareInfo)
+            if freqDividerExponent is not None:
+                description.freqDividerExponent = freqDividerExponent
+            description.updated = time.time()
+        if self.path is not None:
+            self.save(self.path)
+
+    def forgetFreqDivider(self, controllerId: str) -> None:
+        """
+        drop the frequency divider of all transient recorders of a controller, used
+        when the frequency divider is set without knowing the selected transient recorder.
+
+        :param controllerId: controller address and ``*IDN?`` response
+        :type controllerId: str
+        """
+        with self._lock:
+            for description in self._entries.get(controllerId, {}).values():
+                description.freqDividerExponent = None
+
+    def refresh(self, controllerId: str | None = None) -> None:
+        """
+        drop the entries of a controller, of all controllers if ``controllerId``
+        is None. The descriptions are queried again on their next use.
+
+        :param controllerId: controller address and ``*IDN?`` response
+        :type controllerId: str | None
+        """
+        with self._lock:
+            if controllerId is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(controllerId, None)
+        if self.path is not None:
+            self.save(self.path)
+
+    def save(self, path: str) -> None:
+        """
+        write the cache to a JSON file, the file is replaced atomically.
+
+        :param path: file name
+        :type path: str
+        """
+        with self._lock:
+            content = {controllerId : {str(trAddress) : asdict(description)
+                                       for trAddress, description in descriptions.items()}
+                       for controllerId, descriptions in self._entries.items()}
+        tmpPath = path + ".tmp"
+        with open(tmpPath, "w") as cacheFile:
+            json.dump(content, cacheFile, indent = 2)
+        os.replace(tmpPath, path)
+
+    def load(self, path: str) -> None:
+        """
+        replace the cache content with the content of a JSON file written by ``save()``.
+
+        :param path: file name
+        :type path: str
+        """
+        with open(path, "r") as cacheFile:
+            content = json.load(cacheFile)
+        with self._lock:
+            self._entries = {controllerId : {int(trAddress) : HardwareDescription(**description)
+                                             for trAddress, description in descriptions.items()}
+                             for controllerId, descriptions in content.items()}
+
+#: hardware description cache shared by all controllers of the process, assign a
+#: ``HardwareInfoCache(path = ...)`` to persist the descriptions.
+hardwareInfoCache = HardwareInfoCache()
@@ -0,0 +1,280 @@
+'''
+Copyright ©: Licel Gmbh
+
+Binary capture of the push data and its replay for offline reprocessing and
+benchmarking. Contrary to ``DataParser.pushDataLog()`` the capture holds every received
+block once, binary safe, together with its receive time::
+
+    <b"LICELCAP"> <version u16> <header length u32> <JSON header>
+    {<receive time f64> <length u32> <push data>}
+
+All numbers are little endian. The header holds the hardware information, the timestamp
+endianness and the number of shots needed to parse the frames. The capture is written
+through a buffered file, optionally gzip or lzma compressed, and can be paused and
+resumed while the acquisition is running::
+
+    capture = ethernetController.Tr.startPushCapture("mpush.lcap", compression = "gzip")
+    ...
+    capture.enabled = False
+    ...
+    ethernetController.Tr.stopPushCapture()
+
+The capture is replayed with ``CaptureReplay``, at the original or at maximum speed::
+
+    replay = licel_capture.CaptureReplay("mpush.lcap", speed = 1.0)
+    ethernetController = replay.open(Config)
+    while replay.recvPushData():
+        dataParser.parseDataFromBuffer(Config, ethernetController, replay.shots)
+'''
+from types import MappingProxyType
+import gzip
+import json
+import lzma
+import struct
+import threading
+import time
+
+from Licel import licel_tcpip
+
+from typing import TYPE_CHECKING, Any, Iterator
+if TYPE_CHECKING:
+    from Licel import licel_Config
+
+CAPTURE_MAGIC = b"LICELCAP"
+CAPTURE_VERSION = 1
+#: version and length of the JSON header following the magic
+CAPTURE_PREAMBLE = struct.Struct('<HI')
+#: receive time in seconds since the epoch and length of each block
+CAPTURE_RECORD = struct.Struct('<dI')
+
+#: supported compressions of the capture file
+COMPRESSIONS = (None, 'gzip', 'lzma')
+
+#: leading bytes of the compressed files, used to detect the compression when reading
+_COMPRESSION_MAGIC = MappingProxyType({
+b'\x1f\x8b'               : 'gzip',
+b'\xfd7zXZ\x00'           : 'lzma'
+})
+
+def _openCapture(path: str, mode: str, compression: str | None = None):
+    if compression not in COMPRESSIONS:
+        raise ValueError("unknown capture compression: " + str(compression))
+    if compression is None:
+        return open(path, mode, buffering = 1 << 20)
+    # fastest levels, the capture is written in the receive path
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel = 1)
+    if 'w' in mode:
+        return lzma.open(path, mode, preset = 1)
+    return lzma.open(path, mode)
+
+def _detectCompression(path: str) -> str | None:
+    with open(path, "rb") as captureFile:
+        leading = captureFile.read(6)
+    for magic, compression in _COMPRESSION_MAGIC.items():
+        if leading.startswith(magic):
+            return compression
+    return None
+
+class PushCapture:
+    '''
+    writes the received push data blocks to a capture file, usually created by
+    ``TransientRecorder.startPushCapture()``.
+
+    :param path: capture file name
+    :type path: str
+
+    :param header: description of the acquisition stored in the file header
+    :type header: dict[str, Any]
+
+    :param compression: None, 'gzip' or 'lzma'
+    :type compression: str | None
+    '''
+
+    def __init__(self, path: str, header: dict[str, Any], compression: str | None = None) -> None:
+        self.path = path
+        self.header = header
+        #: the blocks are only written while enabled, toggled at runtime to pause the capture
+        self.enabled = True
+        #: number of written blocks
+        self.blocks = 0
+        #: number of written push data bytes
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._file = _openCapture(path, "wb", compression)
+        encodedHeader = json.dumps(header).encode("utf-8")
+        self._file.write(CAPTURE_MAGIC)
+        self._file.write(CAPTURE_PREAMBLE.pack(CAPTURE_VERSION, len(encodedHeader)))
+        self._file.write(encodedHeader)
+
+    def write(self, data) -> None:
+        '''
+        append a received block.
+
+        :param data: push data as received
+        :type data: bytes, bytearray or memoryview
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(CAPTURE_RECORD.pack(time.time(), len(data)))
+            self._file.write(data)
+            self.blocks += 1
+            self.bytes += len(data)
+
+    def close(self) -> None:
+        ''' flush and close the capture file '''
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> 'PushCapture':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class CaptureReader:
+    '''
+    reads a capture file written by ``PushCapture``, the compression is detected.
+
+    :param path: capture file name
+    :type path: str
+
+    :raises ValueError: if the file is not a capture
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = _openCapture(path, "rb", _detectCompression(path))
+        if self._file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            self._file.close()
+            raise ValueError(path + " is not a push data capture")
+        version, headerLength = CAPTURE_PREAMBLE.unpack(self._file.read(CAPTURE_PREAMBLE.size))
+        if version > CAPTURE_VERSION:
+            self._file.close()
+            raise ValueError("unsupported capture version {} in {}".format(version, path))
+        #: description of the acquisition, see ``TransientRecorder.startPushCapture()``
+        self.header : dict[str, Any] = json.loads(self._file.read(headerLength).decode("utf-8"))
+
+    def __iter__(self) -> Iterator[tuple[float, bytes]]:
+        ''' yields the receive time and the data of each block '''
+        while True:
+            record = self._file.read(CAPTURE_RECORD.size)
+            if len(record) < CAPTURE_RECORD.size:
+                # end of the capture, an incomplete record is left by an interrupted acquisition
+                return
+            receiveTime, length = CAPTURE_RECORD.unpack(record)
+            data = self._file.read(length)
+            if len(data) < length:
+                return
+            yield receiveTime, data
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'CaptureReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class CaptureReplay:
+    '''
+    replays a capture into the push buffer of an offline ``EthernetController``, as
+    ``TransientRecorder.recvPushData()`` would fill it. The frames are then parsed with
+    ``DataParser.parseDataFromBuffer()``.
+
+    :param path: capture file name
+    :type path: str
+
+    :param speed: 1.0 replays with the original timing, 2.0 twice as fast,
+        0 as fast as possible
+    :type speed: float
+
+    :param loop: restart at the beginning of the capture instead of ending
+    :type loop: bool
+    '''
+
+    def __init__(self, path: str, speed: float = 0.0, loop: bool = False) -> None:
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._reader = CaptureReader(path)
+        #: description of the acquisition stored in the capture
+        self.header = self._reader.header
+        #: number of shots of the captured acquisition
+        self.shots : int = self.header.get('shots', 0)
+        self._blocks = iter(self._reader)
+        self._start : tuple[float, float] | None = None
+        self.ethernetController : 'licel_tcpip.EthernetController | None' = None
+
+    def open(self, Config: 'licel_Config.Config',
+             shots: int | None = None) -> 'licel_tcpip.EthernetController':
+        '''
+        create an offline ethernet controller holding the hardware information of the
+        capture, its push buffer is filled by ``recvPushData()``.
+
+        :param Config: configuration of the captured acquisition
+        :type Config: licel_Config.Config
+
+        :param shots: number of shots, None for the number stored in the capture
+        :type shots: int | None
+
+        :rtype: licel_tcpip.EthernetController
+        '''
+        if shots is not None:
+            self.shots = shots
+        ethernetController = licel_tcpip.EthernetController("127.0.0.1", 0)
+        Tr = ethernetController.Tr
+        Tr.hardwareInfos = {int(address) : hardwareInfo for address, hardwareInfo
+                            in self.header['hardwareInfos'].items()}
+        Tr.bigEndianTimeStamp = self.header['bigEndianTimeStamp']
+        Tr._setDatasetsCount(self.shots, Config)
+        self.ethernetController = ethernetController
+        return ethernetController
+
+    def _nextBlock(self) -> tuple[float, bytes] | None:
+        block = next(self._blocks, None)
+        if block is None and self.loop:
+            self._reader.close()
+            self._reader = CaptureReader(self.path)
+            self._blocks = iter(self._reader)
+            self._start = None
+            block = next(self._blocks, None)
+        return block
+
+    def recvPushData(self) -> bool:
+        '''
+        append captured blocks to the push buffer until it holds a frame and the next
+        delimiter, ``BufferSize`` bytes.
+
+        :returns: False at the end of the capture
+        :rtype: bool
+        '''
+        Tr = self.ethernetController.Tr
+        while len(Tr.pushBuffer) < Tr.BufferSize:
+            block = self._nextBlock()
+            if block is None:
+                return False
+            receiveTime, data = block
+            if self.speed > 0:
+                now = time.monotonic()
+                if self._start is None:
+                    self._start = (receiveTime, now)
+                delay = (self._start[1] + (receiveTime - self._start[0]) / self.speed) - now
+                if delay > 0:
+                    time.sleep(delay)
+            Tr.pushBuffer.extend(data)
+        return True
+
+    def close(self) -> None:
+        ''' close the capture and the sockets of the offline controller '''
+        self._reader.close()
+        if self.ethernetController is not None:
+            self.ethernetController.commandSocket.close()
+            self.ethernetController.PushSocket.close()
+            self.ethernetController.killsock.close()
@@ -0,0 +1,370 @@
+'''
+Copyright ©: Licel Gmbh
+
+SQLite catalog of the Licel raw data files of a directory tree. The headers of the files
+are parsed with ``licel_reader`` and the acquisitions and data sets are stored with their
+offsets, the queries return the locations to map with ``licel_reader.readDataset()``::
+
+    with licel_catalog.LicelCatalog("catalog.sqlite") as catalog:
+        print(catalog.scan(Config.measurementInfo.szOutPath))
+        for location in catalog.query(start = datetime(2026, 1, 1), wavelength = 532):
+            data = licel_reader.readDataset(location.path, location.offset, location.bins)
+
+A scan only parses the new and the modified files. The files are appended by the
+writers, the acquisitions added to a file since the last scan are indexed from the end
+of the last indexed acquisition, an incomplete acquisition at the end of a file is
+indexed by the next scan.
+'''
+from dataclasses import dataclass, field
+from datetime import datetime
+import os
+import sqlite3
+import time
+
+from Licel import licel_reader
+
+#: version of the catalog tables, a catalog of another version is rebuilt
+CATALOG_VERSION = 1
+#: number of scanned files between two commits
+SCAN_COMMIT_INTERVAL = 200
+#: tolerance in nm of the wavelength queries
+WAVELENGTH_TOLERANCE = 0.5
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id            INTEGER PRIMARY KEY,
+    path          TEXT UNIQUE NOT NULL,
+    size          INTEGER NOT NULL,
+    mtime         INTEGER NOT NULL,
+    indexedSize   INTEGER NOT NULL,
+    acquisitions  INTEGER NOT NULL,
+    valid         INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS acquisitions (
+    id            INTEGER PRIMARY KEY,
+    fileId        INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    position      INTEGER NOT NULL,
+    offset        INTEGER NOT NULL,
+    startTime     TEXT NOT NULL,
+    stopTime      TEXT NOT NULL,
+    location      TEXT NOT NULL,
+    shots         INTEGER NOT NULL,
+    timestamp     INTEGER
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    acquisitionId     INTEGER NOT NULL REFERENCES acquisitions(id) ON DELETE CASCADE,
+    position          INTEGER NOT NULL,
+    descriptor        TEXT NOT NULL,
+    transientRecorder INTEGER NOT NULL,
+    isPhotonCounting  INTEGER NOT NULL,
+    wavelength        REAL NOT NULL,
+    polarisation      TEXT NOT NULL,
+    bins              INTEGER NOT NULL,
+    shots             INTEGER NOT NULL,
+    offset            INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS acquisitionsFile ON acquisitions(fileId);
+CREATE INDEX IF NOT EXISTS acquisitionsTime ON acquisitions(startTime, stopTime);
+CREATE INDEX IF NOT EXISTS datasetsAcquisition ON datasets(acquisitionId);
+CREATE INDEX IF NOT EXISTS datasetsChannel ON datasets(wavelength, transientRecorder, isPhotonCounting);
+'''
+
+@dataclass
+class ScanStatistics:
+    ''' result of ``LicelCatalog.scan()`` '''
+    #: number of files found
+    files            : int   = field(default =0)
+    #: number of files indexed for the first time
+    newFiles         : int   = field(default =0)
+    #: number of modified files indexed again
+    changedFiles     : int   = field(default =0)
+    #: number of files with acquisitions appended since the last scan
+    appendedFiles    : int   = field(default =0)
+    #: number of files skipped because they did not change
+    unchangedFiles   : int   = field(default =0)
+    #: number of files removed from the catalog because they were deleted
+    removedFiles     : int   = field(default =0)
+    #: number of files which are not Licel files
+    invalidFiles     : int   = field(default =0)
+    #: number of acquisitions added to the catalog
+    acquisitions     : int   = field(default =0)
+    #: duration of the scan in seconds
+    seconds          : float = field(default =0.0)
+
+@dataclass
+class DatasetLocation:
+    ''' data set found by ``LicelCatalog.query()`` '''
+    #: Licel file
+    path              : str
+    #: offset of the data in the file, see ``licel_reader.readDataset()``
+    offset            : int
+    #: number of data points
+    bins              : int
+    #: offset of the acquisition in the file, see ``licel_reader.parseHeader()``
+    acquisitionOffset : int
+    startTime         : datetime
+    stopTime          : datetime
+    #: timestamp of the controller in ms, None if not written
+    timestamp         : int | None
+    descriptor        : str
+    transientRecorder : int
+    isPhotonCounting  : bool
+    wavelength        : float
+    polarisation      : str
+    shots             : int
+
+def _timeText(value: datetime) -> str:
+    return value.isoformat(sep = " ", timespec = "seconds")
+
+class LicelCatalog:
+    '''
+    catalog of the acquisitions and data sets of Licel files, stored in a SQLite database.
+
+    :param path: database file, ":memory:" for a catalog which is not stored
+    :type path: str
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, CATALOG_VERSION):
+            with self._connection:
+                for table in ("datasets", "acquisitions", "files"):
+                    self._connection.execute("DROP TABLE IF EXISTS " + table)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute("PRAGMA user_version = {:d}".format(CATALOG_VERSION))
+
+    def scan(self, directory: str, recursive: bool = True) -> ScanStatistics:
+        '''
+        index the new and modified Licel files of ``directory`` and remove the deleted
+        files from the catalog.
+
+        :param directory: directory holding the Licel files, e.g. ``szOutPath``
+        :type directory: str
+
+        :param recursive: include the sub directories
+        :type recursive: bool
+
+        :rtype: ScanStatistics
+        '''
+        start = time.perf_counter()
+        statistics = ScanStatistics()
+        directory = os.path.abspath(directory)
+        known = {path : (fileId, size, mtime, indexedSize, acquisitions) for
+                 fileId, path, size, mtime, indexedSize, acquisitions
+                 in self._connection.execute("SELECT id, path, size, mtime, indexedSize, acquisitions "
+                                             "FROM files WHERE path LIKE ? ESCAPE '\\'",
+                                             (self._likePrefix(directory),))}
+        found = set()
+        database = os.path.abspath(self.path)
+        for path, stat in self._walk(directory, recursive):
+            # the database and its journal
+            if path.startswith(database):
+                continue
+            found.add(path)
+            statistics.files += 1
+            entry = known.get(path)
+            if entry is not None and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+                statistics.unchangedFiles += 1
+                continue
+            if entry is not None and stat.st_size > entry[1] and entry[4] > 0:
+                # appended by the writer, the indexed acquisitions are kept
+                fileId, indexedSize, position = entry[0], entry[3], entry[4]
+                statistics.appendedFiles += 1
+            else:
+                if entry is not None:
+                    self._connection.execute("DELETE FROM files WHERE id = ?", (entry[0],))
+                    statistics.changedFiles += 1
+                else:
+                    statistics.newFiles += 1
+                fileId, indexedSize, position = None, 0, 0
+            added = self._indexFile(path, stat, fileId, indexedSize, position)
+            if added < 0:
+                statistics.invalidFiles += 1
+            else:
+                statistics.acquisitions += added
+            if statistics.files % SCAN_COMMIT_INTERVAL == 0:
+                self._connection.commit()
+        for path, entry in known.items():
+            if path not in found:
+                self._connection.execute("DELETE FROM files WHERE id = ?", (entry[0],))
+                statistics.removedFiles += 1
+        self._connection.commit()
+        statistics.seconds = time.perf_counter() - start
+        return statistics
+
+    @staticmethod
+    def _likePrefix(directory: str) -> str:
+        prefix = os.path.join(directory, "")
+        return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    def _walk(self, directory: str, recursive: bool):
+        ''' yields the path and the ``os.stat_result`` of each file '''
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_file():
+                yield entry.path, entry.stat()
+            elif recursive and entry.is_dir():
+                yield from self._walk(entry.path, recursive)
+
+    def _indexFile(self, path: str, stat: os.stat_result, fileId: int | None,
+                   indexedSize: int, position: int) -> int:
+        '''
+        index the complete acquisitions of ``path`` starting at ``indexedSize``.
+
+        :returns: number of indexed acquisitions, -1 if the file is not a Licel file
+        '''
+        acquisitions : list[licel_reader.AcquisitionHeader] = []
+        offset = indexedSize
+        valid = True
+        try:
+            with open(path, "rb") as licelFile:
+                while offset < stat.st_size:
+                    acquisition = licel_reader.parseHeader(licelFile, offset)
+                    if offset + acquisition.size > stat.st_size:
+                        break
+                    acquisitions.append(acquisition)
+                    offset += acquisition.size
+        except ValueError:
+            # an incomplete header at the end is completed by the writer
+            valid = offset > 0
+        except OSError:
+            valid = False
+        cursor = self._connection.cursor()
+        if fileId is None:
+            cursor.execute("INSERT INTO files (path, size, mtime, indexedSize, acquisitions, valid) "
+                           "VALUES (?, ?, ?, ?, ?, ?)",
+                           (path, stat.st_size, stat.st_mtime_ns, offset,
+                            position + len(acquisitions), int(valid)))
+            fileId = cursor.lastrowid
+        else:
+            cursor.execute("UPDATE files SET size = ?, mtime = ?, indexedSize = ?, acquisitions = ?, "
+                           "valid = ? WHERE id = ?",
+                           (stat.st_size, stat.st_mtime_ns, offset, position + len(acquisitions),
+                            int(valid), fileId))
+        for acquisition in acquisitions:
+            cursor.execute("INSERT INTO acquisitions (fileId, position, offset, startTime, stopTime, "
+                           "location, shots, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           (fileId, position, acquisition.offset, _timeText(acquisition.startTime),
+                            _timeText(acquisition.stopTime), acquisition.location,
+                            acquisition.shotsL0, acquisition.timestamp))
+            acquisitionId = cursor.lastrowid
+            cursor.executemany("INSERT INTO datasets (acquisitionId, position, descriptor, "
+                               "transientRecorder, isPhotonCounting, wavelength, polarisation, "
+                               "bins, shots, offset) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               [(acquisitionId, index, dataset.descriptor, dataset.transientRecorder,
+                                 int(dataset.isPhotonCounting), dataset.wavelength,
+                                 dataset.polarisation, dataset.bins, dataset.shots, dataset.offset)
+                                for index, dataset in enumerate(acquisition.datasets)
+                                if dataset.active])
+            position += 1
+        return len(acquisitions) if valid else -1
+
+    def query(self, start: datetime | None = None, stop: datetime | None = None,
+              wavelength: float | None = None, polarisation: str | None = None,
+              transientRecorder: int | None = None, isPhotonCounting: bool | None = None,
+              location: str | None = None) -> list[DatasetLocation]:
+        '''
+        data sets of the acquisitions overlapping [``start``, ``stop``] matching the
+        channel, in the order of the acquisition start time.
+
+        :param start: earliest stop time of the acquisitions, None for no limit
+        :type start: datetime | None
+
+        :param stop: latest start time of the acquisitions, None for no limit
+        :type stop: datetime | None
+
+        :param wavelength: wavelength in nm, ± ``WAVELENGTH_TOLERANCE``
+        :type wavelength: float | None
+
+        :param polarisation: polarisation status o|p|s|r|l
+        :type polarisation: str | None
+
+        :param transientRecorder: transient recorder of the data set
+        :type transientRecorder: int | None
+
+        :param isPhotonCounting: True for photon counting, False for analogue data sets
+        :type isPhotonCounting: bool | None
+
+        :param location: measurement site
+        :type location: str | None
+
+        :rtype: list[DatasetLocation]
+        '''
+        conditions = []
+        parameters : list = []
+        if start is not None:
+            conditions.append("a.stopTime >= ?")
+            parameters.append(_timeText(start))
+        if stop is not None:
+            conditions.append("a.startTime <= ?")
+            parameters.append(_timeText(stop))
+        if wavelength is not None:
+            conditions.append("d.wavelength BETWEEN ? AND ?")
+            parameters += [wavelength - WAVELENGTH_TOLERANCE, wavelength + WAVELENGTH_TOLERANCE]
+        if polarisation is not None:
+            conditions.append("d.polarisation = ?")
+            parameters.append(polarisation)
+        if transientRecorder is not None:
+            conditions.append("d.transientRecorder = ?")
+            parameters.append(transientRecorder)
+        if isPhotonCounting is not None:
+            conditions.append("d.isPhotonCounting = ?")
+            parameters.append(int(isPhotonCounting))
+        if location is not None:
+            conditions.append("a.location = ?")
+            parameters.append(location)
+        rows = self._connection.execute(
+            "SELECT f.path, d.offset, d.bins, a.offset, a.startTime, a.stopTime, a.timestamp, "
+            "d.descriptor, d.transientRecorder, d.isPhotonCounting, d.wavelength, d.polarisation, "
+            "d.shots FROM datasets d JOIN acquisitions a ON d.acquisitionId = a.id "
+            "JOIN files f ON a.fileId = f.id"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "")
+            + " ORDER BY a.startTime, f.path, a.position, d.position", parameters)
+        return [DatasetLocation(path, offset, bins, acquisitionOffset,
+                                datetime.fromisoformat(startTime), datetime.fromisoformat(stopTime),
+                                timestamp, descriptor, transientRecorder, bool(isPC), wavelength,
+                                polarisation, shots)
+                for (path, offset, bins, acquisitionOffset, startTime, stopTime, timestamp,
+                     descriptor, transientRecorder, isPC, wavelength, polarisation, shots) in rows]
+
+    def channels(self) -> list[tuple[str, bool, float, str, int]]:
+        '''
+        channels of the catalog.
+
+        :returns: descriptor, photon counting, wavelength, polarisation and number of data sets
+        :rtype: list[tuple[str, bool, float, str, int]]
+        '''
+        return [(descriptor, bool(isPC), wavelength, polarisation, count)
+                for descriptor, isPC, wavelength, polarisation, count
+                in self._connection.execute("SELECT descriptor, isPhotonCounting, wavelength, "
+                                            "polarisation, COUNT(*) FROM datasets GROUP BY "
+                                            "descriptor, isPhotonCounting, wavelength, polarisation "
+                                            "ORDER BY descriptor, wavelength")]
+
+    def timeRange(self) -> tuple[datetime, datetime] | None:
+        '''
+        :returns: start time of the first and stop time of the last acquisition,
+            None if the catalog is empty
+        :rtype: tuple[datetime, datetime] | None
+        '''
+        first, last = self._connection.execute("SELECT MIN(startTime), MAX(stopTime) "
+                                               "FROM acquisitions").fetchone()
+        if first is None:
+            return None
+        return datetime.fromisoformat(first), datetime.fromisoformat(last)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'LicelCatalog':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
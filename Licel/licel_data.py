@@ -5,8 +5,9 @@ The data class holds method for (pre)processing the raw data,
 and saving data to Licel file format
 '''
 import numpy
-from Licel import licel_tr_tcpip
+from Licel import licel_tr_tcpip, licel_mpush
 import math
+import operator
 from datetime import datetime
 import os
 
@@ -15,6 +16,233 @@ if TYPE_CHECKING:
     from Licel import licel_tcpip, licel_Config
 
 MPUSH_SHOTNUM_OFFSET = 2 # represents 2 byte shot number needed to parser MPUSH response
+#: number of compiled header templates kept by a DataParser
+HEADER_TEMPLATE_CACHE_SIZE = 8
+#: scaling of the discriminator level to the photon counting header field, from labview
+PC_RANGE_SCALING = 25/63
+
+def _convertPolarizationToFileNotation(polarization: int) -> str:
+    """ see ``DataParser._convertPolarizationToFileNotation`` """
+    if polarization == 0 : 
+        return "o"
+    if polarization == 1 : 
+        return "p"
+    if polarization == 2 : 
+        return "s"
+    if polarization == 3 : 
+        return "r"
+    if polarization == 4 : 
+        return "l"
+
+#: fields of ``MeasureInfo`` formatted into the header lines
+_measurementFields = operator.attrgetter("szLocation", "nAltitude", "dLongitude", "dLatitude",
+                                         "Zenith", "Azimuth", "repRateL0", "repRateL1",
+                                         "repRateL2")
+#: fields of ``TrConfig`` formatted into the data set lines
+_trConfigFields = operator.attrgetter("nTransientRecorder", "freqDivider", "nRange",
+                                      "discriminator")
+_trConfigChannelFields = operator.attrgetter("analogueEnabled", "pcEnabled", "laserAssignment",
+                                             "analogueBins", "pcBins", "analoguePolarisation",
+                                             "pcPolarisation", "pmVoltageAnalogue", "pmVoltagePC",
+                                             "analogueWavelength", "pcWavelength")
+
+def headerFingerprint(Config: 'licel_Config.Config',
+                      TRHardwareInfo: dict[int, dict[str, int | str | float]] | None = None) -> tuple:
+    '''
+    values of all fields formatted into the header lines by ``HeaderTemplate``, the header
+    lines are identical as long as the fingerprint does not change. Of ``TRHardwareInfo`` only
+    ``'ADC Bits'``, ``'binWidth'`` and ``'binShift'`` are formatted, without ``TRHardwareInfo``
+    only the fields of the second and third header line are taken.
+
+    :param Config: system configuration 
+    :type Config: Licel.licel_acq.Config()
+
+    :param TRHardwareInfo: hardware information of each transient recorder
+    :type TRHardwareInfo: dict{Tr_number : {TRHardwareInfo}} | None
+
+    :rtype: tuple
+    '''
+    siteFields = (_measurementFields(Config.measurementInfo), Config.numDataSets)
+    if TRHardwareInfo is None:
+        return siteFields
+    return (siteFields,
+            tuple((_trConfigFields(trConfig),
+                   tuple(map(tuple, map(dict.items, _trConfigChannelFields(trConfig)))))
+                  for trConfig in Config.TrConfigs),
+            tuple((trNum, hardwareInfo.get('ADC Bits'), hardwareInfo.get('binWidth'),
+                   hardwareInfo.get('binShift'))
+                  for trNum, hardwareInfo in TRHardwareInfo.items()))
+
+class HeaderTemplate:
+    """
+    compiled header lines of the Licel file format for a configuration and the hardware
+    information of the transient recorders, see https://licel.com/raw_data_format.html
+    The fields taken from ``Config`` and ``TRHardwareInfo`` are formatted once, each header
+    only patches the start and stop time, the shots, the bins and the timestamp.
+    The lines are compiled on first use and are byte identical to the former
+    ``str.format`` of all fields. A template does not follow later changes of ``Config``
+    or ``TRHardwareInfo``, ``DataParser.headerTemplate()`` compiles a new one when the
+    ``headerFingerprint()`` of the formatted fields changed.
+
+    :param Config: system configuration 
+    :type Config: Licel.licel_acq.Config()
+
+    :param TRHardwareInfo: hardware information of each transient recorder,
+        None for the lines independent of the hardware
+    :type TRHardwareInfo: dict{Tr_number : {TRHardwareInfo}} | None
+    """
+
+    def __init__(self, Config: 'licel_Config.Config',
+                 TRHardwareInfo: dict[int, dict[str, int | str | float]] | None = None) -> None:
+        self.Config = Config
+        self.measurementInfo = Config.measurementInfo
+        self.TRHardwareInfo = TRHardwareInfo
+        self._siteFields : tuple[str, str] | None = None
+        self._shotFields : dict[tuple[int, int], str] = {}
+        self._pushDatasets : list[tuple[str, str, int, str, bool]] | None = None
+        self._acquisDatasets : dict[tuple[int, str, str], list[tuple[str, str, str]]] = {}
+
+    def secondLine(self, startTime: str, stopTime: str) -> str:
+        """ see ``DataParser._generateSecondHeaderline`` """
+        if self._siteFields is None:
+            measInfo = self.measurementInfo
+            assert len(measInfo.szLocation) <= 8, "Measurement site must be 8 character"
+            self._siteFields = (' {:8s} '.format(measInfo.szLocation),
+                                ' {:04d} {:011.6f} {:011.6f} {:04.1f} {:04.1f}\n'
+                                .format(measInfo.nAltitude, measInfo.dLongitude,
+                                        measInfo.dLatitude, measInfo.Zenith, measInfo.Azimuth))
+        location, site = self._siteFields
+        return ''.join((location, '{:19s}'.format(startTime), ' ', '{:19s}'.format(stopTime), site))
+
+    def thirdLine(self, shots: int, timestamp: int | None = None) -> str:
+        """ see ``DataParser._generateThirdHeaderline`` """
+        # the line without timestamp announces a single data set
+        numDataSets = self.Config.numDataSets if timestamp else 1
+        shotFields = self._shotFields.get((shots, numDataSets))
+        if shotFields is None:
+            measurConf = self.measurementInfo
+            if len(self._shotFields) >= HEADER_TEMPLATE_CACHE_SIZE:
+                self._shotFields.clear()
+            shotFields = (' {:d} {:04d} {:07d} {:04d} {:02d} {:07d} {:04d}'
+                          .format(shots, measurConf.repRateL0, shots,
+                                  measurConf.repRateL1, numDataSets,
+                                  shots, measurConf.repRateL2))
+            self._shotFields[(shots, numDataSets)] = shotFields
+        if timestamp :
+            return ''.join((shotFields, ' ', str(timestamp), '\n'))
+        return shotFields + '\n'
+
+    def _compilePushDatasets(self) -> list[tuple[str, str, int, str, bool]]:
+        """ 
+        (text before the shot number, text behind it, transient recorder, memory, 
+        photon counting) for each active data set in the order of the MPUSH frame.
+        """
+        TRHardwareInfo = self.TRHardwareInfo
+        datasets = []
+        for trConfig in self.Config.TrConfigs: 
+            trNum = trConfig.nTransientRecorder
+            divider = 1 if trConfig.freqDivider == 0  else trConfig.freqDivider
+            for key in trConfig.analogueEnabled: 
+                if trConfig.analogueEnabled[key] == True: 
+                    binshift_decimal = int((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
+                    before = (" 1 0 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
+                              " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0"
+                              " {binshift:02d} {binshift_dec:3d} {adc:02d} "
+                              .format(laser = trConfig.laserAssignment[key], 
+                                      dataPoints = (trConfig.analogueBins[key]-1),
+                                      laserPolarization = trConfig.analoguePolarisation[key],
+                                      pmtHV = int(trConfig.pmVoltageAnalogue[key]),
+                                      binwidth = float((TRHardwareInfo[trNum]['binWidth'] )* (divider)),
+                                      wavelength = int (trConfig.analogueWavelength[key]),
+                                      polStatus = _convertPolarizationToFileNotation(trConfig.analoguePolarisation[key]),
+                                      binshift = int(TRHardwareInfo[trNum]['binShift']), 
+                                      binshift_dec = int (binshift_decimal), 
+                                      adc = TRHardwareInfo[trNum]['ADC Bits']))
+                    after = (" 0.{myRange:03d} BT{trNum:1X}\n"
+                             .format(myRange = trConfig.nRange, trNum = trNum))
+                    datasets.append((before, after, trNum, key, False))
+            for key in trConfig.pcEnabled: 
+                if trConfig.pcEnabled[key] == True: 
+                    before = (" 1 1 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
+                              " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0 00 000 00 "
+                              .format(laser = trConfig.laserAssignment[key], 
+                                      dataPoints = (trConfig.pcBins[key]-1),
+                                      laserPolarization = trConfig.pcPolarisation[key],
+                                      pmtHV = int(trConfig.pmVoltagePC[key]),
+                                      binwidth = (float(TRHardwareInfo[trNum]['binWidth'] )* (divider)),
+                                      wavelength = int (trConfig.pcWavelength[key]),
+                                      polStatus = _convertPolarizationToFileNotation(trConfig.pcPolarisation[key])))
+                    after = (" {myRange:6.4f} BC{trNum:1X}\n"
+                             .format(myRange = (trConfig.discriminator * PC_RANGE_SCALING),
+                                     trNum = trNum))
+                    datasets.append((before, after, trNum, key, True))
+        return datasets
+
+    def pushDatasetLines(self, analogue_shot_dict: dict[int, dict[str, int]],
+                         pc_shot_dict: dict[int, dict[str, int]]) -> str:
+        """ see ``DataParser._generatePushDatasetsHeaderline`` """
+        if self._pushDatasets is None:
+            self._pushDatasets = self._compilePushDatasets()
+        parts = []
+        for before, after, trNum, key, isPhotonCounting in self._pushDatasets:
+            shots = (pc_shot_dict if isPhotonCounting else analogue_shot_dict)[trNum][key]
+            parts += (before, '{:06d}'.format(shots - 2), after)
+        return ''.join(parts)
+
+    def _compileAcquisDataset(self, device_number: int, DataType: str,
+                              myMem: str) -> list[tuple[str, str, str]]:
+        """ 
+        (text before the bins, text between bins and shots, text behind the shots)
+        of the requested data set.
+        """
+        TRHardwareInfo = self.TRHardwareInfo
+        lines = []
+        for trConfig in self.Config.TrConfigs: 
+            if trConfig.nTransientRecorder == device_number: 
+                for key in trConfig.analogueEnabled: 
+                    trNum = trConfig.nTransientRecorder
+                    if key == myMem and DataType == "Analogue":
+                        binshift_decimal = int((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
+                        middle = (" {laserPolarization} {pmtHV:04d}"
+                                  " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0"
+                                  " {binshift:02d} {binshift_dec:3d} {adc:02d} "
+                                  .format(laserPolarization = trConfig.analoguePolarisation[key],
+                                          pmtHV = int(trConfig.pmVoltageAnalogue[key]),
+                                          binwidth = float(TRHardwareInfo[trNum]['binWidth']),
+                                          wavelength = int (trConfig.analogueWavelength[key]),
+                                          polStatus = _convertPolarizationToFileNotation(trConfig.analoguePolarisation[key]),
+                                          binshift = int(TRHardwareInfo[trNum]['binShift']), 
+                                          binshift_dec = int (binshift_decimal), 
+                                          adc = TRHardwareInfo[trNum]['ADC Bits']))
+                        lines.append((" 1 0 {} ".format(trConfig.laserAssignment[key]), middle,
+                                      " 0.{myRange:03d} BT{trNum:1X}\n"
+                                      .format(myRange = trConfig.nRange, trNum = trNum)))
+                    if key == myMem and DataType == "PhotonCounting":
+                        middle = (" {laserPolarization} {pmtHV:04d}"
+                                  " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0 00 000 00 "
+                                  .format(laserPolarization = trConfig.pcPolarisation[key],
+                                          pmtHV = int(trConfig.pmVoltagePC[key]),
+                                          binwidth = float(TRHardwareInfo[trNum]['binWidth']),
+                                          wavelength = int (trConfig.pcWavelength[key]),
+                                          polStatus = _convertPolarizationToFileNotation(trConfig.pcPolarisation[key])))
+                        lines.append((" 1 1 {} ".format(trConfig.laserAssignment[key]), middle,
+                                      " {myRange:6.4f} BC{trNum:1X}\n"
+                                      .format(myRange = (trConfig.discriminator * PC_RANGE_SCALING),
+                                              trNum = trNum)))
+        return lines
+
+    def acquisDatasetLine(self, shots: int, bins: int, device_number: int,
+                          DataType: str, Memory: str) -> str:
+        """ see ``DataParser._generateAcquisDatasetsHeaderline`` """
+        myMem = Memory.split("_")[1]
+        lines = self._acquisDatasets.get((device_number, DataType, myMem))
+        if lines is None:
+            lines = self._compileAcquisDataset(device_number, DataType, myMem)
+            self._acquisDatasets[(device_number, DataType, myMem)] = lines
+        shotsField = '{:06d}'.format(shots)
+        return ''.join(''.join((before, str(bins), middle, shotsField, after))
+                       for before, middle, after in lines)
+
 class DataParser:
     
     #: internal value to keep count for how many acquisition are 
@@ -30,34 +258,24 @@ class DataParser:
     _firstLog = True
 
     def __init__(self) -> None:
+        #: validates the MPUSH frames and counts valid, invalid and skipped frames
+        self.frameValidator = licel_mpush.FrameValidator()
+        self._headerTemplates : dict[tuple, HeaderTemplate] = {}
         return 
 
-    def _checkDelimiter(self, pushBuffer : bytearray) -> list[int]:
-        """
-        find the delimiter 'xff xff' positions in the pushBuffer.        
-
-        :param pushBuffer: Buffer holding raw data acquired from push socket.\r\n
-        :type pushBuffer: bytearray
+    @property
+    def statistics(self) -> licel_mpush.FrameStatistics:
+        ''' 
+        counters of the frames parsed by ``parseDataFromBuffer`` and of the data
+        removed by ``removeInvalidDataFromBuffer``
+        '''
+        return self.frameValidator.statistics
 
-        :return: list holding the positions of '\\xff \\xff' in the ``pushBuffer``.
-                last element of the returned list is -1 indicating that we searched the
-                totality of the ``pushBuffer``, '\\xff \\xff' is not more to be found.
-        :rtype: list[int]
-        """
-        temp= 0
-        delimiterPos = []
-        while True:
-            temp = pushBuffer.find(b'\xff\xff',temp,len(pushBuffer))   
-            delimiterPos.append(temp)              
-            if temp == -1:
-                return delimiterPos
-            temp += 2
-        return 
-    
     def _combine_Analog_Datasets_16bit(self,
                                        uLSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
                                        uMSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
-                                       uPHM: numpy.ndarray[Any, numpy.dtype[numpy.uint16]]
+                                       uPHM: numpy.ndarray[Any, numpy.dtype[numpy.uint16]] | None,
+                                       out: numpy.ndarray[Any, numpy.dtype[numpy.uint32]] | None = None
                                        ) -> tuple[numpy.ndarray[Any, numpy.dtype[numpy.uint32]],
                                                   numpy.ndarray[Any, numpy.dtype[numpy.uint32]]]:
         """
@@ -73,9 +291,13 @@ class DataParser:
         :param uMSW: array holding memory High raw data as uint16   
         :type uMSW: numpy.ndarray(dtype=uint16, ndim =1)  
 
-        :param uPHM: array holding memory extra raw data as uint16   
+        :param uPHM: array holding memory extra raw data as uint16, None if not acquired.
         :type uPHM: numpy.ndarray(dtype=uint16, ndim =1)  
 
+        :param out: optional preallocated array of size ``uLSW.size - 1`` receiving the 
+            summed up analog data.
+        :type out: numpy.ndarray(dtype=uint32, ndim =1) 
+
         :return: list containing 2 numpy array: \r\n
             -the first array contains the summed up analog data. \r\n
             -the second array containing the clipping(out of range) information. \r\n 
@@ -85,21 +307,22 @@ class DataParser:
         :rtype: [numpy.ndarray(dtype=uint32, ndim =1), \r\n 
                  numpy.ndarray(dtype=uint32, ndim =1)]
         """
-        lAccumulated = numpy.zeros((uLSW.size), numpy.uint32)
-        iClipping    = numpy.zeros((uLSW.size), numpy.uint32)
-        uMSW__ = uMSW.astype(numpy.uint32,casting='unsafe')
-        uLSW__ = uLSW.astype(numpy.uint32,casting='unsafe')
-        uPHM__ = uPHM.astype(numpy.uint32,casting='unsafe')
+        if out is None:
+            out = numpy.empty((uLSW.size - 1), numpy.uint32)
+        #skip the non valid first array element. 
+        uMSW__ = uMSW[1:].astype(numpy.uint32,casting='unsafe')
+        numpy.left_shift(uMSW__ & 0x0fff, 16, out=out)
+        out += (uMSW__ & 0xE000) << 15
+        out += uLSW[1:]
+        if  uPHM is not None and not (numpy.all(uPHM == 0 )) :
+            out += (uPHM[1:].astype(numpy.uint32,casting='unsafe') & 0x0100) << 23 
         sMSW__ = uMSW.astype(numpy.int16,casting='unsafe')
-        lAccumulated  = uLSW__ + ((uMSW__ & 0x0fff) << 16) +((uMSW__ & 0xE000) << 15) 
         iClipping     = ((sMSW__ & 0x1000) >> 12)
-        if  not (numpy.all(uPHM__ == 0 )) :
-            lAccumulated  += (uPHM__ & 0x0100) << 23 
-        #remove non valid first array element. 
-        return numpy.delete(lAccumulated,0), iClipping.astype(numpy.uint32,casting='unsafe') 
+        return out, iClipping.astype(numpy.uint32,casting='unsafe') 
     
     def _combine_Analog_Datasets(self, uLSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
-                                 uMSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]]):
+                                 uMSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
+                                 out: numpy.ndarray[Any, numpy.dtype[numpy.uint32]] | None = None):
         '''
         Converts the ``uLSW``, ``uMSW`` values into an integer array containing the
         summed up analog values. The first invalid element (due to the data transmission
@@ -112,6 +335,10 @@ class DataParser:
         :param uMSW: array holding memory High raw data as uint16   
         :type uMSW: numpy.ndarray(dtype=uint16, ndim =1)  
 
+        :param out: optional preallocated array of size ``uLSW.size - 1`` receiving the 
+            summed up analog data.
+        :type out: numpy.ndarray(dtype=uint32, ndim =1) 
+
         :return: list containing 2 numpy array: \r\n
                  -the first array contains the summed up analog data.\r\n
                  -the second array containing the clipping(out of range) information. 
@@ -120,15 +347,14 @@ class DataParser:
         :rtype: [numpy.ndarray(dtype=uint32, ndim =1), 
                  numpy.ndarray(dtype=uint32, ndim =1)]
         '''
-        lAccumulated = numpy.zeros((uLSW.size), numpy.uint32)
-        iClipping    = numpy.zeros((uLSW.size), numpy.uint32)
-        uMSW = uMSW.astype(numpy.uint32,casting='unsafe')
-        uLSW = uLSW.astype(numpy.uint32,casting='unsafe')
-        sMSW = uMSW.astype(numpy.int16,casting='unsafe')
-       
-        lAccumulated  = uLSW + ((uMSW & 0xff) << 16) 
+        if out is None:
+            out = numpy.empty((uLSW.size - 1), numpy.uint32)
+        numpy.bitwise_and(uMSW[1:], 0xff, out=out)
+        out <<= 16
+        out += uLSW[1:]
+        sMSW = uMSW.astype(numpy.uint32,casting='unsafe').astype(numpy.int16,casting='unsafe')
         iClipping     = ((sMSW & 0x100) >> 8)
-        return  numpy.delete(lAccumulated,0), iClipping.astype(numpy.uint32,casting='unsafe') 
+        return  out, iClipping.astype(numpy.uint32,casting='unsafe') 
 
     def normalizeData(self,accumulatedData: numpy.ndarray[Any, numpy.dtype[numpy.uint32]],
                       iNumber: int, 
@@ -188,7 +414,8 @@ class DataParser:
 
     def _combineAnalogSquaredData(self,uSQLSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
                                   uSQMSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
-                                  uSQHSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]]
+                                  uSQHSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
+                                  out: numpy.ndarray[Any, numpy.dtype[numpy.uint64]] | None = None
                                   ) -> numpy.ndarray[Any, numpy.dtype[numpy.uint64]]:
         """
         Converts the ``uSQLSW``, ``uSQMSW``, ``uSQHSW`` values into an integer array 
@@ -204,16 +431,22 @@ class DataParser:
         :param uSQHSW: array holding memory extra raw data as uint16    
         :type uSQHSW:  numpy.ndarray(dtype=uint16, ndim =1)  
 
-        :returns: accumulated squared data 
+        :param out: optional preallocated array of size ``uSQMSW.size`` receiving the 
+            accumulated squared data.
+        :type out: numpy.ndarray(dtype=uint64, ndim =1) 
+
+        :returns: accumulated squared data, the last element is always 0.
         :rtype: numpy.ndarray(dtype=uint64, ndim =1)  
          """
-        llSQAccumulated  = numpy.zeros((uSQMSW.size),numpy.uint64)
-        uSQMSW__ = numpy.asarray(uSQMSW,numpy.uint)
-        uSQLSW__ = numpy.asarray(uSQLSW,numpy.uint)
-        uSQHSW__ = numpy.asarray(uSQHSW,numpy.uint)
-        for i in range(1, uSQMSW.size):
-            llSQAccumulated[i-1] = uSQLSW__[i] + (uSQMSW__[i] << 16 ) + (uSQHSW__[i] << 32)
-        return llSQAccumulated.astype(numpy.uint64, casting='safe')
+        if out is None:
+            out = numpy.empty((uSQMSW.size), numpy.uint64)
+        llSQAccumulated = out[:uSQMSW.size - 1]
+        llSQAccumulated[...] = uSQHSW[1:]
+        llSQAccumulated <<= 32
+        llSQAccumulated += uSQMSW[1:].astype(numpy.uint64) << 16
+        llSQAccumulated += uSQLSW[1:]
+        out[uSQMSW.size - 1:] = 0
+        return out
 
     def getSquareRootBinary (self, combinedAnalogueRawData: numpy.ndarray[Any, numpy.dtype[numpy.uint32]],
                              combinedSqdData: numpy.ndarray[Any, numpy.dtype[numpy.uint64]],
@@ -235,19 +468,23 @@ class DataParser:
 
         :returns: square root of  ( ``combinedSqdData`` * ``iShots`` ) - ( ``combinedAnalogueRawData`` ^ 2 ) \r\n
         :rtype: numpy.ndarray(dtype=uint32, ndim =1)
- 
-        """
-        lAccumulated_bis = combinedAnalogueRawData.astype(numpy.uint64,casting='unsafe')
-        sqd_bin = numpy.zeros((iNumber), numpy.uint32)
-        temp = 0
-        y = 0
-        for i in range (0, iNumber):
-            temp = (combinedSqdData[i] * iShots) - (lAccumulated_bis[i] * lAccumulated_bis[i])
-            y = math.sqrt(temp) - 0.000001
-            if (2*y < temp - y**2 ):
-                y += 1 
-            sqd_bin [i] = int(y)
-        return sqd_bin
+
+        :raises OverflowError: if a square root does not fit into uint32
+
+        """
+        lAccumulated_bis = combinedAnalogueRawData[:iNumber].astype(numpy.uint64,casting='unsafe')
+        sqdData = numpy.asarray(combinedSqdData[:iNumber], numpy.uint64)
+        # uint64 arithmetic wraps around exactly like the former per bin computation
+        temp = (sqdData * numpy.uint64(iShots)) - (lAccumulated_bis * lAccumulated_bis)
+        dTemp = temp.astype(numpy.double)
+        y = numpy.sqrt(dTemp) - 0.000001
+        # rounding correction, y is incremented where 2*y < temp - y^2
+        y += (2*y < dTemp - y*y)
+        sqd_bin = numpy.trunc(y)
+        if sqd_bin.size and sqd_bin.max() > numpy.iinfo(numpy.uint32).max:
+            raise OverflowError ("getSquareRootBinary square root exceeds uint32 \r\n maximum is :"
+                                 + str(int(sqd_bin.max())))
+        return sqd_bin.astype(numpy.uint32)
     
     def normalizeSquaredData(self,sqd_bin: numpy.ndarray[Any, numpy.dtype[numpy.uint32]],iShots: int):
         """
@@ -284,7 +521,8 @@ class DataParser:
         return meanError
 
     def _convert_Photoncounting_Fullword(self, uPHO: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
-                                         uPHM: numpy.ndarray[Any, numpy.dtype[numpy.uint16]]):
+                                         uPHM: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
+                                         out: numpy.ndarray[Any, numpy.dtype[numpy.uint32]] | None = None):
         """
         Converts the raw Photon counting data into an integer array containing the
         summed up photon counting values. The first invalid element (due to the data
@@ -301,18 +539,22 @@ class DataParser:
         :param uPHM: memory extra buffer 
         :type uPHM: numpy.ndarray(dtype=uint16, ndim =1)  
 
+        :param out: optional preallocated array of size ``uPHO.size - 1`` receiving the 
+            photon counting raw data.
+        :type out: numpy.ndarray(dtype=uint32, ndim =1) 
+
         :returns: photon counting raw data 
         :rtype: numpy.ndarray(dtype=uint32, ndim =1)
         """
-        photon_c  = numpy.zeros((uPHO.size),numpy.uint32)
-        uPHO = uPHO.astype(numpy.uint32,casting='unsafe')
-        uPHM = uPHM.astype(numpy.uint32,casting='unsafe')
-        for i in range(1,uPHO.size):
-            photon_c[i-1] = uPHO[i] + ((uPHM[i] & 0xFF) <<16 )
-        photon_c = photon_c.astype(numpy.uint32,casting='unsafe')
-        return numpy.delete(photon_c,0)
-
-    def _convert_Photoncounting(self, uPHO: numpy.ndarray[Any, numpy.dtype[numpy.uint16]], iPurePhoton: int):
+        if out is None:
+            out = numpy.empty((uPHO.size - 1), numpy.uint32)
+        numpy.bitwise_and(uPHM[1:], 0xFF, out=out)
+        out <<= 16
+        out += uPHO[1:]
+        return out
+
+    def _convert_Photoncounting(self, uPHO: numpy.ndarray[Any, numpy.dtype[numpy.uint16]], iPurePhoton: int,
+                                out: numpy.ndarray[Any, numpy.dtype[numpy.uint32]] | None = None):
         """
         Converts the  raw Photon counting data into an integer array containing the
         summed up photon counting values. The first invalid element (due to the data
@@ -325,16 +567,20 @@ class DataParser:
         :param iPurePhoton: mask clipping information if 1 
         :type iPurePhoton: uint
 
+        :param out: optional preallocated array of size ``uPHO.size - 1`` receiving the 
+            photon counting raw data.
+        :type out: numpy.ndarray(dtype=uint32, ndim =1) 
+
         :returns: photon counting raw data 
         :rtype: numpy.ndarray(dtype=uint32, ndim =1)
         """
-        photon_c  = numpy.zeros((uPHO.size),numpy.uint32)
+        if out is None:
+            out = numpy.empty((uPHO.size - 1), numpy.uint32)
         iMask = 0x7FFF
         if (iPurePhoton):
             iMask = 0xFFFF
-        photon_c = uPHO & iMask
-        photon_c = photon_c.astype(numpy.uint32,casting='unsafe')
-        return numpy.delete(photon_c,0)
+        numpy.bitwise_and(uPHO[1:], iMask, out=out)
+        return out
 
     def scale_PhotonCounting(self, normalizedPhotonCount: numpy.ndarray[Any, numpy.dtype[numpy.double]],
                              binWidth: float) -> numpy.ndarray[Any, numpy.dtype[numpy.double]]:
@@ -359,7 +605,9 @@ class DataParser:
         return scaled_photon_c
     
     def _combine_Photon_Squared_Data(self, uSQLSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
-                                     uSQMSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]]) -> numpy.ndarray[Any, numpy.dtype[numpy.uint64]]:
+                                     uSQMSW: numpy.ndarray[Any, numpy.dtype[numpy.uint16]],
+                                     out: numpy.ndarray[Any, numpy.dtype[numpy.uint64]] | None = None
+                                     ) -> numpy.ndarray[Any, numpy.dtype[numpy.uint64]]:
         """
         combine squared photon raw data . 
 
@@ -369,17 +617,26 @@ class DataParser:
         :param uSQMSW: raw data memory high buffer 
         :type uSQMSW: numpy.ndarray(dtype=uint16, ndim =1)
 
-        :returns: combined squared photon data
+        :param out: optional preallocated array of size ``uSQLSW.size`` receiving the 
+            combined squared photon data.
+        :type out: numpy.ndarray(dtype=uint64, ndim =1) 
+
+        :returns: combined squared photon data, the last element is always 0.
         :rtype: numpy.ndarray(dtype=uint64, ndim =1) 
         """
-        squared_photon_data  = numpy.zeros((uSQLSW.size),numpy.uint64)
-        uSQLSW__ = numpy.asarray(uSQMSW,numpy.uint)
-        uSQMSW__ = numpy.asarray(uSQLSW,numpy.uint)
-        for i in range(1, uSQLSW.size):
-            squared_photon_data[i-1] = uSQLSW__[i] + (uSQMSW__[i] << 16 )
-        return squared_photon_data    
-
-    def removeInvalidDataFromBuffer(self, pushBuffer: bytearray):
+        if out is None:
+            out = numpy.empty((uSQLSW.size), numpy.uint64)
+        squared_photon_data = out[:uSQLSW.size - 1]
+        # the word order is kept as in the per bin implementation: 
+        # the low buffer holds the upper 16 bit. 
+        squared_photon_data[...] = uSQLSW[1:]
+        squared_photon_data <<= 16
+        squared_photon_data += uSQMSW[1:]
+        out[uSQLSW.size - 1:] = 0
+        return out
+
+    def removeInvalidDataFromBuffer(self, pushBuffer: 'licel_mpush.PushBuffer | bytearray',
+                                    frameSize: int | None = None):
         '''
         remove raw data from buffer until next occurrence of xff xff. 
         this is used to clear the ```pushBuffer`` if the data is invalid. 
@@ -388,14 +645,110 @@ class DataParser:
         ``1- <xff xff> <timestamp> <shots> <INVALID raw data> \r\n``
         ``2- <xff xff> <timestamp><shots> <raw data> <xff xff>``
 
+        If ``frameSize`` is given only the next ``frameSize`` bytes are searched and a
+        delimiter is only taken as frame start if it is followed by an other delimiter
+        ``frameSize`` bytes later, see ``licel_mpush.findFrameStart()``. Delimiters inside the
+        raw data are then skipped.
+
         :param pushBuffer: buffer containing raw data
-        :type pushBuffer: bytearray
+        :type pushBuffer: Licel.licel_mpush.PushBuffer or bytearray
+
+        :param frameSize: number of bytes of a frame without the trailing delimiter,
+            ``TransientRecorder.exceptedByte``
+        :type frameSize: int | None
 
         '''
-        delimiterIndex = self._checkDelimiter(pushBuffer)
-        del pushBuffer [:delimiterIndex[1]]
+        frameStart = licel_mpush.findFrameStart(pushBuffer, frameSize)
+        if frameStart == -1:
+            # keep the last searched byte, it may be the first byte of a delimiter
+            searched = len(pushBuffer) if frameSize is None else frameSize + 2
+            frameStart = max(min(searched, len(pushBuffer)) - 1, 0)
+        del pushBuffer [:frameStart]
+        self.frameValidator.recordResync(frameStart)
         return 
     
+    def getFrameLayout(self, Config: 'licel_Config.Config',
+                       ethernetController: 'licel_tcpip.EthernetController',
+                       shots: int) -> licel_mpush.MPushFrameLayout:
+        '''
+        get the MPUSH frame layout of the running push acquisition, built by
+        ``MPushStartFromConfig()`` from ``Config`` and stored in ``ethernetController.Tr``.
+        The frames are decoded with the layout the MPUSH command was generated from.
+
+        :param Config: holds the acquisition configuration information
+        :type Config: Licel.licel_acq.Config()
+
+        :param ethernetController: holds TRHardwareinfo and timestamp endianness as members.
+        :type ethernetController: licel_tcpip.EthernetController 
+
+        :param shots: number of shots the user wishes to acquire
+        :type shots: int
+
+        :returns: MPUSH frame layout
+        :rtype: Licel.licel_mpush.MPushFrameLayout
+
+        :raises RuntimeError: if the MPUSH acquisition was not started from ``Config``
+        :raises ValueError: if the MPUSH acquisition was started with another number of shots
+        '''
+        frameLayout = ethernetController.Tr.frameLayout
+        if frameLayout is None:
+            raise RuntimeError ("MPUSH frame layout is not known, call MPushStartFromConfig() first.")
+        if frameLayout.shots != shots:
+            raise ValueError ('MPUSH acquisition was started with '+ str(frameLayout.shots)
+                              + ' shots \r\n passed argument is :'+ str(shots))
+        return frameLayout
+
+    def decodeFrame(self, frameLayout: licel_mpush.MPushFrameLayout,
+                    buffer, offset: int = 0) -> tuple[list[numpy.ndarray[Any, numpy.dtype[numpy.uint32]]],
+                                                      int,
+                                                      dict[int, dict[str, int]],
+                                                      dict[int, dict[str, int]]]:
+        '''
+        decode the MPUSH frame starting at ``offset`` in ``buffer``.
+        The raw data sets are read as numpy views at the offsets given by ``frameLayout``,
+        only the combined data sets are allocated. 
+
+        :param frameLayout: layout of the MPUSH frame
+        :type frameLayout: Licel.licel_mpush.MPushFrameLayout
+
+        :param buffer: buffer holding at least ``frameLayout.frameSize`` bytes after ``offset``
+        :type buffer: bytearray, bytes or memoryview
+
+        :param offset: position of the frame start delimiter in ``buffer``
+        :type offset: int
+
+        :returns: ``DataSet``, ``time_stamp``, ``analogue_shot_dict`` and ``pc_shot_dict``
+            as described in ``parseDataFromBuffer``
+        '''
+        analogue_shot_dict : dict[int, dict[str, int]] = {}
+        pc_shot_dict : dict[int, dict[str, int]] = {}
+        DataSet = []
+        frame = frameLayout.frameView(buffer, offset)
+        time_stamp = int(frame['timestamp'])
+        for dataset in frameLayout.datasets:
+            # the shot number of the last raw data set is reported, as before.
+            lastRawDataset = dataset.rawDatasets[-1]
+            shotNumber = int(frame[dataset.shotFieldName(lastRawDataset)])
+            if dataset.isPhotonCounting :
+                mem_low = frame[dataset.fieldName('PC')]
+                if 'PHM' in dataset.rawDatasets:
+                    convertedPc = self._convert_Photoncounting_Fullword(mem_low,
+                                                                        frame[dataset.fieldName('PHM')])
+                else :
+                    convertedPc = self._convert_Photoncounting(mem_low, 0)
+                DataSet.append(convertedPc)
+                pc_shot_dict.setdefault(dataset.nTransientRecorder, {})[dataset.memory] = shotNumber
+            else :
+                mem_extra = None
+                if 'PHM' in dataset.rawDatasets:
+                    mem_extra = frame[dataset.fieldName('PHM')]
+                Analogue32BitData,Clip = self._combine_Analog_Datasets_16bit(frame[dataset.fieldName('LSW')],
+                                                                             frame[dataset.fieldName('MSW')],
+                                                                             mem_extra)
+                DataSet.append(Analogue32BitData)
+                analogue_shot_dict.setdefault(dataset.nTransientRecorder, {})[dataset.memory] = shotNumber
+        return DataSet, time_stamp, analogue_shot_dict, pc_shot_dict
+
     def parseDataFromBuffer(self, Config: 'licel_Config.Config',
                             ethernetController: 'licel_tcpip.EthernetController',
                             shots: int) -> tuple[bool,
@@ -410,7 +763,8 @@ class DataParser:
         Binary push data will be transformed from raw binary data uint8 to preprocessed 
         raw data uint32.
         If the data is valid, meaning no byte were lost during the transmission, we remove
-        the raw binary, from ``ethernetController.pushBuffer``
+        the raw binary, from ``ethernetController.pushBuffer``.
+        The frame is checked by ``frameValidator``, its counters are available as ``statistics``.
 
         :param ethernetController: holds pushBuffer and TRHardwareinfo as members.
         :type ethernetController: licel_tcpip.EthernetController 
@@ -439,100 +793,57 @@ class DataParser:
               if data set is not active in the configuration shot number will be omitted  
 
         '''
-        analogue_shot_dict = {}
-        pc_shot_dict = {}
-        DataSet = []
-        parserIndex = 0
-        dataValid = False
-
-        if ethernetController.Tr.bigEndianTimeStamp == False:
-            time_stamp  = int.from_bytes(ethernetController.Tr.pushBuffer[2:6],
-                                         byteorder='little', signed=False)
-
-        elif ethernetController.Tr.bigEndianTimeStamp == True:
-            time_stamp  = int.from_bytes(ethernetController.Tr.pushBuffer[2:6],
-                                         byteorder='big', signed=False)
-
-        parserIndex += 6 
-        for trConfig in Config.TrConfigs: 
-            tmp_analogue_shot_dict={}
-            tmp_pc_shot_dict = {}
-            for memory in trConfig.analogueEnabled: 
-                if trConfig.analogueEnabled[memory] == True:
-                    TRnum = trConfig.nTransientRecorder
-                    tmp_analogue_shot_dict[memory] =(int.from_bytes(
-                                                [ethernetController.Tr.pushBuffer[parserIndex],
-                                                 ethernetController.Tr.pushBuffer[parserIndex+1]],
-                                                 byteorder='little',signed=False))
-                    parserIndex += MPUSH_SHOTNUM_OFFSET
-                    numberToRead = trConfig.analogueBins[memory] 
-                    RawLsw = ethernetController.Tr.pushBuffer[parserIndex:(2*numberToRead)+parserIndex]
-                    parserIndex += 2*numberToRead 
-                    tmp_analogue_shot_dict[memory] =(int.from_bytes(
-                                                [ethernetController.Tr.pushBuffer[parserIndex],
-                                                 ethernetController.Tr.pushBuffer[parserIndex+1]],
-                                                 byteorder='little',signed=False))
-                    
-                    parserIndex += MPUSH_SHOTNUM_OFFSET
-                    RawMsw = ethernetController.Tr.pushBuffer[parserIndex :(numberToRead*2)+ parserIndex]
-                    parserIndex += 2*numberToRead 
-
-                    lsw = numpy.frombuffer(RawLsw,numpy.uint16) 
-                    msw = numpy.frombuffer(RawMsw,numpy.uint16)  
-                    mem_extra = numpy.zeros((numberToRead))
-                    if ((shots > 32764) and (ethernetController.Tr.hardwareInfos[TRnum]['ADC Bits'] == 16)):
-                        tmp_analogue_shot_dict[memory] =(int.from_bytes(
-                                                        [ethernetController.pushBuffer[parserIndex],
-                                                        ethernetController.pushBuffer[parserIndex+1]],
-                                                        byteorder='little',signed=False))
-                        
-                        parserIndex += MPUSH_SHOTNUM_OFFSET 
-                        rawPHM = ethernetController.pushBuffer[parserIndex :(numberToRead*2)+ parserIndex]
-                        parserIndex += 2*numberToRead 
-                        mem_extra = numpy.frombuffer(rawPHM,numpy.uint16)  
-
-                    Analogue32BitData,Clip = self._combine_Analog_Datasets_16bit(lsw
-                                                                                ,msw,
-                                                                                mem_extra)
-                    DataSet.append(Analogue32BitData)
-                    analogue_shot_dict[TRnum] = tmp_analogue_shot_dict
-
-            for memory in trConfig.pcEnabled: 
-                if trConfig.pcEnabled[memory] == True: 
-                    TRnum = trConfig.nTransientRecorder
-                    tmp_pc_shot_dict[memory] = (int.from_bytes([ethernetController.Tr.pushBuffer[parserIndex],
-                                                            ethernetController.Tr.pushBuffer[parserIndex+1]],
-                                         byteorder='little',signed=False))
-                    parserIndex += MPUSH_SHOTNUM_OFFSET
-
-                    numberToRead = trConfig.pcBins[memory]
-                    rawPC = ethernetController.Tr.pushBuffer[parserIndex:(numberToRead*2)+parserIndex]
-                    parserIndex += 2*numberToRead 
-                    mem_low  = numpy.frombuffer(rawPC,numpy.uint16)
-                    if ((shots > 4096 and ethernetController.Tr.hardwareInfos[TRnum]['PC Bits'] == 4)
-                        or (shots > 1024 and ethernetController.Tr.hardwareInfos[TRnum]['PC Bits'] == 6)
-                        or (shots > 256 and ethernetController.Tr.hardwareInfos[TRnum]['PC Bits'] == 8)):  
-                        tmp_pc_shot_dict[memory] = (int.from_bytes([ethernetController.Tr.pushBuffer[parserIndex],
-                                                            ethernetController.Tr.pushBuffer[parserIndex+1]],
-                                                            byteorder='little',signed=False))
-                        parserIndex += MPUSH_SHOTNUM_OFFSET
-                        mem_extra_buffer = ethernetController.Tr.pushBuffer[parserIndex:(numberToRead*2)+parserIndex]
-                        parserIndex += 2*numberToRead 
-                        mem_extra = numpy.frombuffer(mem_extra_buffer,numpy.uint16)
-                        convertedPc = self._convert_Photoncounting_Fullword(mem_low, mem_extra)
-
-                    else : 
-                        convertedPc = self._convert_Photoncounting(mem_low, 0)
-
-                    DataSet.append(convertedPc)
-                    pc_shot_dict[TRnum] = tmp_pc_shot_dict
-
-        if (ethernetController.Tr.pushBuffer[parserIndex:parserIndex+2] == b'\xff\xff'): 
-            dataValid = True
-            del ethernetController.Tr.pushBuffer[:parserIndex]
-
-        return dataValid, DataSet, time_stamp, analogue_shot_dict, pc_shot_dict
+        pushBuffer = ethernetController.Tr.pushBuffer
+        frameLayout = self.getFrameLayout(Config, ethernetController, shots)
+        if len(pushBuffer) < frameLayout.bufferSize:
+            return False, [], 0, {}, {}
+
+        if not self.frameValidator.validate(frameLayout, pushBuffer.buffer, pushBuffer.start):
+            return False, [], 0, {}, {}
+
+        # decode in place, the frame starts at the read offset of the push buffer
+        (DataSet, time_stamp,
+         analogue_shot_dict, pc_shot_dict) = self.decodeFrame(frameLayout, pushBuffer.buffer,
+                                                              pushBuffer.start)
+        pushBuffer.consume(frameLayout.frameSize)
+
+        return True, DataSet, time_stamp, analogue_shot_dict, pc_shot_dict
          
+    def headerTemplate(self, Config: 'licel_Config.Config',
+                       TRHardwareInfo: dict[int, dict[str, int | str | float]] | None = None
+                       ) -> HeaderTemplate:
+        """
+        compiled header template for ``Config`` and ``TRHardwareInfo``, used by the
+        ``_generate...Headerline()`` methods. The last ``HEADER_TEMPLATE_CACHE_SIZE``
+        templates are kept, they are found by the identity of the configuration and of the
+        hardware information and by the ``headerFingerprint()`` of the formatted fields,
+        so that the headers follow any change of ``Config`` and ``TRHardwareInfo``.
+
+        :param Config: system configuration 
+        :type Config: Licel.licel_acq.Config()
+
+        :param TRHardwareInfo: dictionary holding TRHardwareinfo for each detected 
+            transient recorder. 
+        :type TRHardwareInfo: dict{Tr_number : {TRHardwareInfo}} | None
+
+        :rtype: HeaderTemplate
+        """
+        key = (id(Config), id(Config.measurementInfo), id(TRHardwareInfo),
+               headerFingerprint(Config, TRHardwareInfo))
+        template = self._headerTemplates.get(key)
+        # the template keeps the configuration alive, so that its id is not reused
+        if (template is None or template.Config is not Config
+            or template.measurementInfo is not Config.measurementInfo):
+            if len(self._headerTemplates) >= HEADER_TEMPLATE_CACHE_SIZE:
+                del self._headerTemplates[next(iter(self._headerTemplates))]
+            template = HeaderTemplate(Config, TRHardwareInfo)
+            self._headerTemplates[key] = template
+        return template
+
+    def invalidateHeaderTemplates(self) -> None:
+        """ discard the compiled header templates, for example to release the configurations they keep """
+        self._headerTemplates.clear()
+
     def _generateFileName(self,prefix: str) -> str:
         """ 
         generate file name from date, as specified in  
@@ -579,14 +890,7 @@ class DataParser:
         :returns: second header line. 
         :rtype: str
         """        
-        measInfo = Config.measurementInfo
-        assert len(measInfo.szLocation) <= 8, "Measurement site must be 8 character"
-        header =(' {:8s} {:19s} {:19s} {:04d} {:011.6f} {:011.6f} {:04.1f} {:04.1f}\n'
-                 .format(measInfo.szLocation,startTime,stopTime,
-                         measInfo.nAltitude,measInfo.dLongitude,
-                         measInfo.dLatitude,measInfo.Zenith,
-                         measInfo.Azimuth))
-        return header
+        return self.headerTemplate(Config).secondLine(startTime, stopTime)
     
     def _generateThirdHeaderline(self,Config: 'licel_Config.Config', shots: int,
                                  timestamp: int | None = None) -> str:
@@ -603,19 +907,7 @@ class DataParser:
         :param timestamp: timestamp received with from the controller in millisec
         :type timestamp: uint 
         """
-        measurConf = Config.measurementInfo
-        myDataSetsnum = 1
-        if timestamp :
-            header =(' {:d} {:04d} {:07d} {:04d} {:02d} {:07d} {:04d} {:d}\n'
-                 .format(shots, measurConf.repRateL0, shots, 
-                         measurConf.repRateL1, Config.numDataSets,
-                         shots, measurConf.repRateL2, timestamp) ) 
-        else :
-            header =(' {:d} {:04d} {:07d} {:04d} {:02d} {:07d} {:04d}\n'
-                 .format(shots, measurConf.repRateL0, shots, 
-                         measurConf.repRateL1, 1,
-                         shots, measurConf.repRateL2) ) 
-        return header
+        return self.headerTemplate(Config).thirdLine(shots, timestamp)
 
     def _generatePushDatasetsHeaderline(self, Config:'licel_Config.Config',
                                         TRHardwareInfo: dict[int, dict[str, int | str | float]],
@@ -641,59 +933,8 @@ class DataParser:
             photon counting memory
         :type analogue_shot_dict: dict{'A' : int, 'B' : int, 'C': int, 'D' : int }
         """
-        myHeaderLine = ""
-        for trConfig in Config.TrConfigs: 
-            for key in trConfig.analogueEnabled: 
-                if trConfig.analogueEnabled[key] == True: 
-                    trNum = trConfig.nTransientRecorder
-                    binshift_decimal = int((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
-                    pol = self._convertPolarizationToFileNotation(trConfig.analoguePolarisation[key])
-                    divider = 1 if trConfig.freqDivider == 0  else trConfig.freqDivider
-                    header =(" 1 0 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
-                             " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0"
-                             " {binshift:02d} {binshift_dec:3d} {adc:02d}"
-                             " {shots:06d} 0.{myRange:03d} BT{trNum:1X}\n"
-                            .format(laser = trConfig.laserAssignment[key], 
-                                   dataPoints = (trConfig.analogueBins[key]-1),
-                                   laserPolarization = trConfig.analoguePolarisation[key],
-                                   pmtHV = int(trConfig.pmVoltageAnalogue[key]),
-                                   binwidth = float((TRHardwareInfo[trNum]['binWidth'] )* (divider)),
-                                   wavelength = int (trConfig.analogueWavelength[key]),
-                                   polStatus = pol,
-                                   binshift = int(TRHardwareInfo[trNum]['binShift']), 
-                                   binshift_dec = int (binshift_decimal), 
-                                   adc = TRHardwareInfo[trNum]['ADC Bits'], 
-                                   shots = analogue_shot_dict[trNum][key]-2, 
-                                   myRange = trConfig.nRange,
-                                   trNum = trConfig.nTransientRecorder)   )
-                    myHeaderLine += header
-            
-            for key in trConfig.pcEnabled: 
-                if trConfig.pcEnabled[key] == True: 
-                    trNum = trConfig.nTransientRecorder
-                    binshift_decimal = int ((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
-                    pol = self._convertPolarizationToFileNotation(trConfig.pcPolarisation[key])
-                    scalingFactor = 25/63  # from labview 
-                    divider = 1 if trConfig.freqDivider == 0  else trConfig.freqDivider
-                    header =(" 1 1 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
-                             " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0 00 000 00"
-                             " {shots:06d} {myRange:6.4f} BC{trNum:1X}\n"
-                            .format(laser = trConfig.laserAssignment[key], 
-                                   dataPoints = (trConfig.pcBins[key]-1),
-                                   laserPolarization = trConfig.pcPolarisation[key],
-                                   pmtHV = int(trConfig.pmVoltagePC[key]),
-                                   binwidth = (float(TRHardwareInfo[trNum]['binWidth'] )* (divider)),
-                                   wavelength = int (trConfig.pcWavelength[key]),
-                                   polStatus = pol,
-                                   binshift = int("00"), 
-                                   binshift_dec = int ("000"), 
-                                   adc = TRHardwareInfo[trNum]['ADC Bits'], 
-                                   shots = pc_shot_dict[trNum][key]-2, 
-                                   myRange = (trConfig.discriminator * scalingFactor),
-                                   trNum = trConfig.nTransientRecorder))
-                    myHeaderLine += header   
-
-        return myHeaderLine
+        return (self.headerTemplate(Config, TRHardwareInfo)
+                .pushDatasetLines(analogue_shot_dict, pc_shot_dict))
 
     def _convertPolarizationToFileNotation(self, polarization:int) -> str:
         """ 
@@ -705,16 +946,7 @@ class DataParser:
         :returns: polarization status (none, parallel, crossed, right circular, left circular) o|p|s|r|l
         :rtype: str
         """
-        if polarization == 0 : 
-            return "o"
-        if polarization == 1 : 
-            return "p"
-        if polarization == 2 : 
-            return "s"
-        if polarization == 3 : 
-            return "r"
-        if polarization == 4 : 
-            return "l"
+        return _convertPolarizationToFileNotation(polarization)
         
     def savePushDataToLicelFileFormat(self, DataSet:list[numpy.ndarray[Any, numpy.dtype[numpy.uint32]]],
                                       Config:'licel_Config.Config', 
@@ -789,6 +1021,15 @@ class DataParser:
 
         self._acquisWrittenToFile += 1
 
+    def closeDataFile(self) -> None:
+        '''
+        close the data file left open by ``savePushDataToLicelFileFormat()``, the next
+        acquisition is written to a new file. Nothing is done if no file is open.
+        '''
+        if self._acquisWrittenToFile > 0:
+            self._myFileDescriptor.close()
+            self._acquisWrittenToFile = 0
+
     def _generateAcquisDatasetsHeaderline(self, Config:'licel_Config.Config',
                                           TRHardwareInfo: dict[int, dict[str, int | str | float]],
                                           shots: int, bins: int, device_number: int,
@@ -814,58 +1055,8 @@ class DataParser:
             photon counting memory
         :type analogue_shot_dict: dict{'A' : int, 'B' : int, 'C': int, 'D' : int }
         """
-        myHeaderLine = ""
-        myMem = Memory.split("_")[1]
-        for trConfig in Config.TrConfigs: 
-            if trConfig.nTransientRecorder == device_number: 
-                for key in trConfig.analogueEnabled: 
-                    if key == myMem and DataType == "Analogue":
-                        trNum = trConfig.nTransientRecorder
-                        binshift_decimal = int((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
-                        pol = self._convertPolarizationToFileNotation(trConfig.analoguePolarisation[key])
-                        header =(" 1 0 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
-                                " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0"
-                                " {binshift:02d} {binshift_dec:3d} {adc:02d}"
-                                " {shots:06d} 0.{myRange:03d} BT{trNum:1X}\n"
-                                .format(laser = trConfig.laserAssignment[key], 
-                                    dataPoints = (bins),
-                                    laserPolarization = trConfig.analoguePolarisation[key],
-                                    pmtHV = int(trConfig.pmVoltageAnalogue[key]),
-                                    binwidth = float(TRHardwareInfo[trNum]['binWidth']),
-                                    wavelength = int (trConfig.analogueWavelength[key]),
-                                    polStatus = pol,
-                                    binshift = int(TRHardwareInfo[trNum]['binShift']), 
-                                    binshift_dec = int (binshift_decimal), 
-                                    adc = TRHardwareInfo[trNum]['ADC Bits'], 
-                                    shots = shots, 
-                                    myRange = trConfig.nRange,
-                                    trNum = trConfig.nTransientRecorder)   )
-                        myHeaderLine += header
-                
-                    if key == myMem and DataType == "PhotonCounting":
-                        trNum = trConfig.nTransientRecorder
-                        binshift_decimal = int ((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
-                        pol = self._convertPolarizationToFileNotation(trConfig.pcPolarisation[key])
-                        scalingFactor = 25/63  # from labview 
-                        header =(" 1 1 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
-                                " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0 00 000 00"
-                                " {shots:06d} {myRange:6.4f} BC{trNum:1X}\n"
-                                .format(laser = trConfig.laserAssignment[key], 
-                                    dataPoints = (bins),
-                                    laserPolarization = trConfig.pcPolarisation[key],
-                                    pmtHV = int(trConfig.pmVoltagePC[key]),
-                                    binwidth = float(TRHardwareInfo[trNum]['binWidth']),
-                                    wavelength = int (trConfig.pcWavelength[key]),
-                                    polStatus = pol,
-                                    binshift = int("00"), 
-                                    binshift_dec = int ("000"), 
-                                    adc = TRHardwareInfo[trNum]['ADC Bits'], 
-                                    shots = shots, 
-                                    myRange = (trConfig.discriminator * scalingFactor),
-                                    trNum = trConfig.nTransientRecorder))
-                        myHeaderLine += header   
-
-        return myHeaderLine
+        return (self.headerTemplate(Config, TRHardwareInfo)
+                .acquisDatasetLine(shots, bins, device_number, DataType, Memory))
 
     def saveAcquisDataToLicelFileFormat(self, prefix:str, shots:int, bins:int,  
                                         Config:'licel_Config.Config', my_startTime:'datetime', 
@@ -913,7 +1104,7 @@ class DataParser:
         '''    
         filename = self._generateFileName(prefix)
         
-        self._path = os.path.join(Config.measurmentInfo.szOutPath,filename)
+        self._path = os.path.join(Config.measurementInfo.szOutPath,filename)
         
         my_startTime = my_startTime.strftime("%d/%m/%Y %H:%M:%S")
         my_stopTime = my_stopTime.strftime("%d/%m/%Y %H:%M:%S")
@@ -934,7 +1125,8 @@ class DataParser:
                     ethernetController:'licel_tcpip.EthernetController',
                     idn:str, startTime: datetime, Config:'licel_Config.Config'):
         """
-        write log file to spcified ``asciiFile_path``
+        write log file to spcified ``asciiFile_path``.
+        For a compact and replayable record of the push data see ``licel_capture``.
 
         :param asciiFile_path: path of the file to be written 
         :type asciiFile_path: str
@@ -953,8 +1145,8 @@ class DataParser:
         """
         if (self._firstLog == True):
             asciiFile  = open(asciiFile_path, "a")
-            bufferlength = "raw buffer length:" + str(len(ethernetController.pushBuffer)) + "\r\n"
-            byte_to_recive = "expected bytes to be  received:" + str(ethernetController.BufferSize) + "\r\n"
+            bufferlength = "raw buffer length:" + str(len(ethernetController.Tr.pushBuffer)) + "\r\n"
+            byte_to_recive = "expected bytes to be  received:" + str(ethernetController.Tr.BufferSize) + "\r\n"
             asciiFile.write(idn+ "\r\n")
             asciiFile.write("Acquisiton Start: "+str(startTime)+ "\r\n")
             asciiFile.write(str(Config.TrConfigs)+ "\r\n")
@@ -962,19 +1154,19 @@ class DataParser:
             asciiFile.write(byte_to_recive)
             asciiFile.close()
             asciiFile  = open(asciiFile_path, "ab")
-            asciiFile.write(ethernetController.pushBuffer)
+            asciiFile.write(ethernetController.Tr.pushBuffer.view())
             asciiFile.write(b"\r\n")
             asciiFile.close()
             self._firstLog = False
         else : 
             asciiFile  = open(asciiFile_path, "a")
-            bufferlength = "raw buffer length:" + str(len(ethernetController.pushBuffer)) + "\r\n"
-            byte_to_recive = "expected bytes to be  received:" + str(ethernetController.BufferSize) + "\r\n"
+            bufferlength = "raw buffer length:" + str(len(ethernetController.Tr.pushBuffer)) + "\r\n"
+            byte_to_recive = "expected bytes to be  received:" + str(ethernetController.Tr.BufferSize) + "\r\n"
             asciiFile.write(bufferlength)
             asciiFile.write(byte_to_recive)
             asciiFile.close()
             asciiFile  = open(asciiFile_path, "ab")
-            asciiFile.write(ethernetController.pushBuffer)
+            asciiFile.write(ethernetController.Tr.pushBuffer.view())
             asciiFile.write(b"\r\n")
             asciiFile.close()
 
@@ -0,0 +1,838 @@
+'''
+Copyright ©: Licel Gmbh
+
+The ControllerEmulator class emulates an ethernet controller on the local machine, so that
+the library can be exercised without hardware. It serves:
+
+    - the command port ``port``: text commands of the transient recorder controller
+      (``*IDN?``, ``CAP?``, ``SELECT``, ``STAT?``, ``TRTYPE?``, ``DATA?``, ``MPUSH``, ...),
+      the photomultiplier and the powermeter. With ``profile="SP32"`` the commands of the
+      SP32 detector, with ``profile="WIND"`` the binary protocol of the Waverider.
+    - the push port ``port + 1``: MPUSH frames ``<xff xff><timestamp>{<shots><raw data>}``
+      at the rate given by the laser repetition rate and the number of shots,
+      or powermeter push lines.
+    - the kill port ``port + 2``: ``KILL SOCKETS`` closes the open connections.
+
+The raw data is generated from a synthetic lidar signal and encoded as the transient
+recorder does, so that ``DataParser`` decodes the expected summed up values.
+
+Usage::
+
+    emulator = licel_emulator.ControllerEmulator(port=2055, transientRecorders=[0, 1])
+    emulator.start()
+    ethernetController = licel_tcpip.EthernetController("127.0.0.1", 2055)
+    ...
+    emulator.stop()
+'''
+import numpy
+import select
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+
+from Licel import licel_mpush
+
+from typing import Any
+
+#: identification of the emulated controller
+EMULATOR_IDN = "Licel Ethernet Controller Emulator"
+#: identification of an emulated controller sending the timestamp as big endian
+EMULATOR_IDN_COLDFIRE = "ColdFireEthernet Controller Emulator"
+#: transient recorder profile: controller, transient recorders, photomultiplier, powermeter
+PROFILE_TR = "TR"
+#: SP32 detector profile
+PROFILE_SP32 = "SP32"
+#: Waverider profile, binary protocol on the command port
+PROFILE_WIND = "WIND"
+#: high voltage reported for a not installed photomultiplier
+PMT_NOT_INSTALLED_VOLTAGE = 356.0
+#: number of different frames generated for each MPUSH acquisition, sent in rotation
+FRAME_POOL_SIZE = 4
+#: number of SP32 channels
+SP32_TRACES = 32
+#: size in bytes of the Waverider power spectra payload
+WIND_PAYLOAD_SIZE = 8 * 2**15
+
+INPUTRANGE_MV = {0: '-500mV', 1: '-100mV', 2: '-20mV'}
+
+@dataclass()
+class EmulatedTransientRecorder:
+    '''
+    hardware description and state of an emulated transient recorder
+    '''
+    #: transient recorder address
+    address     : int   = field(default =0)
+    adcBits     : int   = field(default =16)
+    pcBits      : int   = field(default =4)
+    fifoLength  : int   = field(default =16384)
+    binWidth    : float = field(default =7.5)
+    hwcap       : int   = field(default =0x7f)
+    binShift    : float = field(default =3.0)
+    #: configuration written by the commands
+    discriminator : int = field(default =0)
+    threshold     : int = field(default =0)
+    inputRange    : int = field(default =0)
+    pretrigger    : int = field(default =0)
+    maxShots      : int = field(default =4096)
+    freqDivider   : int = field(default =0)
+    blockedTriggers : set[str] = field(default_factory = set)
+    #: acquisition state
+    armed       : bool  = field(default =False)
+    startTime   : float = field(default =0.0)
+    stoppedShots: int   = field(default =0)
+    #: raw data sets returned by ``DATA?`` {(memory, number, shots) : raw data sets},
+    #: repeated reads of the same memory return the same data.
+    memories    : dict[tuple[str, int, int], Any] = field(default_factory = dict)
+
+    def trtypeResponse(self) -> str:
+        return ("TRTYPE ADC Bits {} PC Bits {} FIFOLength {} binWidth {} ID {} "
+                "HWCAP 0x{:x} binShift {} raw 0"
+                .format(self.adcBits, self.pcBits, self.fifoLength, self.binWidth,
+                        self.address, self.hwcap, self.binShift))
+
+    def shots(self, repetitionRate: float) -> int:
+        ''' number of shots acquired since the acquisition start '''
+        if not self.armed:
+            return self.stoppedShots
+        shots = int((time.monotonic() - self.startTime) * repetitionRate)
+        if shots >= self.maxShots:
+            # shot limit reached, the transient recorder returns from the armed state
+            self.armed = False
+            self.stoppedShots = self.maxShots
+        return min(shots, self.maxShots)
+
+    def start(self) -> None:
+        self.memories.clear()
+        self.armed = True
+        self.startTime = time.monotonic()
+
+    def stop(self, repetitionRate: float) -> None:
+        self.stoppedShots = self.shots(repetitionRate)
+        self.armed = False
+
+    def clear(self) -> None:
+        self.memories.clear()
+        self.armed = False
+        self.stoppedShots = 0
+
+@dataclass()
+class EmulatorStatistics:
+    '''
+    counters of the emulator
+    '''
+    #: number of commands received on the command port
+    commands        : int = field(default =0)
+    #: number of MPUSH frames sent on the push port
+    framesSent      : int = field(default =0)
+    #: number of bytes sent on the push port
+    bytesSent       : int = field(default =0)
+    #: number of accepted command connections
+    connections     : int = field(default =0)
+    #: number of accepted push connections
+    pushConnections : int = field(default =0)
+    #: number of ``KILL SOCKETS`` requests
+    killRequests    : int = field(default =0)
+
+def _lidarSignal(bins: int, binWidth: float, maximum: float) -> numpy.ndarray[Any, numpy.dtype[numpy.double]]:
+    '''
+    synthetic mean signal per shot: background plus a range corrected exponential decay,
+    with an overlap function at short range.
+    '''
+    distance = (numpy.arange(bins) + 1) * binWidth * 0.15
+    overlap = numpy.minimum(1.0, (distance / 300.0)**2)
+    signal = overlap * numpy.exp(-distance / 3000.0) / numpy.maximum(distance / 300.0, 1.0)**2
+    return 0.02 * maximum + 0.6 * maximum * signal
+
+def _encodeRawDatasets(tr: EmulatedTransientRecorder, count: int, shots: int,
+                       rng: numpy.random.Generator) -> dict[str, numpy.ndarray[Any, numpy.dtype[numpy.uint16]]]:
+    '''
+    generate the raw data sets of a transient recorder memory for ``shots`` shots.
+    Each array holds ``count`` elements, the first element is invalid as for the hardware.
+
+    :returns: dictionary {raw data set type : uint16 array}
+    '''
+    shots = max(shots, 1)
+    binWidth = tr.binWidth * (1 << tr.freqDivider)
+    # analogue, summed up ADC counts
+    adcMax = float((1 << tr.adcBits) - 1)
+    mean = _lidarSignal(count, binWidth, adcMax)
+    sigma = 0.002 * adcMax
+    summed = shots * mean + rng.normal(0.0, sigma * numpy.sqrt(shots), count)
+    summed = numpy.clip(numpy.rint(summed), 0, 0xffffffff).astype(numpy.uint64)
+    squared = (shots * (mean * mean + sigma * sigma)).astype(numpy.uint64)
+    # photon counting, counts per shot limited by the PC Bits
+    rate = _lidarSignal(count, binWidth, 0.5 * ((1 << tr.pcBits) - 1))
+    counts = rng.poisson(shots * rate).astype(numpy.uint64)
+    countsSquared = (shots * (rate + rate * rate)).astype(numpy.uint64)
+
+    raw : dict[str, numpy.ndarray[Any, numpy.dtype[numpy.uint16]]] = {}
+    raw['LSW'] = (summed & 0xffff).astype(numpy.uint16)
+    if tr.adcBits == 16:
+        # bits 16..27 in MSW bits 0..11, bits 28..30 in MSW bits 13..15, bit 31 in PHM bit 8
+        raw['MSW'] = (((summed >> 16) & 0x0fff) | (((summed >> 28) & 0x7) << 13)).astype(numpy.uint16)
+        analoguePHM = (((summed >> 31) & 0x1) << 8)
+    else:
+        raw['MSW'] = ((summed >> 16) & 0xff).astype(numpy.uint16)
+        analoguePHM = numpy.zeros(count, numpy.uint64)
+    if tr.pcBits and usesPhotonFullword(tr, shots):
+        raw['PC'] = (counts & 0xffff).astype(numpy.uint16)
+        raw['PHM'] = (analoguePHM | ((counts >> 16) & 0xff)).astype(numpy.uint16)
+    else:
+        raw['PC'] = numpy.minimum(counts, 0x7fff).astype(numpy.uint16)
+        raw['PHM'] = analoguePHM.astype(numpy.uint16)
+    raw['A2L'] = (squared & 0xffff).astype(numpy.uint16)
+    raw['A2M'] = ((squared >> 16) & 0xffff).astype(numpy.uint16)
+    raw['A2H'] = ((squared >> 32) & 0xffff).astype(numpy.uint16)
+    # DataParser._combine_Photon_Squared_Data() takes the low word from P2M
+    raw['P2L'] = ((countsSquared >> 16) & 0xffff).astype(numpy.uint16)
+    raw['P2M'] = (countsSquared & 0xffff).astype(numpy.uint16)
+    for rawData in raw.values():
+        rawData[0] = 0
+    return raw
+
+def usesPhotonFullword(tr: EmulatedTransientRecorder, shots: int) -> bool:
+    ''' True if the photon counts of ``shots`` shots are sent with PC and PHM '''
+    return licel_mpush.usesPhotonPHM({'ADC Bits': tr.adcBits, 'PC Bits': tr.pcBits}, shots)
+
+class ControllerEmulator:
+    '''
+    Emulated ethernet controller serving the command, push and kill ports.
+    '''
+
+    #: emulator counters
+    statistics : EmulatorStatistics
+
+    def __init__(self, ip: str = "127.0.0.1", port: int = 2055,
+                 profile: str = PROFILE_TR, transientRecorders: list[int] | None = None,
+                 pmts: list[int] | None = None, repetitionRate: float = 10.0,
+                 frameRate: float | None = None, bigEndianTimeStamp: bool = False,
+                 seed: int = 0) -> None:
+        '''
+        :param ip: address to listen on
+        :type ip: str
+
+        :param port: command port, the push port is ``port + 1`` and the kill port ``port + 2``
+        :type port: int
+
+        :param profile: ``PROFILE_TR``, ``PROFILE_SP32`` or ``PROFILE_WIND``
+        :type profile: str
+
+        :param transientRecorders: addresses of the installed transient recorders
+        :type transientRecorders: list[int]
+
+        :param pmts: addresses of the installed photomultipliers
+        :type pmts: list[int]
+
+        :param repetitionRate: laser repetition rate in Hz, one MPUSH frame is sent
+            every ``shots / repetitionRate`` seconds.
+        :type repetitionRate: float
+
+        :param frameRate: MPUSH frames per second overriding the repetition rate,
+            0 sends the frames as fast as the connection allows.
+        :type frameRate: float
+
+        :param bigEndianTimeStamp: emulate a ColdFire controller sending big endian timestamps
+        :type bigEndianTimeStamp: bool
+
+        :param seed: seed of the random generator for the synthetic data
+        :type seed: int
+        '''
+        self.ip = ip
+        self.port = port
+        self.pushPort = port + 1
+        self.killPort = port + 2
+        self.profile = profile
+        self.repetitionRate = repetitionRate
+        self.frameRate = frameRate
+        self.bigEndianTimeStamp = bigEndianTimeStamp
+        self.rng = numpy.random.default_rng(seed)
+        self.transientRecorders = {address : EmulatedTransientRecorder(address)
+                                   for address in (transientRecorders
+                                                   if transientRecorders is not None else [0])}
+        self.pmtVoltages = {address : 0.0 for address in (pmts if pmts is not None else [0])}
+        self.statistics = EmulatorStatistics()
+        self._selected : list[int] = []
+        self._bootTime = time.monotonic()
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._threads : list[threading.Thread] = []
+        self._servers : list[socket.socket] = []
+        self._commandConnection : socket.socket | None = None
+        self._pushConnection : socket.socket | None = None
+        #: active push mode: None, 'MPUSH' or 'POW'
+        self._pushMode : str | None = None
+        self._pushGeneration = 0
+        self._framePool : list[bytearray] = []
+        self._frameInterval = 0.0
+        self._powerTriggerSimulation = False
+        self._powerChannel = 0
+        # SP32 state
+        self._sp32 = {'shutter': 'CLOSED', 'wideMem': False, 'rangeBins': 1024,
+                      'targetShots': 0, 'startTime': 0.0, 'hv': 0, 'running': False}
+        # Waverider state
+        self._wind = {'shots': 1000, 'fftSize': 512, 'numFFT': 64, 'started': 0.0}
+        #: command handlers by keyword, commands without handler reply ``<keyword> executed``
+        self._commands = {"*IDN?"       : self._idn,
+                          "CAP?"        : self._cap,
+                          "MILLISEC?"   : self._milliSec,
+                          "SELECT"      : self._select,
+                          "STAT?"       : self._stat,
+                          "TRTYPE?"     : self._trtype,
+                          "DATA?"       : self._data,
+                          "MPUSH"       : self._mpush,
+                          "SLAVE"       : self._slave,
+                          "START"       : self._startStop,
+                          "SINGLE"      : self._startStop,
+                          "CONTINUE"    : self._startStop,
+                          "STOP"        : self._startStop,
+                          "CLEAR"       : self._startStop,
+                          "MSTART"      : self._startStop,
+                          "MCONTINUE"   : self._startStop,
+                          "MSTOP"       : self._startStop,
+                          "MCLEAR"      : self._startStop,
+                          "MWAIT"       : self._mwait,
+                          "SHOTAB?"     : self._shotAB,
+                          "MSHOTAB?"    : self._multipleShots,
+                          "MSHOTS?"     : self._multipleShots,
+                          "DISC"        : self._disc,
+                          "PRETRIG"     : self._pretrig,
+                          "SETMAXSHOTS" : self._setMaxShots,
+                          "THRESHOLD"   : self._threshold,
+                          "RANGE"       : self._range,
+                          "BLOCK"       : self._block,
+                          "FREQDIV?"    : self._freqDivQuery,
+                          "FREQDIV"     : self._freqDiv,
+                          "PMTG"        : self._pmtSet,
+                          "PMT?"        : self._pmtGet,
+                          "POW"         : self._pow,
+                          "POWTIMERSIM" : self._powTimerSim,
+                          "TCPIP"       : self._tcpip}
+        self._sp32Commands = {"*IDN?"         : lambda tokens: "SP32 Emulator",
+                              "HW?"           : lambda tokens: "HW SP32 Emulator",
+                              "CAP?"          : lambda tokens: "CAP: 32CHANNEL",
+                              "CURRENT?"      : lambda tokens: "Current 0.12 mA",
+                              "DIETEMP?"      : lambda tokens: "DIETEMP 41.5",
+                              "TEMP?"         : lambda tokens: "Temperature 23.5",
+                              "DISCRIMINATOR" : self._sp32Discriminator,
+                              "PMT?"          : self._sp32Pmt,
+                              "PMTG"          : self._sp32Pmt,
+                              "SHUTTER"       : self._sp32Shutter,
+                              "SHUTTER?"      : self._sp32Shutter,
+                              "RANGEBINS"     : self._sp32RangeBins,
+                              "WIDEMEM"       : self._sp32WideMem,
+                              "STAT?"         : self._sp32Stat,
+                              "START"         : self._sp32Start,
+                              "STOP"          : self._sp32Stop,
+                              "DATA?"         : self._sp32Data}
+
+    # ------------------------------------------------------------------ servers
+    def start(self) -> None:
+        ''' open the command, push and kill ports and serve them on background threads '''
+        self._running.set()
+        for port, target in ((self.port, self._serveCommandPort),
+                             (self.pushPort, self._servePushPort),
+                             (self.killPort, self._serveKillPort)):
+            server = socket.create_server((self.ip, port))
+            server.settimeout(0.2)
+            self._servers.append(server)
+            thread = threading.Thread(target=target, args=(server,), daemon=True,
+                                      name="ControllerEmulator:{}".format(port))
+            self._threads.append(thread)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        ''' close all connections and ports, wait for the background threads '''
+        self._running.clear()
+        self._closeConnections()
+        for thread in self._threads:
+            thread.join()
+        for server in self._servers:
+            server.close()
+        self._threads = []
+        self._servers = []
+
+    def __enter__(self) -> 'ControllerEmulator':
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def milliSecs(self) -> int:
+        ''' controller millisecond timer, 32 bit wide '''
+        return int((time.monotonic() - self._bootTime) * 1000) & 0xffffffff
+
+    def _closeConnections(self) -> None:
+        with self._lock:
+            connections = (self._commandConnection, self._pushConnection)
+            self._commandConnection = None
+            self._pushConnection = None
+            self._pushMode = None
+        for connection in connections:
+            if connection is not None:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                connection.close()
+
+    def _accept(self, server: socket.socket) -> socket.socket | None:
+        try:
+            connection, _ = server.accept()
+        except (socket.timeout, OSError):
+            return None
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def _serveCommandPort(self, server: socket.socket) -> None:
+        while self._running.is_set():
+            connection = self._accept(server)
+            if connection is None:
+                continue
+            self.statistics.connections += 1
+            with self._lock:
+                self._commandConnection = connection
+            try:
+                if self.profile == PROFILE_WIND:
+                    self._serveWind(connection)
+                else:
+                    self._serveText(connection)
+            except OSError:
+                pass
+            finally:
+                connection.close()
+
+    def _serveText(self, connection: socket.socket) -> None:
+        sockFile = connection.makefile('rb')
+        while self._running.is_set():
+            line = sockFile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            if not command:
+                continue
+            self.statistics.commands += 1
+            response = self.handleCommand(command)
+            if isinstance(response, str):
+                connection.sendall((response + "\r\n").encode())
+            else:
+                connection.sendall(response)
+
+    def _serveKillPort(self, server: socket.socket) -> None:
+        while self._running.is_set():
+            connection = self._accept(server)
+            if connection is None:
+                continue
+            connection.settimeout(1)
+            try:
+                request = connection.recv(256)
+            except OSError:
+                request = b''
+            connection.close()
+            if request.startswith(b"KILL SOCKETS"):
+                self.statistics.killRequests += 1
+                self._closeConnections()
+
+    def _servePushPort(self, server: socket.socket) -> None:
+        while self._running.is_set():
+            connection = self._accept(server)
+            if connection is None:
+                continue
+            self.statistics.pushConnections += 1
+            with self._lock:
+                self._pushConnection = connection
+            try:
+                self._push(connection)
+            except OSError:
+                pass
+            finally:
+                connection.close()
+
+    def _push(self, connection: socket.socket) -> None:
+        ''' send push data while the connection is open '''
+        nextSend = time.monotonic()
+        frameIndex = 0
+        generation = -1
+        while self._running.is_set() and self._pushConnection is connection:
+            readable, _, _ = select.select([connection], [], [], 0)
+            if readable and not connection.recv(4096):
+                # connection closed by the client
+                return
+            if self._pushMode is None:
+                time.sleep(0.01)
+                continue
+            if generation != self._pushGeneration:
+                generation = self._pushGeneration
+                nextSend = time.monotonic()
+            delay = nextSend - time.monotonic()
+            if delay > 0:
+                time.sleep(min(delay, 0.05))
+                continue
+            if self._pushMode == 'MPUSH':
+                frame = self._framePool[frameIndex % len(self._framePool)]
+                struct.pack_into('>I' if self.bigEndianTimeStamp else '<I', frame, 2,
+                                 self.milliSecs())
+                connection.sendall(frame)
+                frameIndex += 1
+                self.statistics.framesSent += 1
+                self.statistics.bytesSent += len(frame)
+                nextSend += self._frameInterval
+            else:
+                trigger = self.statistics.framesSent
+                amplitude = int(2000 + self.rng.normal(0, 20))
+                line = "{} {} {}\r\n".format(self.milliSecs(), amplitude, trigger % 4).encode()
+                connection.sendall(line)
+                self.statistics.framesSent += 1
+                self.statistics.bytesSent += len(line)
+                nextSend += 1.0 / self.repetitionRate
+
+    # ------------------------------------------------------------------ commands
+    def handleCommand(self, command: str) -> str | bytes:
+        '''
+        execute a text command of the command port.
+
+        :param command: command without the line ending
+        :type command: str
+
+        :returns: the response line without the line ending, or binary data
+        :rtype: str or bytes
+        '''
+        tokens = command.split()
+        keyword = tokens[0].upper()
+        handler = None
+        if self.profile == PROFILE_SP32:
+            handler = self._sp32Commands.get(keyword)
+        if handler is None:
+            handler = self._commands.get(keyword)
+        if handler is not None:
+            return handler(tokens)
+        if keyword.endswith("?"):
+            return "unknown command " + command
+        return keyword + " executed"
+
+    def _selectedRecorders(self) -> list[EmulatedTransientRecorder]:
+        return [self.transientRecorders[address] for address in self._selected
+                if address in self.transientRecorders]
+
+    def _idn(self, tokens: list[str]) -> str:
+        return EMULATOR_IDN_COLDFIRE if self.bigEndianTimeStamp else EMULATOR_IDN
+
+    def _cap(self, tokens: list[str]) -> str:
+        return "CAP TR PMT POW"
+
+    def _milliSec(self, tokens: list[str]) -> str:
+        return "MILLISEC " + str(self.milliSecs())
+
+    def _select(self, tokens: list[str]) -> str:
+        self._selected = [int(address) for address in "".join(tokens[1:]).split(",")
+                          if address and int(address) >= 0]
+        return "SELECT executed"
+
+    def _stat(self, tokens: list[str]) -> str:
+        recorders = self._selectedRecorders()
+        if not recorders:
+            return "Device ID {} is currently not supported".format(self._selected)
+        tr = recorders[0]
+        shots = tr.shots(self.repetitionRate)
+        return "Shots {}{}".format(shots, " Armed" if tr.armed else "")
+
+    def _trtype(self, tokens: list[str]) -> str:
+        recorders = self._selectedRecorders()
+        if not recorders:
+            return "TRTYPE not supported"
+        return recorders[0].trtypeResponse()
+
+    def _disc(self, tokens: list[str]) -> str:
+        for tr in self._selectedRecorders():
+            tr.discriminator = int(tokens[1])
+        return "DISC set to " + tokens[1]
+
+    def _pretrig(self, tokens: list[str]) -> str:
+        for tr in self._selectedRecorders():
+            tr.pretrigger = int(tokens[1])
+        return "PRETRIG executed"
+
+    def _setMaxShots(self, tokens: list[str]) -> str:
+        for tr in self._selectedRecorders():
+            tr.maxShots = int(tokens[1])
+        return "SETMAXSHOTS executed"
+
+    def _range(self, tokens: list[str]) -> str:
+        value = int(tokens[1])
+        for tr in self._selectedRecorders():
+            tr.inputRange = value
+        return "RANGE set to " + INPUTRANGE_MV.get(value, str(value))
+
+    def _threshold(self, tokens: list[str]) -> str:
+        value = int(tokens[1])
+        for tr in self._selectedRecorders():
+            tr.threshold = value
+        return "THRESHOLD Damping {}".format("on" if value else "off")
+
+    def _freqDivQuery(self, tokens: list[str]) -> str:
+        recorders = self._selectedRecorders()
+        return "FREQDIV {}".format(recorders[0].freqDivider if recorders else 0)
+
+    def _freqDiv(self, tokens: list[str]) -> str:
+        value = int(tokens[1])
+        for tr in self._selectedRecorders():
+            tr.freqDivider = value
+        return "FREQDIV {} executed".format(value)
+
+    def _block(self, tokens: list[str]) -> str:
+        for tr in self._selectedRecorders():
+            if tokens[1].upper() == "OFF":
+                tr.blockedTriggers.clear()
+            else:
+                tr.blockedTriggers.add(tokens[1].upper())
+        return "BLOCK executed"
+
+    def _startStop(self, tokens: list[str]) -> str:
+        keyword = tokens[0].upper().lstrip("M")
+        for tr in (self.transientRecorders.values() if tokens[0].upper().startswith("M")
+                   else self._selectedRecorders()):
+            if keyword in ("START", "SINGLE"):
+                tr.clear()
+                tr.start()
+            elif keyword == "CONTINUE":
+                tr.start()
+            elif keyword == "STOP":
+                tr.stop(self.repetitionRate)
+            elif keyword == "CLEAR":
+                tr.clear()
+        return tokens[0].upper() + " executed"
+
+    def _shotAB(self, tokens: list[str]) -> str:
+        recorders = self._selectedRecorders()
+        shots = recorders[0].shots(self.repetitionRate) if recorders else 0
+        return "{} {} {}".format(tokens[0].upper().rstrip("?"), shots, shots)
+
+    def _multipleShots(self, tokens: list[str]) -> str:
+        return "{} {}".format(tokens[0].upper().rstrip("?"),
+                              " ".join(str(tr.shots(self.repetitionRate))
+                                       for tr in self.transientRecorders.values()))
+
+    def _mwait(self, tokens: list[str]) -> str:
+        deadline = time.monotonic() + int(tokens[1]) / 1000
+        while time.monotonic() < deadline:
+            if not any(tr.armed and tr.shots(self.repetitionRate) < tr.maxShots
+                       for tr in self.transientRecorders.values()):
+                return "MWAIT executed"
+            time.sleep(0.005)
+        return "MWAIT failed"
+
+    def _slave(self, tokens: list[str]) -> str:
+        self._pushMode = None
+        return "SLAVE executed"
+
+    def _data(self, tokens: list[str]) -> bytes:
+        ''' ``DATA? <device> <number> <type> <memory>``, binary response of 2*number bytes '''
+        device, count, datatype = int(tokens[1]), int(tokens[2]), tokens[3].upper()
+        tr = self.transientRecorders.get(device)
+        if tr is None:
+            return bytes(2 * count)
+        shots = tr.shots(self.repetitionRate)
+        key = (tokens[4].upper(), count, shots)
+        if key not in tr.memories:
+            tr.memories[key] = _encodeRawDatasets(tr, count, shots, self.rng)
+        return tr.memories[key][datatype].tobytes()
+
+    def _mpush(self, tokens: list[str]) -> str:
+        '''
+        ``MPUSH <shots> {<device> <bins> <type> <memory>}``, generates the frame pool and
+        starts sending frames on the push port.
+        '''
+        shots = int(tokens[1])
+        requests = [(int(tokens[i]), int(tokens[i + 1]), tokens[i + 2].upper(), tokens[i + 3])
+                    for i in range(2, len(tokens) - 3, 4)]
+        if not requests or any(device not in self.transientRecorders
+                               for device, _, _, _ in requests):
+            return "MPUSH failed"
+        framePool = []
+        for _ in range(FRAME_POOL_SIZE):
+            frame = bytearray(licel_mpush.MPUSH_DELIMITER + bytes(4))
+            generated : dict[tuple[int, str, int], Any] = {}
+            for device, bins, datatype, memory in requests:
+                key = (device, memory, bins)
+                if key not in generated:
+                    generated[key] = _encodeRawDatasets(self.transientRecorders[device],
+                                                        bins, shots, self.rng)
+                frame += struct.pack('<H', min(shots, 0xffff))
+                frame += generated[key][datatype].tobytes()
+            framePool.append(frame)
+        with self._lock:
+            self._framePool = framePool
+            if self.frameRate is None:
+                self._frameInterval = shots / self.repetitionRate
+            else:
+                self._frameInterval = 1.0 / self.frameRate if self.frameRate > 0 else 0.0
+            self._pushGeneration += 1
+            self._pushMode = 'MPUSH'
+        return "MPUSH executed"
+
+    def _pmtSet(self, tokens: list[str]) -> str:
+        device, voltage = int(tokens[1]), float(tokens[2])
+        if device in self.pmtVoltages:
+            self.pmtVoltages[device] = voltage
+        return "PMTG executed"
+
+    def _pmtGet(self, tokens: list[str]) -> str:
+        device = int(tokens[1])
+        if device not in self.pmtVoltages:
+            return "PMT {:.1f}".format(PMT_NOT_INSTALLED_VOLTAGE)
+        return "PMT {:.1f}".format(self.pmtVoltages[device])
+
+    def _pow(self, tokens: list[str]) -> str:
+        subcommand = tokens[1].upper()
+        if subcommand == "CHANNEL":
+            self._powerChannel = int(tokens[2])
+        elif subcommand == "START":
+            self._pushGeneration += 1
+            self._pushMode = 'POW'
+        elif subcommand == "STOP":
+            self._pushMode = None
+        elif subcommand == "TRACE":
+            trace = (1000 * numpy.exp(-numpy.arange(64) / 10.0)).astype(int)
+            return "TRACE " + " ".join(str(point) for point in trace)
+        elif subcommand == "NUMTRIG?":
+            return "POW NUMTRIG 4"
+        return "POW " + subcommand + " executed"
+
+    def _powTimerSim(self, tokens: list[str]) -> str:
+        self._powerTriggerSimulation = tokens[1].upper() == "ON"
+        return "POWTIMERSIM executed"
+
+    def _tcpip(self, tokens: list[str]) -> str:
+        if len(tokens) > 1 and tokens[1].strip('"').upper() == "DHCP":
+            return "DHCP activated"
+        return "TCPIP executed"
+
+    # -------------------------------------------------------------------- SP32
+    def _sp32Stat(self, tokens: list[str]) -> str:
+        state = self._sp32
+        shots = 0
+        if state['running']:
+            shots = min(int((time.monotonic() - state['startTime']) * self.repetitionRate),
+                        state['targetShots'])
+            if shots >= state['targetShots']:
+                state['running'] = False
+        elif state['targetShots']:
+            shots = state['targetShots']
+        return "Run: {}, {} Shots of {} {} {:.6f}".format(2 if state['running'] else 0, shots,
+                                                          state['targetShots'], 2048,
+                                                          time.monotonic() * 1000)
+
+    def _sp32Start(self, tokens: list[str]) -> str:
+        self._sp32['targetShots'] = int(tokens[1])
+        self._sp32['startTime'] = time.monotonic()
+        self._sp32['running'] = True
+        return "START executed"
+
+    def _sp32Stop(self, tokens: list[str]) -> str:
+        self._sp32['running'] = False
+        return "STOP executed"
+
+    def _sp32Data(self, tokens: list[str]) -> bytes:
+        state = self._sp32
+        bins = state['rangeBins']
+        shots = state['targetShots']
+        rate = _lidarSignal(bins, 10.0, 0.5)
+        counts = self.rng.poisson(max(shots, 1) * rate, size=(SP32_TRACES, bins))
+        header = struct.pack('<4H', 0xffff, min(shots, 0xffff), SP32_TRACES, bins)
+        if state['wideMem']:
+            return header + counts.astype('<u4').tobytes()
+        return header + numpy.minimum(counts, 0xffff).astype('<u2').tobytes()
+
+    def _sp32Shutter(self, tokens: list[str]) -> str:
+        if tokens[0].upper() == "SHUTTER?":
+            return "SHUTTER " + self._sp32['shutter']
+        self._sp32['shutter'] = tokens[1].upper()
+        return "SHUTTER executed"
+
+    def _sp32RangeBins(self, tokens: list[str]) -> str:
+        self._sp32['rangeBins'] = int(tokens[1])
+        return "RANGEBINS executed"
+
+    def _sp32Discriminator(self, tokens: list[str]) -> str:
+        return "DISCRIMINATOR set to " + tokens[1]
+
+    def _sp32Pmt(self, tokens: list[str]) -> str:
+        if tokens[0].upper() == "PMT?":
+            return "PMT 0 {}".format(self._sp32['hv'])
+        self._sp32['hv'] = int(tokens[2])
+        return "PMTG executed"
+
+    def _sp32WideMem(self, tokens: list[str]) -> str:
+        self._sp32['wideMem'] = tokens[1] == "1"
+        return "WIDEMEM executed"
+
+    # -------------------------------------------------------------------- WIND
+    def _serveWind(self, connection: socket.socket) -> None:
+        '''
+        binary Waverider protocol: requests are 8 header bytes with the command number in
+        byte 7, followed by 8 bytes (requests) or a 4 byte big endian value (setters).
+        Responses are 8 header bytes, a 4 byte big endian length and the payload.
+        '''
+        while self._running.is_set():
+            header = self._recvExactly(connection, 8)
+            if header is None:
+                return
+            self.statistics.commands += 1
+            commandNumber = header[7]
+            if commandNumber in (1, 2, 3):
+                value = struct.unpack('>I', self._recvExactly(connection, 4))[0]
+                key = {1: 'shots', 2: 'fftSize', 3: 'numFFT'}[commandNumber]
+                self._wind[key] = value
+                keyword = {1: 'SHOTS', 2: 'FFTSIZE', 3: 'NUMFFT'}[commandNumber]
+                self._sendWind(connection, "{} {} executed".format(keyword, value).encode())
+                continue
+            self._recvExactly(connection, 8)
+            self._sendWind(connection, *self._windRequest(commandNumber))
+
+    def _windRequest(self, commandNumber: int) -> tuple[bytes, int | None]:
+        ''' :returns: payload and length field, None for the payload length '''
+        state = self._wind
+        elapsedShots = int((time.monotonic() - state['started']) * self.repetitionRate)
+        if commandNumber == 4:
+            state['started'] = time.monotonic()
+            return b"START executed", None
+        if commandNumber == 5:
+            # the length field holds the data availability, no payload is sent
+            return b"", int(state['started'] > 0 and elapsedShots >= state['shots'])
+        if commandNumber == 12:
+            payload = bytearray(4 + 8 + 8 + WIND_PAYLOAD_SIZE)
+            struct.pack_into('<Q', payload, 4, self.milliSecs())
+            spectra = numpy.frombuffer(payload, '<u8', offset=20)
+            used = state['fftSize'] * state['numFFT'] // 2
+            spectra[:used] = self.rng.integers(1 << 20, 1 << 24, size=used, dtype=numpy.uint64)
+            # the length field is read as little endian by the Waverider class
+            return bytes(payload), int.from_bytes(len(payload).to_bytes(4, 'little'), 'big')
+        responses = {6  : "Shots: {}".format(state['shots']),
+                     9  : "CurrShots: {}".format(min(elapsedShots, state['shots'])),
+                     13 : "Wind_v2_Emulator",
+                     14 : "MSEC: {}".format(self.milliSecs()),
+                     15 : "MAC: 00:00:00:00:00:00",
+                     21 : "HWDESC: Waverider Emulator",
+                     22 : "CAP: Wind",
+                     24 : str(state['numFFT']),
+                     25 : str(state['fftSize'])}
+        return responses.get(commandNumber, "unknown command").encode(), None
+
+    def _sendWind(self, connection: socket.socket, payload: bytes,
+                  lengthField: int | None = None) -> None:
+        if lengthField is None:
+            lengthField = len(payload)
+        connection.sendall(bytes([0, 0, 0, 0xD0, 0, 0x0C, 0, 0])
+                           + struct.pack('>I', lengthField) + payload)
+
+    def _recvExactly(self, connection: socket.socket, size: int) -> bytes | None:
+        data = bytearray()
+        while len(data) < size:
+            packet = connection.recv(size - len(data))
+            if not packet:
+                return None
+            data += packet
+        return bytes(data)
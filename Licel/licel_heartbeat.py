@@ -0,0 +1,234 @@
+'''
+Copyright ©: Licel Gmbh
+
+Liveness supervision of an ethernet controller during push acquisitions.
+The push receive path only records the arrival of data, a heartbeat thread probes the
+controller with ``*IDN?`` on the command socket when the push data stops and derives
+the state of the controller::
+
+    streaming -> idle -> suspect -> dead
+
+- ``streaming`` push data was received within ``idleTimeout``.
+- ``idle`` no push data, but the controller answers the probes, for example because
+  the laser is not triggering.
+- ``suspect`` the last probe was not answered within ``probeTimeout``.
+- ``dead`` the probe was not answered within ``deadTimeout`` or the command connection
+  failed. ``TransientRecorder.recvPushData()`` raises a ConnectionError.
+
+The probes are serialized with the other commands by the ``commandLock`` of the
+controller, the lock is held for at most ``probeTimeout``. The response of a late probe is
+read by the heartbeat thread, or discarded before the next command is written, so that it
+is not taken for the response of an other command. In addition TCP keepalive is enabled
+on the command and push sockets so that the operating system detects a broken connection
+even without traffic.
+'''
+from dataclasses import dataclass, field
+from types import MappingProxyType
+import select
+import threading
+import time
+
+from Licel import TCP_util
+
+from typing import TYPE_CHECKING, Callable
+if TYPE_CHECKING:
+    from Licel import licel_tcpip
+
+# liveness states
+LIVENESSSTATE = MappingProxyType({
+'STREAMING' : 'streaming',
+'IDLE'      : 'idle',
+'SUSPECT'   : 'suspect',
+'DEAD'      : 'dead'
+})
+
+@dataclass
+class HeartbeatConfig:
+    ''' thresholds of the liveness supervision, all times in seconds '''
+    #: time without push data before the controller is probed
+    idleTimeout       : float = field(default =5.0)
+    #: interval between the probes while no push data is received
+    probeInterval     : float = field(default =2.0)
+    #: time for the probe response before the controller becomes suspect
+    probeTimeout      : float = field(default =2.0)
+    #: time for the probe response before the controller is declared dead
+    deadTimeout       : float = field(default =10.0)
+    #: interval of the heartbeat thread and the push receive polling
+    pollInterval      : float = field(default =0.5)
+    #: idle time of a connection before the first TCP keepalive probe, None keeps the system default
+    keepAliveIdle     : int | None = field(default =5)
+    #: interval between TCP keepalive probes
+    keepAliveInterval : int | None = field(default =1)
+    #: number of unanswered TCP keepalive probes before the connection is dropped
+    keepAliveCount    : int | None = field(default =3)
+
+class Heartbeat:
+    '''
+    supervises the liveness of an ethernet controller on a background thread,
+    see the module description. Usually created by ``EthernetController.startHeartbeat()``.
+
+    :param ethernetController: supervised controller
+    :type ethernetController: licel_tcpip.EthernetController
+
+    :param config: thresholds of the supervision
+    :type config: HeartbeatConfig | None
+
+    :param onStateChange: called with the previous and the new state on each transition,
+        from the heartbeat thread
+    :type onStateChange: Callable[[str, str], None] | None
+    '''
+
+    def __init__(self, ethernetController: 'licel_tcpip.EthernetController',
+                 config: HeartbeatConfig | None = None,
+                 onStateChange: Callable[[str, str], None] | None = None) -> None:
+        self.ethernetController = ethernetController
+        self.config = config if config is not None else HeartbeatConfig()
+        self.onStateChange = onStateChange
+        self.state = LIVENESSSTATE['STREAMING']
+        #: number of probes sent
+        self.probes = 0
+        #: number of probes not answered within ``probeTimeout``
+        self.lateProbes = 0
+        self._lastPushData = time.monotonic()
+        self._lastProbe = 0.0
+        #: time the unanswered probe was sent, None if no response is outstanding
+        self._lateProbe : float | None = None
+        self._stopEvent = threading.Event()
+        self._thread : threading.Thread | None = None
+
+    def start(self) -> None:
+        ''' enable TCP keepalive on the controller sockets and start the heartbeat thread '''
+        self.socketsRenewed()
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target = self._run, daemon = True,
+                                        name = "Heartbeat:{}".format(self.ethernetController.ip))
+        self._thread.start()
+
+    def stop(self) -> None:
+        ''' stop the heartbeat thread '''
+        self._stopEvent.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def socketsRenewed(self) -> None:
+        '''
+        supervise the new sockets of the controller after a reconnection. The thread keeps
+        running, the reconnection may be started by ``onStateChange`` on the heartbeat thread.
+        '''
+        for sock in (self.ethernetController.commandSocket, self.ethernetController.PushSocket):
+            TCP_util.setKeepAlive(sock, self.config.keepAliveIdle,
+                                  self.config.keepAliveInterval, self.config.keepAliveCount)
+        self.state = LIVENESSSTATE['STREAMING']
+        self._lastPushData = time.monotonic()
+        self._lateProbe = None
+
+    @property
+    def lateResponsePending(self) -> bool:
+        ''' True while the response of a probe not answered within ``probeTimeout`` is outstanding '''
+        return self._lateProbe is not None
+
+    def discardLateResponse(self) -> None:
+        '''
+        read the response of the late probe. Called with the command lock held before an
+        other command is written, waits for the response up to the socket timeout.
+
+        :raises ConnectionResetError: if the command connection was closed
+        '''
+        if self._lateProbe is None:
+            return
+        if not self.ethernetController.readResponse():
+            self._setState(LIVENESSSTATE['DEAD'])
+            raise ConnectionResetError ("\nCommand connection was closed by the remote host.")
+        self._lateProbe = None
+        self._probeAnswered()
+
+    def pushDataReceived(self) -> None:
+        ''' to be called by the push receive path for each received packet '''
+        self._lastPushData = time.monotonic()
+
+    @property
+    def isDead(self) -> bool:
+        ''' True once the controller was declared dead '''
+        return self.state == LIVENESSSTATE['DEAD']
+
+    def _setState(self, state: str) -> None:
+        previous, self.state = self.state, state
+        if previous != state and self.onStateChange is not None:
+            self.onStateChange(previous, state)
+
+    def _run(self) -> None:
+        while not self._stopEvent.wait(self.config.pollInterval):
+            if self.isDead:
+                continue
+            if self._lateProbe is not None:
+                self._checkLateProbe()
+                if self.isDead:
+                    continue
+            now = time.monotonic()
+            if now - self._lastPushData < self.config.idleTimeout:
+                self._setState(LIVENESSSTATE['STREAMING'])
+                continue
+            if self.state == LIVENESSSTATE['STREAMING']:
+                self._setState(LIVENESSSTATE['IDLE'])
+            if (self._lateProbe is None
+                and now - self._lastProbe >= self.config.probeInterval):
+                self._lastProbe = now
+                self._probe()
+
+    def _probe(self) -> None:
+        '''
+        send ``*IDN?`` and wait ``probeTimeout`` for the response. The command lock is
+        released afterwards, a late response is read by ``_checkLateProbe()`` or discarded
+        by ``discardLateResponse()`` before the next command.
+        '''
+        commandLock = self.ethernetController.commandLock
+        if not commandLock.acquire(blocking = False):
+            # an other command is in progress, its timeout covers the controller
+            return
+        try:
+            self.probes += 1
+            self.ethernetController.writeCommand("*IDN?")
+            sent = time.monotonic()
+            readable, _, _ = select.select([self.ethernetController.commandSocket], [], [],
+                                           self.config.probeTimeout)
+            if not readable:
+                self.lateProbes += 1
+                self._lateProbe = sent
+                self._setState(LIVENESSSTATE['SUSPECT'])
+                return
+            if not self.ethernetController.readResponse():
+                # connection closed by the counter part
+                self._setState(LIVENESSSTATE['DEAD'])
+                return
+            self._probeAnswered()
+        except OSError:
+            self._setState(LIVENESSSTATE['DEAD'])
+        finally:
+            commandLock.release()
+
+    def _checkLateProbe(self) -> None:
+        '''
+        read the response of the late probe if it arrived, the controller is declared dead
+        once it is not answered within ``deadTimeout``.
+        '''
+        commandLock = self.ethernetController.commandLock
+        if not commandLock.acquire(blocking = False):
+            # an other command is in progress, it discards the late response
+            return
+        try:
+            if self._lateProbe is None:
+                return
+            readable, _, _ = select.select([self.ethernetController.commandSocket], [], [], 0)
+            if readable:
+                self.discardLateResponse()
+            elif time.monotonic() - self._lateProbe >= self.config.deadTimeout:
+                self._setState(LIVENESSSTATE['DEAD'])
+        except OSError:
+            self._setState(LIVENESSSTATE['DEAD'])
+        finally:
+            commandLock.release()
+
+    def _probeAnswered(self) -> None:
+        if time.monotonic() - self._lastPushData >= self.config.idleTimeout:
+            self._setState(LIVENESSSTATE['IDLE'])
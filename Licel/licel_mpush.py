@@ -0,0 +1,488 @@
+'''
+Copyright ©: Licel Gmbh
+
+The MPUSH frame layout describes where each raw data set (LSW, MSW, PHM, PC) is placed
+inside a MPUSH frame. The layout is computed once from the configuration and allows to
+decode every frame in place, as numpy views on the receive buffer.
+
+A MPUSH frame is structured as follows: \r\n
+``<xff xff> <timestamp> {<shots> <raw data>} <xff xff>``
+'''
+import numpy
+import socket
+from dataclasses import dataclass, field
+
+from typing import TYPE_CHECKING, Any
+if TYPE_CHECKING:
+    from Licel import licel_Config
+
+#: delimiter marking the start of each MPUSH frame
+MPUSH_DELIMITER = b'\xff\xff'
+
+#: default free space in bytes guaranteed before each receive into the push buffer
+DEFAULT_RECV_SIZE = 65536
+
+def usesAnaloguePHM(TRHardwareInfo: dict[str, int | str | float], shots: int) -> bool:
+    '''
+    check if the analogue data set is formed from LSW, MSW and PHM in MPUSH mode.
+
+    :param TRHardwareInfo: holds information about transient hardware info
+    :type TRHardwareInfo: dict{'ADC Bits' : ' ', 'PC Bits' : ' ' , 'FIFOLength': ' ' ,
+                       'binWidth' : ' ','ID' : ' ', 'HWCAP' : ' ', 'binShift': ' '}
+
+    :param shots: number of shots to be acquired
+    :type shots: int
+
+    :rtype: bool
+    '''
+    return (shots > 32764 and TRHardwareInfo['ADC Bits'] == 16)
+
+def usesPhotonPHM(TRHardwareInfo: dict[str, int | str | float], shots: int) -> bool:
+    '''
+    check if the photon counting data set is formed from PC and PHM.
+
+    :param TRHardwareInfo: holds information about transient hardware info
+    :type TRHardwareInfo: dict{'ADC Bits' : ' ', 'PC Bits' : ' ' , 'FIFOLength': ' ' ,
+                       'binWidth' : ' ','ID' : ' ', 'HWCAP' : ' ', 'binShift': ' '}
+
+    :param shots: number of shots to be acquired
+    :type shots: int
+
+    :rtype: bool
+    '''
+    return ((shots > 4096 and TRHardwareInfo['PC Bits'] == 4)
+            or (shots > 1024 and TRHardwareInfo['PC Bits'] == 6)
+            or (shots > 256 and TRHardwareInfo['PC Bits'] == 8))
+
+@dataclass()
+class FrameDataset:
+    '''
+    describes one data set written to file, and the raw data sets it is formed of.
+    '''
+    #: transient recorder address
+    nTransientRecorder : int = field(default =0)
+    #: memory 'A', 'B', 'C' or 'D'
+    memory             : str = field(default ='A')
+    #: True for photon counting, False for analogue data set
+    isPhotonCounting   : bool = field(default =False)
+    #: number of bins read for each raw data set
+    bins               : int = field(default =0)
+    #: raw data set types in transmission order, for example ['LSW', 'MSW']
+    rawDatasets        : list[str] = field(default_factory = list)
+
+    def fieldName(self, rawDataset: str) -> str:
+        ''' 
+        name of the raw data field in the structured frame dtype, 
+        prefixed by BT for analogue and BC for photon counting as in the licel file format.
+        '''
+        return "{}{:X}_{}_{}".format("BC" if self.isPhotonCounting else "BT",
+                                     self.nTransientRecorder, self.memory, rawDataset)
+
+    def shotFieldName(self, rawDataset: str) -> str:
+        ''' name of the shot number field in the structured frame dtype '''
+        return self.fieldName(rawDataset) + "_shots"
+
+class MPushFrameLayout:
+    '''
+    Layout of a single MPUSH frame, derived from the configuration, the hardware
+    information of each transient recorder and the number of shots.
+    The data sets are ordered as in the MPUSH command and in the ``DataSet`` list
+    returned by ``DataParser.parseDataFromBuffer``
+    '''
+
+    #: data sets in transmission order
+    datasets : list[FrameDataset]
+    #: structured numpy dtype of a complete frame, without the trailing delimiter
+    dtype : numpy.dtype
+    #: number of bytes of a frame, from the first delimiter to the next delimiter
+    frameSize : int = 0
+    #: number of bytes needed to decode and validate a frame (frame + next delimiter)
+    bufferSize : int = 0
+
+    def __init__(self, Config: 'licel_Config.Config',
+                 hardwareInfos: dict[int, dict[str, int | str | float]],
+                 shots: int, bigEndianTimeStamp: bool = False) -> None:
+        self.shots = shots
+        self.bigEndianTimeStamp = bigEndianTimeStamp
+        self.datasets = []
+        for trConfig in Config.TrConfigs:
+            TRnum = trConfig.nTransientRecorder
+            for memory in trConfig.analogueEnabled:
+                if trConfig.analogueEnabled[memory] == True:
+                    rawDatasets = ['LSW', 'MSW']
+                    if usesAnaloguePHM(hardwareInfos[TRnum], shots):
+                        rawDatasets.append('PHM')
+                    self.datasets.append(FrameDataset(TRnum, memory, False,
+                                                      trConfig.analogueBins[memory],
+                                                      rawDatasets))
+            for memory in trConfig.pcEnabled:
+                if trConfig.pcEnabled[memory] == True:
+                    rawDatasets = ['PC']
+                    if usesPhotonPHM(hardwareInfos[TRnum], shots):
+                        rawDatasets.append('PHM')
+                    self.datasets.append(FrameDataset(TRnum, memory, True,
+                                                      trConfig.pcBins[memory],
+                                                      rawDatasets))
+        self.dtype = self._buildDtype()
+        self.frameSize = self.dtype.itemsize
+        self.bufferSize = self.frameSize + len(MPUSH_DELIMITER)
+
+    def _buildDtype(self) -> numpy.dtype:
+        '''
+        build the structured dtype of a frame, raw data fields are uint16 little endian,
+        the timestamp endianness depends on the controller.
+        '''
+        fields : list[tuple[Any, ...]] = [('delimiter', '<u2'),
+                                          ('timestamp', '>u4' if self.bigEndianTimeStamp else '<u4')]
+        for dataset in self.datasets:
+            for rawDataset in dataset.rawDatasets:
+                fields.append((dataset.shotFieldName(rawDataset), '<u2'))
+                fields.append((dataset.fieldName(rawDataset), '<u2', (dataset.bins,)))
+        return numpy.dtype(fields)
+
+    def mpushCommand(self) -> str:
+        '''
+        generate the MPUSH command requesting the raw data sets of this layout,
+        in the same order as they are placed in the frame.
+
+        :returns: Mpush command
+        :rtype: str
+        '''
+        command = "MPUSH " + str(self.shots)
+        for dataset in self.datasets:
+            for rawDataset in dataset.rawDatasets:
+                command += (' {device:2d} {numberToread} {rawDataset} {memory}'
+                            .format(device = dataset.nTransientRecorder,
+                                    numberToread = dataset.bins,
+                                    rawDataset = rawDataset,
+                                    memory = dataset.memory))
+        return command
+
+    def frameView(self, buffer, offset: int = 0) -> numpy.void:
+        '''
+        map the frame starting at ``offset`` in ``buffer`` without copying the data.
+
+        :param buffer: buffer holding raw data acquired from push socket.
+        :type buffer: bytearray, bytes or memoryview
+
+        :param offset: position of the frame start delimiter in ``buffer``
+        :type offset: int
+
+        :returns: structured frame record, fields are views on ``buffer``
+        :rtype: numpy.void
+        '''
+        return numpy.frombuffer(buffer, self.dtype, count=1, offset=offset)[0]
+
+    def hasNextDelimiter(self, buffer, offset: int = 0) -> bool:
+        '''
+        check if the frame starting at ``offset`` is followed by the next delimiter,
+        meaning no bytes were lost during the transmission.
+        '''
+        nextDelimiter = offset + self.frameSize
+        return buffer[nextDelimiter : nextDelimiter + len(MPUSH_DELIMITER)] == MPUSH_DELIMITER
+
+    def findFrameStart(self, buffer, start: int = 1) -> int:
+        '''
+        find the start of the next valid frame, see ``findFrameStart()``.
+        '''
+        return findFrameStart(buffer, self.frameSize, start)
+
+class PushBuffer:
+    '''
+    Preallocated receive buffer for push data. 
+    Data is received with ``socket.recv_into`` directly behind the unconsumed data, 
+    parsed frames are consumed by advancing the read offset. 
+    The unconsumed tail, usually shorter than a frame, is moved to the buffer start only when
+    the free space behind it is smaller than ``minFreeSpace``. Therefore steady state 
+    reception does neither allocate memory for each packet nor shift the whole buffer 
+    for each frame. 
+
+    The class supports the bytearray operations used on the push buffer: ``len()``,
+    indexing and slicing (returning copies), ``find()``, ``extend()`` and the removal
+    of consumed data with ``del pushBuffer[:n]``
+    '''
+
+    def __init__(self, capacity: int = 0, minFreeSpace: int = DEFAULT_RECV_SIZE) -> None:
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        #: position of the first unconsumed byte in the underlying buffer
+        self.start = 0
+        #: position behind the last received byte in the underlying buffer
+        self.end = 0
+        #: free space guaranteed behind the unconsumed data before each receive
+        self.minFreeSpace = minFreeSpace
+        #: set ``TCP_QUICKACK`` again after each receive, Linux clears it while receiving.
+        #: Enabled by ``EthernetController.openPushConnection()`` from the socket options.
+        self.quickAck = False
+
+    @property
+    def capacity(self) -> int:
+        ''' size of the preallocated buffer in bytes '''
+        return len(self._buffer)
+
+    @property
+    def buffer(self) -> bytearray:
+        ''' underlying preallocated buffer, the unconsumed data is ``buffer[start:end]`` '''
+        return self._buffer
+
+    def reserve(self, capacity: int, minFreeSpace: int | None = None) -> None:
+        '''
+        grow the buffer to at least ``capacity`` bytes, keeping the unconsumed data.
+
+        :param capacity: minimal size of the buffer in bytes
+        :type capacity: int
+
+        :param minFreeSpace: free space to be guaranteed before each receive 
+        :type minFreeSpace: int
+        '''
+        if minFreeSpace is not None:
+            self.minFreeSpace = minFreeSpace
+        if capacity <= self.capacity:
+            return
+        newBuffer = bytearray(capacity)
+        newBuffer[:len(self)] = self._view[self.start:self.end]
+        self.end = len(self)
+        self.start = 0
+        self._buffer = newBuffer
+        self._view = memoryview(self._buffer)
+
+    def _compact(self) -> None:
+        ''' move the unconsumed data to the start of the buffer '''
+        length = len(self)
+        if self.start > 0 :
+            self._view[:length] = self._view[self.start:self.end]
+            self.start = 0
+            self.end = length
+
+    def _ensureFreeSpace(self, size: int) -> None:
+        ''' make at least ``size`` bytes available behind the unconsumed data '''
+        if self.capacity - self.end >= size:
+            return
+        self._compact()
+        if self.capacity - self.end < size:
+            self.reserve(max(2 * self.capacity, self.end + size))
+
+    def recvInto(self, sock) -> int:
+        '''
+        receive data from ``sock`` directly into the free space of the buffer.
+
+        :param sock: connected socket
+        :type sock: socket.socket
+
+        :returns: number of received bytes, 0 if the counter part closed the connection.
+        :rtype: int
+        '''
+        self._ensureFreeSpace(max(self.minFreeSpace, 1))
+        received = sock.recv_into(self._view[self.end:])
+        self.end += received
+        if self.quickAck and received:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        return received
+
+    def consume(self, size: int) -> None:
+        '''
+        remove ``size`` bytes from the start of the unconsumed data.
+        '''
+        self.start = min(self.start + size, self.end)
+        if self.start == self.end:
+            # buffer is empty, rewind without moving data
+            self.start = 0
+            self.end = 0
+
+    def clear(self) -> None:
+        ''' discard all unconsumed data '''
+        self.start = 0
+        self.end = 0
+
+    def truncate(self, size: int) -> None:
+        ''' keep only the first ``size`` bytes of the unconsumed data '''
+        self.end = self.start + min(max(size, 0), len(self))
+        if self.start == self.end:
+            self.clear()
+
+    def view(self) -> memoryview:
+        ''' 
+        :returns: view on the unconsumed data, valid until the next receive
+        :rtype: memoryview
+        '''
+        return self._view[self.start:self.end]
+
+    def extend(self, data) -> None:
+        ''' append ``data`` behind the unconsumed data '''
+        size = len(data)
+        self._ensureFreeSpace(size)
+        self._view[self.end:self.end + size] = data
+        self.end += size
+
+    def find(self, sub: bytes, start: int = 0, end: int | None = None) -> int:
+        '''
+        same as ``bytearray.find``, positions are relative to the unconsumed data.
+        '''
+        start, end, _ = slice(start, end).indices(len(self))
+        position = self._buffer.find(sub, self.start + start, self.start + end)
+        if position == -1:
+            return -1
+        return position - self.start
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __bytes__(self) -> bytes:
+        return bytes(self.view())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return bytes(self.view()[key])
+        return self.view()[key]
+
+    def __delitem__(self, key) -> None:
+        if not isinstance(key, slice):
+            key = slice(key, key+1)
+        start, stop, step = key.indices(len(self))
+        if start != 0 or step != 1:
+            raise IndexError("only the start of the push buffer can be removed")
+        self.consume(stop)
+
+@dataclass
+class FrameStatistics:
+    ''' counters of the MPUSH frames checked by a ``FrameValidator`` '''
+    #: frames which passed all checks
+    validFrames       : int = field(default =0)
+    #: frames rejected because of a missing start or end delimiter
+    delimiterErrors   : int = field(default =0)
+    #: frames rejected because the shot counters of their raw data sets differ
+    shotErrors        : int = field(default =0)
+    #: resynchronizations on the push stream after invalid data
+    resyncs           : int = field(default =0)
+    #: bytes removed from the push buffer by the resynchronizations
+    bytesDiscarded    : int = field(default =0)
+    #: frames missing from the timestamp cadence, lost by the controller or the network
+    framesSkipped     : int = field(default =0)
+    #: frames received twice, with the timestamp of the previous frame
+    duplicatedFrames  : int = field(default =0)
+    #: timestamps going backwards, for example after a controller restart
+    timestampResets   : int = field(default =0)
+
+    @property
+    def invalidFrames(self) -> int:
+        ''' frames rejected by one of the checks '''
+        return self.delimiterErrors + self.shotErrors
+
+class FrameValidator:
+    '''
+    checks the MPUSH frames before they are decoded and keeps the ``FrameStatistics``:
+
+    - the frame starts with a delimiter and is followed by the next delimiter.
+    - the raw data sets forming a data set, for example LSW and MSW, report the same
+      number of shots and not more than requested.
+    - the controller timestamps follow the frame cadence. The frame interval is tracked
+      as moving average of the regular intervals, a multiple of it means skipped frames,
+      an unchanged timestamp a duplicated frame.
+
+    Invalid frames are rejected, the cadence is only counted as the data of the frame
+    itself is intact.
+    '''
+
+    def __init__(self) -> None:
+        self.statistics = FrameStatistics()
+        self._lastTimeStamp : int | None = None
+        self._frameInterval : float | None = None
+
+    def reset(self) -> None:
+        ''' clear the statistics and the timestamp cadence '''
+        self.__init__()
+
+    def validate(self, frameLayout: MPushFrameLayout, buffer, offset: int = 0) -> bool:
+        '''
+        :param frameLayout: layout of the MPUSH frame
+        :type frameLayout: MPushFrameLayout
+
+        :param buffer: buffer holding at least ``frameLayout.bufferSize`` bytes after ``offset``
+        :type buffer: bytearray, bytes or memoryview
+
+        :param offset: position of the frame start delimiter in ``buffer``
+        :type offset: int
+
+        :returns: True if the frame can be decoded
+        :rtype: bool
+        '''
+        if (buffer[offset : offset + len(MPUSH_DELIMITER)] != MPUSH_DELIMITER
+            or not frameLayout.hasNextDelimiter(buffer, offset)):
+            self.statistics.delimiterErrors += 1
+            return False
+        frame = frameLayout.frameView(buffer, offset)
+        maxShots = min(frameLayout.shots, 0xffff)
+        for dataset in frameLayout.datasets:
+            shots = {int(frame[dataset.shotFieldName(rawDataset)])
+                     for rawDataset in dataset.rawDatasets}
+            if len(shots) != 1 or shots.pop() > maxShots:
+                self.statistics.shotErrors += 1
+                return False
+        self.statistics.validFrames += 1
+        self._checkCadence(int(frame['timestamp']))
+        return True
+
+    def recordResync(self, bytesDiscarded: int) -> None:
+        ''' count a resynchronization removing ``bytesDiscarded`` bytes '''
+        self.statistics.resyncs += 1
+        self.statistics.bytesDiscarded += bytesDiscarded
+
+    def _checkCadence(self, timeStamp: int) -> None:
+        lastTimeStamp, self._lastTimeStamp = self._lastTimeStamp, timeStamp
+        if lastTimeStamp is None:
+            return
+        # the millisecond timestamp is 32 bit and wraps around
+        interval = (timeStamp - lastTimeStamp) & 0xffffffff
+        if interval == 0:
+            self.statistics.duplicatedFrames += 1
+            return
+        if interval >= 0x80000000:
+            self.statistics.timestampResets += 1
+            return
+        if self._frameInterval is None:
+            self._frameInterval = interval
+            return
+        skipped = round(interval / self._frameInterval) - 1
+        if skipped > 0:
+            self.statistics.framesSkipped += skipped
+        else:
+            self._frameInterval = 0.9 * self._frameInterval + 0.1 * interval
+
+def findFrameStart(buffer: 'PushBuffer | bytearray | bytes', frameSize: int | None,
+                   start: int = 1) -> int:
+    '''
+    find the start of the next frame when resynchronizing on the push stream after
+    corrupted or partial data. The delimiter candidates are located with a vectorized
+    comparison. A frame loses bytes but does not grow, the next frame therefore starts
+    within ``frameSize`` bytes and only this window is searched.
+    A candidate is accepted if it is followed by a delimiter ``frameSize`` bytes later,
+    or if the buffer does not hold enough data yet to check it.
+
+    :param buffer: push data, positions are relative to its unconsumed data
+    :type buffer: PushBuffer, bytearray or bytes
+
+    :param frameSize: number of bytes of a frame without the trailing delimiter, None
+        to accept the first delimiter without validation
+    :type frameSize: int | None
+
+    :param start: position where the search starts, 1 skips the delimiter of the
+        invalid frame at the buffer start
+    :type start: int
+
+    :returns: position of the next frame start, -1 if the searched window holds none
+    :rtype: int
+    '''
+    view = buffer.view() if isinstance(buffer, PushBuffer) else memoryview(buffer)
+    data = numpy.frombuffer(view, dtype=numpy.uint8)
+    end = len(data) if frameSize is None else min(len(data), start + frameSize + len(MPUSH_DELIMITER))
+    window = data[start:end]
+    candidates = numpy.flatnonzero((window[:-1] == 0xff) & (window[1:] == 0xff)) + start
+    if frameSize is None or candidates.size == 0:
+        return int(candidates[0]) if candidates.size else -1
+    nextDelimiters = candidates + frameSize
+    checkable = nextDelimiters + len(MPUSH_DELIMITER) <= len(data)
+    valid = ~checkable
+    checked = nextDelimiters[checkable]
+    valid[checkable] = (data[checked] == 0xff) & (data[checked + 1] == 0xff)
+    accepted = numpy.flatnonzero(valid)
+    return int(candidates[accepted[0]]) if accepted.size else -1
@@ -0,0 +1,277 @@
+'''
+Copyright ©: Licel Gmbh
+
+The MultiControllerAcquisition class runs a MPUSH acquisition on several ethernet
+controllers from a single asyncio event loop. The controllers are configured and started
+in parallel, their push data is received concurrently and the frames are aligned across
+controllers by the controller millisecond timestamp.
+
+Each controller counts the milliseconds with its own timer. At start the ``MILLISEC?``
+timer of each controller is read and related to the host clock, the frame timestamps of
+all controllers are then converted to host time before being aligned.
+'''
+import asyncio
+import collections
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from Licel import licel_asyncio, licel_data, licel_Config
+
+from typing import Any, AsyncIterator
+
+#: the controller millisecond timer is 32 bit wide and wraps around
+TIMESTAMP_MODULO = 1 << 32
+
+@dataclass()
+class ControllerEntry:
+    '''
+    ethernet controller taking part in the acquisition
+    '''
+    #: ethernet controller ip address
+    ip          : str = field(default ="10.49.234.234")
+    #: ethernet controller command port
+    port        : int = field(default =2055)
+    #: path to the acquisition configuration of this controller
+    acquisIni   : str = field(default ="Acquis.ini")
+
+    @property
+    def name(self) -> str:
+        return "{}:{}".format(self.ip, self.port)
+
+@dataclass()
+class ControllerStatistics:
+    '''
+    per controller reception counters
+    '''
+    #: number of valid frames received
+    framesReceived  : int = field(default =0)
+    #: number of bytes of the valid frames
+    bytesReceived   : int = field(default =0)
+    #: number of invalid frames removed from the push buffer
+    invalidFrames   : int = field(default =0)
+    #: number of frames dropped because the alignment queue was full
+    framesDropped   : int = field(default =0)
+    #: number of frames without matching frame from the other controllers
+    unmatchedFrames : int = field(default =0)
+    #: host time in seconds (time.monotonic) of the acquisition start
+    startTime       : float = field(default =0.0)
+    #: host time in seconds (time.monotonic) of the last received frame
+    lastFrameTime   : float = field(default =0.0)
+
+    def framesPerSecond(self) -> float:
+        elapsed = self.lastFrameTime - self.startTime
+        return self.framesReceived / elapsed if elapsed > 0 else 0.0
+
+    def megabytesPerSecond(self) -> float:
+        elapsed = self.lastFrameTime - self.startTime
+        return self.bytesReceived / elapsed / 1e6 if elapsed > 0 else 0.0
+
+@dataclass()
+class PushFrame:
+    '''
+    decoded MPUSH frame of a single controller
+    '''
+    DataSet         : list[Any] = field(default_factory = list)
+    #: controller millisecond timestamp
+    time_stamp      : int = field(default =0)
+    analogue_shots  : dict[int, dict[str, int]] = field(default_factory = dict)
+    pc_shots        : dict[int, dict[str, int]] = field(default_factory = dict)
+    startTime       : datetime = field(default_factory = datetime.now)
+    stopTime        : datetime = field(default_factory = datetime.now)
+    #: controller timestamp converted to host milliseconds
+    hostMillis      : float = field(default =0.0)
+
+class ControllerAcquisition:
+    '''
+    state of a single controller within ``MultiControllerAcquisition``
+    '''
+
+    def __init__(self, entry: ControllerEntry, queueDepth: int) -> None:
+        self.entry = entry
+        self.controller = licel_asyncio.AsyncEthernetController(entry.ip, entry.port)
+        self.dataParser = licel_data.DataParser()
+        self.Config = licel_Config.Config(entry.acquisIni)
+        self.Config.readConfig()
+        self.statistics = ControllerStatistics()
+        self.frames : asyncio.Queue = asyncio.Queue(maxsize = queueDepth)
+        self.pending : collections.deque[PushFrame] = collections.deque()
+        #: controller timer value and host time in ms read at the same instant
+        self.controllerMillisAtSync = 0
+        self.hostMillisAtSync = 0.0
+
+    def toHostMillis(self, time_stamp: int) -> float:
+        ''' convert a controller timestamp to host milliseconds, handles the timer wrap around '''
+        return (self.hostMillisAtSync
+                + (time_stamp - self.controllerMillisAtSync) % TIMESTAMP_MODULO)
+
+class MultiControllerAcquisition:
+    '''
+    MPUSH acquisition on several ethernet controllers.
+
+    Usage::
+
+        acquisition = licel_orchestrator.MultiControllerAcquisition(entries, shots)
+        await acquisition.connect()
+        await acquisition.start()
+        async for alignedFrames in acquisition.alignedFrames():
+            for name, frame in alignedFrames.items():
+                ...
+        await acquisition.stop()
+        print(acquisition.report())
+    '''
+
+    def __init__(self, entries: list[ControllerEntry], shots: int,
+                 alignTolerance: float = 100, queueDepth: int = 64) -> None:
+        '''
+        :param entries: ethernet controllers taking part in the acquisition
+        :type entries: list[ControllerEntry]
+
+        :param shots: number of shots per acquisition
+        :type shots: int
+
+        :param alignTolerance: maximal difference in ms between the timestamps of frames
+            belonging to the same acquisition.
+        :type alignTolerance: float
+
+        :param queueDepth: maximal number of frames waiting for alignment per controller
+        :type queueDepth: int
+        '''
+        if not entries:
+            raise ValueError ("at least one controller is required")
+        self.shots = shots
+        self.alignTolerance = alignTolerance
+        self.controllers = {entry.name : ControllerAcquisition(entry, queueDepth)
+                            for entry in entries}
+        self._receivers : list[asyncio.Task] = []
+
+    async def _forAll(self, coroutine, *args) -> list[Any]:
+        ''' run ``coroutine(controllerAcquisition, *args)`` for all controllers in parallel '''
+        return await asyncio.gather(*[coroutine(acquisition, *args)
+                                      for acquisition in self.controllers.values()])
+
+    async def connect(self) -> None:
+        ''' connect to all controllers, list the installed transient recorders and configure them '''
+        async def connect(acquisition: ControllerAcquisition) -> None:
+            await acquisition.controller.openConnection()
+            await acquisition.controller.openPushConnection()
+            await acquisition.controller.Tr.listInstalledTr()
+            await acquisition.controller.Tr.configureHardware(acquisition.Config)
+        await self._forAll(connect)
+
+    async def _synchronizeClock(self, acquisition: ControllerAcquisition) -> None:
+        '''
+        relate the controller millisecond timer to the host clock, the host time is taken
+        in the middle of the ``MILLISEC?`` round trip.
+        '''
+        before = time.monotonic()
+        resp = await acquisition.controller.getMilliSecs()
+        after = time.monotonic()
+        acquisition.controllerMillisAtSync = int(resp.split()[-1])
+        acquisition.hostMillisAtSync = 1000 * (before + after) / 2
+
+    async def start(self) -> None:
+        ''' synchronize the clocks, start MPUSH on all controllers and receive the push data '''
+        async def start(acquisition: ControllerAcquisition) -> None:
+            await self._synchronizeClock(acquisition)
+            await acquisition.controller.Tr.MPushStartFromConfig(self.shots, acquisition.Config)
+            acquisition.statistics.startTime = time.monotonic()
+        await self._forAll(start)
+        self._receivers = [asyncio.create_task(self._receive(acquisition))
+                           for acquisition in self.controllers.values()]
+
+    async def _receive(self, acquisition: ControllerAcquisition) -> None:
+        ''' receive the push frames of a controller into its alignment queue '''
+        Tr = acquisition.controller.Tr
+        statistics = acquisition.statistics
+        async for (DataSet, time_stamp, analogue_shots, pc_shots,
+                   startTime, stopTime) in Tr.pushFrames(acquisition.dataParser):
+            statistics.framesReceived += 1
+            statistics.bytesReceived += Tr.frameLayout.frameSize
+            statistics.invalidFrames = Tr.invalidFrames
+            statistics.lastFrameTime = time.monotonic()
+            frame = PushFrame(DataSet, time_stamp, analogue_shots, pc_shots, startTime, stopTime,
+                              acquisition.toHostMillis(time_stamp))
+            try:
+                acquisition.frames.put_nowait(frame)
+            except asyncio.QueueFull:
+                statistics.framesDropped += 1
+
+    async def _nextPending(self, acquisition: ControllerAcquisition) -> PushFrame:
+        ''' oldest frame of a controller not aligned yet, waits for the reception if needed '''
+        if not acquisition.pending and not acquisition.frames.empty():
+            acquisition.pending.append(acquisition.frames.get_nowait())
+        if not acquisition.pending:
+            getFrame = asyncio.ensure_future(acquisition.frames.get())
+            done, _ = await asyncio.wait([getFrame] + self._receivers,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if getFrame not in done:
+                getFrame.cancel()
+                for task in done:
+                    # the reception of one controller stopped, raise its exception
+                    task.result()
+                raise ConnectionResetError ("push data reception stopped")
+            acquisition.pending.append(getFrame.result())
+        return acquisition.pending[0]
+
+    async def alignedFrames(self) -> AsyncIterator[dict[str, PushFrame]]:
+        '''
+        asynchronous iterator over the aligned frames. For each acquisition a dictionary
+        {controller name : PushFrame} holding one frame of each controller is returned.
+        Frames without matching frame from all other controllers within ``alignTolerance``
+        are discarded and counted in ``ControllerStatistics.unmatchedFrames``.
+
+        :raises: the exception of a failed reception, ConnectionResetError if the
+            reception stopped.
+        '''
+        while True:
+            heads = {name : await self._nextPending(acquisition)
+                     for name, acquisition in self.controllers.items()}
+            latest = max(frame.hostMillis for frame in heads.values())
+            aligned = True
+            for name, frame in heads.items():
+                if latest - frame.hostMillis > self.alignTolerance:
+                    # no matching frame will follow, newer frames from other controllers exist
+                    self.controllers[name].pending.popleft()
+                    self.controllers[name].statistics.unmatchedFrames += 1
+                    aligned = False
+            if aligned:
+                for acquisition in self.controllers.values():
+                    acquisition.pending.popleft()
+                yield heads
+
+    async def stop(self) -> None:
+        ''' stop the reception and MPUSH on all controllers, close the connections '''
+        for task in self._receivers:
+            task.cancel()
+        await asyncio.gather(*self._receivers, return_exceptions=True)
+        self._receivers = []
+        async def stop(acquisition: ControllerAcquisition) -> None:
+            await acquisition.controller.Tr.MPushStop()
+            await acquisition.controller.shutdownConnection()
+            await acquisition.controller.shutdownPushConnection()
+        results = await asyncio.gather(*[stop(acquisition)
+                                         for acquisition in self.controllers.values()],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    def report(self) -> str:
+        '''
+        :returns: per controller throughput and drop counts
+        :rtype: str
+        '''
+        lines = ["{:<24s} {:>8s} {:>10s} {:>10s} {:>8s} {:>8s} {:>10s}"
+                 .format("controller", "frames", "frames/s", "MB/s", "invalid", "dropped",
+                         "unmatched")]
+        for name, acquisition in self.controllers.items():
+            statistics = acquisition.statistics
+            lines.append("{:<24s} {:>8d} {:>10.2f} {:>10.3f} {:>8d} {:>8d} {:>10d}"
+                         .format(name, statistics.framesReceived,
+                                 statistics.framesPerSecond(),
+                                 statistics.megabytesPerSecond(),
+                                 statistics.invalidFrames,
+                                 statistics.framesDropped,
+                                 statistics.unmatchedFrames))
+        return "\n".join(lines)
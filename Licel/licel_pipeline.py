@@ -0,0 +1,325 @@
+'''
+Copyright ©: Licel Gmbh
+
+The MPushPipeline class decouples the MPUSH network reception from the parsing and the
+writing of the data files. Each stage runs on its own thread:
+
+``receiver thread -> parse queue -> parser thread -> write queue -> writer thread``
+
+The queues are bounded, a slow disk or a long garbage collection pause therefore
+does not stop the push socket from being drained until the queues are full.
+'''
+import queue
+import select
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from Licel import licel_mpush
+
+from typing import TYPE_CHECKING, Any
+if TYPE_CHECKING:
+    from Licel import licel_tcpip, licel_data, licel_Config
+
+#: seconds the receiver waits on the push socket before checking for a stop request
+RECEIVER_POLL_INTERVAL = 0.5
+#: seconds without push data before the controller is probed with ``*IDN?``, without a heartbeat
+PUSH_IDLE_TIMEOUT = 5
+
+@dataclass()
+class PipelineStatistics:
+    '''
+    counters describing the state of the acquisition pipeline
+    '''
+    #: number of valid frames extracted from the push buffer
+    framesReceived      : int = field(default =0)
+    #: number of frames decoded by the parser thread
+    framesParsed        : int = field(default =0)
+    #: number of frames written to file by the writer thread
+    framesWritten       : int = field(default =0)
+    #: number of frames dropped because the parse queue was full, see ``dropWhenFull``
+    framesDropped       : int = field(default =0)
+    #: number of invalid frames removed from the push buffer
+    invalidFrames       : int = field(default =0)
+    #: number of bytes discarded while removing invalid frames
+    bytesDiscarded      : int = field(default =0)
+    #: number of times the receiver found the parse queue full
+    parseQueueFull      : int = field(default =0)
+    #: number of times the parser found the write queue full
+    writeQueueFull      : int = field(default =0)
+    #: maximum number of frames waiting in the parse queue
+    maxParseQueueDepth  : int = field(default =0)
+    #: maximum number of data sets waiting in the write queue
+    maxWriteQueueDepth  : int = field(default =0)
+    #: total time in seconds the receiver was blocked by a full parse queue
+    receiverBlockedTime : float = field(default =0.0)
+    #: total time in seconds the parser was blocked by a full write queue
+    parserBlockedTime   : float = field(default =0.0)
+
+class MPushPipeline:
+    '''
+    Threaded MPUSH acquisition built on ``TransientRecorder`` and ``DataParser``.
+
+    Usage::
+
+        pipeline = licel_pipeline.MPushPipeline(ethernetController, dataParser,
+                                                ConfigInfo, shots, ACQUISPERFILE)
+        pipeline.start()
+        pipeline.wait()
+        pipeline.stop()
+        print(pipeline.statistics)
+    '''
+
+    #: back pressure and throughput counters
+    statistics : PipelineStatistics
+
+    def __init__(self, ethernetController: 'licel_tcpip.EthernetController',
+                 dataParser: 'licel_data.DataParser',
+                 Config: 'licel_Config.Config', shots: int, ACQUISPERFILE: int,
+                 acquisitions: int = -1, parseQueueDepth: int = 16,
+                 writeQueueDepth: int = 16, dropWhenFull: bool = False) -> None:
+        '''
+        :param ethernetController: connected controller, push connection opened
+            and hardware configured.
+        :type ethernetController: licel_tcpip.EthernetController
+
+        :param dataParser: parser used for decoding and saving the data
+        :type dataParser: licel_data.DataParser
+
+        :param Config: holds the acquisition configuration information
+        :type Config: Licel.licel_acq.Config()
+
+        :param shots: number of shots per acquisition
+        :type shots: int
+
+        :param ACQUISPERFILE: maximal number of acquisitions written to a single file
+        :type ACQUISPERFILE: int
+
+        :param acquisitions: number of acquisitions to receive, -1 for infinite
+        :type acquisitions: int
+
+        :param parseQueueDepth: maximal number of raw frames waiting for the parser
+        :type parseQueueDepth: int
+
+        :param writeQueueDepth: maximal number of decoded frames waiting for the writer
+        :type writeQueueDepth: int
+
+        :param dropWhenFull: drop frames instead of blocking the receiver when the
+            parse queue is full
+        :type dropWhenFull: bool
+        '''
+        self.ethernetController = ethernetController
+        self.dataParser = dataParser
+        self.Config = Config
+        self.shots = shots
+        self.ACQUISPERFILE = ACQUISPERFILE
+        self.acquisitions = acquisitions
+        self.dropWhenFull = dropWhenFull
+        self.statistics = PipelineStatistics()
+        self._parseQueue : queue.Queue = queue.Queue(maxsize = parseQueueDepth)
+        self._writeQueue : queue.Queue = queue.Queue(maxsize = writeQueueDepth)
+        self._stopEvent = threading.Event()
+        self._doneEvent = threading.Event()
+        self._errors : list[BaseException] = []
+        self._threads : list[threading.Thread] = []
+        self._frameLayout : 'licel_mpush.MPushFrameLayout | None' = None
+        self._mpushStarted = False
+
+    def start(self, startMPush: bool = True) -> None:
+        '''
+        start the MPUSH acquisition and the receiver, parser and writer threads.
+
+        :param startMPush: send the MPUSH command generated from ``Config``.
+            Set to False if the MPUSH acquisition is already running.
+        :type startMPush: bool
+        '''
+        if startMPush:
+            print(self.ethernetController.Tr.MPushStartFromConfig(self.shots, self.Config))
+        self._mpushStarted = True
+        self._frameLayout = self.dataParser.getFrameLayout(self.Config, self.ethernetController,
+                                                           self.shots)
+        self._stopEvent.clear()
+        self._doneEvent.clear()
+        self._threads = [threading.Thread(target=self._run, args=(self._receiverLoop, 1),
+                                          name="MPushReceiver", daemon=True),
+                         threading.Thread(target=self._run, args=(self._parserLoop, 2),
+                                          name="MPushParser", daemon=True),
+                         threading.Thread(target=self._run, args=(self._writerLoop, None),
+                                          name="MPushWriter", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        '''
+        wait until ``acquisitions`` frames are received and all of them are written or
+        dropped, or one of the threads failed.
+
+        :param timeout: timeout in seconds, None to wait forever
+        :type timeout: float
+
+        :returns: True if the pipeline is done, False on timeout.
+        :rtype: bool
+        '''
+        return self._doneEvent.wait(timeout)
+
+    def stop(self) -> None:
+        '''
+        stop the pipeline: the receiver is stopped first, then ``MPushStop`` is sent to the
+        controller and the frames still queued are parsed and written before the parser
+        and writer threads exit. The current data file is closed.
+
+        :raises: the first exception raised in one of the threads.
+        '''
+        self._stopEvent.set()
+        receiver, parser, writer = self._threads
+        receiver.join()
+        if self._mpushStarted:
+            self._mpushStarted = False
+            try:
+                print(self.ethernetController.Tr.MPushStop())
+            except Exception as error:
+                self._errors.append(error)
+        self._putBlocking(self._parseQueue, None, parser)
+        parser.join()
+        writer.join()
+        self.dataParser.closeDataFile()
+        if self._errors:
+            raise self._errors[0]
+
+    def _run(self, loop, consumer: int | None) -> None:
+        ''' 
+        run ``loop``, store the exception and stop the pipeline on error. 
+        On error the end of the data is passed to the ``consumer`` thread, so that the
+        following stages exit.
+        '''
+        try:
+            loop()
+        except BaseException as error:
+            self._errors.append(error)
+            self._stopEvent.set()
+            self._doneEvent.set()
+            if consumer is not None:
+                myQueue = self._parseQueue if consumer == 1 else self._writeQueue
+                self._putBlocking(myQueue, None, self._threads[consumer])
+
+    def _putBlocking(self, myQueue: queue.Queue, item: Any,
+                     consumer: threading.Thread) -> float:
+        '''
+        put ``item`` in ``myQueue``, waits while the queue is full.
+        The item is discarded if the ``consumer`` thread of the queue stopped on error.
+
+        :returns: time in seconds spent waiting.
+        '''
+        start = time.perf_counter()
+        while True:
+            try:
+                myQueue.put(item, timeout=RECEIVER_POLL_INTERVAL)
+                return time.perf_counter() - start
+            except queue.Full:
+                if not consumer.is_alive():
+                    return time.perf_counter() - start
+
+    def _receiverLoop(self) -> None:
+        Tr = self.ethernetController.Tr
+        pushBuffer = Tr.pushBuffer
+        frameLayout = self._frameLayout
+        # with a heartbeat the liveness is supervised by the heartbeat thread
+        heartbeat = Tr.heartbeat
+        lastData = time.monotonic()
+        startTime = datetime.now()
+        while not self._stopEvent.is_set():
+            readable, _, _ = select.select([Tr.PushSocket], [], [], RECEIVER_POLL_INTERVAL)
+            if not readable:
+                if heartbeat is not None:
+                    if heartbeat.isDead:
+                        raise ConnectionError ("\nController is not responding, liveness state: "
+                                               + heartbeat.state)
+                elif time.monotonic() - lastData > PUSH_IDLE_TIMEOUT:
+                    # if connection is broken a timeout will be raised
+                    Tr.getID()
+                    lastData = time.monotonic()
+                continue
+            received = pushBuffer.recvInto(Tr.PushSocket)
+            if not received:
+                raise ConnectionResetError ("\nPush connection was closed by the remote host.")
+            if Tr.pushCapture is not None:
+                Tr.pushCapture.write(pushBuffer.view()[-received:])
+            if heartbeat is not None:
+                heartbeat.pushDataReceived()
+            lastData = time.monotonic()
+            while len(pushBuffer) >= frameLayout.bufferSize:
+                if not self.dataParser.frameValidator.validate(frameLayout, pushBuffer.buffer,
+                                                               pushBuffer.start):
+                    length = len(pushBuffer)
+                    self.dataParser.removeInvalidDataFromBuffer(pushBuffer,
+                                                                 frameLayout.frameSize)
+                    self.statistics.invalidFrames += 1
+                    self.statistics.bytesDiscarded += length - len(pushBuffer)
+                    continue
+                stopTime = datetime.now()
+                # the frame is copied, the push buffer is reused by the next receive.
+                frame = bytes(pushBuffer.view()[:frameLayout.frameSize])
+                pushBuffer.consume(frameLayout.frameSize)
+                self.statistics.framesReceived += 1
+                self._enqueueFrame((frame, startTime, stopTime))
+                startTime = stopTime
+                if (self.acquisitions != -1
+                    and self.statistics.framesReceived >= self.acquisitions):
+                    # end of the data, the writer sets ``_doneEvent`` once the queues are
+                    # drained, the dropped frames are not written.
+                    self._putBlocking(self._parseQueue, None, self._threads[1])
+                    return
+
+    def _enqueueFrame(self, item: tuple[bytes, datetime, datetime]) -> None:
+        try:
+            self._parseQueue.put_nowait(item)
+        except queue.Full:
+            self.statistics.parseQueueFull += 1
+            if self.dropWhenFull:
+                self.statistics.framesDropped += 1
+                return
+            self.statistics.receiverBlockedTime += self._putBlocking(self._parseQueue, item,
+                                                                  self._threads[1])
+        self.statistics.maxParseQueueDepth = max(self.statistics.maxParseQueueDepth,
+                                                 self._parseQueue.qsize())
+
+    def _parserLoop(self) -> None:
+        while True:
+            item = self._parseQueue.get()
+            if item is None:
+                self._putBlocking(self._writeQueue, None, self._threads[2])
+                return
+            frame, startTime, stopTime = item
+            decoded = self.dataParser.decodeFrame(self._frameLayout, frame)
+            self.statistics.framesParsed += 1
+            writeItem = (decoded, startTime, stopTime)
+            try:
+                self._writeQueue.put_nowait(writeItem)
+            except queue.Full:
+                self.statistics.writeQueueFull += 1
+                self.statistics.parserBlockedTime += self._putBlocking(self._writeQueue, writeItem,
+                                                                self._threads[2])
+            self.statistics.maxWriteQueueDepth = max(self.statistics.maxWriteQueueDepth,
+                                                     self._writeQueue.qsize())
+
+    def _writerLoop(self) -> None:
+        Tr = self.ethernetController.Tr
+        while True:
+            item = self._writeQueue.get()
+            if item is None:
+                self._doneEvent.set()
+                return
+            (DataSet, time_stamp, analogue_shots, pc_shots), startTime, stopTime = item
+            self.dataParser.savePushDataToLicelFileFormat(DataSet, self.Config,
+                                                          startTime, stopTime,
+                                                          Tr.hardwareInfos,
+                                                          time_stamp,
+                                                          analogue_shots,
+                                                          pc_shots,
+                                                          self.shots,
+                                                          self.ACQUISPERFILE)
+            self.statistics.framesWritten += 1
+            if (self.acquisitions != -1
+                and self.statistics.framesWritten >= self.acquisitions):
+                self._doneEvent.set()
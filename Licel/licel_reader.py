@@ -0,0 +1,318 @@
+'''
+Copyright ©: Licel Gmbh
+
+Reader of the Licel raw data files written by ``DataParser.savePushDataToLicelFileFormat()``,
+``DataParser.saveAcquisDataToLicelFileFormat()``, ``licel_writer.LicelFileWriter`` and
+``SP32.saveSP32Data()``, see https://licel.com/raw_data_format.html
+
+The ASCII headers of all acquisitions of a file are parsed once when the file is opened,
+the data sets are then returned as read only ``numpy.memmap`` views of the file, no data
+is copied or read before it is accessed::
+
+    with licel_reader.LicelFileReader(path) as licelFile:
+        for acquisition in licelFile.acquisitions:
+            print(acquisition.startTime, acquisition.timestamp)
+            for dataset, data in zip(acquisition.datasets, licelFile.data(acquisition)):
+                print(dataset.wavelength, dataset.descriptor, data.mean())
+
+Large archives are iterated with ``iterArchive()``, which keeps a single file open.
+'''
+from dataclasses import dataclass, field
+from datetime import datetime
+import numpy
+import os
+
+from typing import Iterable, Iterator
+
+#: data type of the data sets, 32 bit little endian integers
+DATA_TYPE = numpy.dtype('<u4')
+#: bytes following each data set
+DATASET_TERMINATOR = b'\r\n'
+#: format of the start and stop time in the second header line
+TIME_FORMAT = "%d/%m/%Y %H:%M:%S"
+#: longest header line read, a longer line is not a Licel header
+MAX_HEADER_LINE = 1024
+
+@dataclass
+class DatasetHeader:
+    ''' description of a data set, one line of the header '''
+    #: the data set is present in the file
+    active            : bool  = field(default =True)
+    #: photon counting, else analogue
+    isPhotonCounting  : bool  = field(default =False)
+    #: laser source
+    laser             : int   = field(default =0)
+    #: number of data points
+    bins              : int   = field(default =0)
+    #: laser polarisation
+    laserPolarisation : int   = field(default =0)
+    #: high voltage of the photomultiplier in V
+    pmtHV             : int   = field(default =0)
+    #: bin width in m
+    binWidth          : float = field(default =0.0)
+    #: wavelength in nm
+    wavelength        : float = field(default =0.0)
+    #: polarisation status, o|p|s|r|l
+    polarisation      : str   = field(default ="o")
+    #: bin shift of the analogue data set
+    binShift          : float = field(default =0.0)
+    #: number of ADC bits, 0 for photon counting
+    adcBits           : int   = field(default =0)
+    #: number of shots
+    shots             : int   = field(default =0)
+    #: input range of the analogue data set in V, discriminator level of the photon counting
+    inputRange        : float = field(default =0.0)
+    #: data set descriptor, e.g. BT0 or BC0
+    descriptor        : str   = field(default ="")
+    #: transient recorder or channel number encoded in ``descriptor``
+    transientRecorder : int   = field(default =0)
+    #: offset of the data in the file, -1 if the data set is not active
+    offset            : int   = field(default =-1)
+
+@dataclass
+class AcquisitionHeader:
+    ''' header of an acquisition of a Licel file '''
+    #: file name written in the first header line
+    fileName     : str   = field(default ="")
+    #: measurement site
+    location     : str   = field(default ="")
+    startTime    : datetime = field(default =datetime.min)
+    stopTime     : datetime = field(default =datetime.min)
+    #: altitude in m
+    altitude     : int   = field(default =0)
+    longitude    : float = field(default =0.0)
+    latitude     : float = field(default =0.0)
+    zenith       : float = field(default =0.0)
+    azimuth      : float = field(default =0.0)
+    #: number of shots and repetition rate of laser 1
+    shotsL0      : int   = field(default =0)
+    repRateL0    : int   = field(default =0)
+    #: number of shots and repetition rate of laser 2
+    shotsL1      : int   = field(default =0)
+    repRateL1    : int   = field(default =0)
+    #: number of data sets written in the third header line
+    numDataSets  : int   = field(default =0)
+    #: number of shots and repetition rate of laser 3
+    shotsL2      : int   = field(default =0)
+    repRateL2    : int   = field(default =0)
+    #: timestamp of the controller in ms, None if not written
+    timestamp    : int | None = field(default =None)
+    #: offset of the acquisition in the file
+    offset       : int   = field(default =0)
+    #: size of the acquisition, header and data, in bytes
+    size         : int   = field(default =0)
+    datasets     : list[DatasetHeader] = field(default_factory =list)
+
+def _parseSecondLine(line: str, acquisition: AcquisitionHeader) -> None:
+    tokens = line.split()
+    if len(tokens) < 9:
+        raise ValueError("invalid second header line: " + repr(line))
+    # the location is padded and may be empty, the other fields are counted from the end
+    (startDate, startTime, stopDate, stopTime,
+     altitude, longitude, latitude, zenith, azimuth) = tokens[-9:]
+    acquisition.location = " ".join(tokens[:-9])
+    acquisition.startTime = datetime.strptime(startDate + " " + startTime, TIME_FORMAT)
+    acquisition.stopTime = datetime.strptime(stopDate + " " + stopTime, TIME_FORMAT)
+    acquisition.altitude = int(altitude)
+    acquisition.longitude = float(longitude)
+    acquisition.latitude = float(latitude)
+    acquisition.zenith = float(zenith)
+    acquisition.azimuth = float(azimuth)
+
+def _parseThirdLine(line: str, acquisition: AcquisitionHeader) -> None:
+    tokens = line.split()
+    if len(tokens) not in (7, 8):
+        raise ValueError("invalid third header line: " + repr(line))
+    (acquisition.shotsL0, acquisition.repRateL0, acquisition.shotsL1, acquisition.repRateL1,
+     acquisition.numDataSets, acquisition.shotsL2, acquisition.repRateL2) = (int(token) for token
+                                                                           in tokens[:7])
+    acquisition.timestamp = int(tokens[7]) if len(tokens) == 8 else None
+
+def _parseDatasetLine(line: str) -> DatasetHeader:
+    tokens = line.split()
+    if len(tokens) != 16:
+        raise ValueError("invalid data set header line: " + repr(line))
+    dataset = DatasetHeader(active = tokens[0] == "1", isPhotonCounting = tokens[1] == "1",
+                            laser = int(tokens[2]), bins = int(tokens[3]),
+                            laserPolarisation = int(tokens[4]), pmtHV = int(tokens[5]),
+                            binWidth = float(tokens[6]), adcBits = int(tokens[12]),
+                            shots = int(tokens[13]), inputRange = float(tokens[14]),
+                            descriptor = tokens[15])
+    wavelength, _, polarisation = tokens[7].partition(".")
+    if polarisation.isalpha():
+        # <wavelength>.<polarisation>
+        dataset.wavelength = float(wavelength)
+        dataset.polarisation = polarisation
+    else:
+        # SP32: <wavelength> <polarisation>
+        dataset.wavelength = float(tokens[7])
+        dataset.polarisation = tokens[8]
+    dataset.binShift = int(tokens[10]) + int(tokens[11]) / 1000
+    try:
+        dataset.transientRecorder = int(dataset.descriptor[2:], 16)
+    except ValueError:
+        dataset.transientRecorder = -1
+    return dataset
+
+def _readLine(licelFile) -> str:
+    line = licelFile.readline(MAX_HEADER_LINE)
+    if not line.endswith(b"\n"):
+        raise ValueError("incomplete Licel header")
+    return line.rstrip(b"\r\n").decode("ascii")
+
+def parseHeader(licelFile, offset: int = 0) -> AcquisitionHeader:
+    '''
+    parse the header of the acquisition at ``offset`` of ``licelFile``. The data sets are
+    read until the empty line ending the header, the number of data sets in the third
+    header line is not used as it is 1 if the acquisition has no timestamp.
+
+    :param licelFile: file opened in binary mode
+    :type licelFile: BinaryIO
+
+    :param offset: offset of the acquisition in the file
+    :type offset: int
+
+    :returns: header of the acquisition, with the offsets of the data sets
+    :rtype: AcquisitionHeader
+
+    :raises ValueError: if the header is invalid or incomplete
+    '''
+    licelFile.seek(offset)
+    acquisition = AcquisitionHeader(offset = offset)
+    try:
+        acquisition.fileName = _readLine(licelFile).strip()
+        _parseSecondLine(_readLine(licelFile), acquisition)
+        _parseThirdLine(_readLine(licelFile), acquisition)
+        line = _readLine(licelFile)
+        while line.strip():
+            acquisition.datasets.append(_parseDatasetLine(line))
+            line = _readLine(licelFile)
+    except UnicodeDecodeError:
+        raise ValueError("invalid Licel header at offset {}".format(offset))
+    position = licelFile.tell()
+    for dataset in acquisition.datasets:
+        if dataset.active:
+            dataset.offset = position
+            position += dataset.bins * DATA_TYPE.itemsize + len(DATASET_TERMINATOR)
+    acquisition.size = position - offset
+    return acquisition
+
+class LicelFileReader:
+    '''
+    index of the acquisitions of a Licel file, the data sets are mapped on access.
+
+    :param path: Licel file
+    :type path: str
+
+    :raises ValueError: if the file is not a Licel file or is truncated
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        #: acquisitions of the file in the order they were written
+        self.acquisitions : list[AcquisitionHeader] = []
+        self._map : numpy.memmap | None = None
+        fileSize = os.path.getsize(path)
+        with open(path, "rb") as licelFile:
+            offset = 0
+            while offset < fileSize:
+                acquisition = parseHeader(licelFile, offset)
+                if offset + acquisition.size > fileSize:
+                    raise ValueError("{} is truncated at acquisition {}"
+                                     .format(path, len(self.acquisitions)))
+                self.acquisitions.append(acquisition)
+                offset += acquisition.size
+
+    def __len__(self) -> int:
+        return len(self.acquisitions)
+
+    def _fileMap(self) -> numpy.memmap:
+        if self._map is None:
+            self._map = numpy.memmap(self.path, dtype = numpy.uint8, mode = 'r')
+        return self._map
+
+    def dataset(self, dataset: DatasetHeader) -> numpy.memmap:
+        '''
+        read only view of the data of ``dataset``.
+
+        :param dataset: active data set of one of the ``acquisitions``
+        :type dataset: DatasetHeader
+
+        :rtype: numpy.memmap(dtype=uint32, ndim =1)
+        '''
+        if dataset.offset < 0:
+            raise ValueError("data set {} is not active".format(dataset.descriptor))
+        size = dataset.bins * DATA_TYPE.itemsize
+        return self._fileMap()[dataset.offset : dataset.offset + size].view(DATA_TYPE)
+
+    def data(self, acquisition: AcquisitionHeader | int) -> list[numpy.memmap]:
+        '''
+        read only views of the active data sets of an acquisition.
+
+        :param acquisition: acquisition header or index in ``acquisitions``
+        :type acquisition: AcquisitionHeader | int
+
+        :rtype: list[numpy.memmap(dtype=uint32, ndim =1)]
+        '''
+        if isinstance(acquisition, int):
+            acquisition = self.acquisitions[acquisition]
+        return [self.dataset(dataset) for dataset in acquisition.datasets if dataset.active]
+
+    def __iter__(self) -> Iterator[tuple[AcquisitionHeader, list[numpy.memmap]]]:
+        ''' yields each acquisition with the views of its data sets '''
+        for acquisition in self.acquisitions:
+            yield acquisition, self.data(acquisition)
+
+    def close(self) -> None:
+        ''' release the file mapping, the views already returned stay valid '''
+        self._map = None
+
+    def __enter__(self) -> 'LicelFileReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def readDataset(path: str, offset: int, bins: int) -> numpy.memmap:
+    '''
+    map a single data set without parsing the file, e.g. from the offsets
+    stored in an index.
+
+    :param path: Licel file
+    :type path: str
+
+    :param offset: offset of the data, ``DatasetHeader.offset``
+    :type offset: int
+
+    :param bins: number of data points, ``DatasetHeader.bins``
+    :type bins: int
+
+    :rtype: numpy.memmap(dtype=uint32, ndim =1)
+    '''
+    return numpy.memmap(path, dtype = DATA_TYPE, mode = 'r', offset = offset, shape = (bins,))
+
+def iterArchive(paths: Iterable[str],
+                skipInvalid: bool = True) -> Iterator[tuple[str, AcquisitionHeader, list[numpy.memmap]]]:
+    '''
+    iterate over the acquisitions of many Licel files, one file is indexed at a time.
+
+    :param paths: Licel files, e.g. ``sorted(glob.glob(os.path.join(szOutPath, "*")))``
+    :type paths: Iterable[str]
+
+    :param skipInvalid: skip the files which are not Licel files or are truncated,
+        else ValueError is raised
+    :type skipInvalid: bool
+
+    :returns: file, acquisition header and the views of the data sets
+    :rtype: Iterator[tuple[str, AcquisitionHeader, list[numpy.memmap]]]
+    '''
+    for path in paths:
+        try:
+            licelFile = LicelFileReader(path)
+        except ValueError:
+            if skipInvalid:
+                continue
+            raise
+        with licelFile:
+            for acquisition, data in licelFile:
+                yield path, acquisition, data
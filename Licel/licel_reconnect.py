@@ -0,0 +1,321 @@
+'''
+Copyright ©: Licel Gmbh
+
+Reconnection of an ethernet controller after a network outage. The ReconnectionManager
+retries with a jittered exponential backoff, restores the acquisition session with as few
+commands as possible and keeps the complete MPUSH frames received before the outage::
+
+    manager = licel_reconnect.ReconnectionManager(ethernetController, Config, shots)
+    manager.startSession()
+    while True:
+        try:
+            ethernetController.Tr.recvPushData()
+            (dataValid, dataSets, time_stamp,
+             analogue_shots, pc_shots) = dataParser.parseDataFromBuffer(Config,
+                                                                        ethernetController,
+                                                                        shots)
+            if dataValid:
+                manager.recordFrame(time_stamp)
+                ...
+        except (ConnectionError, TimeoutError):
+            manager.reconnect()
+'''
+from dataclasses import dataclass, field, asdict
+import contextlib
+import random
+import time
+
+from Licel import licel_mpush
+
+from typing import TYPE_CHECKING, Any
+if TYPE_CHECKING:
+    from Licel import licel_tcpip, licel_Config
+
+#: TrConfig fields written to the hardware by ``TransientRecorder.configureHardware()``
+HARDWARE_CONFIG_FIELDS = ("nRange", "discriminator", "shotLimit", "pretrigger",
+                          "freqDivider", "threshold", "blockedTrig")
+#: deviation in milliseconds of the controller millisecond timer from the host clock, above
+#: which the controller is taken as restarted
+RESTART_TOLERANCE_MS = 2000
+#: relative drift of the controller timer against the host clock added to the tolerance
+CLOCK_DRIFT = 1e-3
+
+@dataclass
+class ReconnectionPolicy:
+    ''' delays between the reconnection attempts '''
+    #: number of attempts before ``reconnect()`` gives up
+    maxAttempts  : int   = field(default =5)
+    #: delay in seconds before the first attempt
+    initialDelay : float = field(default =0.5)
+    #: upper limit of the delay in seconds
+    maxDelay     : float = field(default =30.0)
+    #: factor applied to the delay after each failed attempt
+    multiplier   : float = field(default =2.0)
+    #: fraction of the delay which is randomized, 0 for fixed delays
+    jitter       : float = field(default =0.5)
+
+    def delay(self, attempt: int, rng: random.Random) -> float:
+        '''
+        :param attempt: number of the attempt, starting with 0
+        :type attempt: int
+
+        :returns: delay in seconds before the attempt
+        :rtype: float
+        '''
+        delay = min(self.maxDelay, self.initialDelay * self.multiplier ** attempt)
+        return delay * (1 - self.jitter * rng.random())
+
+@dataclass
+class ReconnectionStatistics:
+    ''' metrics of the outages handled by a ``ReconnectionManager`` '''
+    #: number of successful reconnections
+    outages                    : int   = field(default =0)
+    #: number of connection attempts
+    attempts                   : int   = field(default =0)
+    #: number of failed connection attempts
+    failedAttempts             : int   = field(default =0)
+    #: duration in seconds of the last outage, from ``reconnect()`` to the restarted session
+    lastOutageDuration         : float = field(default =0.0)
+    #: summed duration of all outages in seconds
+    totalOutageDuration        : float = field(default =0.0)
+    #: longest outage in seconds
+    longestOutageDuration      : float = field(default =0.0)
+    #: MPUSH frames the controller acquired but which were not received
+    framesLost                 : int   = field(default =0)
+    #: bytes of complete frames kept in the push buffer over the outages
+    preservedBytes             : int   = field(default =0)
+    #: restores configuring all transient recorders, after a controller restart
+    fullRestores               : int   = field(default =0)
+    #: restores configuring only the transient recorders whose configuration changed
+    partialRestores            : int   = field(default =0)
+    #: transient recorders configured again by the restores
+    replayedTransientRecorders : int   = field(default =0)
+
+class ReconnectionManager:
+    '''
+    reconnects an ``EthernetController`` and restores its acquisition session.
+
+    The hardware configuration last written by ``startSession()`` or ``reconnect()`` is
+    remembered. As the transient recorders keep their configuration while only the
+    network connection is lost, a restore stops MPUSH, sets all active transient recorders
+    to slave mode and clears them, but configures only the transient recorders whose
+    configuration changed. All transient recorders are configured if the controller
+    millisecond timer did not advance with the host clock since it was last read, which
+    shows that the controller restarted, also after an overflow of the timer.
+
+    :param ethernetController: controller to reconnect
+    :type ethernetController: licel_tcpip.EthernetController
+
+    :param Config: acquisition configuration
+    :type Config: licel_Config.Config
+
+    :param shots: number of shots of the MPUSH acquisition, None if the session does not
+        use MPUSH. MPUSH is restarted after the reconnection if it was started by
+        ``startSession()``.
+    :type shots: int | None
+
+    :param policy: delays between the attempts
+    :type policy: ReconnectionPolicy | None
+
+    :param seed: seed of the random generator used for the jitter
+    :type seed: int | None
+    '''
+
+    def __init__(self, ethernetController: 'licel_tcpip.EthernetController',
+                 Config: 'licel_Config.Config', shots: int | None = None,
+                 policy: ReconnectionPolicy | None = None, seed: int | None = None) -> None:
+        self.ethernetController = ethernetController
+        self.Config = Config
+        self.shots = shots
+        self.policy = policy if policy is not None else ReconnectionPolicy()
+        self.statistics = ReconnectionStatistics()
+        self._rng = random.Random(seed)
+        #: hardware configuration of each transient recorder as last written
+        self._appliedConfig : dict[int, dict[str, Any]] | None = None
+        self._mpushRunning = False
+        self._controllerMillis : int | None = None
+        #: host ``time.monotonic()`` when ``_controllerMillis`` was read
+        self._controllerMillisRead = 0.0
+        self._lastTimeStamp : int | None = None
+        self._frameInterval : float | None = None
+        self._outagePending = False
+
+    def startSession(self) -> str | None:
+        '''
+        list the installed transient recorders, configure the hardware and start MPUSH
+        if ``shots`` is given. The command and push connections need to be open.
+
+        :returns: MPUSH response, None without MPUSH
+        :rtype: str | None
+        '''
+        Tr = self.ethernetController.Tr
+        Tr.listInstalledTr(useCache = True)
+        Tr.configureHardware(self.Config)
+        self._appliedConfig = self._hardwareConfig(self.Config)
+        self._controllerMillis, self._controllerMillisRead = self._readControllerMillis()
+        if self.shots is None:
+            return None
+        resp = Tr.MPushStartFromConfig(self.shots, self.Config)
+        self._mpushRunning = True
+        return resp
+
+    def reconnect(self, Config: 'licel_Config.Config | None' = None) -> None:
+        '''
+        reconnect the command and push connections, restore the hardware configuration
+        and restart MPUSH. The complete frames left in the push buffer are kept.
+
+        :param Config: new acquisition configuration, None to restore the current one.
+        :type Config: licel_Config.Config | None
+
+        :raises RuntimeError: if the controller could not be reconnected within
+            ``policy.maxAttempts`` attempts, the last error is chained.
+        '''
+        if Config is not None:
+            self.Config = Config
+        outageStart = time.monotonic()
+        pushTail = self._completeFrames(self.ethernetController.Tr)
+        self._closeConnections()
+        lastError : Exception | None = None
+        for attempt in range(self.policy.maxAttempts):
+            time.sleep(self.policy.delay(attempt, self._rng))
+            self.statistics.attempts += 1
+            try:
+                self._connect()
+                self.ethernetController.Tr.pushBuffer = pushTail
+                self._restore()
+                break
+            except (OSError, RuntimeError) as error:
+                self.statistics.failedAttempts += 1
+                lastError = error
+                print("Reconnect attempt {} of {} failed: {}".format(attempt + 1,
+                                                                    self.policy.maxAttempts,
+                                                                    error))
+                self._closeConnections()
+        else:
+            raise RuntimeError ("\nFailed to reconnect to " + self.ethernetController.ip +
+                                " after {} attempts".format(self.policy.maxAttempts)) from lastError
+        outage = time.monotonic() - outageStart
+        self._outagePending = True
+        self.statistics.outages += 1
+        self.statistics.preservedBytes += len(pushTail)
+        self.statistics.lastOutageDuration = outage
+        self.statistics.totalOutageDuration += outage
+        self.statistics.longestOutageDuration = max(self.statistics.longestOutageDuration,
+                                                    outage)
+
+    def recordFrame(self, time_stamp: int) -> None:
+        '''
+        to be called for each valid MPUSH frame, the controller timestamps are used to
+        count the frames lost during the outages.
+
+        :param time_stamp: controller millisecond timestamp of the frame
+        :type time_stamp: int
+        '''
+        lastTimeStamp, self._lastTimeStamp = self._lastTimeStamp, time_stamp
+        if lastTimeStamp is None:
+            return
+        # the millisecond timestamp is 32 bit and wraps around
+        interval = (time_stamp - lastTimeStamp) & 0xffffffff
+        if interval == 0 or interval >= 0x80000000:
+            if not self._outagePending:
+                return
+            # controller restarted, the timestamps start again
+            interval = 1000 * self.statistics.lastOutageDuration
+        self._outagePending = False
+        if self._frameInterval is None:
+            self._frameInterval = interval
+            return
+        lostFrames = round(interval / self._frameInterval) - 1
+        if lostFrames > 0:
+            self.statistics.framesLost += lostFrames
+        else:
+            self._frameInterval = 0.9 * self._frameInterval + 0.1 * interval
+
+    def _connect(self) -> None:
+        ethernetController = self.ethernetController
+        with contextlib.suppress(OSError):
+            ethernetController.killSocket()
+        ethernetController._renewSockets()
+        ethernetController.openConnection()
+        ethernetController.openPushConnection()
+        ethernetController.Tr.listInstalledTr(useCache = True)
+
+    def _restore(self) -> None:
+        Tr = self.ethernetController.Tr
+        controllerMillis, controllerMillisRead = self._readControllerMillis()
+        newConfig = self._hardwareConfig(self.Config)
+        restarted = (self._controllerMillis is None or self._appliedConfig is None
+                     or self._controllerRestarted(controllerMillis, controllerMillisRead))
+        if restarted:
+            transientRecorders = set(newConfig)
+            self.statistics.fullRestores += 1
+        else:
+            transientRecorders = {trNumber for trNumber, trConfig in newConfig.items()
+                                  if self._appliedConfig.get(trNumber) != trConfig}
+            self.statistics.partialRestores += 1
+        if self._mpushRunning:
+            # the controller may still push, MPUSH is restarted below
+            print(Tr.MPushStop())
+        # all active transient recorders are set to slave mode and cleared
+        Tr.configureHardware(self.Config, transientRecorders)
+        self.statistics.replayedTransientRecorders += len(transientRecorders)
+        self._appliedConfig = newConfig
+        self._controllerMillis = controllerMillis
+        self._controllerMillisRead = controllerMillisRead
+        if self._mpushRunning:
+            print(Tr.MPushStartFromConfig(self.shots, self.Config))
+
+    def _closeConnections(self) -> None:
+        with contextlib.suppress(OSError):
+            self.ethernetController.shutdownConnection()
+        with contextlib.suppress(OSError):
+            self.ethernetController.shutdownPushConnection()
+
+    def _readControllerMillis(self) -> tuple[int, float]:
+        ''' controller millisecond timer and the host ``time.monotonic()`` it was read at '''
+        start = time.monotonic()
+        controllerMillis = int(self.ethernetController.getMilliSecs().split()[-1])
+        return controllerMillis, (start + time.monotonic()) / 2
+
+    def _controllerRestarted(self, controllerMillis: int, controllerMillisRead: float) -> bool:
+        '''
+        True if the controller timer deviates from the value expected from the host clock,
+        the timer wraps around after 2**32 milliseconds. A timer ahead of the host clock
+        is not expected either, in doubt all transient recorders are configured.
+        '''
+        elapsedMs = (controllerMillisRead - self._controllerMillisRead) * 1000
+        expected = int(self._controllerMillis + elapsedMs)
+        deviation = (controllerMillis - expected) & 0xffffffff
+        if deviation >= 0x80000000:
+            deviation = 0x100000000 - deviation
+        return deviation > RESTART_TOLERANCE_MS + CLOCK_DRIFT * elapsedMs
+
+    @staticmethod
+    def _hardwareConfig(Config: 'licel_Config.Config') -> dict[int, dict[str, Any]]:
+        ''' configuration written to the hardware for each active transient recorder '''
+        hardwareConfig = {}
+        for trConfig in Config.TrConfigs:
+            if not any(trConfig.analogueEnabled[key] == True or trConfig.pcEnabled[key] == True
+                       for key in trConfig.analogueEnabled):
+                continue
+            fields = asdict(trConfig)
+            hardwareConfig[trConfig.nTransientRecorder] = {name : fields[name]
+                                                           for name in HARDWARE_CONFIG_FIELDS}
+        return hardwareConfig
+
+    @staticmethod
+    def _completeFrames(Tr) -> 'licel_mpush.PushBuffer':
+        '''
+        push buffer of ``Tr`` truncated behind its last complete frame. The frames are
+        followed by the first delimiter of the restarted MPUSH stream and can therefore
+        be parsed after the reconnection.
+        '''
+        pushBuffer = Tr.pushBuffer
+        frameSize = Tr.exceptedByte
+        length = 0
+        if frameSize > 0:
+            while (length + frameSize <= len(pushBuffer)
+                   and pushBuffer[length:length + 2] == licel_mpush.MPUSH_DELIMITER):
+                length += frameSize
+        pushBuffer.truncate(length)
+        return pushBuffer
@@ -7,7 +7,7 @@ starting the MPUSH acquisition from configuration
 '''
 
 import socket
-from Licel import licel_tr_tcpip, photomultiplier, TCP_util
+from Licel import licel_tr_tcpip, photomultiplier, TCP_util, licel_reconnect, licel_heartbeat
 import select
 
 from typing import TYPE_CHECKING
@@ -23,18 +23,76 @@ class EthernetController(TCP_util.util):
     Tr: 'licel_tr_tcpip.TransientRecorder' 
     #:
     pmt: 'photomultiplier.photomultiplier'
+    #: liveness supervision started by ``startHeartbeat()``
+    heartbeat: 'licel_heartbeat.Heartbeat | None' = None
   
-    def __init__(self, ip: str, port : int) -> None:
+    def __init__(self, ip: str, port : int,
+                 socketOptions: 'TCP_util.SocketOptions | None' = None) -> None:
+        """
+        :param ip: ethernet controller ip address
+        :type ip: str
+
+        :param port: ethernet controller command port
+        :type port: int
+
+        :param socketOptions: buffer sizes, timeouts and TCP options of the sockets, 
+            for example ``Config.socketOptions`` read from the ``[socket]`` section of Acquis.ini.
+            None for the defaults.
+        :type socketOptions: TCP_util.SocketOptions | None
+        """
         self.ip = ip
         self.port = port 
+        self.socketOptions = socketOptions
         self._renewSockets()
 
 
     def _renewSockets(self) -> None: 
-        TCP_util.util.__init__(self, self.ip, self.port)
+        previousTr = getattr(self, "Tr", None)
+        TCP_util.util.__init__(self, self.ip, self.port, self.socketOptions)
         self.Tr = licel_tr_tcpip.TransientRecorder(self.commandSocket, self.PushSocket,
-                                                   self.killsock, self.sockFile )
+                                                   self.killsock, self.sockFile,
+                                                   self.commandLock)
+        if previousTr is not None:
+            # a push capture continues over the reconnection
+            self.Tr.pushCapture = previousTr.pushCapture
         self.pmt = photomultiplier.photomultiplier(self)  
+        if self.heartbeat is not None:
+            # supervise the new sockets, the heartbeat thread is not restarted as the
+            # reconnection may run on it
+            self.heartbeat.socketsRenewed()
+            self.Tr.heartbeat = self.heartbeat
+
+    def startHeartbeat(self, config: 'licel_heartbeat.HeartbeatConfig | None' = None,
+                       onStateChange = None) -> 'licel_heartbeat.Heartbeat':
+        """
+        supervise the liveness of the controller on a background thread and enable TCP 
+        keepalive on the command and push sockets, see ``licel_heartbeat``. 
+        ``Tr.recvPushData()`` then no longer probes the controller itself, it raises a 
+        ConnectionError once the heartbeat declared the controller dead.
+
+        :param config: idle, probe and keepalive thresholds 
+        :type config: licel_heartbeat.HeartbeatConfig | None
+
+        :param onStateChange: called with the previous and the new liveness state
+        :type onStateChange: Callable[[str, str], None] | None
+
+        :returns: the running heartbeat
+        :rtype: licel_heartbeat.Heartbeat
+        """
+        self.stopHeartbeat()
+        self.heartbeat = licel_heartbeat.Heartbeat(self, config, onStateChange)
+        self.heartbeat.start()
+        self.Tr.heartbeat = self.heartbeat
+        return self.heartbeat
+
+    def stopHeartbeat(self) -> None:
+        """
+        stop the liveness supervision started by ``startHeartbeat()``
+        """
+        if self.heartbeat is not None:
+            self.heartbeat.stop()
+            self.heartbeat = None
+        self.Tr.heartbeat = None
 
     def openConnection(self) -> None:
         """
@@ -78,6 +136,8 @@ class EthernetController(TCP_util.util):
         except socket.timeout: 
             raise socket.timeout ("\nConnection timeout to IP: "+self.ip + 
                                   " PORT: "+str(self.pushPort))
+        self.socketOptions.applyToConnectedPushSocket(self.PushSocket)
+        self.Tr.pushBuffer.quickAck = self.socketOptions.usesQuickAck()
         return
         
     def shutdownPushConnection(self) -> None: 
@@ -186,35 +246,14 @@ class EthernetController(TCP_util.util):
         return  self._writeReadAndVerify("MILLISEC?", " ")
                      
     def reconnection(self, ConfigInfo: 'licel_Config.Config') -> None:
-        reconnectAttempt = 0
-        MAXRECONNECTIONATTEMPT = 5
-        self.shutdownConnection()
-        self.shutdownPushConnection()
-        while (reconnectAttempt < MAXRECONNECTIONATTEMPT):
-            try:
-                print("Reconnect attempt number ",reconnectAttempt)
-                reconnectAttempt += 1
-                self.killSocket()
-                self._renewSockets()
-                self.openConnection()
-                self.openPushConnection()
-                self.Tr.listInstalledTr()   
-                self.Tr.configureHardware(ConfigInfo)  
-                self.pushBuffer = bytearray()
-                print("Reconnection Successful")
-                break
-            except:
-                if (reconnectAttempt > MAXRECONNECTIONATTEMPT):
-                    raise RuntimeError ("\nFailed to reconnect to "+self.ip+" after 5 attempts") 
-                else : 
-                    continue
-    
-
-
-
-    
-
-
-    
+        """
+        reconnect the command and push connections after a connection loss and configure
+        the hardware again. Use ``licel_reconnect.ReconnectionManager`` to restart MPUSH,
+        to configure only the changed transient recorders and to collect outage metrics.
 
+        :param ConfigInfo: acquisition configuration
+        :type ConfigInfo: licel_Config.Config
 
+        :raises RuntimeError: if the controller could not be reconnected.
+        """
+        licel_reconnect.ReconnectionManager(self, ConfigInfo).reconnect()
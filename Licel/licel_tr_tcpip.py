@@ -1,4 +1,4 @@
-from Licel import TCP_util, licel_tcpip
+from Licel import TCP_util, licel_tcpip, licel_mpush, licel_cache, licel_capture
 from types import MappingProxyType
 import time
 import numpy
@@ -7,7 +7,7 @@ import select
 from typing import TYPE_CHECKING, Any
 if TYPE_CHECKING:
     from typing import TextIO 
-    from Licel import licel_data, licel_Config
+    from Licel import licel_data, licel_Config, licel_heartbeat
 
 # Block rack trigger accepted string 
 BLOCKTRIGGER = {"BLOCK A", "BLOCK B", "BLOCK C", "BLOCK D"}
@@ -33,6 +33,14 @@ MEMORY = MappingProxyType({
 'MEM_D' : 'D'
 })
 
+# combined data sets of the batched readout getCombinedDataSets()
+COMBINEDDATATYPE = MappingProxyType({
+'ANALOGUE'         : 'ANALOGUE',
+'ANALOGUE_SQUARED' : 'ANALOGUE_SQUARED',
+'PHOTON'           : 'PHOTON',
+'PHOTON_SQUARED'   : 'PHOTON_SQUARED'
+})
+
 #PUSH MODE TYPE
 PUSHMODETYPE = MappingProxyType({
 'PHO' : 'PHO',
@@ -69,15 +77,40 @@ FREQ_DIVIDER         = 0x40
 
 HEADEROFFSET = 3 # 3* 2 byte = 6byte represents first delimiter xff xff + timestamp 
 NEXT_DELIMTER_OFFSET = 2 # 2 byte representing the next delimiter xff xff
+PUSHBUFFER_FRAMES = 8 # number of MPUSH frames the preallocated push buffer can hold
+
+def parseTRtypeResponse(resp: str) -> dict[str, int | float | str]:
+    '''
+    parse the response to the ``TRTYPE?`` command.
+
+    :param resp: controller response
+    :type resp: str
+
+    :returns: dictionary containing  hardware info
+    :rtype:  dict{'ADC Bits' : ' ', 'PC Bits' : ' ' , 'FIFOLength': ' ' ,
+        binWidth' : ' ','ID' : ' ', 'HWCAP' : ' ', 'binShift': ' '}
+    '''
+    tempTRHardwareInfo : dict[str, int | float | str] = {}
+    parsedResp = resp.split(" ")
+    tempTRHardwareInfo["ADC Bits"] = int(parsedResp[3])
+    tempTRHardwareInfo["PC Bits"] = int(parsedResp[6])
+    tempTRHardwareInfo["FIFOLength"]= int(parsedResp[8])
+    tempTRHardwareInfo["binWidth"] = float(parsedResp[10])
+    tempTRHardwareInfo["ID"] = parsedResp[12]
+    tempTRHardwareInfo["HWCAP"] = parsedResp[14]
+    tempTRHardwareInfo["binShift"] = float(parsedResp[16])
+    #self.TRHardwareInfo["raw"]= parsedResp[18]
+    return tempTRHardwareInfo
+
 class TransientRecorder(TCP_util.util):
 
     Tr_number = " "
-    __MaxTrNumber = 0
     __TrDict: dict[str, str] = {}
 
     bigEndianTimeStamp = False
 
-    pushBuffer = bytearray()
+    #: preallocated buffer holding the received push data
+    pushBuffer : licel_mpush.PushBuffer
 
     #: holds the total number of raw datasets to be read, MSW LSW PC PHM   
     __rawDataSets__ : int = 0  
@@ -87,6 +120,10 @@ class TransientRecorder(TCP_util.util):
     BufferSize : int = 0 
     #: number of byte expected to be received for a complete data set      
     exceptedByte : int = 0  
+    #: number of shots of the push acquisition
+    pushShots : int = 0
+    #: MPUSH frame layout of the push acquisition, built by ``MPushStartFromConfig()``
+    frameLayout : 'licel_mpush.MPushFrameLayout | None' = None
 
     #: a dictionary  containing hardware info for each active transient recorder.
     #  dict{Tr_num : dict{'ADC Bits' : ' ', 'PC Bits' : ' ' , 'FIFOLength': ' ' ,
@@ -98,7 +135,8 @@ class TransientRecorder(TCP_util.util):
                  commandSocket: TCP_util.socket.socket,
                  pushSocket: TCP_util.socket.socket,
                  killSocket: TCP_util.socket.socket,
-                 socket_File ) -> None:
+                 socket_File,
+                 commandLock: 'TCP_util.threading.RLock | None' = None) -> None:
 #        self.Tr_number = TR_num
         self.state: dict[str, bool | str] = { "memory" : MEMORY['MEM_A'] ,
                        "recording": False , "acquisitionState": False}
@@ -106,6 +144,14 @@ class TransientRecorder(TCP_util.util):
         self.PushSocket     = pushSocket 
         self.sockFile       = socket_File
         self.killsock       = killSocket
+        self.pushBuffer     = licel_mpush.PushBuffer()
+        self.__controllerId : str | None = None
+        #: shared with the ethernet controller owning the command socket
+        self.commandLock    = commandLock if commandLock is not None else TCP_util.threading.RLock()
+        #: liveness supervision used by ``recvPushData()``, set by ``EthernetController.startHeartbeat()``
+        self.heartbeat : 'licel_heartbeat.Heartbeat | None' = None
+        #: capture of the received push data, set by ``startPushCapture()``
+        self.pushCapture : 'licel_capture.PushCapture | None' = None
     
     def getStatus(self) -> tuple[bool, bool, str,int]:
         ''' Return the shot number for each memory, there is one clearing cycle at the start.'''
@@ -126,14 +172,22 @@ class TransientRecorder(TCP_util.util):
         Set slave mode. End push mode 
         for more information: https://licel.com/manuals/ethernet_pmt_tr.pdf#TCPIP.SLAVE
         '''
-        return self._writeReadAndVerify("SLAVE", "executed")
+        return self._writeReadAndVerify(*self._slaveModeCommand())
+
+    def _slaveModeCommand(self) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``setSlaveMode()`` '''
+        return "SLAVE", "executed"
     
     def clearMemory(self) -> str: 
         ''' 
         Clear both memories (A and B) of the previously selected device.
         For more info visit: https://licel.com/manuals/ethernet_pmt_tr.pdf#TCPIP.CLEAR
         '''
-        return  self._writeReadAndVerify("CLEAR", "executed")
+        return  self._writeReadAndVerify(*self._clearMemoryCommand())
+
+    def _clearMemoryCommand(self) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``clearMemory()`` '''
+        return "CLEAR", "executed"
         
     def enablePretrigger(self) -> str:
         '''
@@ -144,11 +198,15 @@ class TransientRecorder(TCP_util.util):
         TR devices supporting pretrigger indicate it by bit 3 in the HWCAP field of 
         the TRTYPE? command.
         '''
-        return  self._writeReadAndVerify("PRETRIG 1", "executed")
+        return  self._writeReadAndVerify(*self._pretriggerCommand(True))
     
     def disablePretrigger(self) -> str:
         ''' Disable the pretrigger for a selected TR'''
-        return  self._writeReadAndVerify("PRETRIG 0", "executed")
+        return  self._writeReadAndVerify(*self._pretriggerCommand(False))
+
+    def _pretriggerCommand(self, enable: bool) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``enablePretrigger()`` or ``disablePretrigger()`` '''
+        return ("PRETRIG 1" if enable else "PRETRIG 0"), "executed"
     
     def blockRackTrigger(self, trig: str) -> str:
         '''
@@ -161,22 +219,35 @@ class TransientRecorder(TCP_util.util):
         :type trig: str
 
         '''
-        mode ="BLOCK " + trig
-        if (not (mode in BLOCKTRIGGER )) :
-            raise ValueError ('Argument can only be "A", "B", "C", "D"')
+        mode, expected = self._blockRackTriggerCommand(trig)
         self.writeCommand(mode)
         resp = self.readResponse()
-        assert resp == "BLOCK executed\n", "\r\nLicel_TCPIP_BlockRackTrigger - Error 5108 : " + resp
+        assert resp == expected, "\r\nLicel_TCPIP_BlockRackTrigger - Error 5108 : " + resp
         return resp
+
+    @staticmethod
+    def _blockRackTriggerCommand(trig: str) -> tuple[str, str]:
+        ''' :returns: command and exact expected response of ``blockRackTrigger()`` '''
+        mode ="BLOCK " + trig
+        if (not (mode in BLOCKTRIGGER )) :
+            raise ValueError ('Argument can only be "A", "B", "C", "D"')
+        return mode, "BLOCK executed\n"
     
     def unblockRackTrigger(self) -> str:
         '''
         To unblock previously blocked triggers by ``blockRackTrigger``
         '''
-        self.writeCommand("BLOCK OFF")
+        command, expected = self._unblockRackTriggerCommand()
+        self.writeCommand(command)
         resp = self.readResponse()
-        assert resp == "BLOCK executed\n", "\r\nLicel_TCPIP_UnblockRackTrigger - Error 5108 : " + resp
+        assert resp == expected, "\r\nLicel_TCPIP_UnblockRackTrigger - Error 5108 : " + resp
         return resp
+
+    @staticmethod
+    def _unblockRackTriggerCommand() -> tuple[str, str]:
+        ''' :returns: command and exact expected response of ``unblockRackTrigger()`` '''
+        return "BLOCK OFF", "BLOCK executed\n"
+
     def startAcquisition(self) -> str :
         ''' Start the currently selected transient recorder.'''
         return  self._writeReadAndVerify("START", "executed")
@@ -219,10 +290,14 @@ class TransientRecorder(TCP_util.util):
         TR. If this command fails and the unit claims that it supports 64k shots then
         Licel_TCPIP_SetShotLimit will work.
         '''        
+        return  self._writeReadAndVerify(*self._maxShotsCommand(maxShots))
+
+    def _maxShotsCommand(self, maxShots : int) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``setMaxShots()`` '''
         if (not (maxShots <= 65534 and maxShots >= 1)):
             raise ValueError ('setMaxShots argument must be in range of (1 ... 65534) ')
         cmd = "SETMAXSHOTS "+ str(maxShots)
-        return  self._writeReadAndVerify(cmd, "executed")
+        return cmd, "executed"
  
     def singleShot(self) -> str:
         '''
@@ -238,6 +313,10 @@ class TransientRecorder(TCP_util.util):
         When the damping is set to low, a discriminator level of 63 outputs -25mV
         When the damping is set to High, a discriminator level of 63 outputs -100mV
         '''
+        return  self._writeReadAndVerify(*self._thresholdModeCommand(thresholdMode))
+
+    def _thresholdModeCommand(self, thresholdMode : str) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``setThresholdMode()`` '''
         cmd = " "
         if (not ((thresholdMode != 'ON') ^ (thresholdMode != 'OFF'))):
             raise ValueError ('setThresholdMode argument must be either "ON" or "OFF" \r\n passed argument is :'+thresholdMode)
@@ -245,7 +324,7 @@ class TransientRecorder(TCP_util.util):
             cmd = "THRESHOLD 1"
         if (thresholdMode == 'OFF'):
             cmd = "THRESHOLD 0"
-        return  self._writeReadAndVerify(cmd, "Damping")
+        return cmd, "Damping"
     
     def setInputRange(self, Range : str ) -> str:
         '''
@@ -255,11 +334,15 @@ class TransientRecorder(TCP_util.util):
         * "-100mV" 
         * "-20mV"          
         '''
+        return  self._writeReadAndVerify(*self._inputRangeCommand(Range))
+
+    def _inputRangeCommand(self, Range : str) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``setInputRange()`` '''
         if (not (Range in INPUTRANGE.keys())):
             raise ValueError ('setInputRange argument must be either "-500mV", "-100mV", "-20mV" \r\n passed argument is :'+ Range)
         cmd = (("RANGE "+str(INPUTRANGE[Range])))
         verify = "set to " + Range
-        return  self._writeReadAndVerify(cmd, verify)
+        return cmd, verify
 
     def _getFreqDivider(self) -> str:
         '''
@@ -277,6 +360,12 @@ class TransientRecorder(TCP_util.util):
         supporting this feature, it changes the sampling rate before the summation 
         of the data.
         '''
+        resp = self._writeReadAndVerify(*self._freqDividerCommand(freqDivider))
+        licel_cache.hardwareInfoCache.forgetFreqDivider(self._controllerId())
+        return resp
+
+    def _freqDividerCommand(self, freqDivider : int) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``_setFreqDivider()`` '''
         exponent = 0
         if (freqDivider > 128 or freqDivider < 0):
             raise ValueError ('freqDivider exponent must be in Range of 0 ... 128 \r\n passed argument is :'+ str(freqDivider))
@@ -284,7 +373,7 @@ class TransientRecorder(TCP_util.util):
             freqDivider = freqDivider /2
             exponent +=1
         cmd ="FREQDIV "+ str(exponent)+" 0"
-        return self._writeReadAndVerify(cmd, str(exponent))
+        return cmd, str(exponent)
     
     def _isPowerofTwo(self, number : int):
         '''
@@ -303,18 +392,45 @@ class TransientRecorder(TCP_util.util):
         :rtype:  dict{'ADC Bits' : ' ', 'PC Bits' : ' ' , 'FIFOLength': ' ' ,
             binWidth' : ' ','ID' : ' ', 'HWCAP' : ' ', 'binShift': ' ', 'raw': ' '}
         '''
-        tempTRHardwareInfo : dict[str, int | float | str] = {}
         resp = self._writeReadAndVerify("TRTYPE?", "TRTYPE ADC Bits")        
-        parsedResp = resp.split(" ")
-        tempTRHardwareInfo["ADC Bits"] = int(parsedResp[3])
-        tempTRHardwareInfo["PC Bits"] = int(parsedResp[6])
-        tempTRHardwareInfo["FIFOLength"]= int(parsedResp[8])
-        tempTRHardwareInfo["binWidth"] = float(parsedResp[10])
-        tempTRHardwareInfo["ID"] = parsedResp[12]
-        tempTRHardwareInfo["HWCAP"] = parsedResp[14]
-        tempTRHardwareInfo["binShift"] = float(parsedResp[16])
-        #self.TRHardwareInfo["raw"]= parsedResp[18]
-        return tempTRHardwareInfo
+        return parseTRtypeResponse(resp)
+
+    def getHardwareInfo(self, deviceNumber: int) -> dict[str, int | float | str]:
+        '''
+        hardware information of a transient recorder as returned by ``TRtype()``, 
+        taken from ``licel_cache.hardwareInfoCache`` if available. Otherwise the 
+        transient recorder is queried and the result is cached.
+
+        :param deviceNumber: transient recorder adresse
+        :type deviceNumber: int 
+
+        :returns: dictionary containing  hardware info
+        :rtype: dict[str, int | float | str]
+        '''
+        description = licel_cache.hardwareInfoCache.get(self._controllerId(), deviceNumber)
+        if description is not None and description.hardwareInfo is not None:
+            return description.hardwareInfo
+        batch = self.commandBatch()
+        batch.add(*self._selectTRCommand(deviceNumber))
+        batch.add("TRTYPE?", "TRTYPE ADC Bits")
+        batch.add(*self._selectTRCommand(-1))
+        hardwareInfo = parseTRtypeResponse(batch.execute()[1])
+        licel_cache.hardwareInfoCache.store(self._controllerId(), deviceNumber,
+                                            hardwareInfo = hardwareInfo)
+        return hardwareInfo
+
+    def refreshHardwareInfo(self) -> None:
+        '''
+        drop the cached hardware information and frequency dividers of this controller,
+        they are queried again on their next use.
+        '''
+        licel_cache.hardwareInfoCache.refresh(self._controllerId())
+
+    def _controllerId(self) -> str:
+        ''' controller address and ``*IDN?`` response, queried once per connection '''
+        if self.__controllerId is None:
+            self.__controllerId = self._controllerAddress() + " " + self.getID().strip()
+        return self.__controllerId
        
     def continueAcquisition(self) -> str: 
         '''
@@ -354,9 +470,21 @@ class TransientRecorder(TCP_util.util):
         Reading the raw data sets ( analog LSW, analog MSW or photon counting) from
         the specified device.
         '''
-        self._requestData(device, numberToRead, datatype, memory)
-        data = self._readData(numberToRead)
+        with self.commandLock:
+            self._requestData(device, numberToRead, datatype, memory)
+            data = self._readData(numberToRead)
         return data
+
+    def _getDataSetInto(self, device : int, numberToRead : int,
+                        datatype : str, memory : str ) -> numpy.ndarray[Any, numpy.dtype[numpy.uint16]]:
+        '''
+        Reading the raw data sets ( analog LSW, analog MSW or photon counting) from
+        the specified device into a buffer of ``bufferPool``. The buffer has to be 
+        released with ``self.bufferPool.release()`` after use.
+        '''
+        with self.commandLock:
+            self._requestData(device, numberToRead, datatype, memory)
+            return self.recvInto(numberToRead)
     
     def getShotsAB(self) -> str:
         '''
@@ -441,10 +569,14 @@ class TransientRecorder(TCP_util.util):
         When the threshold mode is activated, a discriminator level of 63 outputs -100mV
         When the threshold mode is deactivated, a discriminator level of 63 outputs -25mV
         '''
+        return self._writeReadAndVerify(*self._discriminatorLevelCommand(discriminatorLevel))
+
+    def _discriminatorLevelCommand(self, discriminatorLevel:int ) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``setDiscriminatorLevel()`` '''
         if (discriminatorLevel <0 or discriminatorLevel > 63): 
             raise ValueError ('setDiscriminatorLevel() discriminatorLevel must be in range 1 ... 63 \r\n passed argument is :'+ str(discriminatorLevel))
         command = "DISC " + str(discriminatorLevel)
-        return self._writeReadAndVerify(command, "set to")
+        return command, "set to"
 
        
     def waitForReady(self,delay: int) -> str:
@@ -501,22 +633,17 @@ class TransientRecorder(TCP_util.util):
         :rtype: [Analogue data set: numpy.ndarray(dtype=uint32, ndim =1), 
                  Clipping information: numpy.ndarray(dtype=uint32, ndim =1)]
         """
-        if TRType['ADC Bits'] == 16 :
-            mem_low_buffer  = self._getDataSet(device, bins + 1, "LSW", memory)   
-            mem_high_buffer = self._getDataSet(device, bins + 1, "MSW", memory)
-            mem_low   = numpy.frombuffer(mem_low_buffer,numpy.uint16)
-            mem_high  = numpy.frombuffer(mem_high_buffer,numpy.uint16)
-            mem_extra = numpy.zeros((bins))
-            if shots > 4096 :
-                mem_extra_buffer = self._getDataSet(device, bins + 1,"PHM", memory)
-                mem_extra = numpy.frombuffer(mem_extra_buffer,numpy.uint16)
-            return  dataParser._combine_Analog_Datasets_16bit(mem_low, mem_high, mem_extra)
-        else : 
-            mem_low_buffer  = self._getDataSet(device, bins + 1, "LSW", memory)   
-            mem_high_buffer = self._getDataSet(device, bins + 1, "MSW", memory)
-            mem_low  = numpy.frombuffer(mem_low_buffer,numpy.uint16)
-            mem_high = numpy.frombuffer(mem_high_buffer,numpy.uint16)
-            return dataParser._combine_Analog_Datasets(mem_low, mem_high)
+        mem = [self._getDataSetInto(device, bins + 1, rawType, memory)
+               for rawType in self._rawDataSetsToRead(TRType, 'ANALOGUE', shots)]
+        try:
+            if TRType['ADC Bits'] == 16 :
+                mem_extra = mem[2] if len(mem) == 3 else None
+                return  dataParser._combine_Analog_Datasets_16bit(mem[0], mem[1], mem_extra)
+            else : 
+                return dataParser._combine_Analog_Datasets(mem[0], mem[1])
+        finally:
+            for buffer in mem:
+                self.bufferPool.release(buffer)
 
     def getCombinedRawAnalogueSquaredData(self, dataParser:'licel_data.DataParser',
                                           binsSqd: int, device: int, memory: str) -> numpy.ndarray[Any, numpy.dtype[numpy.uint64]]: 
@@ -538,14 +665,13 @@ class TransientRecorder(TCP_util.util):
         :returns: the combined raw analogue squared data
         :rtype: numpy.ndarray(dtype=uint64, ndim =1)
         """
-        mem_low_buffer   = self._getDataSet(device, binsSqd + 1, "A2L", memory) 
-        mem_high_buffer  = self._getDataSet(device, binsSqd + 1, "A2M", memory)
-        mem_extra_buffer = self._getDataSet(device, binsSqd + 1, "A2H", memory) 
-        mem_low   = numpy.frombuffer(mem_low_buffer, numpy.uint16)
-        mem_high  = numpy.frombuffer(mem_high_buffer, numpy.uint16)
-        mem_extra = numpy.frombuffer(mem_extra_buffer, numpy.uint16)
-
-        return dataParser._combineAnalogSquaredData(mem_low, mem_high, mem_extra)
+        mem = [self._getDataSetInto(device, binsSqd + 1, rawType, memory)
+               for rawType in ("A2L", "A2M", "A2H")]
+        try:
+            return dataParser._combineAnalogSquaredData(mem[0], mem[1], mem[2])
+        finally:
+            for buffer in mem:
+                self.bufferPool.release(buffer)
 
     def getRawPhotonCountingData(self, TRType:dict[str, int | str |float],
                                  dataParser:'licel_data.DataParser', bins: int, 
@@ -577,20 +703,17 @@ class TransientRecorder(TCP_util.util):
         :returns: photon data set. 
         :rtype: numpy.ndarray(dtype=uint32, ndim =1)
         """      
-        if((TRType['PC Bits'] == 4  and shots > 4096) or 
-        (TRType['PC Bits'] == 6 and shots > 1024) or 
-        (TRType['PC Bits'] == 8 and shots > 256)) :
-            mem_low_buffer   = self._getDataSet(device, bins + 1, "PC" , memory) 
-            mem_extra_buffer = self._getDataSet(device, bins + 1 , "PHM",memory) 
-            mem_low   = numpy.frombuffer(mem_low_buffer,numpy.uint16)
-            mem_extra = numpy.frombuffer(mem_extra_buffer,numpy.uint16)
-            return dataParser._convert_Photoncounting_Fullword(mem_low, mem_extra)
-
-        else: 
-            PUREPHOTON = 0
-            mem_low_buffer   = self._getDataSet(device, bins + 1, "PC" , memory) 
-            mem_low   = numpy.frombuffer(mem_low_buffer,numpy.uint16)
-            return dataParser._convert_Photoncounting(mem_low, PUREPHOTON)
+        mem = [self._getDataSetInto(device, bins + 1, rawType, memory)
+               for rawType in self._rawDataSetsToRead(TRType, 'PHOTON', shots)]
+        try:
+            if len(mem) == 2 :
+                return dataParser._convert_Photoncounting_Fullword(mem[0], mem[1])
+            else: 
+                PUREPHOTON = 0
+                return dataParser._convert_Photoncounting(mem[0], PUREPHOTON)
+        finally:
+            for buffer in mem:
+                self.bufferPool.release(buffer)
 
     def getRawPhotonCountingSquaredData(self, dataParser:'licel_data.DataParser',
                                         binsSqd: int, device: int,
@@ -613,12 +736,118 @@ class TransientRecorder(TCP_util.util):
         :returns: the combined  photon counting raw squared data
         :rtype: numpy.ndarray(dtype=uint64, ndim =1)
         """
-        mem_low_buffer   = self._getDataSet(device, binsSqd + 1, "P2L", memory) 
-        mem_high_buffer  = self._getDataSet(device, binsSqd + 1, "P2M", memory)
-        mem_low   = numpy.frombuffer(mem_low_buffer,numpy.uint16)
-        mem_high  = numpy.frombuffer(mem_high_buffer,numpy.uint16)
+        mem = [self._getDataSetInto(device, binsSqd + 1, rawType, memory)
+               for rawType in ("P2L", "P2M")]
+        try:
+            return dataParser._combine_Photon_Squared_Data(mem[0], mem[1])
+        finally:
+            for buffer in mem:
+                self.bufferPool.release(buffer)
+
+    def _rawDataSetsToRead(self, TRType: dict[str, int | float | str], datatype: str,
+                           shots: int) -> list[str]:
+        '''
+        raw data sets to read for the combined data set ``datatype``, in the order
+        expected by the combine methods of ``licel_data.DataParser``.
+        '''
+        if datatype == 'ANALOGUE':
+            if TRType['ADC Bits'] == 16 and shots > 4096:
+                return ['LSW', 'MSW', 'PHM']
+            return ['LSW', 'MSW']
+        if datatype == 'ANALOGUE_SQUARED':
+            return ['A2L', 'A2M', 'A2H']
+        if datatype == 'PHOTON':
+            if licel_mpush.usesPhotonPHM(TRType, shots):
+                return ['PC', 'PHM']
+            return ['PC']
+        return ['P2L', 'P2M']
+
+    def getCombinedDataSets(self, hardwareInfos: dict[int, dict[str, int | float | str]],
+                            dataParser: 'licel_data.DataParser', shots: int,
+                            dataRequests: list[tuple[int, str, str, int]]) -> list[Any]:
+        """
+        batched readout of several combined data sets. All ``DATA?`` commands are sent
+        at once, the binary responses are read back to back into a single buffer of
+        ``bufferPool``. A raw data set needed by several requests, e.g. ``PHM`` for the analogue
+        and the photon counting data, is read only once.
+
+        :param hardwareInfos: information about the transient recorder hardware for each
+            requested device, as returned by ``TRtype()``.
+        :type hardwareInfos: dict{device : dict{'ADC Bits' :" " , 'PC Bits' : " ", 
+                                  'FIFOLength': " ", 'binWidth' :" " , 'ID' : " ",
+                                  'HWCAP' : " ", 'binShift': " "}}
 
-        return dataParser._combine_Photon_Squared_Data(mem_low, mem_high)
+        :param dataParser: Class holding method for processing and parsing raw data
+        :type dataParser: Licel.licel_data.DataParser
+
+        :param shots: number of acquired shots. 
+        :type shots: int 
+
+        :param dataRequests: list of (device, memory, datatype, bins) to read. \r\n
+            memory can be 'MEM_A', 'MEM_B', 'MEM_C', 'MEM_D'. \r\n
+            datatype can be 'ANALOGUE', 'ANALOGUE_SQUARED', 'PHOTON', 'PHOTON_SQUARED'.
+        :type dataRequests: list[tuple[int, str, str, int]]
+
+        :raises: ConnectionResetError if the counter part closes the connection
+
+        :returns: the combined data sets in the order of ``dataRequests``, each element
+            as returned by the corresponding single readout: \r\n
+            - 'ANALOGUE' : as ``getCombinedRawAnalogueData()`` \r\n
+            - 'ANALOGUE_SQUARED' : as ``getCombinedRawAnalogueSquaredData()`` \r\n
+            - 'PHOTON' : as ``getRawPhotonCountingData()`` \r\n
+            - 'PHOTON_SQUARED' : as ``getRawPhotonCountingSquaredData()``
+        :rtype: list
+        """
+        # raw data set (device, memory, raw datatype, number) -> offset in the buffer
+        rawDataSets : dict[tuple[int, str, str, int], int] = {}
+        totalLength = 0
+        commands = []
+        for device, memory, datatype, bins in dataRequests:
+            if (not (datatype in COMBINEDDATATYPE.keys())):
+                raise ValueError ('getCombinedDataSets datatype can be :'+ str(COMBINEDDATATYPE.keys())+'\r\n passed argument is :'+ datatype)
+            if (not (memory in MEMORY.keys())):
+                raise ValueError ('getCombinedDataSets memory can be :'+ str(MEMORY.keys())+'\r\n passed argument is :'+ memory)
+            for rawType in self._rawDataSetsToRead(hardwareInfos[device], datatype, shots):
+                key = (device, memory, rawType, bins + 1)
+                if key in rawDataSets:
+                    continue
+                rawDataSets[key] = totalLength
+                totalLength += bins + 1
+                commands.append("DATA? " + str(device) + " " + str(bins + 1) + " "
+                                + DATASETSTYPE[rawType] + " " + MEMORY[memory] + "\r\n")
+
+        with self.commandLock:
+            self.commandSocket.sendall("".join(commands).encode())
+            rawData = self.recvInto(totalLength)
+
+        combinedDataSets : list[Any] = []
+        try:
+            for device, memory, datatype, bins in dataRequests:
+                TRType = hardwareInfos[device]
+                offsets = [rawDataSets[(device, memory, rawType, bins + 1)]
+                           for rawType in self._rawDataSetsToRead(TRType, datatype, shots)]
+                mem = [rawData[offset : offset + bins + 1] for offset in offsets]
+                if datatype == 'ANALOGUE':
+                    if TRType['ADC Bits'] == 16:
+                        mem_extra = mem[2] if len(mem) == 3 else None
+                        combinedDataSets.append(dataParser._combine_Analog_Datasets_16bit(mem[0], mem[1],
+                                                                                          mem_extra))
+                    else:
+                        combinedDataSets.append(dataParser._combine_Analog_Datasets(mem[0], mem[1]))
+                elif datatype == 'ANALOGUE_SQUARED':
+                    combinedDataSets.append(dataParser._combineAnalogSquaredData(mem[0], mem[1], mem[2]))
+                elif datatype == 'PHOTON':
+                    if len(mem) == 2:
+                        combinedDataSets.append(dataParser._convert_Photoncounting_Fullword(mem[0], mem[1]))
+                    else:
+                        PUREPHOTON = 0
+                        combinedDataSets.append(dataParser._convert_Photoncounting(mem[0], PUREPHOTON))
+                else:
+                    combinedDataSets.append(dataParser._combine_Photon_Squared_Data(mem[0], mem[1]))
+        finally:
+            # the buffer is given back also if a conversion fails
+            self.bufferPool.release(rawData)
+        return combinedDataSets
     
     def MPushStop(self) -> str: 
         """ 
@@ -644,15 +873,25 @@ class TransientRecorder(TCP_util.util):
 
         :rtype: str
         """
+        return  self._writeReadAndVerify(*self._selectTRCommand(numTR))
+
+    def _selectTRCommand(self, numTR : int) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``selectTR()`` '''
         if ( not isinstance(numTR, int) ):
             raise ValueError ("selectTR argument must be an integer \r\n" "passed argument is :"+ type(numTR))
         cmd = ("SELECT " +str(numTR))
-        return  self._writeReadAndVerify(cmd , "executed")
+        return cmd, "executed"
     
-    def listInstalledTr(self) -> dict[str, str]:
+    def listInstalledTr(self, useCache: bool = False) -> dict[str, str]:
         '''
         attempts to communicate with transient recorder with adresse 0 .. 15 and lists 
-        all installed transient recorders.
+        all installed transient recorders. The probes of all addresses are sent 
+        in a single burst, the result is stored in ``licel_cache.trDiscoveryCache``.
+
+        :param useCache: if True and the controller, identified by its address and its
+            ``*IDN?`` response, was probed before, the cached result is returned 
+            without probing the transient recorders. 
+        :type useCache: bool
 
         :raises RuntimeError: if no transient recorder is detected 
 
@@ -661,23 +900,55 @@ class TransientRecorder(TCP_util.util):
                  'TR3': '(not)installed', ....................... 'TR15': '(not)installed'}
         
         '''
-
-        self.selectTR(-1)
+        address = self._controllerAddress()
+        if useCache:
+            idn = self.getID()
+            installed = licel_cache.trDiscoveryCache.get(address, idn)
+            self.__controllerId = address + " " + idn.strip()
+            if installed is not None:
+                self.__TrDict = installed
+                return self.__TrDict
+
+        batch = self.commandBatch()
+        batch.add("*IDN?", " ")
+        batch.add(*self._selectTRCommand(-1))
         for i in range (0,16): 
-            self.selectTR(i)
-            self.writeCommand("STAT?")
-            resp = self.readResponse()
+            batch.add(*self._selectTRCommand(i))
+            batch.add("STAT?")
+        # all probes in a single burst
+        batch.maxPipelinedCommands = len(batch)
+        responses = batch.execute()
+        idn = responses[0]
+        self.__controllerId = address + " " + idn.strip()
+        # responses of SELECT i and STAT? for each address, after *IDN? and SELECT -1 
+        statusResponses = responses[3::2]
+        installedTrNumber = 0
+        self.__TrDict = {}
+        for i, resp in enumerate(statusResponses): 
             key = "TR" + str(i)
             if (resp.find("Shots") >= 0):
-                self.__MaxTrNumber += 1
+                installedTrNumber += 1
                 self.__TrDict[key] = "installed"
             else:
                 self.__TrDict[key] = "not installed"
-        if self.__MaxTrNumber > 0 :
+        if installedTrNumber > 0 :
+            licel_cache.trDiscoveryCache.store(address, idn, self.__TrDict)
             return self.__TrDict
         else:
             raise RuntimeError ("no TR detected")
             return 
+
+    def invalidateInstalledTr(self) -> None:
+        '''
+        remove the installed transient recorders of this controller from 
+        ``licel_cache.trDiscoveryCache``. To be called after changing the hardware, 
+        the next ``listInstalledTr()`` probes the transient recorders again.
+        '''
+        licel_cache.trDiscoveryCache.invalidate(self._controllerAddress())
+
+    def _controllerAddress(self) -> str:
+        ip, port = self.commandSocket.getpeername()[:2]
+        return "{}:{}".format(ip, port)
         
 
     def multiplyBinwidth(self, multiplier: int) -> str: 
@@ -694,19 +965,45 @@ class TransientRecorder(TCP_util.util):
         :param int:  
         '''
 
+        resp = self._writeReadAndVerify(*self._multiplyBinwidthCommand(multiplier))
+        licel_cache.hardwareInfoCache.forgetFreqDivider(self._controllerId())
+        return resp 
+
+    def _multiplyBinwidthCommand(self, multiplier: int) -> tuple[str, str]:
+        ''' :returns: command and expected response of ``multiplyBinwidth()`` '''
         if (not self._isPowerofTwo(multiplier)):
             raise ValueError ('\r\n multiplier must be 0 or a power of 2, possible value are 0, 1, 2 ,4, 8, 16, 32, 64, 128. Passed argument is :'+ str(multiplier))
-        resp = self._setFreqDivider(multiplier)
-        return resp 
+        return self._freqDividerCommand(multiplier)
     
     def getActualBinwidth(self, deviceNumber: int, hardwareInfos) -> float:
-        self.selectTR(deviceNumber)
-        freqDividerExponent = int (self._getFreqDivider().split(" ")[1])
+        '''
+        binwidth of the transient recorder taking the frequency divider into account. 
+        The frequency divider is taken from ``licel_cache.hardwareInfoCache``, it is only
+        queried if it was neither set by ``configureHardware()`` nor queried before. 
+
+        :param deviceNumber: transient recorder adresse
+        :type deviceNumber: int 
+
+        :param hardwareInfos: hardware information for each transient recorder
+        :type hardwareInfos: dict[int, dict[str, int | float | str]]
+
+        :returns: binwidth in m
+        :rtype: float
+        '''
+        description = licel_cache.hardwareInfoCache.get(self._controllerId(), deviceNumber)
+        if description is not None and description.freqDividerExponent is not None:
+            freqDividerExponent = description.freqDividerExponent
+        else:
+            self.selectTR(deviceNumber)
+            freqDividerExponent = int (self._getFreqDivider().split(" ")[1])
+            self.selectTR(-1)
+            licel_cache.hardwareInfoCache.store(self._controllerId(), deviceNumber,
+                                                freqDividerExponent = freqDividerExponent)
         actualBinwidth = hardwareInfos[deviceNumber]['binWidth'] * (1<<freqDividerExponent)
-        self.selectTR(-1)
         return actualBinwidth
     
-    def configureHardware(self, Config: 'licel_Config.Config') -> None:
+    def configureHardware(self, Config: 'licel_Config.Config',
+                          transientRecorders: set[int] | None = None) -> None:
         """
         Configure the active transient recorders hardware as specified in config. \r\n
             currently configuers following parameters :
@@ -720,6 +1017,11 @@ class TransientRecorder(TCP_util.util):
 
         :param Config: holds the acquisition configuration information
         :type Config: Licel.licel_acq.Config()
+
+        :param transientRecorders: addresses of the transient recorders to configure,
+            None to configure all active transient recorders. The other active transient
+            recorders are only set to slave mode and cleared.
+        :type transientRecorders: set[int] | None
         
         :returns: None
         """
@@ -727,6 +1029,12 @@ class TransientRecorder(TCP_util.util):
 
         if not Config.TrConfigs :
             raise RuntimeError("Config file does not contain any transient recorder configuration.")
+        # the commands of all transient recorders are pipelined, the commands of a
+        # transient recorder are written after its SELECT succeeded
+        batch = self.commandBatch()
+        freqDividerExponents : dict[int, int] = {}
+        # position in the batch, exact response and error message of the BLOCK commands
+        blockCommands : list[tuple[int, str, str]] = []
         for trConfig in Config.TrConfigs:
             transientIsActive = False
             for key in  trConfig.analogueEnabled:
@@ -734,21 +1042,34 @@ class TransientRecorder(TCP_util.util):
                     or trConfig.pcEnabled[key]    == True) :
                         transientIsActive = True
             if transientIsActive == True :
-                print(self.selectTR(trConfig.nTransientRecorder))
-                print(self.setSlaveMode())
-                print(self.clearMemory())
-                print(self.setDiscriminatorLevel(trConfig.discriminator))
-                print(self.disablePretrigger() if trConfig.pretrigger == 0 else self.enablePretrigger())
+                batch.add(*self._selectTRCommand(trConfig.nTransientRecorder), barrier = True)
+                batch.add(*self._slaveModeCommand())
+                batch.add(*self._clearMemoryCommand())
+                if (transientRecorders is not None 
+                    and trConfig.nTransientRecorder not in transientRecorders):
+                    continue
+                batch.add(*self._discriminatorLevelCommand(trConfig.discriminator))
+                batch.add(*self._pretriggerCommand(trConfig.pretrigger != 0))
                 if trConfig.threshold != 0 :
-                    print(self.setThresholdMode("ON"))
+                    batch.add(*self._thresholdModeCommand("ON"))
                 if trConfig.threshold == 0 :
-                    print(self.setThresholdMode("OFF"))
+                    batch.add(*self._thresholdModeCommand("OFF"))
                 if trConfig.shotLimit != 0 :
-                    print(self.setMaxShots(trConfig.shotLimit))
+                    batch.add(*self._maxShotsCommand(trConfig.shotLimit))
                 nRange_str = "-"+ str(trConfig.nRange) +"mV"
-                print(self.setInputRange(nRange_str))
-                print(self.multiplyBinwidth(trConfig.freqDivider))
-                self.__configureBlockGlobalTrigger__(trConfig)
+                batch.add(*self._inputRangeCommand(nRange_str))
+                freqDividerCommand = self._multiplyBinwidthCommand(trConfig.freqDivider)
+                batch.add(*freqDividerCommand)
+                freqDividerExponents[trConfig.nTransientRecorder] = int(freqDividerCommand[1])
+                blockCommands.extend(self.__configureBlockGlobalTrigger__(batch, trConfig))
+        responses = batch.execute()
+        for resp in responses:
+            print(resp)
+        for index, expected, message in blockCommands:
+            assert responses[index] == expected, message + responses[index]
+        for trNumber, exponent in freqDividerExponents.items():
+            licel_cache.hardwareInfoCache.store(self._controllerId(), trNumber,
+                                                freqDividerExponent = exponent)
 
         self.selectTR(-1)
         self._getTrHardwareInfo(Config)
@@ -756,21 +1077,31 @@ class TransientRecorder(TCP_util.util):
         return 
     
         
-    def __configureBlockGlobalTrigger__(self, trConfig: 'licel_Config.TrConfig') -> None:
-        print(self.unblockRackTrigger())
-        if trConfig.blockedTrig["A"]:
-            print(self.blockRackTrigger("A"))
-        if trConfig.blockedTrig["B"]:
-            print(self.blockRackTrigger("B"))
-        if trConfig.blockedTrig["C"]:
-            print(self.blockRackTrigger("C"))
-        if trConfig.blockedTrig["D"]:
-            print(self.blockRackTrigger("D"))
+    def __configureBlockGlobalTrigger__(self, batch: 'TCP_util.CommandBatch',
+                                        trConfig: 'licel_Config.TrConfig') -> list[tuple[int, str, str]]:
+        '''
+        add the BLOCK commands of ``trConfig`` to ``batch``. Their responses are not verified
+        by the batch, they have to match exactly, as for ``blockRackTrigger()``.
+
+        :returns: position in the batch, exact response and error message of each BLOCK command
+        :rtype: list[tuple[int, str, str]]
+        '''
+        command, expected = self._unblockRackTriggerCommand()
+        blockCommands = [(len(batch), expected, "\r\nLicel_TCPIP_UnblockRackTrigger - Error 5108 : ")]
+        batch.add(command)
+        for trigger in ("A", "B", "C", "D"):
+            if trConfig.blockedTrig[trigger]:
+                command, expected = self._blockRackTriggerCommand(trigger)
+                blockCommands.append((len(batch), expected,
+                                      "\r\nLicel_TCPIP_BlockRackTrigger - Error 5108 : "))
+                batch.add(command)
+        return blockCommands
 
     def _getTrHardwareInfo(self, Config: 'licel_Config.Config') -> None:
         '''
         get the transient hardware description from each active transient recorder in the 
-        configuration.
+        configuration. Descriptions found in ``licel_cache.hardwareInfoCache`` are not
+        queried again.
         Writes the Hardware Information internally in `self.hardwareInfos`  
 
         :param Config: system configuration
@@ -779,6 +1110,9 @@ class TransientRecorder(TCP_util.util):
         :returns: None
         '''
 
+        controllerId = self._controllerId()
+        batch = self.commandBatch()
+        queriedTransientRecorders = []
         for trConfig in Config.TrConfigs:
             transientIsActive = False
             for key in  trConfig.analogueEnabled:
@@ -786,9 +1120,23 @@ class TransientRecorder(TCP_util.util):
                     or trConfig.pcEnabled[key]    == True) :
                         transientIsActive = True
             if transientIsActive == True :
-                self.selectTR(trConfig.nTransientRecorder)
-                self.hardwareInfos[trConfig.nTransientRecorder] = self.TRtype()
-        self.selectTR(-1)
+                description = licel_cache.hardwareInfoCache.get(controllerId,
+                                                                trConfig.nTransientRecorder)
+                if description is not None and description.hardwareInfo is not None:
+                    self.hardwareInfos[trConfig.nTransientRecorder] = description.hardwareInfo
+                    continue
+                batch.add(*self._selectTRCommand(trConfig.nTransientRecorder))
+                batch.add("TRTYPE?", "TRTYPE ADC Bits")
+                queriedTransientRecorders.append(trConfig.nTransientRecorder)
+        if not queriedTransientRecorders:
+            return
+        batch.add(*self._selectTRCommand(-1))
+        # responses of SELECT and TRTYPE? for each transient recorder, then SELECT -1
+        trtypeResponses = batch.execute()[1:-1:2]
+        for trNumber, resp in zip(queriedTransientRecorders, trtypeResponses):
+            self.hardwareInfos[trNumber] = parseTRtypeResponse(resp)
+            licel_cache.hardwareInfoCache.store(controllerId, trNumber,
+                                                hardwareInfo = self.hardwareInfos[trNumber])
         return 
     
     def MPushStartFromConfig(self, shots: int, Config: 'licel_Config.Config') -> str:
@@ -816,7 +1164,7 @@ class TransientRecorder(TCP_util.util):
         
         self._getTimestampEndianness()
         self._setDatasetsCount(shots, Config)
-        command = self._generateMPUSHCommandFromConfig(shots, Config) 
+        command = self.frameLayout.mpushCommand()
         print(command)
         return  self._writeReadAndVerify(command, "executed")
     
@@ -833,109 +1181,55 @@ class TransientRecorder(TCP_util.util):
         :returns: Mpush command
         :rtype: str 
         """
-        command = "MPUSH " + str(shots)
-        for trConfig in Config.TrConfigs: 
-            for key in trConfig.analogueEnabled: 
-                if trConfig.analogueEnabled[key] == True: 
-                    tmpCommandLSW = (' {device:2d} {numberToread} LSW {memory}'
-                        .format (device = trConfig.nTransientRecorder,
-                                numberToread = trConfig.analogueBins[key],
-                                memory = key)) 
-                    tmpCommandMSW = (' {device:2d} {numberToread} MSW {memory}'
-                        .format (device = trConfig.nTransientRecorder,
-                                numberToread = trConfig.analogueBins[key],
-                                memory = key)) 
-                    tmpCommandPHM = ""
-                    if (shots > 32764  
-                    and self.hardwareInfos[trConfig.nTransientRecorder]['ADC Bits'] == 16 ):
-
-                        tmpCommandPHM = (' {device:2d} {numberToread} PHM {memory}'
-                        .format (device = trConfig.nTransientRecorder,
-                                numberToread = trConfig.analogueBins[key],
-                                memory = key)) 
-                        
-                    command += tmpCommandLSW + tmpCommandMSW + tmpCommandPHM
-
-            for key in trConfig.pcEnabled: 
-                if trConfig.pcEnabled[key] == True: 
-                    TRnum = trConfig.nTransientRecorder
-                    tmpCommandPC = (' {device:2d} {numberToread} PC {memory}'
-                                    .format (device = trConfig.nTransientRecorder,
-                                            numberToread = trConfig.pcBins[key],
-                                            memory = key))
-                    
-                    tmpCommandPHM = ""
-                    if ((shots > 4096 and self.hardwareInfos[TRnum]['PC Bits'] == 4)
-                        or (shots > 1024 and self.hardwareInfos[TRnum]['PC Bits'] == 6)
-                        or (shots > 256 and self.hardwareInfos[TRnum]['PC Bits'] == 8)): 
-                        
-                        tmpCommandPHM = (' {device:2d} {numberToread} PHM {memory}'
-                        .format (device = trConfig.nTransientRecorder,
-                                numberToread = trConfig.pcBins[key],
-                                memory = key)) 
-                    command += tmpCommandPC + tmpCommandPHM
-        return command   
+        frameLayout = licel_mpush.MPushFrameLayout(Config, self.hardwareInfos, shots,
+                                                   self.bigEndianTimeStamp)
+        return frameLayout.mpushCommand()
     
     def _setDatasetsCount(self, shots: int, Config: 'licel_Config.Config') -> None:
         """ 
         we parse the Configuration and calculate how many (raw)dataset 
         and the total number of bins we need to acquire. The number of shots and transient
         hardware information influences the number of raw data bytes we need to acquire. 
-        this function update the value of ``exceptedByte`` and ``BufferSize`` in self.
+        this function update the value of ``frameLayout``, ``exceptedByte`` and ``BufferSize``
+        in self, and preallocates ``pushBuffer`` to hold ``PUSHBUFFER_FRAMES`` frames.
 
         :param shots: number of shots the user wishes to acquire
         :type shots : int
 
         :returns: None
         """
-        numDataSets = 0
-        for myTrConfig in Config.TrConfigs: 
-            for key in myTrConfig.analogueEnabled : 
-                if myTrConfig.analogueEnabled[key] == True: 
-                    Trnum = myTrConfig.nTransientRecorder
-                    numDataSets += 1 #analogue data to be written to file. 
-                    if ((shots > 4096) and (self.hardwareInfos[Trnum]['ADC Bits'] == 16)): 
-                        #analogue data are formed from MSW LSW and PHM.  
-                        self.__rawDataSets__ += 3 
-                        self.totalnumBins += 3*myTrConfig.analogueBins[key]
-                    else:
-                        #analogue data are formed from MSW and LSW, 
-                        self.__rawDataSets__ += 2 
-                        self.totalnumBins += 2*myTrConfig.analogueBins[key]
-                    
-            for key in myTrConfig.pcEnabled: 
-                if myTrConfig.pcEnabled[key] == True: 
-                    Trnum = myTrConfig.nTransientRecorder
-                    numDataSets += 1 #PC data to be written to file. 
-                    if ((shots > 4096 and self.hardwareInfos[Trnum]['PC Bits'] == 4)
-                        or (shots > 1024 and self.hardwareInfos[Trnum]['PC Bits'] == 6)
-                        or (shots > 256 and self.hardwareInfos[Trnum]['PC Bits'] == 8)): 
-                        #PC data are formed from PC and PHM. 
-                        self.__rawDataSets__ += 2
-                        self.totalnumBins += 2*myTrConfig.pcBins[key]
-                    else:
-                        #PC data are formed from PC only.
-                        self.__rawDataSets__ += 1
-                        self.totalnumBins += myTrConfig.pcBins[key]
-            
-            Config.numDataSets = numDataSets
-            self.exceptedByte = (2*(self.totalnumBins + self.__rawDataSets__ + HEADEROFFSET))
-            self.BufferSize = self.exceptedByte + NEXT_DELIMTER_OFFSET 
+        frameLayout = licel_mpush.MPushFrameLayout(Config, self.hardwareInfos, shots,
+                                                   self.bigEndianTimeStamp)
+        self.__rawDataSets__ = 0
+        self.totalnumBins = 0
+        for dataset in frameLayout.datasets:
+            self.__rawDataSets__ += len(dataset.rawDatasets)
+            self.totalnumBins += len(dataset.rawDatasets) * dataset.bins
+        Config.numDataSets = len(frameLayout.datasets)
+        self.frameLayout = frameLayout
+        self.pushShots = shots
+        self.exceptedByte = frameLayout.frameSize
+        self.BufferSize = frameLayout.bufferSize
+        self.pushBuffer.reserve(PUSHBUFFER_FRAMES * self.BufferSize, self.BufferSize)
 
-    
     def recvPushData(self) -> None:
         """
         read push/mpush data from the ethernet controller push port. \r\n
         used for reading push/mpush from transient recorder. \r\n
-        fills ``self.pushBuffer``. 
-        If after a certain time not data is recived, checks if counterpart is still 
+        fills ``self.pushBuffer``, data is received in place into the preallocated buffer. 
+        If a ``heartbeat`` is set, the liveness of the controller is supervised by the 
+        heartbeat thread and this method only waits for push data. 
+        Otherwise, if after a certain time not data is recived, checks if counterpart is still 
         reachable by sending ``*IDN?`` on the command socket. 
 
 
         :raises: ConnectionResetError if the counter part closes the connection
         :raises: socketTimeout if counter part is unreachable
-        :raises: ConnectionError if error is written.   
+        :raises: ConnectionError if error is written or the heartbeat declared the 
+            controller dead.
         """
+        if self.heartbeat is not None:
+            return self._recvSupervisedPushData(self.heartbeat)
         readSocket  = [self.PushSocket]
         writeSocket = [self.commandSocket]
         ErrorSocket = [self.commandSocket, self.PushSocket]
@@ -946,13 +1240,13 @@ class TransientRecorder(TCP_util.util):
             if (readableSocket): 
                 # Push socket is readable 
                 # read from socket 
-                packet = self.PushSocket.recv(self.BufferSize)
-                if packet:
-                    self.pushBuffer.extend(packet)
-                # if socket is readable and packet is empty
+                received = self.pushBuffer.recvInto(self.PushSocket)
+                # if socket is readable and nothing is received
                 # this means we received a FIN from our counter part
-                else : 
+                if not received : 
                     raise ConnectionResetError ("\nPush connection was closed by the remote host.")
+                if self.pushCapture is not None:
+                    self.pushCapture.write(self.pushBuffer.view()[-received:])
             else:
                 (readableSocket,
                 writableSocket,
@@ -965,7 +1259,61 @@ class TransientRecorder(TCP_util.util):
                 if(error_sockets):
                     raise ConnectionError
         return 
+
+    def _recvSupervisedPushData(self, heartbeat: 'licel_heartbeat.Heartbeat') -> None:
+        ''' ``recvPushData()`` with the liveness supervised by ``heartbeat`` '''
+        while (len(self.pushBuffer) < self.BufferSize):
+            (readableSocket, _,
+             error_sockets) = select.select([self.PushSocket], [], [self.PushSocket],
+                                            heartbeat.config.pollInterval)
+            if (readableSocket): 
+                received = self.pushBuffer.recvInto(self.PushSocket)
+                if not received : 
+                    raise ConnectionResetError ("\nPush connection was closed by the remote host.")
+                if self.pushCapture is not None:
+                    self.pushCapture.write(self.pushBuffer.view()[-received:])
+                heartbeat.pushDataReceived()
+            elif (error_sockets or heartbeat.isDead):
+                raise ConnectionError ("\nController is not responding, liveness state: " 
+                                       + heartbeat.state)
+        return
     
+    def startPushCapture(self, path: str, compression: str | None = None,
+                         metadata: dict[str, Any] | None = None) -> 'licel_capture.PushCapture':
+        '''
+        write the push data received by ``recvPushData()`` or by
+        ``licel_pipeline.MPushPipeline`` to a capture file, see ``licel_capture``. Called after ``MPushStartFromConfig()``, the header then holds
+        the hardware information and the number of shots needed for the replay.
+        A running capture is stopped.
+
+        :param path: capture file name
+        :type path: str
+
+        :param compression: None, 'gzip' or 'lzma'
+        :type compression: str | None
+
+        :param metadata: additional description stored in the header
+        :type metadata: dict[str, Any] | None
+
+        :returns: the capture, ``enabled`` pauses and resumes it.
+        :rtype: licel_capture.PushCapture
+        '''
+        self.stopPushCapture()
+        header = {'hardwareInfos'      : self.hardwareInfos,
+                  'bigEndianTimeStamp' : self.bigEndianTimeStamp,
+                  'shots'              : self.pushShots,
+                  'frameSize'          : self.exceptedByte,
+                  'created'            : time.time(),
+                  'metadata'           : metadata if metadata is not None else {}}
+        self.pushCapture = licel_capture.PushCapture(path, header, compression)
+        return self.pushCapture
+
+    def stopPushCapture(self) -> None:
+        ''' stop and close the capture started by ``startPushCapture()`` '''
+        pushCapture, self.pushCapture = self.pushCapture, None
+        if pushCapture is not None:
+            pushCapture.close()
+
     def getID(self) -> str:
         ''' Get the identification string from the controller 
         
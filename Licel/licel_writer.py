@@ -0,0 +1,459 @@
+'''
+Copyright ©: Licel Gmbh
+
+Buffered writer of MPUSH acquisitions in the Licel file format, see
+https://licel.com/raw_data_format.html
+
+The files are identical to the files written by ``DataParser.savePushDataToLicelFileFormat()``.
+The header is patched into the ``licel_data.HeaderTemplate`` compiled once for the
+configuration and the hardware information, each acquisition is then assembled from the header and the data sets and written with a
+single ``os.writev`` call, or a single write of the joined buffer where ``os.writev`` is
+not available::
+
+    with licel_writer.LicelFileWriter(Config, ethernetController.Tr.hardwareInfos,
+                                      shots, ACQUISPERFILE) as writer:
+        ...
+        writer.write(dataSets, startTime, stopTime, time_stamp, analogue_shots, pc_shots)
+
+Besides the number of acquisitions, a file is completed when it would exceed
+``maxFileSize`` bytes or after ``rotationInterval`` seconds. ``WriterThread`` moves the
+writer and its files to a thread fed by a bounded queue, so that a slow or network mounted
+output directory does not delay the reception of the push data::
+
+    writer = licel_writer.LicelFileWriter(Config, hardwareInfos, shots, ACQUISPERFILE,
+                                          maxFileSize = 100 << 20, rotationInterval = 3600)
+    with licel_writer.WriterThread(writer) as writerThread:
+        ...
+        writerThread.write(dataSets, startTime, stopTime, time_stamp, analogue_shots, pc_shots)
+    print(writerThread.statistics)
+'''
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+import os
+import queue
+import threading
+import time
+
+from Licel import licel_data
+
+from typing import TYPE_CHECKING, Any
+if TYPE_CHECKING:
+    import numpy
+    from Licel import licel_Config
+
+#: when the written data is forced to the storage with ``os.fsync``
+FSYNCPOLICY = MappingProxyType({
+'NEVER'       : 'never',        # left to the operating system
+'ACQUISITION' : 'acquisition',  # after each acquisition
+'FILE'        : 'file',         # when a file is completed
+'INTERVAL'    : 'interval'      # at most every ``fsyncInterval`` seconds and when a file is completed
+})
+
+#: seconds the producer waits on a full queue before checking the writer thread
+WRITER_POLL_INTERVAL = 0.5
+
+#: maximal number of buffers passed to a single ``os.writev`` call
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+@dataclass
+class WriterStatistics:
+    ''' counters of a ``LicelFileWriter`` '''
+    #: number of written acquisitions
+    acquisitions : int   = field(default =0)
+    #: number of opened files
+    files        : int   = field(default =0)
+    #: number of written bytes
+    bytesWritten : int   = field(default =0)
+    #: number of write system calls
+    writeCalls   : int   = field(default =0)
+    #: number of ``os.fsync`` calls
+    fsyncs       : int   = field(default =0)
+    #: time spent in the write system calls in seconds
+    writeSeconds : float = field(default =0.0)
+    #: time spent in ``os.fsync`` in seconds
+    fsyncSeconds : float = field(default =0.0)
+    #: number of files completed because of ``maxFileSize``
+    sizeRotations     : int = field(default =0)
+    #: number of files completed because of ``rotationInterval``
+    intervalRotations : int = field(default =0)
+
+@dataclass
+class QueueStatistics:
+    ''' counters of the queue of a ``WriterThread`` '''
+    #: number of acquisitions put in the queue
+    queued          : int   = field(default =0)
+    #: number of acquisitions written by the writer thread
+    written         : int   = field(default =0)
+    #: number of acquisitions dropped because the queue was full, see ``dropWhenFull``
+    dropped         : int   = field(default =0)
+    #: number of times the queue was found full
+    queueFull       : int   = field(default =0)
+    #: maximum number of acquisitions waiting in the queue
+    maxQueueDepth   : int   = field(default =0)
+    #: total time in seconds the producer was blocked by a full queue
+    blockedSeconds  : float = field(default =0.0)
+    #: total time in seconds the written acquisitions waited in the queue
+    totalLatency    : float = field(default =0.0)
+    #: longest time in seconds an acquisition waited in the queue
+    maxLatency      : float = field(default =0.0)
+
+    @property
+    def meanLatency(self) -> float:
+        ''' mean time in seconds the written acquisitions waited in the queue '''
+        return self.totalLatency / self.written if self.written else 0.0
+
+class LicelFileWriter:
+    '''
+    writes MPUSH acquisitions to Licel files, ``acquisPerFile`` acquisitions per file.
+    A file is also completed before it would exceed ``maxFileSize`` bytes, or after
+    ``rotationInterval`` seconds, a file holds at least one acquisition.
+    A new writer has to be created when the configuration, the hardware information or
+    the number of shots change.
+
+    :param Config: acquisition configuration, ``Config.numDataSets`` is set by
+        ``MPushStartFromConfig()``
+    :type Config: licel_Config.Config
+
+    :param hardwareInfos: hardware information of each transient recorder
+    :type hardwareInfos: dict[int, dict[str, int | str | float]]
+
+    :param shots: number of shots of the MPUSH acquisition
+    :type shots: int
+
+    :param acquisPerFile: maximal number of acquisitions written in a single file
+    :type acquisPerFile: int
+
+    :param fsyncPolicy: one of ``FSYNCPOLICY``
+    :type fsyncPolicy: str
+
+    :param fsyncInterval: seconds between the ``os.fsync`` calls of the 'interval' policy
+    :type fsyncInterval: float
+
+    :param maxFileSize: maximal size of a file in bytes, 0 for no limit
+    :type maxFileSize: int
+
+    :param rotationInterval: seconds after which a new file is started, 0 for no limit
+    :type rotationInterval: float
+    '''
+
+    def __init__(self, Config: 'licel_Config.Config',
+                 hardwareInfos: dict[int, dict[str, int | str | float]],
+                 shots: int, acquisPerFile: int = 10,
+                 fsyncPolicy: str = FSYNCPOLICY['NEVER'], fsyncInterval: float = 1.0,
+                 maxFileSize: int = 0, rotationInterval: float = 0.0) -> None:
+        if fsyncPolicy not in FSYNCPOLICY.values():
+            raise ValueError("unknown fsync policy: " + str(fsyncPolicy))
+        self.Config = Config
+        self.shots = shots
+        self.acquisPerFile = acquisPerFile
+        self.fsyncPolicy = fsyncPolicy
+        self.fsyncInterval = fsyncInterval
+        self.maxFileSize = maxFileSize
+        self.rotationInterval = rotationInterval
+        self.statistics = WriterStatistics()
+        #: path of the file written at the moment
+        self.path : str | None = None
+        self._fd : int | None = None
+        self._acquisWrittenToFile = 0
+        self._fileBytes = 0
+        self._fileOpened = time.monotonic()
+        self._lastFsync = time.monotonic()
+        self._dataParser = licel_data.DataParser()
+        self.hardwareInfos = hardwareInfos
+
+    def _fileName(self) -> str:
+        return self._dataParser._generateFileName(self.Config.measurementInfo.cFirstLetter)
+
+    def _header(self, fileName: str, startTime: datetime, stopTime: datetime, time_stamp: int,
+                analogue_shot_dict: dict[int, dict[str, int]],
+                pc_shot_dict: dict[int, dict[str, int]]) -> bytes:
+        template = self._dataParser.headerTemplate(self.Config, self.hardwareInfos)
+        return "".join((fileName, "\n",
+                        template.secondLine(startTime.strftime("%d/%m/%Y %H:%M:%S"),
+                                            stopTime.strftime("%d/%m/%Y %H:%M:%S")),
+                        template.thirdLine(int(self.shots), int(time_stamp)),
+                        template.pushDatasetLines(analogue_shot_dict, pc_shot_dict),
+                        "\n")).encode()
+
+    def write(self, DataSet: list['numpy.ndarray[Any, numpy.dtype[numpy.uint32]]'],
+              startTime: datetime, stopTime: datetime, time_stamp: int,
+              analogue_shot_dict: dict[int, dict[str, int]],
+              pc_shot_dict: dict[int, dict[str, int]]) -> None:
+        '''
+        write an acquisition, arguments as for ``DataParser.savePushDataToLicelFileFormat()``.
+        A new file is started after ``acquisPerFile`` acquisitions.
+        '''
+        fileName = self._fileName()
+        buffers : list[Any] = [self._header(fileName, startTime, stopTime, time_stamp,
+                                            analogue_shot_dict, pc_shot_dict)]
+        for Set in DataSet:
+            buffers.append(memoryview(Set).cast('B'))
+            buffers.append(b'\r\n')
+        if self._fd is not None and self._rotate(sum(len(buffer) for buffer in buffers)):
+            self._closeFile()
+        if self._fd is None:
+            self._openFile(os.path.join(self.Config.measurementInfo.szOutPath, fileName))
+        self._writeBuffers(buffers)
+        self._acquisWrittenToFile += 1
+        self.statistics.acquisitions += 1
+        if (self.fsyncPolicy == FSYNCPOLICY['ACQUISITION']
+            or (self.fsyncPolicy == FSYNCPOLICY['INTERVAL']
+                and time.monotonic() - self._lastFsync >= self.fsyncInterval)):
+            self._fsync()
+
+    def writeAcquis(self, prefix: str, shots: int, bins: int, startTime: datetime,
+                    stopTime: datetime, deviceNumber: int, DataType: str, Memory: str,
+                    Data: 'numpy.ndarray[Any, numpy.dtype[numpy.uint32]]') -> None:
+        '''
+        write a single data set to its own file, arguments and file as for
+        ``DataParser.saveAcquisDataToLicelFileFormat()``. The file of the push
+        acquisitions is not affected.
+        '''
+        fileName = self._dataParser._generateFileName(prefix)
+        template = self._dataParser.headerTemplate(self.Config, self.hardwareInfos)
+        header = "".join((" ", fileName, "\n",
+                          template.secondLine(startTime.strftime("%d/%m/%Y %H:%M:%S"),
+                                              stopTime.strftime("%d/%m/%Y %H:%M:%S")),
+                          template.thirdLine(int(shots)),
+                          template.acquisDatasetLine(shots, bins, deviceNumber, DataType, Memory),
+                          "\n"))
+        # the header was written in text mode
+        buffers = [header.replace("\n", os.linesep).encode(), memoryview(Data).cast('B'), b'\r\n']
+        pushFile = (self.path, self._fd, self._acquisWrittenToFile, self._fileBytes, self._fileOpened)
+        self._openFile(os.path.join(self.Config.measurementInfo.szOutPath, fileName))
+        try:
+            self._writeBuffers(buffers)
+        finally:
+            self._closeFile()
+            self.path, self._fd, self._acquisWrittenToFile, self._fileBytes, self._fileOpened = pushFile
+
+    def _rotate(self, size: int) -> bool:
+        ''' True if the actual file has to be completed before writing ``size`` bytes '''
+        if self._acquisWrittenToFile > self.acquisPerFile - 1:
+            return True
+        if self._acquisWrittenToFile == 0:
+            return False
+        if self.maxFileSize > 0 and self._fileBytes + size > self.maxFileSize:
+            self.statistics.sizeRotations += 1
+            return True
+        if self.rotationInterval > 0 and time.monotonic() - self._fileOpened >= self.rotationInterval:
+            self.statistics.intervalRotations += 1
+            return True
+        return False
+
+    def _writeBuffers(self, buffers: list[Any]) -> None:
+        start = time.perf_counter()
+        if hasattr(os, 'writev'):
+            views = [memoryview(buffer) for buffer in buffers]
+            index = 0
+            while index < len(views):
+                written = os.writev(self._fd, views[index:index + IOV_MAX])
+                self.statistics.writeCalls += 1
+                self.statistics.bytesWritten += written
+                self._fileBytes += written
+                # skip the written buffers, a partial write continues inside a buffer
+                while index < len(views) and written >= len(views[index]):
+                    written -= len(views[index])
+                    index += 1
+                if written:
+                    views[index] = views[index][written:]
+        else:
+            data = memoryview(b"".join(buffers))
+            while data:
+                written = os.write(self._fd, data)
+                self.statistics.writeCalls += 1
+                self.statistics.bytesWritten += written
+                self._fileBytes += written
+                data = data[written:]
+        self.statistics.writeSeconds += time.perf_counter() - start
+
+    def _fsync(self) -> None:
+        start = time.perf_counter()
+        os.fsync(self._fd)
+        self._lastFsync = time.monotonic()
+        self.statistics.fsyncs += 1
+        self.statistics.fsyncSeconds += time.perf_counter() - start
+
+    def _openFile(self, path: str) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0),
+                           0o666)
+        self._acquisWrittenToFile = 0
+        self._fileBytes = 0
+        self._fileOpened = time.monotonic()
+        self.statistics.files += 1
+
+    def _closeFile(self) -> None:
+        if self.fsyncPolicy != FSYNCPOLICY['NEVER']:
+            self._fsync()
+        os.close(self._fd)
+        self._fd = None
+
+    def close(self) -> None:
+        ''' complete and close the actual file '''
+        if self._fd is not None:
+            self._closeFile()
+
+    def __enter__(self) -> 'LicelFileWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class WriterThread:
+    '''
+    runs a ``LicelFileWriter`` on its own thread. The acquisitions are passed through a
+    bounded queue, the writer thread owns the files and does the rotation, the acquisition
+    loop only waits when the queue is full. The data sets are queued by reference and
+    must not be modified afterwards, the arrays returned by ``DataParser.decodeFrame()``
+    and ``DataParser.parseDataFromBuffer()`` are newly allocated for each frame.
+    The thread is started on creation, ``close()`` writes the queued acquisitions and
+    closes the files.
+
+    :param writer: writer used by the thread, not to be used by the caller afterwards
+    :type writer: LicelFileWriter
+
+    :param queueDepth: maximal number of acquisitions waiting in the queue
+    :type queueDepth: int
+
+    :param dropWhenFull: drop acquisitions instead of waiting when the queue is full
+    :type dropWhenFull: bool
+    '''
+
+    def __init__(self, writer: LicelFileWriter, queueDepth: int = 16,
+                 dropWhenFull: bool = False) -> None:
+        self.writer = writer
+        self.dropWhenFull = dropWhenFull
+        self.statistics = QueueStatistics()
+        self._queue : queue.Queue = queue.Queue(maxsize = queueDepth)
+        self._error : BaseException | None = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="LicelFileWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, DataSet: list['numpy.ndarray[Any, numpy.dtype[numpy.uint32]]'],
+              startTime: datetime, stopTime: datetime, time_stamp: int,
+              analogue_shot_dict: dict[int, dict[str, int]],
+              pc_shot_dict: dict[int, dict[str, int]]) -> bool:
+        '''
+        queue an acquisition for ``LicelFileWriter.write()``.
+
+        :returns: False if the acquisition was dropped, see ``dropWhenFull``
+        :rtype: bool
+
+        :raises: the exception which stopped the writer thread
+        '''
+        return self._put((self.writer.write, (DataSet, startTime, stopTime, time_stamp,
+                                              analogue_shot_dict, pc_shot_dict)))
+
+    def writeAcquis(self, prefix: str, shots: int, bins: int, startTime: datetime,
+                    stopTime: datetime, deviceNumber: int, DataType: str, Memory: str,
+                    Data: 'numpy.ndarray[Any, numpy.dtype[numpy.uint32]]') -> bool:
+        '''
+        queue a data set for ``LicelFileWriter.writeAcquis()``.
+
+        :returns: False if the data set was dropped, see ``dropWhenFull``
+        :rtype: bool
+
+        :raises: the exception which stopped the writer thread
+        '''
+        return self._put((self.writer.writeAcquis, (prefix, shots, bins, startTime, stopTime,
+                                                    deviceNumber, DataType, Memory, Data)))
+
+    def _put(self, item: tuple) -> bool:
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise ValueError("write to a closed WriterThread")
+        queued = (time.perf_counter(), item)
+        try:
+            self._queue.put_nowait(queued)
+        except queue.Full:
+            self.statistics.queueFull += 1
+            if self.dropWhenFull:
+                self.statistics.dropped += 1
+                return False
+            start = time.perf_counter()
+            self._putBlocking(queued)
+            self.statistics.blockedSeconds += time.perf_counter() - start
+        self.statistics.queued += 1
+        self.statistics.maxQueueDepth = max(self.statistics.maxQueueDepth, self._queue.qsize())
+        return True
+
+    def _putBlocking(self, item: tuple | None) -> None:
+        ''' put ``item`` in the queue, waits while the queue is full and the thread is running '''
+        while True:
+            try:
+                self._queue.put(item, timeout=WRITER_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if not self._thread.is_alive():
+                    if self._error is not None:
+                        raise self._error
+                    return
+
+    def _run(self) -> None:
+        try:
+            while True:
+                queued = self._queue.get()
+                try:
+                    if queued is None:
+                        return
+                    queuedTime, (method, arguments) = queued
+                    latency = time.perf_counter() - queuedTime
+                    self.statistics.totalLatency += latency
+                    self.statistics.maxLatency = max(self.statistics.maxLatency, latency)
+                    method(*arguments)
+                    self.statistics.written += 1
+                finally:
+                    self._queue.task_done()
+        except BaseException as error:
+            self._error = error
+            # the queued acquisitions are lost, release flush()
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._queue.task_done()
+        finally:
+            try:
+                self.writer.close()
+            except BaseException as error:
+                if self._error is None:
+                    self._error = error
+
+    def flush(self) -> None:
+        '''
+        wait until the queued acquisitions are written.
+
+        :raises: the exception which stopped the writer thread
+        '''
+        if self._thread.is_alive():
+            self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        '''
+        write the queued acquisitions, close the files and stop the thread.
+
+        :raises: the exception which stopped the writer thread
+        '''
+        if not self._closed:
+            self._closed = True
+            if self._thread.is_alive():
+                self._putBlocking(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> 'WriterThread':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
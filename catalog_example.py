@@ -0,0 +1,55 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Usage:
+python3 catalog_example.py --directory <Licel data directory> --catalog <catalog file>
+                 --start <YYYY-MM-DD HH:MM:SS> --stop <YYYY-MM-DD HH:MM:SS>
+                 --wavelength <nm> --tr <transient recorder> --mode <analogue|photon>
+'''
+from Licel import licel_catalog, licel_reader
+from datetime import datetime
+import argparse
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Licel archive catalog example')
+    argparser.add_argument('--directory', type=str, default=".",
+                    help='directory tree holding the Licel files, e.g. szOutPath of Acquis.ini')
+    argparser.add_argument('--catalog', type=str, default="licel_catalog.sqlite",
+                    help='catalog file, updated with the new and modified files of --directory')
+    argparser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                    help='earliest acquisition time, e.g. "2026-01-01 12:00:00"')
+    argparser.add_argument('--stop', type=datetime.fromisoformat, default=None,
+                    help='latest acquisition time')
+    argparser.add_argument('--wavelength', type=float, default=None,
+                    help='wavelength of the data sets in nm')
+    argparser.add_argument('--tr', type=int, default=None,
+                    help='transient recorder of the data sets')
+    argparser.add_argument('--mode', type=str, choices=["analogue", "photon"], default=None,
+                    help='analogue or photon counting data sets')
+    args = argparser.parse_args()
+    return args
+
+def main():
+    myArguments = commandLineInterface()
+    with licel_catalog.LicelCatalog(myArguments.catalog) as catalog:
+        print(catalog.scan(myArguments.directory))
+        print("time range:", catalog.timeRange())
+        for descriptor, isPhotonCounting, wavelength, polarisation, count in catalog.channels():
+            print("    {:5s} {:>7g}.{} {:8d} data sets".format(descriptor, wavelength,
+                                                              polarisation, count))
+        isPhotonCounting = None if myArguments.mode is None else myArguments.mode == "photon"
+        locations = catalog.query(start = myArguments.start, stop = myArguments.stop,
+                                  wavelength = myArguments.wavelength,
+                                  transientRecorder = myArguments.tr,
+                                  isPhotonCounting = isPhotonCounting)
+    print("{} data sets found".format(len(locations)))
+    for location in locations[:10]:
+        data = licel_reader.readDataset(location.path, location.offset, location.bins)
+        print("{} {} {:5s} {:>7g}.{} mean {:.1f}".format(location.startTime, location.path,
+                                                         location.descriptor, location.wavelength,
+                                                         location.polarisation, data.mean()))
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,209 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Regression and benchmark for the vectorized raw data processing of the DataParser.
+The vectorized methods are compared against the former per bin python loops,
+the script fails if the outputs are not bit identical. The output of the methods listed
+in INTENTIONAL_CHANGES differs on purpose from the former implementation, their
+reference loops include the correction.
+
+Usage:
+python3 dataParser_benchmark.py --bins <bins> [<bins> ...] --repeat <repeat>
+'''
+from Licel import licel_data
+import numpy
+import math
+import argparse
+import timeit
+from types import MappingProxyType
+
+MAX_SHOTS = 65534
+
+#: methods whose output differs on purpose from the former implementation
+INTENTIONAL_CHANGES = MappingProxyType({
+'_convert_Photoncounting_Fullword' : 'the first valid bin is no longer dropped, the bins are '
+                                     'aligned with _convert_Photoncounting'
+})
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='DataParser regression and benchmark')
+    argparser.add_argument('--bins', type=int, nargs='+', default=[1000, 4000, 16000, 32000],
+                    help='number of bins to benchmark')
+    argparser.add_argument('--repeat', type=int, default=5,
+                    help='number of repetitions for each timing')
+    argparser.add_argument('--seed', type=int, default=0,
+                    help='seed of the random generator')
+    args = argparser.parse_args()
+    return args
+
+def referenceSquareRootBinary(combinedAnalogueRawData, combinedSqdData, iNumber, iShots):
+    ''' former per bin implementation of ``DataParser.getSquareRootBinary`` '''
+    lAccumulated_bis = combinedAnalogueRawData.astype(numpy.uint64,casting='unsafe')
+    sqd_bin = numpy.zeros((iNumber), numpy.uint32)
+    temp = 0
+    y = 0
+    for i in range (0, iNumber):
+        temp = (combinedSqdData[i] * iShots) - (lAccumulated_bis[i] * lAccumulated_bis[i])
+        y = math.sqrt(temp) - 0.000001
+        if (2*y < temp - y**2 ):
+            y += 1 
+        sqd_bin [i] = int(y)
+    return sqd_bin
+
+def referenceCombineAnalogSquaredData(uSQLSW, uSQMSW, uSQHSW):
+    ''' former per bin implementation of ``DataParser._combineAnalogSquaredData`` '''
+    llSQAccumulated  = numpy.zeros((uSQMSW.size),numpy.uint64)
+    uSQMSW__ = numpy.asarray(uSQMSW,numpy.uint)
+    uSQLSW__ = numpy.asarray(uSQLSW,numpy.uint)
+    uSQHSW__ = numpy.asarray(uSQHSW,numpy.uint)
+    for i in range(1, uSQMSW.size):
+        llSQAccumulated[i-1] = uSQLSW__[i] + (uSQMSW__[i] << 16 ) + (uSQHSW__[i] << 32)
+    return llSQAccumulated.astype(numpy.uint64, casting='safe')
+
+def referenceCombinePhotonSquaredData(uSQLSW, uSQMSW):
+    ''' former per bin implementation of ``DataParser._combine_Photon_Squared_Data`` '''
+    squared_photon_data  = numpy.zeros((uSQLSW.size),numpy.uint64)
+    uSQLSW__ = numpy.asarray(uSQMSW,numpy.uint)
+    uSQMSW__ = numpy.asarray(uSQLSW,numpy.uint)
+    for i in range(1, uSQLSW.size):
+        squared_photon_data[i-1] = uSQLSW__[i] + (uSQMSW__[i] << 16 )
+    return squared_photon_data
+
+def referenceConvertPhotoncountingFullword(uPHO, uPHM):
+    ''' 
+    former per bin implementation of ``DataParser._convert_Photoncounting_Fullword``
+    without the second removal of the first element, which dropped the first valid bin.
+    This output change is intentional, see ``INTENTIONAL_CHANGES``.
+    '''
+    photon_c  = numpy.zeros((uPHO.size),numpy.uint32)
+    uPHO = uPHO.astype(numpy.uint32,casting='unsafe')
+    uPHM = uPHM.astype(numpy.uint32,casting='unsafe')
+    for i in range(1,uPHO.size):
+        photon_c[i-1] = uPHO[i] + ((uPHM[i] & 0xFF) <<16 )
+    return photon_c[:-1]
+
+def combineCases(dataParser, rng, bins):
+    ''' 
+    generate (name, reference, vectorized, preallocated) test cases for the combine routines 
+    raw buffers hold bins + 1 elements as read from the transient recorder 
+    '''
+    words = [rng.integers(0, 1 << 16, size=bins + 1, dtype=numpy.uint16) for i in range(3)]
+    words[2][:] = numpy.uint16(0xffff) 
+    sqd64 = numpy.empty(bins + 1, numpy.uint64)
+    pc32 = numpy.empty(bins, numpy.uint32)
+    return [("_combineAnalogSquaredData",
+             lambda: referenceCombineAnalogSquaredData(*words),
+             lambda: dataParser._combineAnalogSquaredData(*words),
+             lambda: dataParser._combineAnalogSquaredData(*words, out=sqd64)),
+            ("_combine_Photon_Squared_Data",
+             lambda: referenceCombinePhotonSquaredData(words[0], words[1]),
+             lambda: dataParser._combine_Photon_Squared_Data(words[0], words[1]),
+             lambda: dataParser._combine_Photon_Squared_Data(words[0], words[1], out=sqd64)),
+            ("_convert_Photoncounting_Fullword",
+             lambda: referenceConvertPhotoncountingFullword(words[0], words[1]),
+             lambda: dataParser._convert_Photoncounting_Fullword(words[0], words[1]),
+             lambda: dataParser._convert_Photoncounting_Fullword(words[0], words[1], out=pc32))]
+
+def squareRootCases(rng, bins):
+    ''' generate (name, analogue, squared, shots) test cases for the square root binary '''
+    cases = []
+    # random traces, the squared sum is always >= (sum^2)/shots
+    shots = 4000
+    samples = rng.integers(0, 1 << 16, size=bins, dtype=numpy.uint64)
+    analogue = (samples * shots).astype(numpy.uint32)
+    squared = samples * samples * shots + rng.integers(0, 1 << 20, size=bins, dtype=numpy.uint64)
+    cases.append(("random", analogue, squared, shots))
+    # zero variance, every shot measured the same value
+    squared = samples * samples * shots
+    cases.append(("zero variance", analogue, squared, shots))
+    # maximum number of shots
+    samples = rng.integers(0, 1 << 16, size=bins, dtype=numpy.uint64)
+    analogue = (samples * MAX_SHOTS).astype(numpy.uint32, casting='unsafe')
+    squared = samples * samples * MAX_SHOTS
+    cases.append(("max shots", analogue, squared, MAX_SHOTS))
+    # largest square root fitting into uint32
+    squared = numpy.full(bins, 0xffffffff ** 2, numpy.uint64)
+    analogue = numpy.zeros(bins, numpy.uint32)
+    cases.append(("uint32 maximum", analogue, squared, 1))
+    # values around the uint64 overflow boundary
+    squared = numpy.full(bins, numpy.iinfo(numpy.uint64).max, numpy.uint64)
+    squared[::3] = numpy.uint64(1 << 63)
+    analogue = numpy.zeros(bins, numpy.uint32)
+    analogue[1::3] = numpy.uint32(0xffffffff)
+    cases.append(("overflow boundary", analogue, squared, 1))
+    # wrap around of the uint64 arithmetic, sum^2 > squared * shots
+    analogue = rng.integers(1 << 20, 1 << 32, size=bins, dtype=numpy.uint64).astype(numpy.uint32)
+    squared = numpy.zeros(bins, numpy.uint64)
+    cases.append(("wrap around", analogue, squared, 2))
+    return cases
+
+def checkSquareRootBinary(dataParser, rng, bins):
+    for name, analogue, squared, shots in squareRootCases(rng, bins):
+        # the uint64 arithmetic of the reference wraps around on purpose
+        with numpy.errstate(over='ignore'):
+            try:
+                expected = referenceSquareRootBinary(analogue, squared, bins, shots)
+            except OverflowError:
+                expected = None
+        try:
+            actual = dataParser.getSquareRootBinary(analogue, squared, bins, shots)
+        except OverflowError:
+            actual = None
+        if expected is None or actual is None:
+            if expected is not actual:
+                raise AssertionError("getSquareRootBinary overflow mismatch for case '{}' with {} bins"
+                                     .format(name, bins))
+            continue
+        if not numpy.array_equal(expected, actual) or actual.dtype != expected.dtype:
+            raise AssertionError("getSquareRootBinary mismatch for case '{}' with {} bins"
+                                 .format(name, bins))
+
+def benchmarkSquareRootBinary(dataParser, rng, bins, repeat):
+    name, analogue, squared, shots = squareRootCases(rng, bins)[0]
+    loop = min(timeit.repeat(lambda: referenceSquareRootBinary(analogue, squared, bins, shots),
+                             number=1, repeat=repeat))
+    vectorized = min(timeit.repeat(lambda: dataParser.getSquareRootBinary(analogue, squared,
+                                                                          bins, shots),
+                                   number=1, repeat=repeat))
+    return loop, vectorized
+
+def checkAndBenchmarkCombine(dataParser, rng, bins, repeat):
+    results = []
+    for name, reference, vectorized, preallocated in combineCases(dataParser, rng, bins):
+        expected = reference()
+        for actual in (vectorized(), preallocated()):
+            if not numpy.array_equal(expected, actual) or actual.dtype != expected.dtype:
+                raise AssertionError("{} mismatch with {} bins".format(name, bins))
+        loop = min(timeit.repeat(reference, number=1, repeat=repeat))
+        vector = min(timeit.repeat(vectorized, number=1, repeat=repeat))
+        preallocatedTime = min(timeit.repeat(preallocated, number=1, repeat=repeat))
+        results.append((name, loop, vector, preallocatedTime))
+    return results
+
+def main():
+    myArguments = commandLineInterface()
+    rng = numpy.random.default_rng(myArguments.seed)
+    dataParser = licel_data.DataParser()
+
+    print("{:<34s} {:>8s} {:>12s} {:>12s} {:>12s} {:>8s}"
+          .format("method", "bins", "loop [ms]", "numpy [ms]", "out= [ms]", "speedup"))
+    for bins in myArguments.bins:
+        checkSquareRootBinary(dataParser, rng, bins)
+        loop, vectorized = benchmarkSquareRootBinary(dataParser, rng, bins, myArguments.repeat)
+        print("{:<34s} {:>8d} {:>12.3f} {:>12.3f} {:>12s} {:>8.1f}"
+              .format("getSquareRootBinary", bins, 1000*loop, 1000*vectorized, "-",
+                      loop/vectorized))
+        for name, loop, vectorized, preallocated in checkAndBenchmarkCombine(dataParser, rng, bins,
+                                                                            myArguments.repeat):
+            print("{:<34s} {:>8d} {:>12.3f} {:>12.3f} {:>12.3f} {:>8.1f}"
+                  .format(name, bins, 1000*loop, 1000*vectorized, 1000*preallocated,
+                          loop/vectorized))
+    print("all outputs are bit identical to the reference implementation")
+    for name, change in INTENTIONAL_CHANGES.items():
+        print("note: intentional output change of {} compared with the former implementation: {}"
+              .format(name, change))
+
+if __name__ == "__main__":
+
+    main()
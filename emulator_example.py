@@ -0,0 +1,65 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Runs an emulated ethernet controller on the local machine. The examples can be run
+against it by passing the emulator address, for example:
+
+python3 mpush_example.py --ip 127.0.0.1 --port 2055 --acq 10 --shots 10
+
+Usage:
+python3 emulator_example.py --ip <ip> --port <port> --profile <TR|SP32|WIND>
+                 --tr <Tr address> [<Tr address> ...] --rate <repetition rate>
+                 --frame_rate <frames per second> --big_endian
+'''
+from Licel import licel_emulator
+import argparse
+import time
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Ethernet controller emulator ')
+    argparser.add_argument('--ip', type=str, default = "127.0.0.1",
+                    help='address to listen on')
+    argparser.add_argument('--port', type=int, default=2055,
+                    help='command port, the push port is port+1 and the kill port port+2')
+    argparser.add_argument('--profile', type=str, default=licel_emulator.PROFILE_TR,
+                           choices=[licel_emulator.PROFILE_TR,
+                                    licel_emulator.PROFILE_SP32,
+                                    licel_emulator.PROFILE_WIND],
+                    help='emulated hardware')
+    argparser.add_argument('--tr', type=int, nargs='+', default=[0],
+                    help='addresses of the installed transient recorders')
+    argparser.add_argument('--rate', type=float, default=10.0,
+                    help='laser repetition rate in Hz')
+    argparser.add_argument('--frame_rate', type=float, default=None,
+                    help='MPUSH frames per second overriding the repetition rate, '
+                         '0 sends the frames as fast as possible')
+    argparser.add_argument('--big_endian', action='store_true',
+                    help='emulate a controller sending big endian timestamps')
+
+    args = argparser.parse_args()
+    return args
+
+def main():
+    myArguments = commandLineInterface()
+    emulator = licel_emulator.ControllerEmulator(myArguments.ip, myArguments.port,
+                                                 myArguments.profile,
+                                                 myArguments.tr,
+                                                 repetitionRate = myArguments.rate,
+                                                 frameRate = myArguments.frame_rate,
+                                                 bigEndianTimeStamp = myArguments.big_endian)
+    emulator.start()
+    print("*** emulator listening on {}:{} (push {}, kill {}), Ctrl+C to stop *** \r\n"
+          .format(myArguments.ip, emulator.port, emulator.pushPort, emulator.killPort))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+    print(emulator.statistics)
+
+if __name__ == "__main__":
+
+    main()
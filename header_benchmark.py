@@ -0,0 +1,266 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Regression and benchmark for the compiled header templates of the DataParser.
+The header lines of Licel.licel_data.HeaderTemplate are compared against the former
+str.format implementation of all fields, for random configurations, the script fails
+if a header line is not byte identical.
+
+Usage:
+python3 header_benchmark.py --configs <configs> --datasets <datasets> [<datasets> ...] --repeat <repeat>
+'''
+from Licel import licel_data, licel_Config
+import argparse
+import numpy
+import timeit
+
+MEMORIES = ("A", "B", "C", "D")
+POLARIZATION = ("o", "p", "s", "r", "l")
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Licel header template regression and benchmark')
+    argparser.add_argument('--configs', type=int, default=200,
+                    help='number of random configurations to compare')
+    argparser.add_argument('--datasets', type=int, nargs='+', default=[8, 32, 128],
+                    help='number of data sets of the benchmarked configurations, at most 128')
+    argparser.add_argument('--repeat', type=int, default=5,
+                    help='number of repetitions for each timing')
+    argparser.add_argument('--seed', type=int, default=0,
+                    help='seed of the random generator')
+    args = argparser.parse_args()
+    return args
+
+def referenceSecondHeaderline(Config, startTime, stopTime):
+    ''' former implementation of ``DataParser._generateSecondHeaderline`` '''
+    measInfo = Config.measurementInfo
+    return (' {:8s} {:19s} {:19s} {:04d} {:011.6f} {:011.6f} {:04.1f} {:04.1f}\n'
+            .format(measInfo.szLocation,startTime,stopTime,
+                    measInfo.nAltitude,measInfo.dLongitude,
+                    measInfo.dLatitude,measInfo.Zenith,
+                    measInfo.Azimuth))
+
+def referenceThirdHeaderline(Config, shots, timestamp=None):
+    ''' former implementation of ``DataParser._generateThirdHeaderline`` '''
+    measurConf = Config.measurementInfo
+    if timestamp :
+        return (' {:d} {:04d} {:07d} {:04d} {:02d} {:07d} {:04d} {:d}\n'
+                .format(shots, measurConf.repRateL0, shots, 
+                        measurConf.repRateL1, Config.numDataSets,
+                        shots, measurConf.repRateL2, timestamp))
+    return (' {:d} {:04d} {:07d} {:04d} {:02d} {:07d} {:04d}\n'
+            .format(shots, measurConf.repRateL0, shots, 
+                    measurConf.repRateL1, 1,
+                    shots, measurConf.repRateL2))
+
+def referencePushDatasetsHeaderline(Config, TRHardwareInfo, analogue_shot_dict, pc_shot_dict):
+    ''' former implementation of ``DataParser._generatePushDatasetsHeaderline`` '''
+    myHeaderLine = ""
+    for trConfig in Config.TrConfigs: 
+        for key in trConfig.analogueEnabled: 
+            if trConfig.analogueEnabled[key] == True: 
+                trNum = trConfig.nTransientRecorder
+                binshift_decimal = int((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
+                divider = 1 if trConfig.freqDivider == 0  else trConfig.freqDivider
+                myHeaderLine += (" 1 0 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
+                                 " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0"
+                                 " {binshift:02d} {binshift_dec:3d} {adc:02d}"
+                                 " {shots:06d} 0.{myRange:03d} BT{trNum:1X}\n"
+                                 .format(laser = trConfig.laserAssignment[key], 
+                                         dataPoints = (trConfig.analogueBins[key]-1),
+                                         laserPolarization = trConfig.analoguePolarisation[key],
+                                         pmtHV = int(trConfig.pmVoltageAnalogue[key]),
+                                         binwidth = float((TRHardwareInfo[trNum]['binWidth'] )* (divider)),
+                                         wavelength = int (trConfig.analogueWavelength[key]),
+                                         polStatus = POLARIZATION[trConfig.analoguePolarisation[key]],
+                                         binshift = int(TRHardwareInfo[trNum]['binShift']), 
+                                         binshift_dec = int (binshift_decimal), 
+                                         adc = TRHardwareInfo[trNum]['ADC Bits'], 
+                                         shots = analogue_shot_dict[trNum][key]-2, 
+                                         myRange = trConfig.nRange,
+                                         trNum = trConfig.nTransientRecorder))
+        for key in trConfig.pcEnabled: 
+            if trConfig.pcEnabled[key] == True: 
+                trNum = trConfig.nTransientRecorder
+                divider = 1 if trConfig.freqDivider == 0  else trConfig.freqDivider
+                myHeaderLine += (" 1 1 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
+                                 " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0 00 000 00"
+                                 " {shots:06d} {myRange:6.4f} BC{trNum:1X}\n"
+                                 .format(laser = trConfig.laserAssignment[key], 
+                                         dataPoints = (trConfig.pcBins[key]-1),
+                                         laserPolarization = trConfig.pcPolarisation[key],
+                                         pmtHV = int(trConfig.pmVoltagePC[key]),
+                                         binwidth = (float(TRHardwareInfo[trNum]['binWidth'] )* (divider)),
+                                         wavelength = int (trConfig.pcWavelength[key]),
+                                         polStatus = POLARIZATION[trConfig.pcPolarisation[key]],
+                                         shots = pc_shot_dict[trNum][key]-2, 
+                                         myRange = (trConfig.discriminator * 25/63),
+                                         trNum = trConfig.nTransientRecorder))
+    return myHeaderLine
+
+def referenceAcquisDatasetsHeaderline(Config, TRHardwareInfo, shots, bins, device_number,
+                                      DataType, Memory):
+    ''' former implementation of ``DataParser._generateAcquisDatasetsHeaderline`` '''
+    myHeaderLine = ""
+    myMem = Memory.split("_")[1]
+    for trConfig in Config.TrConfigs: 
+        if trConfig.nTransientRecorder == device_number: 
+            for key in trConfig.analogueEnabled: 
+                trNum = trConfig.nTransientRecorder
+                if key == myMem and DataType == "Analogue":
+                    binshift_decimal = int((TRHardwareInfo[trNum]['binShift'] % 1) * 1000)
+                    myHeaderLine += (" 1 0 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
+                                     " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0"
+                                     " {binshift:02d} {binshift_dec:3d} {adc:02d}"
+                                     " {shots:06d} 0.{myRange:03d} BT{trNum:1X}\n"
+                                     .format(laser = trConfig.laserAssignment[key], 
+                                             dataPoints = (bins),
+                                             laserPolarization = trConfig.analoguePolarisation[key],
+                                             pmtHV = int(trConfig.pmVoltageAnalogue[key]),
+                                             binwidth = float(TRHardwareInfo[trNum]['binWidth']),
+                                             wavelength = int (trConfig.analogueWavelength[key]),
+                                             polStatus = POLARIZATION[trConfig.analoguePolarisation[key]],
+                                             binshift = int(TRHardwareInfo[trNum]['binShift']), 
+                                             binshift_dec = int (binshift_decimal), 
+                                             adc = TRHardwareInfo[trNum]['ADC Bits'], 
+                                             shots = shots, 
+                                             myRange = trConfig.nRange,
+                                             trNum = trConfig.nTransientRecorder))
+                if key == myMem and DataType == "PhotonCounting":
+                    myHeaderLine += (" 1 1 {laser} {dataPoints} {laserPolarization} {pmtHV:04d}"
+                                     " {binwidth:1.2f} {wavelength:05d}.{polStatus} 0 0 00 000 00"
+                                     " {shots:06d} {myRange:6.4f} BC{trNum:1X}\n"
+                                     .format(laser = trConfig.laserAssignment[key], 
+                                             dataPoints = (bins),
+                                             laserPolarization = trConfig.pcPolarisation[key],
+                                             pmtHV = int(trConfig.pmVoltagePC[key]),
+                                             binwidth = float(TRHardwareInfo[trNum]['binWidth']),
+                                             wavelength = int (trConfig.pcWavelength[key]),
+                                             polStatus = POLARIZATION[trConfig.pcPolarisation[key]],
+                                             shots = shots, 
+                                             myRange = (trConfig.discriminator * 25/63),
+                                             trNum = trConfig.nTransientRecorder))
+    return myHeaderLine
+
+def randomConfig(rng, datasets: int):
+    ''' configuration of 16 transient recorders with ``datasets`` random data sets '''
+    Config = licel_Config.Config("Acquis.ini")
+    Config.measurementInfo = licel_Config.MeasureInfo(
+        szLocation = "".join(rng.choice(list("BerlinAdlershof "), int(rng.integers(0, 9)))),
+        nAltitude = int(rng.integers(0, 5000)), dLongitude = float(rng.uniform(-180, 180)),
+        dLatitude = float(rng.uniform(-90, 90)), Zenith = float(rng.uniform(0, 90)),
+        Azimuth = float(rng.uniform(0, 360)), cFirstLetter = "b", szOutPath = ".",
+        repRateL0 = int(rng.integers(0, 10000)), repRateL1 = int(rng.integers(0, 100)),
+        repRateL2 = int(rng.integers(0, 100)))
+    Config.TrConfigs = []
+    for address in range(16):
+        Config.TrConfigs.append(licel_Config.TrConfig(nTransientRecorder = address,
+                                                      nRange = int(rng.choice([20, 100, 500])),
+                                                      discriminator = int(rng.integers(0, 64)),
+                                                      freqDivider = int(rng.integers(0, 8))))
+    channels = [(trConfig, memory, isPhotonCounting) for memory in MEMORIES
+                for isPhotonCounting in (False, True) for trConfig in Config.TrConfigs]
+    for index in rng.permutation(len(channels))[:datasets]:
+        trConfig, memory, isPhotonCounting = channels[index]
+        (trConfig.pcEnabled if isPhotonCounting else trConfig.analogueEnabled)[memory] = True
+        (trConfig.pcBins if isPhotonCounting else trConfig.analogueBins)[memory] = int(rng.integers(1, 32000))
+        (trConfig.pcWavelength if isPhotonCounting else trConfig.analogueWavelength)[memory] = int(rng.choice([355, 387, 532, 607, 1064]))
+        (trConfig.pcPolarisation if isPhotonCounting else trConfig.analoguePolarisation)[memory] = int(rng.integers(0, 5))
+        (trConfig.pmVoltagePC if isPhotonCounting else trConfig.pmVoltageAnalogue)[memory] = float(rng.uniform(0, 1000))
+        trConfig.laserAssignment[memory] = int(rng.integers(1, 4))
+    Config.numDataSets = min(datasets, len(channels))
+    return Config
+
+def randomHardwareInfos(rng) -> dict[int, dict[str, int | str | float]]:
+    return {address : {'ADC Bits' : int(rng.choice([12, 16])), 'PC Bits' : 4, 'FIFOLength' : 16384,
+                       'binWidth' : float(rng.choice([3.75, 7.5, 0.25])), 'ID' : 'TR{}'.format(address),
+                       'HWCAP' : '0', 'binShift' : float(rng.choice([0, 1.25, 2.5, 0.125]))}
+            for address in range(16)}
+
+def randomShots(rng, Config):
+    ''' shot number of each active data set, including the smallest and largest values '''
+    analogue_shots : dict[int, dict[str, int]] = {}
+    pc_shots : dict[int, dict[str, int]] = {}
+    for trConfig in Config.TrConfigs:
+        for memory in MEMORIES:
+            shots = int(rng.choice([2, 3, 300, 4001, 65535]))
+            analogue_shots.setdefault(trConfig.nTransientRecorder, {})[memory] = shots
+            pc_shots.setdefault(trConfig.nTransientRecorder, {})[memory] = shots
+    return analogue_shots, pc_shots
+
+def headerCases(dataParser, Config, hardwareInfos, rng):
+    ''' (name, reference, template) for each header line '''
+    times = ("", "01/01/2026 12:00:00")
+    shots = int(rng.choice([0, 1, 300, 65535]))
+    timestamp = int(rng.choice([0, 1, 2**32 - 1]))
+    analogue_shots, pc_shots = randomShots(rng, Config)
+    trConfig = Config.TrConfigs[int(rng.integers(0, len(Config.TrConfigs)))]
+    memory = "MEM_" + str(rng.choice(MEMORIES))
+    bins = int(rng.integers(1, 32000))
+    cases = [("second header line",
+              lambda: referenceSecondHeaderline(Config, *times),
+              lambda: dataParser._generateSecondHeaderline(Config, *times)),
+             ("third header line without timestamp",
+              lambda: referenceThirdHeaderline(Config, shots),
+              lambda: dataParser._generateThirdHeaderline(Config, shots)),
+             ("third header line",
+              lambda: referenceThirdHeaderline(Config, shots, timestamp),
+              lambda: dataParser._generateThirdHeaderline(Config, shots, timestamp)),
+             ("push data set lines",
+              lambda: referencePushDatasetsHeaderline(Config, hardwareInfos, analogue_shots, pc_shots),
+              lambda: dataParser._generatePushDatasetsHeaderline(Config, hardwareInfos,
+                                                                 analogue_shots, pc_shots))]
+    for DataType in ("Analogue", "PhotonCounting"):
+        cases.append(("acquis {} data set line".format(DataType),
+                      lambda DataType=DataType: referenceAcquisDatasetsHeaderline(
+                          Config, hardwareInfos, shots, bins, trConfig.nTransientRecorder, DataType, memory),
+                      lambda DataType=DataType: dataParser._generateAcquisDatasetsHeaderline(
+                          Config, hardwareInfos, shots, bins, trConfig.nTransientRecorder, DataType, memory)))
+    return cases
+
+def checkHeaders(rng, configs: int):
+    dataParser = licel_data.DataParser()
+    for number in range(configs):
+        Config = randomConfig(rng, int(rng.integers(0, 129)))
+        hardwareInfos = randomHardwareInfos(rng)
+        for name, reference, template in headerCases(dataParser, Config, hardwareInfos, rng):
+            if reference() != template():
+                raise AssertionError("{} differs for configuration {}:\n{!r}\n{!r}"
+                                     .format(name, number, reference(), template()))
+
+def benchmarkHeaders(rng, datasets: int, repeat: int):
+    ''' time of a complete MPUSH acquisition header with the former and the compiled header lines '''
+    dataParser = licel_data.DataParser()
+    Config = randomConfig(rng, datasets)
+    hardwareInfos = randomHardwareInfos(rng)
+    analogue_shots, pc_shots = randomShots(rng, Config)
+    times = ("01/01/2026 12:00:00", "01/01/2026 12:00:01")
+    def reference():
+        return (referenceSecondHeaderline(Config, *times)
+                + referenceThirdHeaderline(Config, 300, 1000)
+                + referencePushDatasetsHeaderline(Config, hardwareInfos, analogue_shots, pc_shots))
+    def template():
+        return (dataParser._generateSecondHeaderline(Config, *times)
+                + dataParser._generateThirdHeaderline(Config, 300, 1000)
+                + dataParser._generatePushDatasetsHeaderline(Config, hardwareInfos,
+                                                             analogue_shots, pc_shots))
+    number = 200
+    formatted = min(timeit.repeat(reference, number=number, repeat=repeat)) / number
+    compiled = min(timeit.repeat(template, number=number, repeat=repeat)) / number
+    return Config.numDataSets, formatted, compiled
+
+def main():
+    myArguments = commandLineInterface()
+    rng = numpy.random.default_rng(myArguments.seed)
+    checkHeaders(rng, myArguments.configs)
+    print("{:>9s} {:>14s} {:>14s} {:>8s}".format("datasets", "format [us]", "template [us]",
+                                                 "speedup"))
+    for datasets in myArguments.datasets:
+        datasets, formatted, compiled = benchmarkHeaders(rng, datasets, myArguments.repeat)
+        print("{:9d} {:14.1f} {:14.1f} {:8.1f}".format(datasets, 1e6*formatted, 1e6*compiled,
+                                                       formatted/compiled))
+    print("all header lines are byte identical to the reference implementation")
+
+if __name__ == "__main__":
+
+    main()
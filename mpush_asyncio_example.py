@@ -0,0 +1,74 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Same acquisition as mpush_example.py, using the asyncio client Licel.licel_asyncio
+
+Usage:
+python3 mpush_asyncio_example.py --ip <ip> --port <port>  --acq <num acquis> --shots <num shots>
+                 --acquis_per_file <acquis per file>
+'''
+from Licel import licel_asyncio, licel_data, licel_Config
+from datetime import datetime
+import argparse
+import asyncio
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Mpush asyncio example ')
+    argparser.add_argument('--ip', type=str, default = "10.49.234.234",
+                    help='ethernet controller ip address')
+    argparser.add_argument('--port', type=int, default=2055,
+                    help='ethernet controller command port')
+    argparser.add_argument('--acq', type=int, default=10,
+                    help='number of acquisitions, if -1 we will acquire infinite number of acquisitions')
+    argparser.add_argument('--shots', type=int,  default=150,
+                    help='number of shots per acquisition')
+    argparser.add_argument('--acquis_per_file', type=int, nargs='?', default=10,
+                    help='maximal number of acquisitions to write in a single file')
+
+    args = argparser.parse_args()
+    return args
+
+async def acquire(myArguments):
+    ethernetController = licel_asyncio.AsyncEthernetController(myArguments.ip, myArguments.port)
+    dataParser = licel_data.DataParser()
+    ConfigInfo = licel_Config.Config("Acquis.ini")
+
+    ConfigInfo.readConfig()
+    await ethernetController.openConnection()
+    await ethernetController.openPushConnection()
+
+    print(await ethernetController.Tr.listInstalledTr())
+    await ethernetController.Tr.configureHardware(ConfigInfo)
+    print(await ethernetController.Tr.MPushStartFromConfig(myArguments.shots, ConfigInfo))
+    print("*** Started mpush acqusition at:",datetime.now(), " *** \r\n")
+
+    cycle_count = 0
+    async for (dataSets, time_stamp, analogue_shots, pc_shots,
+               startTime, stopTime) in ethernetController.Tr.pushFrames(dataParser):
+        dataParser.savePushDataToLicelFileFormat(dataSets,
+                                                 ConfigInfo,
+                                                 startTime,stopTime,
+                                                 ethernetController.Tr.hardwareInfos,
+                                                 time_stamp,
+                                                 analogue_shots,
+                                                 pc_shots,
+                                                 myArguments.shots,
+                                                 myArguments.acquis_per_file)
+        cycle_count += 1
+        if cycle_count == myArguments.acq:
+            break
+
+    print(await ethernetController.Tr.MPushStop())
+    await ethernetController.shutdownConnection()
+    await ethernetController.shutdownPushConnection()
+    print("{} acquisition written to {} \r\n"
+        .format(cycle_count, ConfigInfo.measurementInfo.szOutPath))
+    print("*** Stopped mpush acquisition at:",datetime.now(), " *** \r\n")
+
+def main():
+    asyncio.run(acquire(commandLineInterface()))
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,359 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Throughput benchmark of the MPUSH path: reception (``recvPushData``), parsing
+(``parseDataFromBuffer``) and writing (``savePushDataToLicelFileFormat``).
+Every combination of number of transient recorders, bins, acquisition mode and shots is
+measured, the shot numbers are chosen to cross the PHM / fullword thresholds.
+
+The push data is either received from the local controller emulator (loopback) or
+replayed from captures recorded with ``--record``. The results are written as JSON,
+``--baseline`` compares them with the results of a previous run.
+
+With ``--frame_rate`` the emulator sends the frames at a fixed rate, the frames missing
+from the controller timestamp sequence are counted as dropped and the frames received more
+than ``--late_ms`` after the earliest observed latency as late. ``--tuning both`` measures
+each configuration with the default and with the tuned socket options.
+
+Usage:
+python3 mpush_benchmark.py --tr <num Tr> [...] --bins <bins> [...] --mode <analogue|photon|both> [...]
+                 --shots <shots> [...] --frames <frames> --output <results.json>
+                 --record <capture dir> | --capture <capture dir>
+                 --baseline <results.json> --tolerance <fraction>
+                 --frame_rate <frames/s> --tuning <off|on|both> --rcvbuf <bytes> --late_ms <ms>
+'''
+from Licel import licel_tcpip, licel_data, licel_Config, licel_emulator
+from Licel import licel_capture, TCP_util
+from contextlib import redirect_stdout
+from datetime import datetime
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import numpy
+
+MODES = ("analogue", "photon", "both")
+#: file name suffix of the captures
+CAPTURE_SUFFIX = ".lcap"
+TUNINGS = {"off" : ("default",), "on" : ("tuned",), "both" : ("default", "tuned")}
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='MPUSH throughput benchmark ')
+    argparser.add_argument('--tr', type=int, nargs='+', default=[1, 4],
+                    help='number of transient recorders')
+    argparser.add_argument('--bins', type=int, nargs='+', default=[4000, 16000, 32000],
+                    help='number of bins per memory')
+    argparser.add_argument('--mode', type=str, nargs='+', choices=MODES, default=list(MODES),
+                    help='acquired data sets of memory A')
+    argparser.add_argument('--shots', type=int, nargs='+', default=[100, 5000, 40000],
+                    help='number of shots per acquisition')
+    argparser.add_argument('--frames', type=int, default=50,
+                    help='number of measured frames per configuration')
+    argparser.add_argument('--warmup', type=int, default=2,
+                    help='number of frames received before the measurement')
+    argparser.add_argument('--acquis_per_file', type=int, default=10,
+                    help='maximal number of acquisitions to write in a single file')
+    argparser.add_argument('--acquis_ini', type=str, default="Acquis.ini",
+                    help='configuration providing the global information of the data files')
+    argparser.add_argument('--port', type=int, default=12055,
+                    help='command port of the loopback emulator')
+    argparser.add_argument('--record', type=str, default=None,
+                    help='directory to record the received push data of each configuration')
+    argparser.add_argument('--capture', type=str, default=None,
+                    help='directory of recorded push data to replay instead of the loopback emulator')
+    argparser.add_argument('--output', type=str, default=None,
+                    help='JSON result file, printed on stdout if not given')
+    argparser.add_argument('--baseline', type=str, default=None,
+                    help='JSON result file of a previous run to compare with')
+    argparser.add_argument('--tolerance', type=float, default=0.1,
+                    help='allowed relative frames/s decrease compared with the baseline')
+    argparser.add_argument('--label', type=str, default="",
+                    help='label stored with the results, e.g. the release')
+    argparser.add_argument('--frame_rate', type=float, default=0,
+                    help='frames per second sent by the loopback emulator, 0 sends as fast as possible')
+    argparser.add_argument('--tuning', type=str, choices=list(TUNINGS), default="off",
+                    help='measure with the default socket options, the tuned ones or both')
+    argparser.add_argument('--rcvbuf', type=int, default=4*1024*1024,
+                    help='push socket receive buffer in bytes of the tuned socket options')
+    argparser.add_argument('--late_ms', type=float, default=20,
+                    help='latency in ms above the lowest observed latency counting a frame as late')
+    args = argparser.parse_args()
+    return args
+
+def scenarioName(scenario: dict) -> str:
+    name = "tr{tr}_bins{bins}_{mode}_shots{shots}".format(**scenario)
+    if scenario.get('tuning', "default") != "default":
+        name += "_" + scenario['tuning']
+    return name
+
+def socketOptions(scenario: dict, myArguments) -> 'TCP_util.SocketOptions':
+    ''' default socket options, or the options tuned for high rate push streams '''
+    if scenario.get('tuning', "default") == "default":
+        return TCP_util.SocketOptions()
+    return TCP_util.SocketOptions(pushReceiveBuffer = myArguments.rcvbuf,
+                                  commandNoDelay = True, quickAck = True)
+
+def makeConfig(acquisIni: str, scenario: dict, outPath: str) -> 'licel_Config.Config':
+    ''' configuration acquiring memory A of ``scenario['tr']`` transient recorders '''
+    Config = licel_Config.Config(acquisIni)
+    Config.readConfig()
+    Config.measurementInfo.szOutPath = outPath
+    Config.TrConfigs = []
+    for address in range(scenario['tr']):
+        trConfig = licel_Config.TrConfig(nTransientRecorder = address, nRange = 500,
+                                         discriminator = 0, shotLimit = 4096, pretrigger = 0,
+                                         freqDivider = 0, threshold = 0)
+        trConfig.analogueEnabled["A"] = scenario['mode'] in ("analogue", "both")
+        trConfig.pcEnabled["A"] = scenario['mode'] in ("photon", "both")
+        trConfig.analogueBins["A"] = scenario['bins']
+        trConfig.pcBins["A"] = scenario['bins']
+        Config.TrConfigs.append(trConfig)
+    return Config
+
+class LoopbackSource:
+    '''
+    push data received from the local controller emulator, sent as fast as possible
+    '''
+
+    def __init__(self, port: int, frameRate: float = 0,
+                 socketOptions: 'TCP_util.SocketOptions | None' = None,
+                 capturePath: str | None = None) -> None:
+        self.port = port
+        self.frameRate = frameRate
+        self.socketOptions = socketOptions
+        self.capturePath = capturePath
+
+    def open(self, scenario: dict, Config: 'licel_Config.Config') -> 'licel_tcpip.EthernetController':
+        self.emulator = licel_emulator.ControllerEmulator(port = self.port,
+                                                          transientRecorders = list(range(scenario['tr'])),
+                                                          frameRate = self.frameRate)
+        for tr in self.emulator.transientRecorders.values():
+            tr.fifoLength = max(tr.fifoLength, scenario['bins'])
+        self.emulator.start()
+        ethernetController = licel_tcpip.EthernetController("127.0.0.1", self.port,
+                                                            self.socketOptions)
+        ethernetController.openConnection()
+        ethernetController.openPushConnection()
+        with redirect_stdout(io.StringIO()):
+            ethernetController.Tr.configureHardware(Config)
+            ethernetController.Tr.MPushStartFromConfig(scenario['shots'], Config)
+        if self.capturePath is not None:
+            ethernetController.Tr.startPushCapture(self.capturePath,
+                                                   metadata = {'scenario' : scenario})
+        self.ethernetController = ethernetController
+        return ethernetController
+
+    def recv(self) -> None:
+        self.ethernetController.Tr.recvPushData()
+
+    def close(self) -> None:
+        self.ethernetController.Tr.stopPushCapture()
+        self.ethernetController.Tr.MPushStop()
+        self.ethernetController.shutdownConnection()
+        self.ethernetController.shutdownPushConnection()
+        self.emulator.stop()
+
+class CaptureSource:
+    '''
+    push data replayed in a loop from a capture recorded with ``--record``,
+    see ``licel_capture``.
+    '''
+
+    def __init__(self, capturePath: str) -> None:
+        self.replay = licel_capture.CaptureReplay(capturePath, loop = True)
+
+    def open(self, scenario: dict, Config: 'licel_Config.Config') -> 'licel_tcpip.EthernetController':
+        return self.replay.open(Config, scenario['shots'])
+
+    def recv(self) -> None:
+        if not self.replay.recvPushData():
+            raise EOFError("empty capture " + self.replay.path)
+
+    def close(self) -> None:
+        self.replay.close()
+
+def runScenario(source, scenario: dict, myArguments, outPath: str) -> dict:
+    Config = makeConfig(myArguments.acquis_ini, scenario, outPath)
+    dataParser = licel_data.DataParser()
+    ethernetController = source.open(scenario, Config)
+    Tr = ethernetController.Tr
+    frameSize = Tr.exceptedByte
+    times = {'recv' : 0.0, 'parse' : 0.0, 'write' : 0.0}
+    frames = 0
+    invalidFrames = 0
+    # controller timestamp and host reception time in ms of each valid frame
+    timing : list[tuple[int, float]] = []
+    try:
+        while frames < myArguments.warmup + myArguments.frames:
+            if frames == myArguments.warmup:
+                times = {'recv' : 0.0, 'parse' : 0.0, 'write' : 0.0}
+                invalidFrames = 0
+                timing = []
+                startTime = time.perf_counter()
+            t0 = time.perf_counter()
+            source.recv()
+            t1 = time.perf_counter()
+            (dataValid, DataSet, time_stamp,
+             analogue_shots, pc_shots) = dataParser.parseDataFromBuffer(Config, ethernetController,
+                                                                        scenario['shots'])
+            t2 = time.perf_counter()
+            if dataValid:
+                timing.append((time_stamp, 1000 * t1))
+            if not dataValid:
+                invalidFrames += 1
+                dataParser.removeInvalidDataFromBuffer(Tr.pushBuffer, Tr.exceptedByte)
+                times['recv'] += t1 - t0
+                times['parse'] += t2 - t1
+                continue
+            now = datetime.now()
+            dataParser.savePushDataToLicelFileFormat(DataSet, Config, now, now, Tr.hardwareInfos,
+                                                     time_stamp, analogue_shots, pc_shots,
+                                                     scenario['shots'], myArguments.acquis_per_file)
+            t3 = time.perf_counter()
+            times['recv'] += t1 - t0
+            times['parse'] += t2 - t1
+            times['write'] += t3 - t2
+            frames += 1
+        elapsed = time.perf_counter() - startTime
+    finally:
+        if dataParser._acquisWrittenToFile > 0:
+            dataParser._myFileDescriptor.close()
+        source.close()
+    droppedFrames, lateFrames = None, None
+    if isinstance(source, LoopbackSource) and myArguments.frame_rate > 0:
+        droppedFrames, lateFrames = frameTiming(timing, myArguments.frame_rate,
+                                                myArguments.late_ms)
+        droppedFrames += invalidFrames
+    result = dict(scenario)
+    result.update({'name'               : scenarioName(scenario),
+                   'frameSize'          : frameSize,
+                   'frames'             : myArguments.frames,
+                   'invalidFrames'      : invalidFrames,
+                   'droppedFrames'      : droppedFrames,
+                   'lateFrames'         : lateFrames,
+                   'seconds'            : elapsed,
+                   'framesPerSecond'    : myArguments.frames / elapsed,
+                   'megabytesPerSecond' : myArguments.frames * frameSize / elapsed / 1e6,
+                   'recvSeconds'        : times['recv'],
+                   'parseSeconds'       : times['parse'],
+                   'writeSeconds'       : times['write']})
+    return result
+
+def frameTiming(timing: list[tuple[int, float]], frameRate: float,
+                lateMs: float) -> tuple[int, int]:
+    '''
+    :returns: number of frames missing from the timestamp sequence and number of frames
+        received more than ``lateMs`` after the lowest latency
+    '''
+    if len(timing) < 2:
+        return 0, 0
+    interval = 1000 / frameRate
+    timeStamps = numpy.array([timeStamp for timeStamp, _ in timing], dtype=numpy.int64)
+    received = numpy.array([receiveTime for _, receiveTime in timing])
+    gaps = numpy.rint(numpy.diff(timeStamps) / interval) - 1
+    droppedFrames = int(gaps[gaps > 0].sum())
+    # the clocks of host and controller differ by an unknown offset, the lowest latency is the reference
+    latency = received - timeStamps
+    lateFrames = int(numpy.count_nonzero(latency - latency.min() > lateMs))
+    return droppedFrames, lateFrames
+
+def capturePath(captureDir: str, scenario: dict) -> str:
+    return os.path.join(captureDir, scenarioName(scenario) + CAPTURE_SUFFIX)
+
+def scenarios(myArguments) -> list[dict]:
+    if myArguments.capture is not None:
+        found = []
+        for fileName in sorted(os.listdir(myArguments.capture)):
+            if fileName.endswith(CAPTURE_SUFFIX):
+                with licel_capture.CaptureReader(os.path.join(myArguments.capture,
+                                                              fileName)) as reader:
+                    found.append(reader.header['metadata']['scenario'])
+        return found
+    return [{'tr' : tr, 'bins' : bins, 'mode' : mode, 'shots' : shots, 'tuning' : tuning}
+            for tr in myArguments.tr
+            for bins in myArguments.bins
+            for mode in myArguments.mode
+            for shots in myArguments.shots
+            for tuning in TUNINGS[myArguments.tuning]]
+
+def compareWithBaseline(results: list[dict], baselinePath: str, tolerance: float) -> list[str]:
+    ''' :returns: description of the configurations slower than the baseline '''
+    with open(baselinePath) as file:
+        baseline = {result['name'] : result for result in json.load(file)['results']}
+    regressions = []
+    for result in results:
+        reference = baseline.get(result['name'])
+        if reference is None:
+            continue
+        ratio = result['framesPerSecond'] / reference['framesPerSecond']
+        result['baselineRatio'] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append("{}: {:.1f} frames/s, baseline {:.1f} frames/s"
+                               .format(result['name'], result['framesPerSecond'],
+                                       reference['framesPerSecond']))
+    return regressions
+
+def main():
+    myArguments = commandLineInterface()
+    if myArguments.record is not None and myArguments.capture is not None:
+        raise SystemExit("--record and --capture can not be used together")
+    if myArguments.record is not None:
+        os.makedirs(myArguments.record, exist_ok=True)
+
+    results = []
+    outPath = tempfile.mkdtemp(prefix="mpush_benchmark_")
+    print("{:<36s} {:>10s} {:>10s} {:>10s}".format("configuration", "frame [B]", "frames/s", "MB/s"),
+          file=sys.stderr)
+    try:
+        for scenario in scenarios(myArguments):
+            if myArguments.capture is not None:
+                source = CaptureSource(capturePath(myArguments.capture, scenario))
+            else:
+                source = LoopbackSource(myArguments.port, myArguments.frame_rate,
+                                        socketOptions(scenario, myArguments),
+                                        None if myArguments.record is None
+                                        else capturePath(myArguments.record, scenario))
+            result = runScenario(source, scenario, myArguments, outPath)
+            results.append(result)
+            print("{:<36s} {:>10d} {:>10.1f} {:>10.2f}  recv {:6.3f}s parse {:6.3f}s write {:6.3f}s"
+                  .format(result['name'], result['frameSize'], result['framesPerSecond'],
+                          result['megabytesPerSecond'], result['recvSeconds'],
+                          result['parseSeconds'], result['writeSeconds']), file=sys.stderr)
+            if result['droppedFrames'] is not None:
+                print("{:<36s} dropped {:d} late {:d}".format("", result['droppedFrames'],
+                                                             result['lateFrames']), file=sys.stderr)
+    finally:
+        shutil.rmtree(outPath, ignore_errors=True)
+
+    regressions = []
+    if myArguments.baseline is not None:
+        regressions = compareWithBaseline(results, myArguments.baseline, myArguments.tolerance)
+    report = {'label'    : myArguments.label,
+              'date'     : datetime.now().isoformat(timespec='seconds'),
+              'source'   : "capture" if myArguments.capture is not None else "loopback",
+              'python'   : platform.python_version(),
+              'numpy'    : numpy.__version__,
+              'platform' : platform.platform(),
+              'frames'   : myArguments.frames,
+              'frameRate': myArguments.frame_rate,
+              'results'  : results}
+    if myArguments.output is not None:
+        with open(myArguments.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    for regression in regressions:
+        print("regression: " + regression, file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+
+    main()
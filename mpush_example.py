@@ -5,8 +5,10 @@ Copyright ©: Licel GmbH
 Usage:
 python3 mpush_example.py --ip <ip> --port <port>  --acq <num acquis> --shots <num shots>
                  --acquis_per_file <acquis per file> --log
+                 --capture <capture file> --compression <none|gzip|lzma>
+                 --writer_thread --max_file_size <bytes> --rotation_interval <seconds>
 '''
-from Licel import licel_tcpip, licel_data, licel_Config
+from Licel import licel_tcpip, licel_data, licel_Config, licel_reconnect, licel_writer
 from datetime import datetime
 import argparse
 
@@ -27,6 +29,17 @@ def commandLineInterface():
                     help='log the push data when error occurs in push buffer raw data ')
     argparser.add_argument('--acquis_per_file', type=int, nargs='?', default=10,
                     help='maximal number of acquisitions to write in a single file')
+    argparser.add_argument('--capture', type=str, default=None,
+                    help='record the received push data to a capture file, replayed by mpush_replay_example.py')
+    argparser.add_argument('--compression', type=str, choices=["none", "gzip", "lzma"], default="none",
+                    help='compression of the capture file')
+    argparser.add_argument('--writer_thread', type=bool, default=False,
+                           action=argparse.BooleanOptionalAction,
+                    help='write the files on a separate thread, see licel_writer.WriterThread')
+    argparser.add_argument('--max_file_size', type=int, default=0,
+                    help='with --writer_thread, maximal size of a file in bytes, 0 for no limit')
+    argparser.add_argument('--rotation_interval', type=float, default=0,
+                    help='with --writer_thread, seconds after which a new file is started, 0 for no limit')
     
     args = argparser.parse_args()
     return args 
@@ -39,10 +52,15 @@ desiredShots = myArguments.shots
 ACQUISTION_CYCLES = myArguments.acq
 ACQUISPERFILE = myArguments.acquis_per_file 
 LOGPUSHDATA = myArguments.log 
+CAPTUREFILE = myArguments.capture
+CAPTURECOMPRESSION = None if myArguments.compression == "none" else myArguments.compression
+WRITERTHREAD = myArguments.writer_thread
 
 def singleAcquistionCycle(ethernetController: 'licel_tcpip.EthernetController',
                           dataParser: 'licel_data.DataParser',
-                          ConfigInfo: 'licel_Config.Config'):
+                          ConfigInfo: 'licel_Config.Config',
+                          reconnectionManager: 'licel_reconnect.ReconnectionManager',
+                          writerThread: 'licel_writer.WriterThread | None' = None):
     
     startTime =  datetime.now()
     ethernetController.Tr.recvPushData() 
@@ -64,6 +82,10 @@ def singleAcquistionCycle(ethernetController: 'licel_tcpip.EthernetController',
                                                 desiredShots)
     
     if (dataValid): 
+        reconnectionManager.recordFrame(time_stamp)
+        if writerThread is not None:
+            writerThread.write(dataSets, startTime, stopTime, time_stamp, analogue_shots, pc_shots)
+            return
         dataParser.savePushDataToLicelFileFormat(dataSets,
                                       ConfigInfo,
                                       startTime,stopTime,
@@ -76,21 +98,33 @@ def singleAcquistionCycle(ethernetController: 'licel_tcpip.EthernetController',
 
     else :
         # if data is not valid clear buffer until next occurrence of xff xff 
-        dataParser.removeInvalidDataFromBuffer(ethernetController.pushBuffer)
+        dataParser.removeInvalidDataFromBuffer(ethernetController.Tr.pushBuffer,
+                                                ethernetController.Tr.exceptedByte)
 
 def main():
     
-    ethernetController = licel_tcpip.EthernetController (ip, port)
     dataParser = licel_data.DataParser()
     ConfigInfo = licel_Config.Config("Acquis.ini")
     
     ConfigInfo.readConfig()
+    ethernetController = licel_tcpip.EthernetController (ip, port, ConfigInfo.socketOptions)
     ethernetController.openConnection()
     ethernetController.openPushConnection()
 
     print(ethernetController.Tr.listInstalledTr())   
-    ethernetController.Tr.configureHardware(ConfigInfo)
-    print(ethernetController.Tr.MPushStartFromConfig(desiredShots, ConfigInfo))
+    reconnectionManager = licel_reconnect.ReconnectionManager(ethernetController,
+                                                              ConfigInfo,
+                                                              desiredShots)
+    print(reconnectionManager.startSession())
+    if CAPTUREFILE is not None:
+        ethernetController.Tr.startPushCapture(CAPTUREFILE, CAPTURECOMPRESSION)
+    writerThread = None
+    if WRITERTHREAD:
+        writer = licel_writer.LicelFileWriter(ConfigInfo, ethernetController.Tr.hardwareInfos,
+                                              desiredShots, ACQUISPERFILE,
+                                              maxFileSize = myArguments.max_file_size,
+                                              rotationInterval = myArguments.rotation_interval)
+        writerThread = licel_writer.WriterThread(writer)
     startTime =  datetime.now()
     print("*** Started mpush acqusition at:",startTime, " *** \r\n")
 
@@ -98,23 +132,31 @@ def main():
     while ((cycle_count < ACQUISTION_CYCLES) or (ACQUISTION_CYCLES == -1) ):
         try:
             cycle_count += 1
-            singleAcquistionCycle(ethernetController, dataParser, ConfigInfo)
+            singleAcquistionCycle(ethernetController, dataParser, ConfigInfo,
+                                  reconnectionManager, writerThread)
         except (ConnectionError, ConnectionResetError, TimeoutError) as myExecption:
             cycle_count = cycle_count - 1
-            ethernetController.reconnection(ConfigInfo)
-            print("*** Restarting MPUSH *** ")
-            print(ethernetController.Tr.MPushStartFromConfig(desiredShots, ConfigInfo))
+            print("*** Reconnecting and restarting MPUSH *** ")
+            reconnectionManager.reconnect()
         except KeyboardInterrupt: 
             print("User interrupted program by pressing Ctrl-C.")
             break
 
 
+    ethernetController.Tr.stopPushCapture()
+    if writerThread is not None:
+        writerThread.close()
     ethernetController.Tr.MPushStop()
     ethernetController.shutdownConnection()
     ethernetController.shutdownPushConnection()
     stopTime =  datetime.now()
     print("{} acquisition written to {} \r\n"
         .format(cycle_count, ConfigInfo.measurementInfo.szOutPath))
+    print(dataParser.statistics)
+    if writerThread is not None:
+        print(writerThread.statistics)
+    if reconnectionManager.statistics.outages:
+        print(reconnectionManager.statistics)
     print("*** Stopped mpush acquisition at:",stopTime, " *** \r\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Same acquisition as mpush_example.py, the reception, the parsing and the writing of the
+data files run on separate threads using Licel.licel_pipeline.MPushPipeline
+
+Usage:
+python3 mpush_pipeline_example.py --ip <ip> --port <port>  --acq <num acquis> --shots <num shots>
+                 --acquis_per_file <acquis per file> --parse_queue <depth> --write_queue <depth>
+'''
+from Licel import licel_tcpip, licel_data, licel_Config, licel_pipeline
+from datetime import datetime
+import argparse
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Mpush pipeline example ')
+    argparser.add_argument('--ip', type=str, default = "10.49.234.234",
+                    help='ethernet controller ip address')
+    argparser.add_argument('--port', type=int, default=2055,
+                    help='ethernet controller command port')
+    argparser.add_argument('--acq', type=int, default=10,
+                    help='number of acquisitions, if -1 we will acquire infinite number of acquisitions')
+    argparser.add_argument('--shots', type=int,  default=150,
+                    help='number of shots per acquisition')
+    argparser.add_argument('--acquis_per_file', type=int, nargs='?', default=10,
+                    help='maximal number of acquisitions to write in a single file')
+    argparser.add_argument('--parse_queue', type=int, default=16,
+                    help='maximal number of received frames waiting for the parser')
+    argparser.add_argument('--write_queue', type=int, default=16,
+                    help='maximal number of parsed frames waiting for the writer')
+    argparser.add_argument('--drop', type=bool, default=False,
+                           action=argparse.BooleanOptionalAction,
+                    help='drop frames instead of blocking the reception when the parse queue is full')
+
+    args = argparser.parse_args()
+    return args
+
+def main():
+    myArguments = commandLineInterface()
+    dataParser = licel_data.DataParser()
+    ConfigInfo = licel_Config.Config("Acquis.ini")
+
+    ConfigInfo.readConfig()
+    ethernetController = licel_tcpip.EthernetController (myArguments.ip, myArguments.port,
+                                                         ConfigInfo.socketOptions)
+    ethernetController.openConnection()
+    ethernetController.openPushConnection()
+
+    print(ethernetController.Tr.listInstalledTr())
+    ethernetController.Tr.configureHardware(ConfigInfo)
+
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, dataParser, ConfigInfo,
+                                            myArguments.shots, myArguments.acquis_per_file,
+                                            acquisitions = myArguments.acq,
+                                            parseQueueDepth = myArguments.parse_queue,
+                                            writeQueueDepth = myArguments.write_queue,
+                                            dropWhenFull = myArguments.drop)
+    pipeline.start()
+    startTime =  datetime.now()
+    print("*** Started mpush acqusition at:",startTime, " *** \r\n")
+    try:
+        pipeline.wait()
+    except KeyboardInterrupt:
+        print("User interrupted program by pressing Ctrl-C.")
+    finally:
+        pipeline.stop()
+        ethernetController.shutdownConnection()
+        ethernetController.shutdownPushConnection()
+
+    stopTime =  datetime.now()
+    print("{} acquisition written to {} \r\n"
+        .format(pipeline.statistics.framesWritten, ConfigInfo.measurementInfo.szOutPath))
+    print(pipeline.statistics)
+    print("*** Stopped mpush acquisition at:",stopTime, " *** \r\n")
+
+if __name__ == "__main__":
+
+    main()
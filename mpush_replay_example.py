@@ -0,0 +1,78 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Reprocess the push data recorded by mpush_example.py --capture, the frames are parsed
+and written to data files as during the acquisition.
+
+Usage:
+python3 mpush_replay_example.py --capture <capture file> --speed <speed> --shots <num shots>
+                 --acquis_per_file <acquis per file>
+'''
+from Licel import licel_data, licel_Config, licel_capture
+from datetime import datetime
+import argparse
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Mpush replay example ')
+    argparser.add_argument('--capture', type=str, required=True,
+                    help='capture file recorded by mpush_example.py --capture')
+    argparser.add_argument('--speed', type=float, default=0,
+                    help='1 replays with the original timing, 0 as fast as possible')
+    argparser.add_argument('--shots', type=int, default=None,
+                    help='number of shots per acquisition, by default the number stored in the capture')
+    argparser.add_argument('--acquis_per_file', type=int, nargs='?', default=10,
+                    help='maximal number of acquisitions to write in a single file')
+
+    args = argparser.parse_args()
+    return args
+
+def main():
+    myArguments = commandLineInterface()
+    dataParser = licel_data.DataParser()
+    ConfigInfo = licel_Config.Config("Acquis.ini")
+    ConfigInfo.readConfig()
+
+    replay = licel_capture.CaptureReplay(myArguments.capture, myArguments.speed)
+    ethernetController = replay.open(ConfigInfo, myArguments.shots)
+    print("*** Replaying {} recorded at: {} *** \r\n"
+          .format(myArguments.capture, datetime.fromtimestamp(replay.header['created'])))
+
+    acquisitions = 0
+    startTime = datetime.now()
+    try:
+        while replay.recvPushData():
+            stopTime = datetime.now()
+            (dataValid,
+             dataSets,
+             time_stamp,
+             analogue_shots,
+             pc_shots) = dataParser.parseDataFromBuffer(ConfigInfo, ethernetController,
+                                                        replay.shots)
+            if (dataValid):
+                dataParser.savePushDataToLicelFileFormat(dataSets,
+                                                         ConfigInfo,
+                                                         startTime, stopTime,
+                                                         ethernetController.Tr.hardwareInfos,
+                                                         time_stamp,
+                                                         analogue_shots,
+                                                         pc_shots,
+                                                         replay.shots,
+                                                         myArguments.acquis_per_file)
+                acquisitions += 1
+            else :
+                dataParser.removeInvalidDataFromBuffer(ethernetController.Tr.pushBuffer,
+                                                       ethernetController.Tr.exceptedByte)
+            startTime = stopTime
+    except KeyboardInterrupt:
+        print("User interrupted program by pressing Ctrl-C.")
+    finally:
+        replay.close()
+
+    print("{} acquisition written to {} \r\n"
+          .format(acquisitions, ConfigInfo.measurementInfo.szOutPath))
+    print(dataParser.statistics)
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,78 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+MPUSH acquisition on several ethernet controllers, the frames of all controllers are
+aligned by the controller millisecond timestamp. Each controller writes its data files
+as configured in its own Acquis.ini.
+
+Usage:
+python3 multi_controller_example.py --controller <ip>:<port>:<Acquis.ini> [--controller ...]
+                 --acq <num acquis> --shots <num shots> --acquis_per_file <acquis per file>
+                 --tolerance <ms>
+'''
+from Licel import licel_orchestrator
+from datetime import datetime
+import argparse
+import asyncio
+
+def parseControllerEntry(argument: str) -> 'licel_orchestrator.ControllerEntry':
+    ip, port, acquisIni = argument.split(":", 2)
+    return licel_orchestrator.ControllerEntry(ip, int(port), acquisIni)
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Multi controller example ')
+    argparser.add_argument('--controller', type=parseControllerEntry, action='append',
+                           required=True,
+                    help='ethernet controller as <ip>:<port>:<Acquis.ini>, repeat for each controller')
+    argparser.add_argument('--acq', type=int, default=10,
+                    help='number of aligned acquisitions, if -1 we will acquire infinite number of acquisitions')
+    argparser.add_argument('--shots', type=int,  default=150,
+                    help='number of shots per acquisition')
+    argparser.add_argument('--acquis_per_file', type=int, nargs='?', default=10,
+                    help='maximal number of acquisitions to write in a single file')
+    argparser.add_argument('--tolerance', type=float, default=100,
+                    help='maximal timestamp difference in ms between aligned frames')
+
+    args = argparser.parse_args()
+    return args
+
+async def acquire(myArguments):
+    acquisition = licel_orchestrator.MultiControllerAcquisition(myArguments.controller,
+                                                                myArguments.shots,
+                                                                myArguments.tolerance)
+    await acquisition.connect()
+    await acquisition.start()
+    print("*** Started mpush acqusition at:",datetime.now(), " *** \r\n")
+
+    cycle_count = 0
+    try:
+        async for alignedFrames in acquisition.alignedFrames():
+            for name, frame in alignedFrames.items():
+                controller = acquisition.controllers[name]
+                controller.dataParser.savePushDataToLicelFileFormat(frame.DataSet,
+                                                                    controller.Config,
+                                                                    frame.startTime,
+                                                                    frame.stopTime,
+                                                                    controller.controller.Tr.hardwareInfos,
+                                                                    frame.time_stamp,
+                                                                    frame.analogue_shots,
+                                                                    frame.pc_shots,
+                                                                    myArguments.shots,
+                                                                    myArguments.acquis_per_file)
+            cycle_count += 1
+            if cycle_count == myArguments.acq:
+                break
+    finally:
+        await acquisition.stop()
+
+    print("{} aligned acquisitions written \r\n".format(cycle_count))
+    print(acquisition.report())
+    print("*** Stopped mpush acquisition at:",datetime.now(), " *** \r\n")
+
+def main():
+    asyncio.run(acquire(commandLineInterface()))
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,53 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Usage:
+python3 reader_example.py --path <Licel file or directory> --verbose
+'''
+from Licel import licel_reader
+import argparse
+import os
+import time
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Licel file reader example')
+    argparser.add_argument('--path', type=str, default=".",
+                    help='Licel file or directory holding Licel files, e.g. szOutPath of Acquis.ini')
+    argparser.add_argument('--verbose', type=bool, default=False,
+                           action=argparse.BooleanOptionalAction,
+                    help='print the data sets of each acquisition')
+    args = argparser.parse_args()
+    return args
+
+def main():
+    myArguments = commandLineInterface()
+    if os.path.isdir(myArguments.path):
+        paths = sorted(os.path.join(myArguments.path, name) for name in os.listdir(myArguments.path)
+                       if os.path.isfile(os.path.join(myArguments.path, name)))
+    else:
+        paths = [myArguments.path]
+
+    start = time.perf_counter()
+    files = set()
+    acquisitions = 0
+    bins = 0
+    for path, acquisition, data in licel_reader.iterArchive(paths):
+        files.add(path)
+        acquisitions += 1
+        if myArguments.verbose:
+            print("{} {} {} timestamp {}".format(os.path.basename(path), acquisition.fileName,
+                                                 acquisition.startTime, acquisition.timestamp))
+        for dataset, Set in zip((dataset for dataset in acquisition.datasets if dataset.active), data):
+            bins += Set.size
+            if myArguments.verbose:
+                print("    {:5s} {:>7g}.{} {:6d} bins {:6d} shots mean {:.1f}"
+                      .format(dataset.descriptor, dataset.wavelength, dataset.polarisation,
+                              dataset.bins, dataset.shots, Set.mean()))
+    seconds = time.perf_counter() - start
+    print("{} acquisitions in {} files, {} bins mapped in {:.3f} s"
+          .format(acquisitions, len(files), bins, seconds))
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,58 @@
+'''
+Copyright ©: Licel GmbH
+
+fixtures running the library against the controller emulator on the local machine
+'''
+import os
+import socket
+
+import pytest
+
+from Licel import licel_emulator, licel_tcpip, licel_Config
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def freePort() -> int:
+    ''' command port whose push and kill ports, port+1 and port+2, are free as well '''
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        if port > 65000:
+            continue
+        try:
+            for offset in (1, 2):
+                with socket.socket() as probe:
+                    probe.bind(("127.0.0.1", port + offset))
+        except OSError:
+            continue
+        return port
+
+@pytest.fixture
+def emulator():
+    ''' running emulator with the transient recorder of Acquis.ini, sending 200 frames/s '''
+    myEmulator = licel_emulator.ControllerEmulator(port = freePort(), transientRecorders = [0],
+                                                   frameRate = 200)
+    myEmulator.start()
+    yield myEmulator
+    myEmulator.stop()
+
+@pytest.fixture
+def Config(tmp_path):
+    ''' configuration of Acquis.ini writing the data files to ``tmp_path`` '''
+    myConfig = licel_Config.Config(os.path.join(REPOSITORY, "Acquis.ini"))
+    myConfig.readConfig()
+    myConfig.measurementInfo.szOutPath = str(tmp_path)
+    return myConfig
+
+@pytest.fixture
+def ethernetController(emulator, Config):
+    ''' controller connected to ``emulator``, command and push connection opened '''
+    controller = licel_tcpip.EthernetController("127.0.0.1", emulator.port, Config.socketOptions)
+    controller.openConnection()
+    controller.openPushConnection()
+    controller.Tr.listInstalledTr()
+    controller.Tr.configureHardware(Config)
+    yield controller
+    controller.shutdownConnection()
+    controller.shutdownPushConnection()
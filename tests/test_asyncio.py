@@ -0,0 +1,26 @@
+'''
+Copyright ©: Licel GmbH
+
+AsyncEthernetController and AsyncTransientRecorder against the controller emulator
+'''
+import asyncio
+
+import pytest
+
+from Licel import licel_asyncio
+
+def test_block_response_must_match(emulator, monkeypatch):
+    handleCommand = emulator.handleCommand
+    def noBlock(command):
+        return "NO BLOCK executed" if command == "BLOCK OFF" else handleCommand(command)
+    monkeypatch.setattr(emulator, "handleCommand", noBlock)
+    async def blockTriggers():
+        controller = licel_asyncio.AsyncEthernetController("127.0.0.1", emulator.port)
+        await controller.openConnection()
+        try:
+            assert await controller.Tr.blockRackTrigger("A") == "BLOCK executed\n"
+            with pytest.raises(AssertionError):
+                await controller.Tr.unblockRackTrigger()
+        finally:
+            await controller.shutdownConnection()
+    asyncio.run(blockTriggers())
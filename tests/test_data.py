@@ -0,0 +1,79 @@
+'''
+Copyright ©: Licel GmbH
+
+DataParser against the controller emulator
+'''
+import numpy
+import pytest
+
+from Licel import licel_data
+
+SHOTS = 10
+
+def test_frame_layout_of_the_mpush_acquisition(ethernetController, Config):
+    Tr = ethernetController.Tr
+    dataParser = licel_data.DataParser()
+    with pytest.raises(RuntimeError):
+        dataParser.getFrameLayout(Config, ethernetController, SHOTS)
+    print(Tr.MPushStartFromConfig(SHOTS, Config))
+    try:
+        # editing the configuration in place does not change the running acquisition
+        Config.TrConfigs[0].pcEnabled['A'] = False
+        frameLayout = dataParser.getFrameLayout(Config, ethernetController, SHOTS)
+        assert frameLayout is Tr.frameLayout
+        assert frameLayout.frameSize == Tr.exceptedByte
+        with pytest.raises(ValueError):
+            dataParser.getFrameLayout(Config, ethernetController, SHOTS + 1)
+        Tr.recvPushData()
+        dataValid, DataSet, *_ = dataParser.parseDataFromBuffer(Config, ethernetController, SHOTS)
+        assert dataValid
+        assert len(DataSet) == 2
+    finally:
+        print(Tr.MPushStop())
+
+def test_header_follows_edits_of_the_configuration(ethernetController, Config, monkeypatch):
+    Tr = ethernetController.Tr
+    dataParser = licel_data.DataParser()
+    shots = {0: {'A': 12}}
+    before = dataParser._generatePushDatasetsHeaderline(Config, Tr.hardwareInfos, shots, shots)
+    assert " 01064." not in before
+    # edits in place show up in the next header without applying the configuration again
+    Config.TrConfigs[0].analogueWavelength['A'] = 1064
+    # the hardware information is shared by all transient recorder objects and updated in place
+    binWidth = Tr.hardwareInfos[0]['binWidth']
+    monkeypatch.setitem(Tr.hardwareInfos[0], 'binWidth', 2 * binWidth)
+    after = dataParser._generatePushDatasetsHeaderline(Config, Tr.hardwareInfos, shots, shots)
+    assert after.count("\n") == before.count("\n")
+    assert " 01064." in after
+    assert " {:1.2f} ".format(Tr.hardwareInfos[0]['binWidth']) in after
+    Config.TrConfigs[0].pcEnabled['A'] = False
+    assert dataParser._generatePushDatasetsHeaderline(Config, Tr.hardwareInfos,
+                                                      shots, shots).count("\n") == 1
+    Config.measurementInfo.Zenith = 45
+    Config.measurementInfo.Azimuth = 90
+    secondLine = dataParser._generateSecondHeaderline(Config, "01/01/2025 00:00:00",
+                                                      "01/01/2025 00:01:00")
+    assert secondLine.endswith(" 45.0 90.0\n")
+
+def test_square_root_binary_at_the_uint32_limit():
+    dataParser = licel_data.DataParser()
+    analogue = numpy.zeros(3, numpy.uint32)
+    squared = numpy.full(3, 0xffffffff ** 2, numpy.uint64)
+    squared[1] = numpy.iinfo(numpy.uint64).max
+    # the largest square roots fit into uint32 and do not wrap around
+    sqd_bin = dataParser.getSquareRootBinary(analogue, squared, 3, 1)
+    assert sqd_bin.dtype == numpy.uint32
+    assert (sqd_bin >= 0xfffffffe).all()
+
+def test_photon_counting_fullword_bins_align_with_photon_counting():
+    dataParser = licel_data.DataParser()
+    rng = numpy.random.default_rng(0)
+    uPHO = rng.integers(0, 1 << 16, size=101, dtype=numpy.uint16)
+    uPHM = rng.integers(0, 1 << 16, size=101, dtype=numpy.uint16)
+    PUREPHOTON = 1
+    photon = dataParser._convert_Photoncounting(uPHO, PUREPHOTON)
+    fullword = dataParser._convert_Photoncounting_Fullword(uPHO, uPHM)
+    # only the first, invalid element is removed, the first valid bin is kept
+    assert fullword.size == photon.size == uPHO.size - 1
+    assert numpy.array_equal(fullword & 0xFFFF, photon)
+    assert numpy.array_equal(fullword >> 16, uPHM[1:] & 0xFF)
@@ -0,0 +1,80 @@
+'''
+Copyright ©: Licel GmbH
+
+Heartbeat against the controller emulator answering the probes late.
+'''
+import threading
+import time
+
+from Licel import licel_heartbeat, licel_reconnect
+
+def delayProbes(emulator, monkeypatch, delay: float) -> threading.Event:
+    ''' the emulator answers ``*IDN?`` after ``delay`` seconds while the returned event is set '''
+    slow = threading.Event()
+    handleCommand = emulator.handleCommand
+    def slowCommand(command):
+        if command == "*IDN?" and slow.is_set():
+            slow.clear()
+            time.sleep(delay)
+        return handleCommand(command)
+    monkeypatch.setattr(emulator, "handleCommand", slowCommand)
+    return slow
+
+def waitFor(condition, timeout: float = 5) -> bool:
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+CONFIG = licel_heartbeat.HeartbeatConfig(idleTimeout = 0.1, probeInterval = 0.1,
+                                         probeTimeout = 0.2, deadTimeout = 5,
+                                         pollInterval = 0.05)
+
+def test_late_probe_releases_the_command_lock(ethernetController, emulator, monkeypatch):
+    slow = delayProbes(emulator, monkeypatch, 1.0)
+    slow.set()
+    heartbeat = ethernetController.startHeartbeat(CONFIG)
+    try:
+        assert waitFor(lambda: heartbeat.state == licel_heartbeat.LIVENESSSTATE['SUSPECT'])
+        assert heartbeat.lateResponsePending
+        assert ethernetController.commandLock.acquire(timeout = 0.5)
+        try:
+            # the late response is discarded before the command is written
+            assert ethernetController.Tr.selectTR(0) == "SELECT executed\n"
+        finally:
+            ethernetController.commandLock.release()
+        assert not heartbeat.lateResponsePending
+        assert heartbeat.state == licel_heartbeat.LIVENESSSTATE['IDLE']
+        assert heartbeat.lateProbes == 1
+    finally:
+        ethernetController.stopHeartbeat()
+
+def test_reconnect_from_the_heartbeat_thread(ethernetController, Config, emulator, monkeypatch):
+    slow = delayProbes(emulator, monkeypatch, 1.0)
+    policy = licel_reconnect.ReconnectionPolicy(initialDelay = 0.01)
+    manager = licel_reconnect.ReconnectionManager(ethernetController, Config, policy = policy)
+    manager.startSession()
+    errors : list[BaseException] = []
+    reconnected = threading.Event()
+    def onStateChange(previous, state):
+        if state != licel_heartbeat.LIVENESSSTATE['DEAD']:
+            return
+        try:
+            manager.reconnect()
+            reconnected.set()
+        except BaseException as error:
+            errors.append(error)
+    config = licel_heartbeat.HeartbeatConfig(**{**vars(CONFIG), 'deadTimeout' : 0.4})
+    heartbeat = ethernetController.startHeartbeat(config, onStateChange)
+    try:
+        slow.set()
+        assert waitFor(lambda: reconnected.is_set() or errors)
+        assert not errors
+        assert ethernetController.heartbeat is heartbeat
+        assert heartbeat._thread is not None and heartbeat._thread.is_alive()
+        assert ethernetController.Tr.heartbeat is heartbeat
+        assert "executed" in ethernetController.Tr.selectTR(0)
+    finally:
+        ethernetController.stopHeartbeat()
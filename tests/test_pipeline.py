@@ -0,0 +1,144 @@
+'''
+Copyright ©: Licel GmbH
+
+MPushPipeline against the controller emulator: end of the acquisition, stop on error
+and dropped frames.
+'''
+import threading
+import time
+
+import pytest
+
+from Licel import licel_capture, licel_data, licel_heartbeat, licel_pipeline
+
+SHOTS = 10
+#: seconds within which the pipeline has to finish or stop
+TIMEOUT = 10
+HEARTBEAT = licel_heartbeat.HeartbeatConfig(idleTimeout = 0.1, probeInterval = 0.1,
+                                            probeTimeout = 0.2, deadTimeout = 0.5,
+                                            pollInterval = 0.05)
+
+def stopWithin(pipeline: licel_pipeline.MPushPipeline, timeout: float = TIMEOUT):
+    ''' call ``pipeline.stop()``, fails if it does not return within ``timeout`` '''
+    result : list = []
+    def stop():
+        try:
+            pipeline.stop()
+            result.append(None)
+        except BaseException as error:
+            result.append(error)
+    thread = threading.Thread(target=stop, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "stop() did not return"
+    return result[0]
+
+def test_acquisitions_are_written(ethernetController, Config, tmp_path):
+    dataParser = licel_data.DataParser()
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, dataParser, Config,
+                                            SHOTS, 5, acquisitions = 12)
+    pipeline.start()
+    assert pipeline.wait(TIMEOUT)
+    assert stopWithin(pipeline) is None
+    assert dataParser._myFileDescriptor.closed
+    assert pipeline.statistics.framesReceived == 12
+    assert pipeline.statistics.framesWritten == 12
+    assert len(list(tmp_path.iterdir())) >= 1
+
+def test_stop_before_the_end(ethernetController, Config):
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, licel_data.DataParser(), Config,
+                                            SHOTS, 5)
+    pipeline.start()
+    assert not pipeline.wait(0.5)
+    assert stopWithin(pipeline) is None
+    assert pipeline.statistics.framesWritten == pipeline.statistics.framesReceived > 0
+
+def test_stop_after_parser_error(ethernetController, Config):
+    dataParser = licel_data.DataParser()
+    def decodeFrame(*args, **kwargs):
+        raise RuntimeError("decode failed")
+    dataParser.decodeFrame = decodeFrame
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, dataParser, Config, SHOTS, 5)
+    pipeline.start()
+    assert pipeline.wait(TIMEOUT)
+    error = stopWithin(pipeline)
+    assert isinstance(error, RuntimeError)
+    assert pipeline.statistics.framesWritten == 0
+
+def test_stop_after_writer_error(ethernetController, Config):
+    dataParser = licel_data.DataParser()
+    def savePushDataToLicelFileFormat(*args, **kwargs):
+        raise OSError("disk full")
+    dataParser.savePushDataToLicelFileFormat = savePushDataToLicelFileFormat
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, dataParser, Config, SHOTS, 5,
+                                            parseQueueDepth = 2, writeQueueDepth = 2)
+    pipeline.start()
+    assert pipeline.wait(TIMEOUT)
+    assert isinstance(stopWithin(pipeline), OSError)
+
+def test_wait_returns_with_dropped_frames(ethernetController, Config):
+    dataParser = licel_data.DataParser()
+    decodeFrame = dataParser.decodeFrame
+    def slowDecodeFrame(*args, **kwargs):
+        time.sleep(0.05)
+        return decodeFrame(*args, **kwargs)
+    dataParser.decodeFrame = slowDecodeFrame
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, dataParser, Config, SHOTS, 5,
+                                            acquisitions = 20, parseQueueDepth = 1,
+                                            dropWhenFull = True)
+    pipeline.start()
+    assert pipeline.wait(TIMEOUT)
+    assert stopWithin(pipeline) is None
+    statistics = pipeline.statistics
+    assert statistics.framesReceived == 20
+    assert statistics.framesDropped > 0
+    assert statistics.framesWritten + statistics.framesDropped == statistics.framesReceived
+
+def test_push_capture(ethernetController, Config, tmp_path):
+    Tr = ethernetController.Tr
+    print(Tr.MPushStartFromConfig(SHOTS, Config))
+    Tr.startPushCapture(str(tmp_path / "push.cap"))
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, licel_data.DataParser(), Config,
+                                            SHOTS, 5, acquisitions = 12)
+    pipeline.start(startMPush = False)
+    assert pipeline.wait(TIMEOUT)
+    assert stopWithin(pipeline) is None
+    Tr.stopPushCapture()
+    captured = sum(len(data) for _, data in licel_capture.CaptureReader(str(tmp_path / "push.cap")))
+    assert captured >= 12 * Tr.exceptedByte
+
+def test_receiver_reports_push_data_to_the_heartbeat(ethernetController, Config):
+    heartbeat = ethernetController.startHeartbeat(HEARTBEAT)
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, licel_data.DataParser(), Config,
+                                            SHOTS, 5)
+    try:
+        pipeline.start()
+        time.sleep(0.5)
+        assert heartbeat.state == licel_heartbeat.LIVENESSSTATE['STREAMING']
+        assert stopWithin(pipeline) is None
+    finally:
+        ethernetController.stopHeartbeat()
+
+def test_receiver_stops_when_the_heartbeat_declares_the_controller_dead(ethernetController,
+                                                                       Config, emulator,
+                                                                       monkeypatch):
+    handleCommand = emulator.handleCommand
+    def lateProbes(command):
+        if command == "*IDN?":
+            time.sleep(1.0)
+        return handleCommand(command)
+    monkeypatch.setattr(emulator, "handleCommand", lateProbes)
+    Tr = ethernetController.Tr
+    # no push data arrives after MPUSH is stopped
+    print(Tr.MPushStartFromConfig(SHOTS, Config))
+    print(Tr.MPushStop())
+    heartbeat = ethernetController.startHeartbeat(HEARTBEAT)
+    pipeline = licel_pipeline.MPushPipeline(ethernetController, licel_data.DataParser(), Config,
+                                            SHOTS, 5)
+    try:
+        pipeline.start(startMPush = False)
+        assert pipeline.wait(TIMEOUT)
+        assert heartbeat.isDead
+        assert isinstance(stopWithin(pipeline), ConnectionError)
+    finally:
+        ethernetController.stopHeartbeat()
@@ -0,0 +1,66 @@
+'''
+Copyright ©: Licel GmbH
+
+ReconnectionManager: restore of the session on the controller emulator and counting of
+the lost frames.
+'''
+import time
+
+from Licel import licel_data, licel_reconnect
+
+SHOTS = 10
+
+def test_partial_restore_stops_and_clears_all_transient_recorders(ethernetController, Config,
+                                                                  emulator, monkeypatch):
+    policy = licel_reconnect.ReconnectionPolicy(initialDelay = 0.01)
+    manager = licel_reconnect.ReconnectionManager(ethernetController, Config, SHOTS, policy)
+    manager.startSession()
+    ethernetController.Tr.recvPushData()
+    commands : list[str] = []
+    handleCommand = emulator.handleCommand
+    def logCommand(command):
+        commands.append(command)
+        return handleCommand(command)
+    monkeypatch.setattr(emulator, "handleCommand", logCommand)
+    manager.reconnect()
+    assert manager.statistics.partialRestores == 1
+    assert manager.statistics.replayedTransientRecorders == 0
+    mpush = next(index for index, command in enumerate(commands) if command.startswith("MPUSH"))
+    restore = commands[:mpush]
+    selectTr0 = restore.index("SELECT 0")
+    assert restore[selectTr0 + 1:selectTr0 + 3] == ["SLAVE", "CLEAR"]
+    assert not any(command.startswith(("DISC", "PRETRIG", "RANGE")) for command in restore)
+    dataParser = licel_data.DataParser()
+    ethernetController.Tr.recvPushData()
+    dataValid, *_ = dataParser.parseDataFromBuffer(Config, ethernetController, SHOTS)
+    assert dataValid
+    print(ethernetController.Tr.MPushStop())
+
+def test_full_restore_after_a_controller_restart(ethernetController, Config, emulator):
+    # the controller runs for an hour, its timer restarts during the outage
+    emulator._bootTime = time.monotonic() - 3600
+    manager = licel_reconnect.ReconnectionManager(ethernetController, Config)
+    manager.startSession()
+    emulator._bootTime = time.monotonic()
+    manager.reconnect()
+    assert manager.statistics.fullRestores == 1
+    assert manager.statistics.replayedTransientRecorders == 1
+
+def test_partial_restore_over_the_millisecond_timer_wrap(ethernetController, Config, emulator):
+    emulator._bootTime = time.monotonic() - (0xffffffff - 200) / 1000
+    manager = licel_reconnect.ReconnectionManager(ethernetController, Config)
+    manager.startSession()
+    time.sleep(0.4)
+    manager.reconnect()
+    assert int(ethernetController.getMilliSecs().split()[-1]) < 0x80000000
+    assert manager.statistics.partialRestores == 1
+    assert manager.statistics.fullRestores == 0
+
+def test_lost_frames_over_the_timestamp_wrap():
+    manager = licel_reconnect.ReconnectionManager(None, None)
+    time_stamp = 0xffffffff - 250
+    # the frame after the wrap follows a gap of 3 frames
+    for step in (0, 100, 100, 400, 100):
+        time_stamp = (time_stamp + step) & 0xffffffff
+        manager.recordFrame(time_stamp)
+    assert manager.statistics.framesLost == 3
@@ -0,0 +1,44 @@
+'''
+Copyright ©: Licel GmbH
+
+socket options of the push connection against the controller emulator
+'''
+import socket
+
+import pytest
+
+from Licel import licel_tcpip
+
+SHOTS = 10
+
+@pytest.mark.skipif(not hasattr(socket, "TCP_QUICKACK"), reason="TCP_QUICKACK is Linux only")
+def test_quickack_is_set_after_each_receive(emulator, Config, monkeypatch):
+    Config.socketOptions.quickAck = True
+    controller = licel_tcpip.EthernetController("127.0.0.1", emulator.port, Config.socketOptions)
+    controller.openConnection()
+    controller.openPushConnection()
+    try:
+        Tr = controller.Tr
+        assert Tr.pushBuffer.quickAck
+        Tr.listInstalledTr()
+        Tr.configureHardware(Config)
+        print(Tr.MPushStartFromConfig(SHOTS, Config))
+        options : list[tuple[int, int, int]] = []
+        PushSocket = Tr.PushSocket
+        class RecordingSocket:
+            ''' push socket recording the options set '''
+            def recv_into(self, *args):
+                return PushSocket.recv_into(*args)
+            def setsockopt(self, *args):
+                options.append(args)
+                return PushSocket.setsockopt(*args)
+            def __getattr__(self, name):
+                return getattr(PushSocket, name)
+        monkeypatch.setattr(Tr, "PushSocket", RecordingSocket())
+        Tr.recvPushData()
+        Tr.recvPushData()
+        print(Tr.MPushStop())
+        assert options.count((socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)) >= 2
+    finally:
+        controller.shutdownConnection()
+        controller.shutdownPushConnection()
@@ -0,0 +1,61 @@
+'''
+Copyright ©: Licel GmbH
+
+TransientRecorder.configureHardware against the controller emulator
+'''
+import pytest
+
+from Licel import licel_data
+
+def logCommands(emulator, monkeypatch, responses: dict[str, str] | None = None) -> list[str]:
+    ''' commands received by the emulator, ``responses`` replaces the response of a command '''
+    commands : list[str] = []
+    handleCommand = emulator.handleCommand
+    def logCommand(command):
+        commands.append(command)
+        if responses is not None and command in responses:
+            return responses[command]
+        return handleCommand(command)
+    monkeypatch.setattr(emulator, "handleCommand", logCommand)
+    return commands
+
+def test_configure_hardware_commands(ethernetController, Config, emulator, monkeypatch):
+    commands = logCommands(emulator, monkeypatch)
+    Config.TrConfigs[0].blockedTrig['B'] = True
+    ethernetController.Tr.configureHardware(Config)
+    selectTr0 = commands.index("SELECT 0")
+    assert commands[selectTr0 + 1:selectTr0 + 3] == ["SLAVE", "CLEAR"]
+    assert "PRETRIG 0" in commands or "PRETRIG 1" in commands
+    blockOff = commands.index("BLOCK OFF")
+    assert commands[blockOff + 1] == "BLOCK B"
+
+def test_configure_hardware_block_response_must_match(ethernetController, Config, emulator,
+                                                      monkeypatch):
+    logCommands(emulator, monkeypatch, {"BLOCK OFF" : "NO BLOCK executed"})
+    with pytest.raises(AssertionError):
+        ethernetController.Tr.configureHardware(Config)
+
+def test_configure_hardware_stops_at_a_failed_select(ethernetController, Config, emulator,
+                                                     monkeypatch):
+    commands = logCommands(emulator, monkeypatch, {"SELECT 0" : "SELECT failed"})
+    with pytest.raises(RuntimeError):
+        ethernetController.Tr.configureHardware(Config)
+    # the commands for the transient recorder are not sent to the one selected before
+    assert commands[-1] == "SELECT 0"
+
+def test_combined_data_sets_give_the_buffer_back_on_errors(ethernetController, monkeypatch):
+    Tr = ethernetController.Tr
+    dataParser = licel_data.DataParser()
+    def conversionFails(*args):
+        raise ValueError("conversion failed")
+    monkeypatch.setattr(dataParser, "_combine_Analog_Datasets_16bit", conversionFails)
+    monkeypatch.setattr(dataParser, "_combine_Analog_Datasets", conversionFails)
+    released = []
+    release = Tr.bufferPool.release
+    def logRelease(buffer):
+        released.append(buffer)
+        release(buffer)
+    monkeypatch.setattr(Tr.bufferPool, "release", logRelease)
+    with pytest.raises(ValueError):
+        Tr.getCombinedDataSets(Tr.hardwareInfos, dataParser, 10, [(0, "MEM_A", "ANALOGUE", 100)])
+    assert len(released) == 1
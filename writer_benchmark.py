@@ -0,0 +1,176 @@
+#! python3.10
+'''
+Copyright ©: Licel GmbH
+
+Benchmark of the Licel file writing of MPUSH acquisitions with many data sets per frame.
+DataParser.savePushDataToLicelFileFormat is compared against Licel.licel_writer.LicelFileWriter,
+the script fails if the written files are not byte identical.
+
+Usage:
+python3 writer_benchmark.py --datasets <datasets> [<datasets> ...] --bins <bins>
+                 --acquisitions <acquisitions> --acquis_per_file <acquis per file>
+                 --fsync <never|acquisition|file|interval> --writer_thread
+'''
+from Licel import licel_data, licel_Config, licel_writer
+from datetime import datetime
+import argparse
+import filecmp
+import numpy
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+MEMORIES = ("A", "B", "C", "D")
+
+def commandLineInterface():
+    argparser = argparse.ArgumentParser(description='Licel file writer benchmark')
+    argparser.add_argument('--datasets', type=int, nargs='+', default=[8, 32, 128],
+                    help='number of data sets per acquisition, at most 128')
+    argparser.add_argument('--bins', type=int, default=2000,
+                    help='number of bins of each data set')
+    argparser.add_argument('--acquisitions', type=int, default=500,
+                    help='number of acquisitions written by each writer')
+    argparser.add_argument('--acquis_per_file', type=int, default=100,
+                    help='maximal number of acquisitions to write in a single file')
+    argparser.add_argument('--fsync', type=str, choices=list(licel_writer.FSYNCPOLICY.values()),
+                    default=licel_writer.FSYNCPOLICY['NEVER'],
+                    help='fsync policy of the LicelFileWriter')
+    argparser.add_argument('--writer_thread', type=bool, default=False,
+                           action=argparse.BooleanOptionalAction,
+                    help='write through a licel_writer.WriterThread and print the queue latency')
+    argparser.add_argument('--seed', type=int, default=0,
+                    help='seed of the random generator')
+    args = argparser.parse_args()
+    return args
+
+class FileNames:
+    ''' deterministic file names, so that the files of both writers can be compared '''
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, prefix: str) -> str:
+        self.count += 1
+        return "{:s}{:07d}.{:06d}".format(prefix, 0, self.count)
+
+def makeConfig(datasets: int, bins: int, outPath: str) -> 'licel_Config.Config':
+    ''' configuration with ``datasets`` data sets, analogue and photon counting of 16 transient recorders '''
+    Config = licel_Config.Config("Acquis.ini")
+    Config.measurementInfo = licel_Config.MeasureInfo(szLocation = "Berlin", nAltitude = 50,
+                                                      dLongitude = 13.4, dLatitude = 52.5,
+                                                      Zenith = 0.0, Azimuth = 0.0,
+                                                      cFirstLetter = "b", szOutPath = outPath,
+                                                      repRateL0 = 20, repRateL1 = 0, repRateL2 = 0)
+    Config.TrConfigs = []
+    for address in range(16):
+        trConfig = licel_Config.TrConfig(nTransientRecorder = address, nRange = 500,
+                                         discriminator = 8, freqDivider = address % 3)
+        Config.TrConfigs.append(trConfig)
+    channels = [(trConfig, memory, isPhotonCounting) for memory in MEMORIES
+                for isPhotonCounting in (False, True) for trConfig in Config.TrConfigs]
+    for trConfig, memory, isPhotonCounting in channels[:datasets]:
+        enabled = trConfig.pcEnabled if isPhotonCounting else trConfig.analogueEnabled
+        enabled[memory] = True
+        (trConfig.pcBins if isPhotonCounting else trConfig.analogueBins)[memory] = bins
+        (trConfig.pcWavelength if isPhotonCounting else trConfig.analogueWavelength)[memory] = 355
+        (trConfig.pcPolarisation if isPhotonCounting else trConfig.analoguePolarisation)[memory] = 0
+        (trConfig.pmVoltagePC if isPhotonCounting else trConfig.pmVoltageAnalogue)[memory] = 800
+        trConfig.laserAssignment[memory] = 1
+    Config.numDataSets = min(datasets, len(channels))
+    return Config
+
+def makeAcquisitions(Config: 'licel_Config.Config', bins: int, count: int, rng):
+    ''' synthetic (DataSet, time_stamp, analogue_shots, pc_shots) as returned by parseDataFromBuffer '''
+    acquisitions = []
+    for number in range(count):
+        DataSet = []
+        analogue_shots : dict[int, dict[str, int]] = {}
+        pc_shots : dict[int, dict[str, int]] = {}
+        for trConfig in Config.TrConfigs:
+            for memory, enabled in trConfig.analogueEnabled.items():
+                if enabled == True:
+                    DataSet.append(rng.integers(0, 2**32, bins, dtype=numpy.uint32))
+                    analogue_shots.setdefault(trConfig.nTransientRecorder, {})[memory] = 300
+            for memory, enabled in trConfig.pcEnabled.items():
+                if enabled == True:
+                    DataSet.append(rng.integers(0, 2**16, bins, dtype=numpy.uint32))
+                    pc_shots.setdefault(trConfig.nTransientRecorder, {})[memory] = 300
+        acquisitions.append((DataSet, 1000 + 50 * number, analogue_shots, pc_shots))
+    return acquisitions
+
+def hardwareInfos() -> dict[int, dict[str, int | str | float]]:
+    return {address : {'ADC Bits' : 16, 'PC Bits' : 4, 'FIFOLength' : 16384, 'binWidth' : 3.75,
+                       'ID' : 'TR{}'.format(address), 'HWCAP' : '0', 'binShift' : 1.25}
+            for address in range(16)}
+
+def runDataParser(Config, acquisitions, myArguments) -> float:
+    dataParser = licel_data.DataParser()
+    dataParser._generateFileName = FileNames()
+    startTime = stopTime = datetime(2026, 1, 1, 12, 0, 0)
+    start = time.perf_counter()
+    for DataSet, time_stamp, analogue_shots, pc_shots in acquisitions:
+        dataParser.savePushDataToLicelFileFormat(DataSet, Config, startTime, stopTime,
+                                                 hardwareInfos(), time_stamp, analogue_shots,
+                                                 pc_shots, 300, myArguments.acquis_per_file)
+    dataParser._myFileDescriptor.close()
+    return time.perf_counter() - start
+
+def runWriter(Config, acquisitions, myArguments) -> tuple[float, 'licel_writer.WriterStatistics',
+                                                          'licel_writer.QueueStatistics | None']:
+    writer = licel_writer.LicelFileWriter(Config, hardwareInfos(), 300, myArguments.acquis_per_file,
+                                          myArguments.fsync)
+    writer._dataParser._generateFileName = FileNames()
+    startTime = stopTime = datetime(2026, 1, 1, 12, 0, 0)
+    start = time.perf_counter()
+    if myArguments.writer_thread:
+        with licel_writer.WriterThread(writer) as writerThread:
+            for DataSet, time_stamp, analogue_shots, pc_shots in acquisitions:
+                writerThread.write(DataSet, startTime, stopTime, time_stamp, analogue_shots, pc_shots)
+        return time.perf_counter() - start, writer.statistics, writerThread.statistics
+    with writer:
+        for DataSet, time_stamp, analogue_shots, pc_shots in acquisitions:
+            writer.write(DataSet, startTime, stopTime, time_stamp, analogue_shots, pc_shots)
+    return time.perf_counter() - start, writer.statistics, None
+
+def main():
+    myArguments = commandLineInterface()
+    rng = numpy.random.default_rng(myArguments.seed)
+    identical = True
+    print("{:>9s} {:>14s} {:>14s} {:>8s} {:>12s}".format("datasets", "DataParser/s", "writer/s",
+                                                         "speedup", "calls/acq"))
+    for datasets in myArguments.datasets:
+        outPath = tempfile.mkdtemp(prefix="writer_benchmark_")
+        try:
+            referencePath = os.path.join(outPath, "dataParser")
+            writerPath = os.path.join(outPath, "writer")
+            os.makedirs(referencePath)
+            os.makedirs(writerPath)
+            Config = makeConfig(datasets, myArguments.bins, referencePath)
+            acquisitions = makeAcquisitions(Config, myArguments.bins, myArguments.acquisitions, rng)
+            referenceSeconds = runDataParser(Config, acquisitions, myArguments)
+            Config.measurementInfo.szOutPath = writerPath
+            writerSeconds, statistics, queueStatistics = runWriter(Config, acquisitions, myArguments)
+            files = sorted(os.listdir(referencePath))
+            match, mismatch, errors = filecmp.cmpfiles(referencePath, writerPath, files, shallow=False)
+            if mismatch or errors or sorted(os.listdir(writerPath)) != files:
+                identical = False
+                print("{} data sets: files differ {}".format(datasets, mismatch + errors),
+                      file=sys.stderr)
+            print("{:9d} {:14.1f} {:14.1f} {:8.2f} {:12.2f}"
+                  .format(Config.numDataSets, len(acquisitions) / referenceSeconds,
+                          len(acquisitions) / writerSeconds, referenceSeconds / writerSeconds,
+                          statistics.writeCalls / statistics.acquisitions))
+            if queueStatistics is not None:
+                print("{:9s} queue latency mean {:.3f} ms max {:.3f} ms, blocked {:.3f} s"
+                      .format("", 1000 * queueStatistics.meanLatency, 1000 * queueStatistics.maxLatency,
+                              queueStatistics.blockedSeconds))
+        finally:
+            shutil.rmtree(outPath, ignore_errors=True)
+    if not identical:
+        raise SystemExit("LicelFileWriter output differs from DataParser.savePushDataToLicelFileFormat")
+
+if __name__ == "__main__":
+
+    main()